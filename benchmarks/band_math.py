@@ -0,0 +1,80 @@
+"""
+Benchmark for the compiled band-math plan against naive NumPy evaluation.
+The naive path evaluates every index expression on its own with ordinary
+NumPy operators, allocating a new full-size array per operation. Reports the
+number of full-size temporaries, traced peak memory and wall time of both.
+
+Run from the repository root:
+    python -m benchmarks.band_math --size 4000
+"""
+
+import argparse
+import time
+import tracemalloc
+
+import numpy as np
+
+from processing.band_math import INDEX_EXPRESSIONS, compile_indices, parse_expression
+
+def count_operations(tree):
+    """
+    Count array operations in a parsed expression (each one is a naive temporary).
+    """
+    if tree[0] in ("band", "const"):
+        return 0
+    return 1 + sum(count_operations(child) for child in tree[1:])
+
+def naive_indices(bands, indices):
+    """
+    Evaluate each index expression separately with plain NumPy operators.
+    """
+    floats = {name: values.astype(np.float32) for name, values in bands.items()}
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return {name: eval(INDEX_EXPRESSIONS[name], {}, floats) for name in indices}
+
+def measure(func):
+    """
+    Return (seconds, traced peak bytes) for one call of `func`.
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+    func()
+    seconds = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return seconds, peak
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--size", type=int, default=4000, help="tile width and height in pixels")
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    indices = list(INDEX_EXPRESSIONS)
+    rng = np.random.default_rng(0)
+    bands = {
+        name: rng.integers(1, 10000, (args.size, args.size), dtype=np.uint16)
+        for name in ("blue", "green", "red", "red_edge", "nir")
+    }
+
+    plan = compile_indices(indices)
+    out = {name: np.empty((args.size, args.size), dtype=np.float32) for name in indices}
+
+    naive_ops = sum(count_operations(parse_expression(INDEX_EXPRESSIONS[name])) for name in indices)
+    naive_temporaries = naive_ops + len(bands)
+    naive = min(measure(lambda: naive_indices(bands, indices)) for _ in range(args.repeats))
+    # A fresh plan per run so its scratch buffers count towards the peak
+    compiled = min(measure(lambda: compile_indices(indices).evaluate(bands, out=out)) for _ in range(args.repeats))
+    # Steady state for windowed processing: one plan reused across tiles
+    plan.evaluate(bands, out=out)
+    warm = min(measure(lambda: plan.evaluate(bands, out=out)) for _ in range(args.repeats))
+
+    tile_mb = args.size * args.size * 4 / 1e6
+    print(f"indices: {', '.join(indices)} on {args.size:,} x {args.size:,} ({tile_mb:.0f} MB per float32 array)")
+    print(f"{'':10} {'ops':>5} {'temporaries':>12} {'peak MB':>9} {'seconds':>9}")
+    print(f"{'naive':10} {naive_ops:>5} {naive_temporaries:>12} {naive[1] / 1e6:>9.1f} {naive[0]:>9.3f}")
+    print(f"{'compiled':10} {plan.n_operations:>5} {plan.n_buffers:>12} {compiled[1] / 1e6:>9.1f} {compiled[0]:>9.3f}")
+    print(f"{'reused':10} {plan.n_operations:>5} {0:>12} {warm[1] / 1e6:>9.1f} {warm[0]:>9.3f}")
+
+if __name__ == "__main__":
+    main()
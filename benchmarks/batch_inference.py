@@ -0,0 +1,73 @@
+"""
+Throughput benchmark for batch biomass inference.
+Trains the per-stage models on a small simulated survey set, writes a large
+feature survey (rows resampled from the simulated plots) to a SurveyStore and
+times predict_field() in-process and score_survey() streaming predictions into
+the store with 1 and N worker processes.
+
+Run from the repository root:
+    python -m benchmarks.batch_inference --rows 20000000 --workers 4
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from data.survey_store import SurveyStore
+from modeling.features import MODEL_FEATURES, load_feature_matrix
+from modeling.inference import get_registry, predict_field, score_survey
+from modeling.training import train_models
+
+def write_large_survey(store, table, matrix, dah, n_rows, seed=0):
+    """
+    Append one survey of `n_rows` plots resampled (with jitter) from `matrix`.
+    """
+    rng = np.random.default_rng(seed)
+    survey = matrix["dah"] == dah
+    source = np.flatnonzero(survey)[rng.integers(0, survey.sum(), n_rows)]
+    columns = {"field_id": np.arange(n_rows, dtype=np.int32)}
+    for name in MODEL_FEATURES["fusion"]:
+        values = matrix[name][source]
+        columns[name] = (values * rng.normal(1, 0.02, n_rows)).astype(np.float32)
+    store.append_survey(table, dah, columns)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10**7)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--dah", type=int, default=226)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SurveyStore(os.path.join(tmp, "store"))
+        model_dir = os.path.join(tmp, "models")
+        matrix = load_feature_matrix(store, n_fields=40)
+        train_models(matrix, model_dir, targets=("biomass",), max_workers=1)
+        write_large_survey(store, "features", matrix, args.dah, args.rows)
+
+        segment = store._segment_path("features", args.dah)
+        columns = {name: np.load(os.path.join(segment, f"{name}.npy"), mmap_mode="r")
+                   for name in MODEL_FEATURES["fusion"]}
+        predict_field(columns, dah=args.dah, model_dir=model_dir)  # load models, warm the page cache
+        model = get_registry(model_dir).stage_routes("biomass")[0]
+        print(f"{args.rows:,} rows, {len(MODEL_FEATURES['fusion'])} feature columns, "
+              f"linear models folded: {model.is_linear}")
+
+        began = time.perf_counter()
+        predict_field(columns, dah=args.dah, model_dir=model_dir)
+        elapsed = time.perf_counter() - began
+        print(f"predict_field (in process):    {elapsed:6.2f} s  {args.rows / elapsed / 1e6:7.1f} M predictions/s")
+
+        for workers in sorted({1, args.workers}):
+            output = f"predictions_w{workers}"
+            began = time.perf_counter()
+            score_survey(store, "features", args.dah, output, model_dir=model_dir, workers=workers)
+            elapsed = time.perf_counter() - began
+            print(f"score_survey ({workers:>2} workers):      {elapsed:6.2f} s  "
+                  f"{args.rows / elapsed / 1e6:7.1f} M predictions/s (streamed to the store)")
+
+if __name__ == "__main__":
+    main()
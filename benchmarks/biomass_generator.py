@@ -0,0 +1,41 @@
+"""
+Scaling benchmark for the vectorized biomass season generator.
+Times generate_biomass_season() from 10^3 up to 10^7 rows and reports the cost
+per row, which stays roughly flat when the generator scales linearly.
+
+Run from the repository root:
+    python -m benchmarks.biomass_generator --max-rows 10000000
+"""
+
+import argparse
+import time
+
+from data.biomass_data import DAH_INTERVALS, generate_biomass_season
+
+def time_generator(n_rows, repeats=3):
+    """
+    Return the best wall time (seconds) for generating roughly `n_rows` rows.
+    """
+    n_fields = max(1, n_rows // len(DAH_INTERVALS))
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        generate_biomass_season(n_fields=n_fields)
+        best = min(best, time.perf_counter() - start)
+    return n_fields * len(DAH_INTERVALS), best
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--max-rows", type=int, default=10**7)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'rows':>12} {'seconds':>10} {'ns/row':>8} {'Mrows/s':>8}")
+    n_rows = 10**3
+    while n_rows <= args.max_rows:
+        rows, seconds = time_generator(n_rows, args.repeats)
+        print(f"{rows:>12,} {seconds:>10.4f} {seconds / rows * 1e9:>8.1f} {rows / seconds / 1e6:>8.2f}")
+        n_rows *= 10
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Throughput benchmark for the vectorized UAV flight-path planner.
+Plans lawnmower flights over a synthetic farm of irregular convex fields at
+the advisor's altitudes, then re-plans the whole farm for a changed overlap
+the way a parameter change in the planner would, and reports plan time,
+waypoints and the farm's totals of images and flight hours.
+
+Run from the repository root:
+    python -m benchmarks.flight_planner --fields 10000 --repeats 5
+"""
+
+import argparse
+import statistics
+import time
+
+import numpy as np
+
+from planning.flight_path import advisor_altitude, plan_flights
+
+def synthetic_farm(n_fields, seed=0, min_ha=5.0, max_ha=60.0):
+    """
+    Return (vertices, offsets, dah) for n_fields convex fields of 4 to 8
+    vertices laid out on a grid, with random size, shape and orientation.
+    """
+    rng = np.random.default_rng(seed)
+    n_vertices = rng.integers(4, 9, n_fields)
+    offsets = np.zeros(n_fields + 1, dtype=np.int64)
+    np.cumsum(n_vertices, out=offsets[1:])
+    field = np.repeat(np.arange(n_fields), n_vertices)
+
+    # Vertices at sorted random angles on a stretched, rotated ellipse
+    angle = np.sort(rng.uniform(0, 2 * np.pi, offsets[-1]) + 2 * np.pi * field) - 2 * np.pi * field
+    radius = np.sqrt(rng.uniform(min_ha, max_ha, n_fields) * 1e4 / np.pi)
+    stretch = rng.uniform(1.0, 3.0, n_fields)
+    rotation = rng.uniform(0, np.pi, n_fields)
+    u = np.cos(angle) * (radius * np.sqrt(stretch))[field]
+    v = np.sin(angle) * (radius / np.sqrt(stretch))[field]
+    cos, sin = np.cos(rotation)[field], np.sin(rotation)[field]
+    side = int(np.ceil(np.sqrt(n_fields)))
+    centre = np.column_stack([np.arange(n_fields) % side, np.arange(n_fields) // side]) * 2000.0
+    vertices = np.column_stack([u * cos - v * sin, u * sin + v * cos]) + centre[field]
+    return vertices, offsets, rng.integers(100, 310, n_fields)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--fields", type=int, default=10000)
+    parser.add_argument("--sensor", default="multispectral")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    vertices, offsets, dah = synthetic_farm(args.fields, args.seed)
+    altitude = advisor_altitude(dah)
+
+    timings = {}
+    for label, side_overlap in (("plan", 0.7), ("re-plan", 0.8)):
+        runs = []
+        for _ in range(args.repeats):
+            began = time.perf_counter()
+            plan = plan_flights(vertices, offsets, altitude, sensor=args.sensor, side_overlap=side_overlap)
+            runs.append(time.perf_counter() - began)
+        timings[label] = statistics.median(runs)
+        print(f"{label:<8} side overlap {side_overlap:.0%}: {timings[label] * 1e3:8.1f} ms  "
+              f"{plan['n_lines'].sum():>9,} lines {plan['waypoints'].shape[0]:>10,} waypoints  "
+              f"{plan['n_images'].sum():>12,} images  {plan['flight_time_s'].sum() / 3600:8.0f} flight h")
+    gsd = f", median GSD {np.median(plan['gsd_cm']):.1f} cm/px" if plan["n_images"].any() else ""
+    print(f"{args.fields:,} fields, {offsets[-1]:,} vertices; {args.fields / timings['plan']:,.0f} fields/s{gsd}")
+
+if __name__ == "__main__":
+    main()
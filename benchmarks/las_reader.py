@@ -0,0 +1,78 @@
+"""
+Open, query and stream benchmark for the memory-mapped LAS reader.
+Writes a synthetic sugarcane cloud as a LAS file (or uses --path), then times
+opening it, a spatial-window plus classification query and streaming x/y/z
+chunks into a PointGridder. Opening only parses the header, so it costs the
+same for any file size.
+
+Run from the repository root:
+    python -m benchmarks.las_reader --points 50000000
+"""
+
+import argparse
+import os
+import resource
+import tempfile
+import time
+
+import numpy as np
+
+from processing.las import GROUND_CLASS, LasFile, write_las
+from processing.lidar import GridSpec, PointGridder, synthetic_sugarcane_cloud
+
+def write_synthetic(path, n_points, extent, chunk):
+    """
+    Write a synthetic cloud in `chunk`-point pieces, classifying the lowest returns as ground.
+    """
+    pieces = []
+    for seed, start in enumerate(range(0, n_points, chunk)):
+        points = synthetic_sugarcane_cloud(min(chunk, n_points - start), width=extent, length=extent, seed=seed)
+        pieces.append(points.astype(np.float32))
+    points = np.concatenate(pieces)
+    terrain = 0.02 * points[:, 0] + 0.5 * np.sin(points[:, 1] / 20.0)
+    classes = np.where(points[:, 2] - terrain < 0.1, GROUND_CLASS, 5).astype(np.uint8)
+    write_las(path, {"x": points[:, 0], "y": points[:, 1], "z": points[:, 2], "classification": classes},
+              point_format=1)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--points", type=int, default=10**7)
+    parser.add_argument("--extent", type=float, default=300.0, help="field width and length (m)")
+    parser.add_argument("--window", type=float, default=50.0, help="side of the queried square (m)")
+    parser.add_argument("--chunk", type=int, default=5 * 10**6)
+    parser.add_argument("--path", help="existing LAS file to use instead of a synthetic one")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = args.path
+        if path is None:
+            path = os.path.join(tmp, "cloud.las")
+            write_synthetic(path, args.points, args.extent, args.chunk)
+
+        began = time.perf_counter()
+        las = LasFile(path)
+        opened = time.perf_counter() - began
+
+        xmin, ymin, _ = las.header["min"]
+        bounds = (xmin, ymin, xmin + args.window, ymin + args.window)
+        began = time.perf_counter()
+        rows = las.select(bounds=bounds, classes=[GROUND_CLASS], chunk_size=args.chunk)
+        query = time.perf_counter() - began
+
+        began = time.perf_counter()
+        gridder = PointGridder(GridSpec.from_bounds(*las.header["min"][:2], *las.header["max"][:2], 0.5))
+        gridder.add_chunks(las.iter_xyz(chunk_size=args.chunk))
+        streaming = time.perf_counter() - began
+
+        size_mb = os.path.getsize(path) / 2**20
+        del las
+
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"file: {size_mb:,.0f} MB, {gridder.n_points:,} points")
+    print(f"open:   {opened * 1e3:8.2f} ms")
+    print(f"query:  {query:8.2f} s  ({len(rows):,} ground points in a {args.window:g} m window)")
+    print(f"stream: {streaming:8.2f} s  ({gridder.n_points / streaming / 1e6:6.2f} Mpoints/s into the gridder)")
+    print(f"peak RSS {peak_mb:,.0f} MB")
+
+if __name__ == "__main__":
+    main()
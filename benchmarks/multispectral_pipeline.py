@@ -0,0 +1,76 @@
+"""
+Throughput and memory benchmark for the chunked multispectral index pipeline.
+Writes synthetic 5-band uint16 rasters of SIZE x SIZE pixels to a temporary
+directory, computes NDVI, GNDVI and NDRE window by window and reports input
+MB/s and the process peak RSS.
+
+Run from the repository root:
+    python -m benchmarks.multispectral_pipeline --size 20000
+"""
+
+import argparse
+import os
+import resource
+import tempfile
+import time
+
+import numpy as np
+
+from processing.multispectral import (
+    BAND_NAMES,
+    DEFAULT_WINDOW,
+    create_output,
+    process_rasters,
+    write_strip,
+)
+
+def peak_rss_mb():
+    """
+    Return the peak resident set size of this process in MB (Linux reports KB).
+    """
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def write_synthetic_band(path, size, seed, strip_rows=512):
+    """
+    Write a SIZE x SIZE uint16 band strip by strip, so generation stays small in memory.
+    """
+    raster = create_output(path, (size, size), dtype=np.uint16)
+    rng = np.random.default_rng(seed)
+    for row in range(0, size, strip_rows):
+        stop = min(row + strip_rows, size)
+        strip = write_strip(raster, row, stop)
+        strip[:] = rng.integers(500, 40000, (stop - row, size), dtype=np.uint16)
+        strip.flush()
+        del strip
+    return path
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--size", type=int, default=20000, help="raster width and height in pixels")
+    parser.add_argument("--window", type=int, nargs=2, default=DEFAULT_WINDOW, metavar=("ROWS", "COLS"))
+    parser.add_argument("--dir", default=None, help="scratch directory (default: system temp)")
+    args = parser.parse_args()
+
+    indices = ["ndvi", "gndvi", "ndre"]
+    with tempfile.TemporaryDirectory(dir=args.dir) as root:
+        band_paths = {
+            band: write_synthetic_band(os.path.join(root, f"{band}.npy"), args.size, seed)
+            for seed, band in enumerate(BAND_NAMES)
+            if band in ("green", "red", "red_edge", "nir")
+        }
+        rss_before = peak_rss_mb()
+
+        start = time.perf_counter()
+        process_rasters(band_paths, indices, os.path.join(root, "indices"), tuple(args.window))
+        seconds = time.perf_counter() - start
+
+    input_mb = len(band_paths) * args.size * args.size * 2 / 1e6
+    output_mb = len(indices) * args.size * args.size * 4 / 1e6
+    print(f"raster: {args.size:,} x {args.size:,}, {len(band_paths)} bands in, {len(indices)} indices out")
+    print(f"time:      {seconds:10.2f} s")
+    print(f"input:     {input_mb / seconds:10.1f} MB/s ({input_mb:,.0f} MB)")
+    print(f"output:    {output_mb / seconds:10.1f} MB/s ({output_mb:,.0f} MB)")
+    print(f"peak RSS:  {peak_rss_mb():10.1f} MB (before processing: {rss_before:.1f} MB)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""
+Throughput benchmark for nitrogen recommendations.
+Compares per-call get_nitrogen_recommendation() with the batch classify_nitrogen()
+over random (DAH, leaf N %) pairs, reporting pairs per second for each.
+
+Run from the repository root:
+    python -m benchmarks.nitrogen_recommendation --scalar 100000 --batch 10000000
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from data.nitrogen_data import classify_nitrogen, get_nitrogen_recommendation
+
+def random_pairs(n, seed=0):
+    """
+    Return arrays of DAH and leaf N % covering all stages and status levels.
+    """
+    rng = np.random.default_rng(seed)
+    dah = rng.integers(80, 330, n).astype(np.int32)
+    nitrogen = rng.uniform(1.0, 2.6, n).astype(np.float32)
+    return dah, nitrogen
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scalar", type=int, default=10**5, help="pairs for the per-call loop")
+    parser.add_argument("--batch", type=int, default=10**7, help="pairs for the batch call")
+    args = parser.parse_args()
+
+    dah, nitrogen = random_pairs(args.scalar)
+    start = time.perf_counter()
+    for day, value in zip(dah.tolist(), nitrogen.tolist()):
+        get_nitrogen_recommendation(day, value)
+    scalar_rate = args.scalar / (time.perf_counter() - start)
+
+    dah, nitrogen = random_pairs(args.batch)
+    start = time.perf_counter()
+    classify_nitrogen(dah, nitrogen, return_delta=True)
+    batch_rate = args.batch / (time.perf_counter() - start)
+
+    print(f"per-call: {scalar_rate:>14,.0f} pairs/s ({args.scalar:,} pairs)")
+    print(f"batch:    {batch_rate:>14,.0f} pairs/s ({args.batch:,} pairs)")
+    print(f"speed-up: {batch_rate / scalar_rate:>14,.0f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Throughput benchmark for orthomosaic assembly from synthetic UAV frames.
+Renders a textured ground raster, cuts a lawnmower survey of overlapping,
+slightly rotated and noisy frames from it with GPS positions off by a few
+metres, assembles them with processing.orthomosaic and reports per-stage
+throughput, peak RSS and how far frames were placed from their true
+positions compared with GPS alone.
+
+Run from the repository root:
+    python -m benchmarks.orthomosaic --lines 8 --frames-per-line 12 --workers 4
+"""
+
+import argparse
+import os
+import resource
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+from processing.orthomosaic import build_orthomosaic
+
+def synthetic_ground(rows, cols, seed=0):
+    """
+    Return a uint8 ground texture: crop rows over multi-scale noise with soil patches.
+    """
+    rng = np.random.default_rng(seed)
+    ground = np.zeros((rows, cols), dtype=np.float32)
+    for sigma, amplitude in ((1.5, 20.0), (6.0, 30.0), (25.0, 25.0)):
+        noise = rng.standard_normal((rows, cols)).astype(np.float32)
+        noise = cv2.GaussianBlur(noise, (0, 0), sigma)
+        ground += amplitude * noise / noise.std()
+    row_angle = rng.uniform(0, np.pi)
+    y, x = np.mgrid[:rows, :cols].astype(np.float32)
+    ground += 25 * np.sin((x * np.cos(row_angle) + y * np.sin(row_angle)) * 2 * np.pi / 30)
+    return np.clip(ground + 128, 0, 255).astype(np.uint8)
+
+def write_synthetic_frames(root, lines, frames_per_line, frame_shape=(480, 640), gsd=0.05,
+                           front_overlap=0.75, side_overlap=0.7, bands=1, gps_sigma=1.5, seed=0):
+    """
+    Write a lawnmower survey of frames to `root`.
+    Returns (frame paths, GPS positions (m), true frame centres (ground pixels)).
+    """
+    rng = np.random.default_rng(seed)
+    frame_rows, frame_cols = frame_shape
+    across, along = frame_cols * (1 - side_overlap), frame_rows * (1 - front_overlap)
+    margin = max(frame_shape)
+    ground = synthetic_ground(int(2 * margin + frames_per_line * along), int(2 * margin + lines * across), seed)
+
+    line, step = np.divmod(np.arange(lines * frames_per_line), frames_per_line)
+    centres = np.column_stack([margin + line * across, margin + step * along])
+    centres += rng.normal(0, 4, centres.shape)
+    angles = rng.normal(0, 1.5, len(centres))
+
+    paths = []
+    for index, ((col, row), angle) in enumerate(zip(centres, angles)):
+        # Ground -> frame: rotate about the frame centre, then centre the frame
+        M = cv2.getRotationMatrix2D((col, row), angle, 1.0)
+        M[:, 2] += ((frame_cols - 1) / 2 - col, (frame_rows - 1) / 2 - row)
+        frame = cv2.warpAffine(ground, M, (frame_cols, frame_rows), flags=cv2.INTER_LINEAR)
+        gain = rng.uniform(0.95, 1.05, bands)
+        noise = rng.normal(0, 3, (frame_rows, frame_cols, bands))
+        frame = np.clip(frame[..., None] * gain + noise, 0, 255).astype(np.uint8)
+        path = os.path.join(root, f"frame_{index:05d}.npy")
+        np.save(path, frame[..., 0] if bands == 1 else frame)
+        paths.append(path)
+
+    positions = np.column_stack([centres[:, 0], ground.shape[0] - centres[:, 1]]) * gsd
+    positions += rng.normal(0, gps_sigma, positions.shape)
+    return paths, positions, centres
+
+def placement_error(transforms, frame_shape, centres):
+    """
+    Return per-frame distance (pixels) between placed and true centres, after
+    removing the mosaic's overall offset.
+    """
+    frame_rows, frame_cols = frame_shape
+    centre = np.array([(frame_cols - 1) / 2, (frame_rows - 1) / 2, 1.0])
+    placed = transforms @ centre
+    placed = placed[:, :2] / placed[:, 2:]
+    offset = (placed - centres).mean(axis=0)
+    return np.hypot(*(placed - centres - offset).T)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--lines", type=int, default=8)
+    parser.add_argument("--frames-per-line", type=int, default=12)
+    parser.add_argument("--frame-shape", type=int, nargs=2, default=(480, 640), metavar=("ROWS", "COLS"))
+    parser.add_argument("--bands", type=int, default=1)
+    parser.add_argument("--gsd", type=float, default=0.05)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--detector", choices=("orb", "akaze"), default="orb")
+    parser.add_argument("--motion", choices=("similarity", "homography"), default="similarity")
+    parser.add_argument("--tile-size", type=int, default=1024)
+    parser.add_argument("--dir", default=None, help="scratch directory (default: system temp)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(dir=args.dir) as root:
+        began = time.perf_counter()
+        paths, positions, centres = write_synthetic_frames(
+            root, args.lines, args.frames_per_line, tuple(args.frame_shape), args.gsd, bands=args.bands,
+        )
+        print(f"wrote {len(paths)} frames of {args.frame_shape[0]}x{args.frame_shape[1]}x{args.bands} "
+              f"in {time.perf_counter() - began:.2f} s")
+
+        began = time.perf_counter()
+        result = build_orthomosaic(paths, positions, args.gsd, os.path.join(root, "mosaic.npy"),
+                                   workers=args.workers, detector=args.detector, motion=args.motion,
+                                   tile_size=args.tile_size)
+        elapsed = time.perf_counter() - began
+
+    n = len(paths)
+    mosaic_mp = result["shape"][0] * result["shape"][1] / 1e6
+    print(f"features  {result['features_s']:7.2f} s  {n / result['features_s']:8.1f} frames/s")
+    print(f"matching  {result['matching_s']:7.2f} s  {len(result['pairs']) / result['matching_s']:8.1f} pairs/s  "
+          f"({int((result['inliers'] > 0).sum())}/{len(result['pairs'])} pairs matched, "
+          f"{n * (n - 1) // 2} for all pairs)")
+    print(f"blending  {result['blending_s']:7.2f} s  {mosaic_mp / result['blending_s']:8.1f} MP/s  "
+          f"({result['tiles']} tiles, mosaic {result['shape']})")
+    print(f"total     {elapsed:7.2f} s  {n / elapsed:8.1f} frames/s, {result['registered']}/{n} frames registered")
+
+    gps = np.column_stack([positions[:, 0], -positions[:, 1]]) / args.gsd
+    gps_error = np.hypot(*(gps - centres - (gps - centres).mean(axis=0)).T)
+    error = placement_error(result["transforms"], tuple(args.frame_shape), centres)
+    print(f"placement error: mean {error.mean():.1f} px, max {error.max():.1f} px "
+          f"(GPS alone: mean {gps_error.mean():.1f} px)")
+    parent = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+    print(f"peak RSS {parent:.0f} MB (largest worker {children:.0f} MB)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""
+Payload and render-cost benchmark for level-of-detail point-cloud views.
+Builds voxel pyramids for synthetic sugarcane clouds of growing size and
+reports the level picked for a point budget, the Plotly figure JSON size and
+the time to serialize it. Payload should stay flat as the cloud grows.
+
+Run from the repository root:
+    python -m benchmarks.point_lod --max-points 10000000 --budget 20000
+"""
+
+import argparse
+import time
+
+import plotly.graph_objects as go
+
+from processing.lidar import synthetic_sugarcane_cloud
+from processing.point_lod import PointCloudLOD
+
+def figure_json(view):
+    """
+    Serialize the page's Scatter3d figure for a view, as Streamlit would.
+    """
+    fig = go.Figure(data=[go.Scatter3d(
+        x=view["x"], y=view["y"], z=view["z"], mode="markers",
+        marker=dict(size=2, color=view["z"], colorscale="Greens", opacity=0.8),
+    )])
+    return fig.to_json()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--max-points", type=int, default=10**7)
+    parser.add_argument("--budget", type=int, default=20_000)
+    parser.add_argument("--extent", type=float, default=20.0, help="field width and length (m)")
+    args = parser.parse_args()
+
+    sizes = [n for n in (10**4, 10**5, 10**6, 10**7, 10**8) if n <= args.max_points]
+    print(f"{'points':>12} {'build s':>8} {'level':>6} {'voxel m':>8} {'shown':>8} {'json MB':>8} {'json s':>7}")
+    for n_points in sizes:
+        points = synthetic_sugarcane_cloud(n_points, width=args.extent, length=args.extent)
+        began = time.perf_counter()
+        lod = PointCloudLOD.from_points(points)
+        build = time.perf_counter() - began
+        del points
+
+        view = lod.view(args.budget)
+        began = time.perf_counter()
+        payload = figure_json(view)
+        render = time.perf_counter() - began
+        print(f"{n_points:>12,} {build:>8.2f} {view['level']:>6} {view['voxel_size']:>8.2f} "
+              f"{len(view['z']):>8,} {len(payload) / 2**20:>8.2f} {render:>7.3f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Throughput benchmark for variable-rate nitrogen prescriptions.
+Writes a leaf N raster of a synthetic sugarcane block of the given area and
+pixel size (from its NDRE via the demo calibration), delineates NDRE zones,
+then times per-pixel and per-zone prescriptions on the spreader grid and their
+CSV and GeoJSON export.
+
+Run from the repository root:
+    python -m benchmarks.prescription --hectares 1000 --pixel-size 0.5 --dah 120
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from data.index_rasters import generate_index_raster, ndre_to_nitrogen
+from planning.prescription import build_prescription, write_prescription_csv, write_prescription_geojson
+from processing.multispectral import BandRaster, create_output, write_strip
+from processing.zoning import delineate_zones
+
+def write_nitrogen_raster(path, ndre_path, strip_rows=512):
+    """
+    Convert an NDRE raster into a leaf N (%) raster strip by strip.
+    """
+    ndre = BandRaster.open(ndre_path)
+    raster = create_output(path, ndre.shape)
+    for row in range(0, ndre.shape[0], strip_rows):
+        stop = min(row + strip_rows, ndre.shape[0])
+        source = ndre.read_strip(row, stop)
+        target = write_strip(raster, row, stop)
+        target[:] = ndre_to_nitrogen(source)
+        target.flush()
+        del source, target
+    return path
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--hectares", type=float, default=1000)
+    parser.add_argument("--pixel-size", type=float, default=0.5, help="metres")
+    parser.add_argument("--dah", type=float, default=120)
+    parser.add_argument("--swath", type=float, default=24.0, help="spreader swath width (m)")
+    parser.add_argument("--zones", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--dir", default=None, help="scratch directory (default: system temp)")
+    args = parser.parse_args()
+
+    size = int(round(np.sqrt(args.hectares * 1e4) / args.pixel_size))
+    with tempfile.TemporaryDirectory(dir=args.dir) as root:
+        ndre = generate_index_raster(os.path.join(root, "ndre.npy"), "ndre", size, args.seed)
+        nitrogen = write_nitrogen_raster(os.path.join(root, "nitrogen.npy"), ndre)
+        zoning = delineate_zones({"ndre": ndre, "nitrogen": nitrogen}, os.path.join(root, "zones.npy"), args.zones,
+                                 seed=args.seed)
+        table = zoning["table"]
+        zone_nitrogen = dict(zip(table["zone"].tolist(), table["nitrogen_mean"].tolist()))
+        print(f"{args.hectares:,.0f} ha at {args.pixel_size} m: {size:,} x {size:,} pixels "
+              f"({size * size / 1e6:,.0f} Mpx); {args.zones} zones delineated in {zoning['seconds']:.1f} s")
+
+        for label, source, zones in (("per pixel", nitrogen, None), ("per zone", zoning["path"], zone_nitrogen)):
+            prescription = build_prescription(source, args.dah, args.pixel_size, args.swath, zone_nitrogen=zones)
+            began = time.perf_counter()
+            write_prescription_csv(os.path.join(root, "prescription.csv"), prescription)
+            csv_seconds = time.perf_counter() - began
+            began = time.perf_counter()
+            write_prescription_geojson(os.path.join(root, "prescription.geojson"), prescription)
+            geojson_seconds = time.perf_counter() - began
+            rates = prescription["cells"]["rate_kg_ha"]
+            print(f"{label:<10} {prescription['seconds']:6.2f} s ({size * size / prescription['seconds'] / 1e6:.0f} Mpx/s)  "
+                  f"{rates.size:,} cells  {prescription['total_n_kg'] / prescription['area_ha']:5.1f} kg N/ha mean, "
+                  f"{np.percentile(rates, 10):.0f}-{np.percentile(rates, 90):.0f} kg/ha P10-P90  "
+                  f"export csv {csv_seconds * 1e3:.0f} ms, geojson {geojson_seconds * 1e3:.0f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Throughput benchmark for the streaming radiometric calibration stage.
+Writes raw 12-bit 5-band frames of a synthetic field under changing sunlight
+(irradiance, auto-exposure and gain vary per frame) plus two calibration-panel
+captures, calibrates the folder with processing.radiometry and reports
+frames/s, MB/s and the reflectance error against the known scene.
+
+Run from the repository root:
+    python -m benchmarks.radiometric_calibration --frames 200 --workers 8 --dtype uint16
+"""
+
+import argparse
+import csv
+import os
+import resource
+import tempfile
+
+import numpy as np
+
+from processing.multispectral import BAND_NAMES
+from processing.radiometry import (
+    FRAME_TABLE,
+    REFLECTANCE_SCALE,
+    calibrate_folder,
+    load_panel_calibration,
+)
+
+# Sensor constants of the synthetic camera: DN per unit of reflectance x
+# irradiance x exposure x gain, dark offset and 12-bit saturation
+SENSITIVITY = np.array([1.2e6, 1.1e6, 1.0e6, 0.9e6, 0.8e6])
+BLACK_LEVEL = 64
+MAX_DN = 4095
+
+PANEL_REFLECTANCE = np.array([0.49, 0.49, 0.49, 0.49, 0.49])
+
+def write_capture_folder(folder, reflectance, irradiance, exposure, gain, rng, fmt="npy"):
+    """
+    Render raw frames of the given (N, rows, columns, B) reflectance and write
+    them with their frame table.
+    """
+    os.makedirs(folder, exist_ok=True)
+    rows = []
+    for index, scene in enumerate(reflectance):
+        dn = scene * (irradiance[index] * SENSITIVITY * exposure[index] * gain[index]) + BLACK_LEVEL
+        dn += rng.normal(0, 2, dn.shape)
+        raw = np.clip(np.rint(dn), 0, MAX_DN).astype(np.uint16)
+        name = f"frame_{index:05d}.{'tif' if fmt == 'tiff' else 'npy'}"
+        if fmt == "tiff":
+            import tifffile
+            tifffile.imwrite(os.path.join(folder, name), raw)
+        else:
+            np.save(os.path.join(folder, name), raw)
+        rows.append([name, exposure[index], gain[index], *irradiance[index]])
+    with open(os.path.join(folder, FRAME_TABLE), "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["file", "exposure", "gain", *(f"irradiance_{band}" for band in BAND_NAMES)])
+        writer.writerows(rows)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--frames", type=int, default=200)
+    parser.add_argument("--frame-shape", type=int, nargs=2, default=(960, 1280), metavar=("ROWS", "COLS"))
+    parser.add_argument("--format", choices=("npy", "tiff"), default="npy")
+    parser.add_argument("--dtype", choices=("float32", "uint16"), default="float32")
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--dir", default=None, help="scratch directory (default: system temp)")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    rows, cols = args.frame_shape
+    bands = len(BAND_NAMES)
+    # Canopy reflectance per band (vegetation: low visible, high NIR) with texture
+    base = np.array([0.04, 0.08, 0.05, 0.25, 0.45])
+    texture = rng.uniform(0.8, 1.2, (rows, cols, 1))
+    scene = (base * texture).astype(np.float32)
+
+    # Sunlight drops by up to 40% under passing clouds; auto-exposure compensates
+    irradiance = np.outer(1 - 0.4 * rng.uniform(0, 1, args.frames) ** 2, [1.0, 1.05, 1.1, 1.0, 0.9])
+    exposure = 1e-3 / irradiance.mean(axis=1) * rng.uniform(0.9, 1.1, args.frames)
+    gain = rng.choice([1.0, 2.0], args.frames)
+
+    with tempfile.TemporaryDirectory(dir=args.dir) as root:
+        panel_scene = np.broadcast_to(PANEL_REFLECTANCE.astype(np.float32), (2, rows, cols, bands))
+        write_capture_folder(os.path.join(root, "panels"), panel_scene, irradiance[[0, -1]] * 1.02,
+                             np.full(2, 1e-3), np.ones(2), rng)
+        write_capture_folder(os.path.join(root, "flight"), np.broadcast_to(scene, (args.frames, rows, cols, bands)),
+                             irradiance, exposure, gain, rng, fmt=args.format)
+
+        calibration = load_panel_calibration(os.path.join(root, "panels"), PANEL_REFLECTANCE,
+                                             black_level=BLACK_LEVEL)
+        out_dir = os.path.join(root, "reflectance")
+        stats = calibrate_folder(os.path.join(root, "flight"), calibration, out_dir, dtype=args.dtype,
+                                 batch_size=args.batch_size, workers=args.workers)
+        sample = np.load(os.path.join(out_dir, "frame_00000.npy")).astype(np.float32)
+        if args.dtype == "uint16":
+            sample /= REFLECTANCE_SCALE
+
+    raw_mb = args.frames * rows * cols * bands * 2 / 1e6
+    error = np.abs(sample - scene).mean(axis=(0, 1))
+    print(f"{stats['frames']} frames of {rows}x{cols}x{bands} ({args.format} -> {args.dtype}) "
+          f"in {stats['seconds']:.2f} s: {stats['frames_per_s']:.1f} frames/s, {raw_mb / stats['seconds']:.0f} MB/s raw")
+    print("mean absolute reflectance error per band: "
+          + ", ".join(f"{band} {value:.4f}" for band, value in zip(BAND_NAMES, error)))
+    print(f"peak RSS {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f} MB")
+
+if __name__ == "__main__":
+    main()
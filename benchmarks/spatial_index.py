@@ -0,0 +1,85 @@
+"""
+Build and query benchmark for the tiled LiDAR spatial index.
+Writes a synthetic sugarcane cloud to a memory-mapped .npy file, indexes it
+tile by tile and times batched radius, kNN and box queries. Only the tiles
+being queried are loaded, so peak memory follows --max-tiles, not --points.
+
+Run from the repository root:
+    python -m benchmarks.spatial_index --points 100000000 --extent 1000
+"""
+
+import argparse
+import os
+import resource
+import tempfile
+import time
+
+import numpy as np
+
+from processing.lidar import synthetic_sugarcane_cloud
+from processing.spatial_index import SpatialIndex
+
+def write_cloud(path, n_points, extent, chunk):
+    """
+    Write a synthetic cloud to a .npy file chunk by chunk and return it memory-mapped.
+    """
+    points = np.lib.format.open_memmap(path, mode="w+", dtype=np.float64, shape=(n_points, 3))
+    for seed, start in enumerate(range(0, n_points, chunk)):
+        stop = min(start + chunk, n_points)
+        points[start:stop] = synthetic_sugarcane_cloud(stop - start, width=extent, length=extent, seed=seed)
+    points.flush()
+    del points
+    return np.load(path, mmap_mode="r")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--points", type=int, default=10**7)
+    parser.add_argument("--extent", type=float, default=300.0, help="field width and length (m)")
+    parser.add_argument("--tile-size", type=float, default=50.0)
+    parser.add_argument("--max-tiles", type=int, default=16)
+    parser.add_argument("--queries", type=int, default=100_000)
+    parser.add_argument("--radius", type=float, default=0.25)
+    parser.add_argument("--k", type=int, default=16)
+    parser.add_argument("--chunk", type=int, default=5 * 10**6)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        points = write_cloud(os.path.join(tmp, "cloud.npy"), args.points, args.extent, args.chunk)
+        after_write_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+        began = time.perf_counter()
+        index = SpatialIndex(points, tile_size=args.tile_size, max_tiles=args.max_tiles,
+                             chunk_size=args.chunk, bounds=(0, 0, args.extent, args.extent))
+        build = time.perf_counter() - began
+
+        # Queries clustered in one corner, as for a row-detection pass over a block
+        rng = np.random.default_rng(0)
+        span = min(args.extent, 2 * args.tile_size)
+        queries = np.column_stack([rng.uniform(0, span, args.queries), rng.uniform(0, span, args.queries),
+                                   rng.uniform(0, 3, args.queries)])
+        print(f"{args.points:,} points in {index.n_tiles:,} tiles of {args.tile_size:g} m, "
+              f"bucketed in {build:.2f} s")
+
+        began = time.perf_counter()
+        offsets, neighbours = index.query_radius(queries, args.radius)
+        elapsed = time.perf_counter() - began
+        print(f"radius {args.radius:g} m: {elapsed:7.2f} s  {len(queries) / elapsed:>12,.0f} queries/s  "
+              f"{neighbours.size:,} neighbours")
+
+        began = time.perf_counter()
+        index.query_knn(queries, args.k)
+        elapsed = time.perf_counter() - began
+        print(f"kNN k={args.k}:     {elapsed:7.2f} s  {len(queries) / elapsed:>12,.0f} queries/s")
+
+        boxes = rng.uniform(0, span - 2, (1000, 2))
+        began = time.perf_counter()
+        offsets, inside = index.query_box(boxes, boxes + 2)
+        elapsed = time.perf_counter() - began
+        print(f"box 2 m:        {elapsed:7.2f} s  {len(boxes) / elapsed:>12,.0f} boxes/s  {inside.size:,} points")
+
+        del points, index
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"peak RSS {peak_mb:,.0f} MB (after writing the cloud: {after_write_mb:,.0f} MB)")
+
+if __name__ == "__main__":
+    main()
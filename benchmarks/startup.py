@@ -0,0 +1,129 @@
+"""
+Startup benchmark and import-time report for app.py and the pages.
+Runs every page in a fresh interpreter under `-X importtime` and Streamlit's
+AppTest harness, records the cold first run (imports included) and warm
+reruns, and breaks the imports triggered by the page down by top-level
+package. Numeric libraries imported by a page are listed separately; text
+pages (Glossary, Precision Agriculture) should import none.
+
+Run from the repository root:
+    python -m benchmarks.startup --repeats 5 --top 6
+"""
+
+import argparse
+import glob
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+NUMERIC_PACKAGES = ("numpy", "pandas", "pyarrow", "scipy", "sklearn", "skimage", "cv2",
+                    "matplotlib", "seaborn", "joblib")
+
+# Written to stderr between the harness imports and the page run
+_MARKER = "-- page start --"
+
+def _run_child(path, repeats):
+    """
+    Runs in the child interpreter: time one cold and `repeats` warm page runs
+    and print the result as JSON.
+    """
+    started = time.perf_counter()
+    sys.path.insert(0, ROOT)
+    from streamlit.testing.v1 import AppTest
+    harness = time.perf_counter() - started
+
+    before = set(sys.modules)
+    sys.stderr.write(_MARKER + "\n")
+    sys.stderr.flush()
+    began = time.perf_counter()
+    app = AppTest.from_file(path, default_timeout=120).run()
+    cold = time.perf_counter() - began
+    imported = sorted(set(sys.modules) - before)
+
+    warm = []
+    for _ in range(repeats):
+        began = time.perf_counter()
+        app.run()
+        warm.append(time.perf_counter() - began)
+    print(json.dumps({
+        "harness_s": harness,
+        "cold_s": cold,
+        "warm_s": warm,
+        "modules": imported,
+        "exception": str(app.exception[0].value) if app.exception else None,
+    }))
+
+def import_breakdown(stderr):
+    """
+    Sum `-X importtime` cumulative microseconds after the marker by top-level package.
+    """
+    totals = defaultdict(int)
+    lines = stderr.split(_MARKER, 1)[-1].splitlines()
+    for line in lines:
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        # Top-level imports are not indented; nested ones are counted by their parent
+        if name.startswith(" ") and not name[1:].startswith(" ") and cumulative.strip().isdigit():
+            totals[name.strip().split(".")[0]] += int(cumulative)
+    return dict(sorted(totals.items(), key=lambda item: -item[1]))
+
+def profile_page(path, repeats):
+    """
+    Benchmark one page in a fresh interpreter; returns a result dict.
+    """
+    began = time.perf_counter()
+    child = subprocess.run(
+        [sys.executable, "-X", "importtime", "-m", "benchmarks.startup", "--child", path,
+         "--repeats", str(repeats)],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    process = time.perf_counter() - began
+    result = json.loads(child.stdout.strip().splitlines()[-1])
+    result["process_s"] = process
+    result["imports_us"] = import_breakdown(child.stderr)
+    result["numeric"] = sorted({name.split(".")[0] for name in result["modules"]} & set(NUMERIC_PACKAGES))
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("pages", nargs="*", help="page scripts (default: app.py and pages/*.py)")
+    parser.add_argument("--repeats", type=int, default=5, help="warm reruns per page")
+    parser.add_argument("--top", type=int, default=5, help="imports listed per page")
+    parser.add_argument("--out", help="write results JSON to this path")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        _run_child(args.child, args.repeats)
+        return
+
+    pages = [os.path.abspath(page) for page in args.pages] or (
+        [os.path.join(ROOT, "app.py")] + sorted(glob.glob(os.path.join(ROOT, "pages", "*.py")))
+    )
+    results = {}
+    print(f"{'page':<34} {'process':>9} {'cold':>9} {'warm':>9}  numeric imports")
+    for path in pages:
+        name = os.path.splitext(os.path.basename(path))[0]
+        result = results[name] = profile_page(path, args.repeats)
+        warm = statistics.median(result["warm_s"]) if result["warm_s"] else float("nan")
+        print(f"{name:<34} {result['process_s'] * 1e3:7.0f} ms {result['cold_s'] * 1e3:6.0f} ms "
+              f"{warm * 1e3:6.0f} ms  {', '.join(result['numeric']) or '-'}")
+        top = list(result["imports_us"].items())[:args.top]
+        if top:
+            print(" " * 36 + ", ".join(f"{package} {us / 1e3:.0f} ms" for package, us in top))
+        if result["exception"]:
+            print(" " * 36 + f"raised: {result['exception']}")
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump({"python": sys.version.split()[0], "results": results}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,330 @@
+"""
+Benchmark suite for the data generators, index math, point-cloud gridding and page scripts.
+Sized cases run at a size preset (S, M, L or XL). The page accessors and page
+scripts work on fixed data whatever the preset, so they form the separate
+`fixed` group and are left out of sized runs. Every case is timed over
+repeated runs with the garbage collector paused, and has its peak traced
+allocation measured in one extra run. Results are written as JSON; `compare`
+reports the change between two result files and exits non-zero when a case
+regressed.
+
+Run from the repository root:
+    python -m benchmarks.suite run --size M --out results/main.json
+    python -m benchmarks.suite run --size fixed --out results/pages.json
+    python -m benchmarks.suite compare results/main.json results/branch.json --threshold 0.1
+"""
+
+import argparse
+import datetime
+import gc
+import glob
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Problem size per preset: rows for generators and classifiers, pixels per
+# side for band math, points for gridding
+SIZES = {
+    "S": {"rows": 10_000, "calls": 1_000, "pixels": 512, "points": 100_000},
+    "M": {"rows": 1_000_000, "calls": 10_000, "pixels": 2048, "points": 2_000_000},
+    "L": {"rows": 10_000_000, "calls": 100_000, "pixels": 4096, "points": 10_000_000},
+    "XL": {"rows": 50_000_000, "calls": 1_000_000, "pixels": 8192, "points": 50_000_000},
+}
+
+# Group of the size-independent cases; they are set up with size None
+FIXED = "fixed"
+
+# Time changes below this are treated as noise by `compare` (seconds)
+NOISE_FLOOR = 0.002
+
+def _biomass_data(size):
+    from data.biomass_data import generate_biomass_data
+    from data.cache import invalidate_data_cache
+
+    def run():
+        # Cold cache, as on the first page view
+        invalidate_data_cache()
+        generate_biomass_data()
+    return run
+
+def _nitrogen_data(size):
+    from data.cache import invalidate_data_cache
+    from data.nitrogen_data import generate_nitrogen_data
+
+    def run():
+        invalidate_data_cache()
+        generate_nitrogen_data()
+    return run
+
+def _biomass_season(size):
+    from data.biomass_data import generate_biomass_season
+    n_fields = size["rows"] // 6
+    return lambda: generate_biomass_season(n_fields=n_fields)
+
+def _nitrogen_season(size):
+    from data.nitrogen_data import generate_nitrogen_season
+    n_fields = size["rows"] // 6
+    return lambda: generate_nitrogen_season(n_fields=n_fields)
+
+def _random_surveys(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.integers(80, 330, n).astype(np.int32), rng.uniform(1.0, 2.6, n).astype(np.float32)
+
+def _nitrogen_recommendation(size):
+    from data.nitrogen_data import get_nitrogen_recommendation
+    dah, nitrogen = _random_surveys(size["calls"])
+    pairs = list(zip(dah.tolist(), nitrogen.tolist()))
+
+    def run():
+        for day, value in pairs:
+            get_nitrogen_recommendation(day, value)
+    return run
+
+def _nitrogen_classify(size):
+    from data.nitrogen_data import classify_nitrogen
+    dah, nitrogen = _random_surveys(size["rows"])
+    return lambda: classify_nitrogen(dah, nitrogen, return_delta=True)
+
+def _growth_stage_batch(size):
+    from data.growth_stages import classify_growth_stage, growth_stage_labels
+    dah, _ = _random_surveys(size["rows"])
+    return lambda: growth_stage_labels(classify_growth_stage(dah))
+
+def _growth_stage_scalar(size):
+    from data.biomass_data import get_growth_stage
+    from utils import get_sugarcane_growth_stage
+    dah = _random_surveys(size["calls"])[0].tolist()
+
+    def run():
+        for day in dah:
+            get_growth_stage(day)
+            get_sugarcane_growth_stage(day)
+    return run
+
+def _band_math(size):
+    from processing.band_math import INDEX_EXPRESSIONS, compile_indices
+    n = size["pixels"]
+    rng = np.random.default_rng(0)
+    bands = {name: rng.uniform(0.01, 0.6, (n, n)).astype(np.float32)
+             for name in ("blue", "green", "red", "red_edge", "nir")}
+    plan = compile_indices(list(INDEX_EXPRESSIONS))
+    outputs = {name: np.empty((n, n), dtype=np.float32) for name in plan.indices}
+    return lambda: plan.evaluate(bands, out=outputs)
+
+def _lidar_gridding(size):
+    from processing.lidar import GridSpec, PointGridder, surface_models, synthetic_sugarcane_cloud
+    extent = max(50.0, np.sqrt(size["points"] / 400))
+    points = synthetic_sugarcane_cloud(size["points"], width=extent, length=extent)
+    grid = GridSpec.from_bounds(0, 0, extent, extent, 0.25)
+    return lambda: surface_models(PointGridder(grid).add(points))
+
+def _page(path):
+    def setup(size):
+        from streamlit.testing.v1 import AppTest
+        if ROOT not in sys.path:
+            sys.path.insert(0, ROOT)
+
+        def run():
+            app = AppTest.from_file(path, default_timeout=120).run()
+            if app.exception:
+                raise RuntimeError(f"{os.path.basename(path)} raised: {app.exception[0].value}")
+        return run
+    return setup
+
+def _cases(size_name):
+    """
+    Return {case name: setup(size) -> callable} in run order for a size preset
+    or the FIXED group.
+    """
+    if size_name == FIXED:
+        cases = {
+            "biomass_data": _biomass_data,
+            "nitrogen_data": _nitrogen_data,
+        }
+        for path in [os.path.join(ROOT, "app.py")] + sorted(glob.glob(os.path.join(ROOT, "pages", "*.py"))):
+            cases[f"page:{os.path.splitext(os.path.basename(path))[0]}"] = _page(path)
+        return cases
+    return {
+        "biomass_season": _biomass_season,
+        "nitrogen_season": _nitrogen_season,
+        "nitrogen_recommendation": _nitrogen_recommendation,
+        "nitrogen_classify": _nitrogen_classify,
+        "growth_stage_batch": _growth_stage_batch,
+        "growth_stage_scalar": _growth_stage_scalar,
+        "band_math": _band_math,
+        "lidar_gridding": _lidar_gridding,
+    }
+
+def measure(run, repeats, warmup=1):
+    """
+    Time `run` and trace its peak allocation. Returns a result dict.
+    """
+    began = time.perf_counter()
+    run()
+    first = time.perf_counter() - began
+    for _ in range(warmup - 1):
+        run()
+
+    times = []
+    for _ in range(repeats):
+        gc.collect()
+        gc.disable()
+        try:
+            began = time.perf_counter()
+            run()
+            times.append(time.perf_counter() - began)
+        finally:
+            gc.enable()
+
+    # Tracing slows Python-heavy code, so the allocation peak gets its own run
+    gc.collect()
+    tracemalloc.start()
+    try:
+        run()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "first_s": first,
+        "median_s": float(np.median(times)),
+        "min_s": min(times),
+        "max_s": max(times),
+        "repeats": repeats,
+        "peak_alloc_mb": peak / 2**20,
+        "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run_suite(size_name, only=(), repeats=5, warmup=1):
+    """
+    Run the matching cases of a size preset or the FIXED group and return the
+    results document.
+    """
+    size = SIZES.get(size_name)
+    results = {}
+    for name, setup in _cases(size_name).items():
+        if only and not any(pattern in name for pattern in only):
+            continue
+        run = setup(size)
+        results[name] = measure(run, repeats, warmup)
+        result = results[name]
+        print(f"{name:<36} median {result['median_s'] * 1e3:10.2f} ms  first {result['first_s'] * 1e3:10.2f} ms  "
+              f"peak {result['peak_alloc_mb']:9.1f} MB", flush=True)
+        del run
+        gc.collect()
+
+    return {
+        "meta": {
+            "size": size_name,
+            "parameters": size,
+            "repeats": repeats,
+            "commit": _git_commit(),
+            "created": datetime.datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+        "results": results,
+    }
+
+def compare(base, new, threshold=0.10):
+    """
+    Compare two results documents. Returns (rows, regressions) where each row is
+    (case, base median, new median, time ratio, peak ratio, flag).
+    """
+    rows = []
+    regressions = []
+    for name in sorted(set(base["results"]) | set(new["results"])):
+        old = base["results"].get(name)
+        current = new["results"].get(name)
+        if old is None or current is None:
+            rows.append((name, old and old["median_s"], current and current["median_s"], None, None,
+                         "added" if old is None else "removed"))
+            continue
+        time_ratio = current["median_s"] / old["median_s"] if old["median_s"] else float("inf")
+        peak_ratio = (current["peak_alloc_mb"] / old["peak_alloc_mb"]) if old["peak_alloc_mb"] else 1.0
+        slower = time_ratio > 1 + threshold and current["median_s"] - old["median_s"] > NOISE_FLOOR
+        bigger = peak_ratio > 1 + threshold and current["peak_alloc_mb"] - old["peak_alloc_mb"] > 1.0
+        flag = "REGRESSION" if slower or bigger else ("faster" if time_ratio < 1 - threshold else "")
+        if flag == "REGRESSION":
+            regressions.append(name)
+        rows.append((name, old["median_s"], current["median_s"], time_ratio, peak_ratio, flag))
+    return rows, regressions
+
+def _format_seconds(value):
+    return f"{value * 1e3:10.2f} ms" if value is not None else f"{'-':>13}"
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="run benchmark cases")
+    run_parser.add_argument("--size", choices=list(SIZES) + [FIXED], default="S",
+                            help=f"size preset, or {FIXED} for the page accessors and page scripts")
+    run_parser.add_argument("--only", action="append", default=[], metavar="PATTERN",
+                            help="run cases whose name contains PATTERN (repeatable)")
+    run_parser.add_argument("--repeats", type=int, default=5)
+    run_parser.add_argument("--warmup", type=int, default=1)
+    run_parser.add_argument("--out", help="write results JSON to this path")
+
+    compare_parser = commands.add_parser("compare", help="flag regressions between two result files")
+    compare_parser.add_argument("base")
+    compare_parser.add_argument("new")
+    compare_parser.add_argument("--threshold", type=float, default=0.10,
+                                help="relative slowdown or memory growth counted as a regression")
+
+    commands.add_parser("list", help="list benchmark cases and size presets")
+    args = parser.parse_args(argv)
+
+    if args.command == "list":
+        for name in _cases("S"):
+            print(name)
+        for name, size in SIZES.items():
+            print(f"{name}: {size}")
+        print(f"{FIXED}: {', '.join(_cases(FIXED))}")
+        return 0
+
+    if args.command == "run":
+        document = run_suite(args.size, args.only, args.repeats, args.warmup)
+        if args.out:
+            os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+            with open(args.out, "w") as f:
+                json.dump(document, f, indent=2)
+            print(f"results written to {args.out}")
+        return 0
+
+    with open(args.base) as f:
+        base = json.load(f)
+    with open(args.new) as f:
+        new = json.load(f)
+    if base["meta"]["size"] != new["meta"]["size"]:
+        print(f"warning: comparing size {base['meta']['size']} with size {new['meta']['size']}")
+    rows, regressions = compare(base, new, args.threshold)
+    print(f"{'case':<36} {'base':>13} {'new':>13} {'time':>7} {'peak':>7}")
+    for name, old, current, time_ratio, peak_ratio, flag in rows:
+        ratios = f"{time_ratio:6.2f}x {peak_ratio:6.2f}x" if time_ratio is not None else f"{'':>15}"
+        print(f"{name:<36} {_format_seconds(old)} {_format_seconds(current)} {ratios} {flag}")
+    if regressions:
+        print(f"{len(regressions)} regression(s): {', '.join(regressions)}")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,56 @@
+"""
+Throughput benchmark for the multi-field UAV survey scheduler.
+Schedules a season of surveys for synthetic fields with staggered harvest
+dates and reports solve time, surveys per field, lateness and the busiest
+day's load against the fleet's capacity.
+
+Run from the repository root:
+    python -m benchmarks.survey_scheduler --fields 5000 --multispectral-drones 40 --lidar-drones 30 --crews 40
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from planning.survey_schedule import HECTARES_PER_DRONE_DAY, daily_load, schedule_surveys
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--fields", type=int, default=5000)
+    parser.add_argument("--harvest-spread", type=int, default=120, help="days over which fields are harvested")
+    parser.add_argument("--multispectral-drones", type=int, default=40)
+    parser.add_argument("--lidar-drones", type=int, default=30)
+    parser.add_argument("--crews", type=int, default=40)
+    parser.add_argument("--early-days", type=int, default=0)
+    parser.add_argument("--late-days", type=int, default=7)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    fields = {
+        "field_id": np.arange(args.fields),
+        "harvest_date": np.datetime64("2026-01-01") + rng.integers(0, args.harvest_spread, args.fields),
+        "area_ha": rng.uniform(5, 60, args.fields),
+    }
+    drones = {"multispectral": args.multispectral_drones, "lidar": args.lidar_drones}
+
+    began = time.perf_counter()
+    schedule = schedule_surveys(fields, drones=drones, crews=args.crews, early_days=args.early_days,
+                                late_days=args.late_days)
+    elapsed = time.perf_counter() - began
+
+    load = daily_load(schedule, fields)
+    late = schedule["late_days"] > 0
+    print(f"{args.fields:,} fields, {schedule['field_id'].size:,} surveys "
+          f"({schedule['field_id'].size / args.fields:.1f} per field) in {elapsed:.3f} s")
+    print(f"late: {late.mean():.1%} of surveys, mean {schedule['late_days'][late].mean() if late.any() else 0:.1f} "
+          f"days, max {schedule['late_days'].max()} days beyond the window")
+    for sensor, drones_count in drones.items():
+        capacity = drones_count * HECTARES_PER_DRONE_DAY
+        print(f"{sensor:<14} busiest day {load[f'{sensor}_ha'].max():8.0f} ha of {capacity:8.0f} ha, "
+              f"mean {load[f'{sensor}_ha'].mean():8.0f} ha")
+    print(f"{load['date'].size} flying days, busiest {load['surveys'].max()} visits")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Read benchmark for the columnar survey store.
+Compares a single-model time series read through SurveyStore (column projection
+plus a field range) with the regenerate-everything path that builds the whole
+season and then slices three columns out of it.
+
+Run from the repository root:
+    python -m benchmarks.survey_store --fields 1000000 --select 1000
+"""
+
+import argparse
+import tempfile
+import time
+
+from data.biomass_data import (
+    BIOMASS_TABLE,
+    generate_biomass_season,
+    get_biomass_time_series_for_model,
+)
+from data.survey_store import SurveyStore
+
+def best_time(func, repeats):
+    """
+    Return the best wall time (seconds) of `repeats` calls to `func`.
+    """
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--fields", type=int, default=10**6, help="fields in the stored season")
+    parser.add_argument("--select", type=int, default=1000, help="fields in the requested time series")
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as root:
+        store = SurveyStore(root)
+        season = generate_biomass_season(n_fields=args.fields)
+        store.write_season(BIOMASS_TABLE, season)
+        table_bytes = sum(values.nbytes for values in season.values())
+        del season
+
+        selected = range(0, args.select)
+        columns = ["dah", "lidar_biomass", "lidar_error"]
+
+        def regenerate():
+            season = generate_biomass_season(n_fields=args.fields)
+            mask = season["field_id"] < args.select
+            return {name: season[name][mask] for name in columns}
+
+        def projected():
+            return get_biomass_time_series_for_model("lidar", store=store, fields=selected)
+
+        result = projected()
+        read_bytes = int(result.memory_usage(index=False).sum())
+        regenerate_s = best_time(regenerate, args.repeats)
+        projected_s = best_time(projected, args.repeats)
+
+    print(f"table: {args.fields:,} fields, {table_bytes / 1e6:,.1f} MB; selecting {args.select:,} fields")
+    print(f"regenerate + slice: {regenerate_s * 1e3:10.2f} ms")
+    print(f"store projection:   {projected_s * 1e3:10.2f} ms  ({read_bytes / 1e3:,.1f} kB of column data)")
+    print(f"speed-up:           {regenerate_s / projected_s:10.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Build and update benchmark for the index-raster tile pyramid and tile cache.
+Generates a synthetic NDVI raster, builds its full pyramid, re-runs the
+update with nothing changed, overwrites a small window (a re-flown strip)
+and updates again, then times viewport fetches from a cold and a warm cache.
+
+Run from the repository root:
+    python -m benchmarks.tile_pyramid --size 8192 --workers 8
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from data.index_rasters import generate_index_raster
+from processing.tiles import TileCache, TilePyramid
+
+def fetch_view(pyramid, zoom, centre, size=(960, 540)):
+    """
+    Fetch every tile of one viewport; returns (tiles, bytes).
+    """
+    tiles = pyramid.tiles_in_view(zoom, centre, size)
+    return len(tiles), sum(len(pyramid.tile(zoom, x, y)) for x, y, _, _ in tiles)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--size", type=int, default=8192, help="raster width and height in pixels")
+    parser.add_argument("--format", choices=("png", "webp"), default="webp")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--max-mb", type=float, default=512)
+    parser.add_argument("--dir", default=None, help="scratch directory (default: system temp)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(dir=args.dir) as root:
+        source = generate_index_raster(os.path.join(root, "ndvi.npy"), "ndvi", args.size)
+        cache = TileCache(os.path.join(root, "cache"), int(args.max_mb * 2**20))
+        pyramid = TilePyramid(source, cache, fmt=args.format, workers=args.workers)
+        total = sum(np.prod(pyramid.grid(zoom)) for zoom in range(pyramid.max_zoom + 1))
+        print(f"{args.size:,} x {args.size:,} raster, zoom 0-{pyramid.max_zoom}, {total:,} tiles")
+
+        for label in ("full build", "unchanged"):
+            stats = pyramid.update()
+            print(f"{label:<12} {stats['seconds']:7.2f} s  {stats['changed_blocks']:6} changed blocks  "
+                  f"{stats['overview_tiles']:6} overview tiles  {stats['rendered_tiles']:6} rendered "
+                  f"({stats['rendered_tiles'] / stats['seconds']:,.0f} tiles/s)")
+
+        # Re-fly a 300 x 1500 pixel strip
+        raster = np.load(source, mmap_mode="r+")
+        raster[1000:1300, 2000:3500] *= 0.9
+        raster.flush()
+        del raster
+        stats = pyramid.update()
+        print(f"{'re-flown':<12} {stats['seconds']:7.2f} s  {stats['changed_blocks']:6} changed blocks  "
+              f"{stats['overview_tiles']:6} overview tiles  {stats['rendered_tiles']:6} rendered")
+        print(f"cache: {cache.info()['tiles']:,} tiles, {cache.nbytes / 2**20:.1f} MB")
+
+        zoom = pyramid.max_zoom
+        centre = (args.size / 2, args.size / 2)
+        cache.remove([pyramid.key(zoom, x, y) for x, y, _, _ in pyramid.tiles_in_view(zoom, centre, (960, 540))])
+        for label in ("cold view", "warm view"):
+            began = time.perf_counter()
+            tiles, nbytes = fetch_view(pyramid, zoom, centre)
+            print(f"{label:<12} {(time.perf_counter() - began) * 1e3:7.1f} ms  {tiles} tiles, {nbytes / 1024:.0f} KB")
+        print(f"the raster itself is {args.size * args.size * 4 / 2**20:,.0f} MB as float32")
+
+if __name__ == "__main__":
+    main()
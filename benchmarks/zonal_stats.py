@@ -0,0 +1,84 @@
+"""
+Throughput and accuracy benchmark for zonal statistics over large rasters.
+Writes NDVI and NDRE rasters of a synthetic farm block and a label raster of
+square management zones, computes per-zone statistics of both indices with
+processing.zonal and checks a sample of zones against exact in-memory values.
+
+Run from the repository root:
+    python -m benchmarks.zonal_stats --size 16384 --zone-size 128 --workers 4
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from data.index_rasters import generate_index_raster
+from processing.multispectral import create_output, write_strip
+from processing.zonal import zonal_statistics
+
+def write_zone_grid(path, size, zone_size, strip_rows=512):
+    """
+    Write a SIZE x SIZE int32 label raster of square zones numbered from 1.
+    """
+    per_row = -(-size // zone_size)
+    raster = create_output(path, (size, size), np.int32)
+    x = np.arange(size)
+    for row in range(0, size, strip_rows):
+        stop = min(row + strip_rows, size)
+        strip = write_strip(raster, row, stop)
+        strip[:] = (np.arange(row, stop)[:, None] // zone_size) * per_row + x // zone_size + 1
+        strip.flush()
+        del strip
+    return path
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--size", type=int, default=8192, help="raster width and height in pixels")
+    parser.add_argument("--zone-size", type=int, default=128, help="zone edge in pixels")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--check", type=int, default=20, help="zones checked against exact values")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--dir", default=None, help="scratch directory (default: system temp)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(dir=args.dir) as root:
+        values = {index: generate_index_raster(os.path.join(root, f"{index}.npy"), index, args.size, args.seed)
+                  for index in ("ndvi", "ndre")}
+        labels = write_zone_grid(os.path.join(root, "zones.npy"), args.size, args.zone_size)
+
+        began = time.perf_counter()
+        stats = zonal_statistics(labels, values, ranges={"ndvi": (0, 1), "ndre": (0, 0.6)}, workers=args.workers)
+        table = stats.table()
+        seconds = time.perf_counter() - began
+        pixels = args.size * args.size
+        print(f"{pixels / 1e6:,.0f} Mpx, {table['zone'].size:,} zones, {len(values)} values: "
+              f"{seconds:.2f} s ({pixels / seconds / 1e6:.0f} Mpx/s)")
+
+        # Exact statistics of a sample of zones from their bounding boxes
+        rng = np.random.default_rng(args.seed)
+        per_row = -(-args.size // args.zone_size)
+        errors = {}
+        arrays = {index: np.load(path, mmap_mode="r") for index, path in values.items()}
+        for row in rng.choice(table["zone"].size, min(args.check, table["zone"].size), replace=False):
+            zone = table["zone"][row]
+            top, left = divmod(int(zone) - 1, per_row)
+            box = (slice(top * args.zone_size, (top + 1) * args.zone_size),
+                   slice(left * args.zone_size, (left + 1) * args.zone_size))
+            for index, array in arrays.items():
+                data = np.asarray(array[box], dtype=np.float64)
+                data = data[~np.isnan(data)]
+                if not data.size:
+                    continue
+                exact = {"mean": data.mean(), "std": data.std(), "min": data.min(), "max": data.max()}
+                exact.update(zip(("p10", "p50", "p90"), np.percentile(data, (10, 50, 90))))
+                for stat, value in exact.items():
+                    error = abs(table[f"{index}_{stat}"][row] - value)
+                    errors[stat] = max(errors.get(stat, 0.0), error)
+        del arrays
+    print(f"max abs error over {args.check} zones: " + ", ".join(f"{stat} {error:.2g}" for stat, error in errors.items()))
+
+if __name__ == "__main__":
+    main()
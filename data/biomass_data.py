@@ -5,91 +5,150 @@ This file contains sample data for biomass prediction based on different sensing
 
 import numpy as np
 import pandas as pd
+from data.cache import DATA_CACHE
+from data.growth_stages import classify_growth_stage, get_growth_stage_label, get_stage_table, growth_stage_labels
+from data.model_metrics import fill_untrained, stage_metrics
 
 # Define days after harvest intervals for the six surveys
 DAH_INTERVALS = [100, 142, 184, 226, 268, 310]
 
-def generate_biomass_data():
+# Table name used for biomass surveys in a data.survey_store.SurveyStore
+BIOMASS_TABLE = "biomass"
+
+# Growth stage labels, indexed by the stage codes stored in the columnar output
+GROWTH_STAGES = get_stage_table()["stages"]
+
+# Display names of the sensing models, keyed like BIOMASS_MODELS
+MODEL_LABELS = {"multispectral": "Multispectral", "lidar": "LiDAR", "fusion": "Fusion", "ndvi": "NDVI"}
+
+# Actual biomass curve sampled at DAH_INTERVALS (tons/hectare, sigmoidal growth)
+# Other DAH grids are linearly interpolated from these reference points
+ACTUAL_BIOMASS_CURVE = [20, 45, 70, 90, 100, 105]
+
+# Per-model settings: bias factors for the (early, mid, late) survey windows,
+# noise standard deviation, reported error bars and R-squared at DAH_INTERVALS.
+# The R-squared values are the field-study figures, served until models are
+# trained with modeling.training
+BIOMASS_MODELS = {
+    # Multispectral - better in early stages, underestimates in late stages
+    "multispectral": {
+        "factors": (1.1, 1.0, 0.85),
+        "noise": 3,
+        "errors": [3, 5, 7, 9, 11, 12],
+        "r2": [0.52, 0.57, 0.49, 0.43, 0.41, 0.38],
+    },
+    # LiDAR - better in late stages, underestimates in early stages
+    "lidar": {
+        "factors": (0.85, 1.0, 1.05),
+        "noise": 3,
+        "errors": [4, 5, 6, 6, 5, 4],
+        "r2": [0.31, 0.44, 0.53, 0.61, 0.68, 0.71],
+    },
+    # Fusion model - generally better across all stages but still has errors
+    "fusion": {
+        "factors": (1.02, 1.01, 1.03),
+        "noise": 2,
+        "errors": [3, 4, 5, 5, 4, 3],
+        "r2": [0.54, 0.59, 0.57, 0.63, 0.69, 0.72],
+    },
+    # NDVI benchmark - simplistic model with limitations in dense canopy
+    "ndvi": {
+        "factors": (1.05, 0.95, 0.9),
+        "noise": 4,
+        "errors": [4, 6, 8, 10, 12, 14],
+        "r2": [0.48, 0.46, 0.39, 0.36, 0.33, 0.31],
+    },
+}
+
+def get_bias_window(dah):
+    """
+    Return the bias window index (0 early, 1 mid, 2 late) for an array of DAH values.
+    Model bias factors switch before 184 DAH and after 226 DAH.
+    """
+    dah = np.asarray(dah)
+    window = np.ones(dah.shape, dtype=np.int8)
+    window[dah < 184] = 0
+    window[dah > 226] = 2
+    return window
+
+def generate_biomass_season(n_fields=1, dah=None, seed=42, field_cv=0.08, dtype=np.float32):
+    """
+    Generate synthetic biomass surveys for many fields in one vectorized pass.
+    Rows are field-major (every survey of field 0, then field 1, ...), `dah` may be
+    any grid of survey days and defaults to DAH_INTERVALS. Each field gets a vigour
+    multiplier drawn with coefficient of variation `field_cv`.
+    Returns a dict mapping column names to 1-D NumPy arrays.
+    """
+    rng = np.random.default_rng(seed)
+    dah_grid = np.asarray(DAH_INTERVALS if dah is None else dah, dtype=np.int32)
+    n_surveys = dah_grid.size
+    n_rows = n_fields * n_surveys
+
+    # Per-survey quantities are computed once on the grid and tiled across fields
+    stage_grid = classify_growth_stage(dah_grid)
+    window_grid = get_bias_window(dah_grid)
+    curve_grid = np.interp(dah_grid, DAH_INTERVALS, ACTUAL_BIOMASS_CURVE).astype(dtype)
+
+    columns = {
+        "field_id": np.repeat(np.arange(n_fields, dtype=np.int32), n_surveys),
+        "dah": np.tile(dah_grid, n_fields),
+        "stage_code": np.tile(stage_grid, n_fields),
+    }
+
+    # Actual biomass: reference curve scaled by field vigour plus survey noise
+    vigour = 1 + field_cv * rng.standard_normal(n_fields, dtype=dtype)
+    actual = np.multiply.outer(vigour, curve_grid).reshape(n_rows)
+    actual += 2 * rng.standard_normal(n_rows, dtype=dtype)
+    columns["actual_biomass"] = actual
+
+    window = np.tile(window_grid, n_fields)
+    for model, settings in BIOMASS_MODELS.items():
+        # Stage-dependent bias through the window codes, noise drawn in bulk
+        factors = np.asarray(settings["factors"], dtype=dtype)
+        predicted = rng.standard_normal(n_rows, dtype=dtype)
+        predicted *= settings["noise"]
+        predicted += actual * factors[window]
+        columns[f"{model}_biomass"] = predicted
+
+        errors = np.interp(dah_grid, DAH_INTERVALS, settings["errors"]).astype(dtype)
+        columns[f"{model}_error"] = np.tile(errors, n_fields)
+
+    # Model performance metrics (R-squared values) on the same survey grid
+    for model, settings in BIOMASS_MODELS.items():
+        r2 = np.interp(dah_grid, DAH_INTERVALS, settings["r2"]).astype(dtype)
+        columns[f"r2_{model}"] = np.tile(r2, n_fields)
+
+    return columns
+
+# Memoized generator: repeated calls with equal parameters share one read-only result
+get_biomass_season = DATA_CACHE.memoize(generate_biomass_season)
+
+def get_reference_biomass_season():
+    """
+    Returns the cached single reference field on the six survey dates as read-only arrays.
+    """
+    return get_biomass_season(n_fields=1, seed=42, field_cv=0.0, dtype=np.float64)
+
+def generate_biomass_data(model_dir=None):
     """
     Generate synthetic biomass data for visualization and modeling purposes.
-    Returns a pandas DataFrame with biomass prediction data.
-    """
-    # Set seed for reproducibility
-    np.random.seed(42)
-    
-    # Create a dataframe with days after harvest
-    df = pd.DataFrame({'dah': DAH_INTERVALS})
-    
+    Returns a pandas DataFrame with biomass prediction data; R² comes from the
+    models trained in `model_dir` (default: MODEL_DIR) where available.
+    """
+    # Single reference field on the six survey dates, no field-to-field variation
+    columns = get_reference_biomass_season()
+    df = pd.DataFrame(columns).drop(columns=["field_id"])
+
+    # Trained per-stage R-squared replaces the study figures where available
+    trained = stage_metrics("biomass", "r2", model_dir)
+    if trained is not None:
+        for model in BIOMASS_MODELS:
+            if model in trained:
+                df[f"r2_{model}"] = fill_untrained(trained[model][df["stage_code"].to_numpy()], df[f"r2_{model}"])
+
     # Add growth stage information
-    df['growth_stage'] = df['dah'].apply(get_growth_stage)
-    
-    # Actual biomass curve (typical sugarcane growth follows a sigmoidal curve)
-    # Values in tons/hectare, based on literature for sugarcane
-    df['actual_biomass'] = [20, 45, 70, 90, 100, 105]
-    
-    # Add small random variations to actual biomass for realism
-    df['actual_biomass'] = df['actual_biomass'] + np.random.normal(0, 2, len(df))
-    
-    # Predicted biomass by different technologies
-    # Multispectral - better in early stages
-    early_factor = 1.1  # Slightly overestimates in early stages
-    late_factor = 0.85  # Underestimates in late stages
-    multispectral_errors = [3, 5, 7, 9, 11, 12]  # Increasing error with growth
-    
-    df['multispectral_biomass'] = df.apply(
-        lambda row: row['actual_biomass'] * (
-            early_factor if row['dah'] < 184 else 
-            late_factor if row['dah'] > 226 else 
-            1.0
-        ) + np.random.normal(0, 3), axis=1
-    )
-    df['multispectral_error'] = multispectral_errors
-    
-    # LiDAR - better in late stages
-    early_factor = 0.85  # Underestimates in early stages
-    late_factor = 1.05  # Slightly overestimates in late stages
-    lidar_errors = [4, 5, 6, 6, 5, 4]  # Decreasing error with growth
-    
-    df['lidar_biomass'] = df.apply(
-        lambda row: row['actual_biomass'] * (
-            early_factor if row['dah'] < 184 else 
-            late_factor if row['dah'] > 226 else 
-            1.0
-        ) + np.random.normal(0, 3), axis=1
-    )
-    df['lidar_error'] = lidar_errors
-    
-    # Fusion model - generally better across all stages but still has errors
-    fusion_errors = [3, 4, 5, 5, 4, 3]  # More consistent error across growth
-    
-    df['fusion_biomass'] = df.apply(
-        lambda row: row['actual_biomass'] * (
-            1.02 if row['dah'] < 184 else 
-            1.03 if row['dah'] > 226 else 
-            1.01
-        ) + np.random.normal(0, 2), axis=1
-    )
-    df['fusion_error'] = fusion_errors
-    
-    # NDVI benchmark - simplistic model with limitations in dense canopy
-    ndvi_errors = [4, 6, 8, 10, 12, 14]  # Increasing error with growth
-    
-    df['ndvi_biomass'] = df.apply(
-        lambda row: row['actual_biomass'] * (
-            1.05 if row['dah'] < 184 else 
-            0.9 if row['dah'] > 226 else 
-            0.95
-        ) + np.random.normal(0, 4), axis=1
-    )
-    df['ndvi_error'] = ndvi_errors
-    
-    # Model performance metrics (R-squared values)
-    # These follow the pattern described in the research summary
-    df['r2_multispectral'] = [0.52, 0.57, 0.49, 0.43, 0.41, 0.38]
-    df['r2_lidar'] = [0.31, 0.44, 0.53, 0.61, 0.68, 0.71]
-    df['r2_fusion'] = [0.54, 0.59, 0.57, 0.63, 0.69, 0.72]
-    df['r2_ndvi'] = [0.48, 0.46, 0.39, 0.36, 0.33, 0.31]
-    
+    df.insert(1, "growth_stage", growth_stage_labels(df.pop("stage_code").to_numpy()))
+
     return df
 
 def get_biomass_prediction_data():
@@ -102,12 +161,7 @@ def get_growth_stage(dah):
     """
     Determine the growth stage based on days after harvest (DAH).
     """
-    if dah < 150:
-        return "Early Growth Stage"
-    elif dah < 250:
-        return "Grand Growth Stage"
-    else:
-        return "Maturation Stage"
+    return get_growth_stage_label(dah)
 
 def get_best_model_by_stage(growth_stage):
     """
@@ -120,54 +174,52 @@ def get_best_model_by_stage(growth_stage):
     else:  # Maturation Stage
         return "LiDAR"
 
-def get_biomass_time_series_for_model(model_name):
+def get_biomass_time_series_for_model(model_name, store=None, fields=None):
     """
     Returns time series data for a specific model.
+    With a SurveyStore, only the three projected columns are read from disk,
+    optionally restricted to `fields` (a range or iterable of field ids).
     """
-    df = generate_biomass_data()
-    
-    if model_name.lower() == "multispectral":
-        return df[['dah', 'multispectral_biomass', 'multispectral_error']]
-    elif model_name.lower() == "lidar":
-        return df[['dah', 'lidar_biomass', 'lidar_error']]
-    elif model_name.lower() == "fusion":
-        return df[['dah', 'fusion_biomass', 'fusion_error']]
-    elif model_name.lower() == "ndvi":
-        return df[['dah', 'ndvi_biomass', 'ndvi_error']]
+    model = model_name.lower()
+    if model in BIOMASS_MODELS:
+        columns = ['dah', f'{model}_biomass', f'{model}_error']
     else:
-        return df[['dah', 'actual_biomass']]
+        columns = ['dah', 'actual_biomass']
+
+    if store is not None:
+        return pd.DataFrame(store.read(BIOMASS_TABLE, columns=columns, fields=fields))
+
+    season = get_reference_biomass_season()
+    return pd.DataFrame({name: season[name] for name in columns})
 
-def get_model_performance_by_stage():
+def get_model_performance_by_stage(model_dir=None):
     """
     Returns model performance data (R² values) for each growth stage.
+    Cross-validated R² of the models trained in `model_dir` is used where available.
     """
-    df = generate_biomass_data()
-    
-    early_stage = df[df['dah'] < 150].iloc[0]
-    mid_stage = df[(df['dah'] >= 150) & (df['dah'] < 250)].iloc[0]
-    late_stage = df[df['dah'] >= 250].iloc[0]
-    
+    season = get_reference_biomass_season()
+
+    # First survey of each stage, as in the original per-stage lookup
+    stage_code = season["stage_code"]
+    first_survey = [int(np.flatnonzero(stage_code == code)[0]) for code in range(len(GROWTH_STAGES))]
+
     performance_data = {
-        "Early Growth Stage": {
-            "Multispectral": early_stage["r2_multispectral"],
-            "LiDAR": early_stage["r2_lidar"],
-            "Fusion": early_stage["r2_fusion"],
-            "NDVI": early_stage["r2_ndvi"]
-        },
-        "Grand Growth Stage": {
-            "Multispectral": mid_stage["r2_multispectral"],
-            "LiDAR": mid_stage["r2_lidar"],
-            "Fusion": mid_stage["r2_fusion"],
-            "NDVI": mid_stage["r2_ndvi"]
-        },
-        "Maturation Stage": {
-            "Multispectral": late_stage["r2_multispectral"],
-            "LiDAR": late_stage["r2_lidar"],
-            "Fusion": late_stage["r2_fusion"],
-            "NDVI": late_stage["r2_ndvi"]
+        stage: {
+            label: float(season[f"r2_{model}"][index])
+            for model, label in MODEL_LABELS.items()
         }
+        for stage, index in zip(GROWTH_STAGES, first_survey)
     }
-    
+
+    trained = stage_metrics("biomass", "r2", model_dir)
+    if trained is not None:
+        for code, stage in enumerate(GROWTH_STAGES):
+            for model, label in MODEL_LABELS.items():
+                if model in trained:
+                    performance_data[stage][label] = float(
+                        fill_untrained(trained[model][code], performance_data[stage][label])
+                    )
+
     return performance_data
 
 if __name__ == "__main__":
@@ -0,0 +1,139 @@
+"""
+Process-wide memoization for the data package.
+
+Generated seasons are cached by their generator parameters (seed, DAH grid,
+field count, ...) in a size-bounded LRU. Cached columns are frozen and every
+lookup hands out fresh read-only views, so callers can slice freely without
+copying and without being able to corrupt the shared result. This works the
+same inside and outside Streamlit.
+"""
+
+import functools
+import inspect
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+class ColumnarCache:
+    """
+    LRU cache of column dicts (name -> NumPy array) with hit/miss counters.
+    """
+
+    def __init__(self, maxsize=32):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, builder):
+        """
+        Return read-only views of the columns cached under `key`, calling
+        `builder()` to produce them on a miss.
+        """
+        with self._lock:
+            columns = self._entries.get(key)
+            if columns is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return _views(columns)
+            self.misses += 1
+
+        columns = _freeze(builder())
+        with self._lock:
+            self._entries[key] = columns
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return _views(columns)
+
+    def invalidate(self, func=None):
+        """
+        Drop cached entries, either all of them or only those built by `func`.
+        """
+        name = None if func is None else _qualified_name(func)
+        with self._lock:
+            if name is None:
+                self._entries.clear()
+                return
+            for key in [key for key in self._entries if key[0] == name]:
+                del self._entries[key]
+
+    def info(self):
+        """
+        Return cache statistics as a dict.
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+            }
+
+    def memoize(self, func):
+        """
+        Wrap a column generator so calls with equal parameters share one result.
+        Arguments are normalized through the function signature, so positional,
+        keyword and default spellings of the same call hit the same entry.
+        """
+        signature = inspect.signature(func)
+        name = _qualified_name(func)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            key = (name,) + tuple(
+                (param, _hashable(value)) for param, value in bound.arguments.items()
+            )
+            return self.get(key, lambda: func(*args, **kwargs))
+
+        wrapper.uncached = func
+        return wrapper
+
+# Shared cache used by the accessor functions in data.biomass_data and data.nitrogen_data
+DATA_CACHE = ColumnarCache()
+
+def invalidate_data_cache(func=None):
+    """
+    Clear the shared data cache, or only the entries produced by `func`.
+    """
+    DATA_CACHE.invalidate(getattr(func, "uncached", func))
+
+def data_cache_info():
+    """
+    Return hit/miss counters and size of the shared data cache.
+    """
+    return DATA_CACHE.info()
+
+def _qualified_name(func):
+    return f"{func.__module__}.{func.__qualname__}"
+
+def _hashable(value):
+    """
+    Convert generator parameters (DAH grids, field sets, dtypes) into hashable keys.
+    """
+    if isinstance(value, np.ndarray):
+        return ("ndarray", str(value.dtype), value.shape, value.tobytes())
+    if isinstance(value, (list, tuple, range)):
+        return tuple(_hashable(item) for item in value)
+    if isinstance(value, (set, frozenset)):
+        return frozenset(_hashable(item) for item in value)
+    if isinstance(value, type) or isinstance(value, np.dtype):
+        return str(np.dtype(value))
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+def _freeze(columns):
+    frozen = {}
+    for name, values in columns.items():
+        values = np.asarray(values)
+        values.flags.writeable = False
+        frozen[name] = values
+    return frozen
+
+def _views(columns):
+    return {name: values.view() for name, values in columns.items()}
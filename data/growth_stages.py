@@ -0,0 +1,68 @@
+"""
+Growth stage classification for sugarcane, shared by the data modules, utils and pages.
+
+Stages are defined by threshold tables: the DAH at which each stage after the
+first begins. Classification is a single np.searchsorted over the boundaries,
+so whole DAH arrays or rasters are labelled in one call as int8 stage codes;
+labels are only looked up when something is displayed.
+"""
+
+import numpy as np
+
+# Threshold tables keyed by variety/region profile
+STAGE_TABLES = {
+    # Three-stage scheme used by the research study data
+    "default": {
+        "boundaries": (150, 250),
+        "stages": ("Early Growth Stage", "Grand Growth Stage", "Maturation Stage"),
+    },
+    # Finer four-stage scheme used for general guidance
+    "four_stage": {
+        "boundaries": (100, 180, 250),
+        "stages": ("Early Growth Stage", "Mid Growth Stage", "Late Growth Stage", "Maturation Stage"),
+    },
+}
+
+def register_stage_table(name, boundaries, stages):
+    """
+    Add or replace a threshold table, e.g. for a variety or region with a different season.
+    `boundaries` are the increasing DAH values where stages[1:] begin.
+    """
+    boundaries = tuple(boundaries)
+    stages = tuple(stages)
+    if len(stages) != len(boundaries) + 1:
+        raise ValueError("A stage table needs exactly one more stage than boundaries")
+    if any(low >= high for low, high in zip(boundaries, boundaries[1:])):
+        raise ValueError("Stage boundaries must be strictly increasing")
+    STAGE_TABLES[name] = {"boundaries": boundaries, "stages": stages}
+
+def get_stage_table(table="default"):
+    """
+    Return the threshold table registered under `table`.
+    """
+    try:
+        return STAGE_TABLES[table]
+    except KeyError:
+        raise ValueError(f"Unknown growth stage table: {table!r}") from None
+
+def classify_growth_stage(dah, table="default"):
+    """
+    Return int8 stage codes (indices into the table's stages) for DAH values.
+    Accepts scalars, arrays or rasters and preserves their shape.
+    """
+    boundaries = get_stage_table(table)["boundaries"]
+    return np.searchsorted(boundaries, dah, side="right").astype(np.int8)
+
+def growth_stage_labels(codes, table="default"):
+    """
+    Resolve stage codes to stage names; returns a str for a scalar code.
+    """
+    stages = np.array(get_stage_table(table)["stages"], dtype=object)
+    labels = stages[np.asarray(codes)]
+    return labels if np.ndim(labels) else str(labels)
+
+def get_growth_stage_label(dah, table="default"):
+    """
+    Return the stage name for a single DAH value.
+    """
+    return growth_stage_labels(classify_growth_stage(dah, table), table)
@@ -0,0 +1,118 @@
+"""
+Synthetic vegetation index rasters for the map view.
+
+A farm block of rectangular sugarcane fields separated by unplanted roads
+(no data, stored as NaN) is rendered as an NDVI or NDRE raster: canopy vigour
+varies smoothly across the block, crop rows add fine texture and a few
+stressed patches (waterlogging, nitrogen deficiency) pull the index down.
+Rasters are written strip by strip into `.npy` files, so the size is limited
+by disk rather than memory. A matching label raster numbers the fields
+(roads are 0) for per-field statistics.
+"""
+
+import os
+
+import numpy as np
+
+from processing.multispectral import create_output, write_strip
+
+# Index value range of healthy canopy and of the stress patches, and the colour
+# range the map uses for each index
+INDEX_RASTERS = {
+    "ndvi": {"healthy": (0.70, 0.90), "stressed": 0.35, "range": (0.0, 1.0)},
+    "ndre": {"healthy": (0.30, 0.50), "stressed": 0.12, "range": (0.0, 0.6)},
+}
+
+# Linear leaf N (%) calibration of the demo farm's NDRE, (intercept, slope),
+# of the kind fitted to leaf samples from surveyed plots
+NDRE_NITROGEN_CALIBRATION = (0.8, 2.8)
+
+# Field edge and road width (pixels)
+FIELD_SIZE = 900
+ROAD_WIDTH = 24
+
+def generate_index_raster(path, index="ndvi", size=4096, seed=0, strip_rows=512):
+    """
+    Write a SIZE x SIZE float32 `index` raster to `path` and return the path.
+    """
+    settings = INDEX_RASTERS[index]
+    rng = np.random.default_rng(seed)
+    low, high = settings["healthy"]
+    phases = rng.uniform(0, 2 * np.pi, 4)
+    patches = np.column_stack([rng.uniform(0, size, 12), rng.uniform(0, size, 12), rng.uniform(60, 260, 12)])
+
+    raster = create_output(path, (size, size))
+    x = np.arange(size, dtype=np.float32)
+    for row in range(0, size, strip_rows):
+        stop = min(row + strip_rows, size)
+        y = np.arange(row, stop, dtype=np.float32)[:, None]
+        # Block-scale vigour gradient and crop-row texture
+        vigour = 0.5 + 0.25 * np.sin(x / size * 2 * np.pi + phases[0]) * np.cos(y / size * 3 * np.pi + phases[1])
+        vigour += 0.15 * np.sin((x + y) / size * 5 * np.pi + phases[2])
+        values = low + (high - low) * np.clip(vigour, 0, 1) + 0.02 * np.sin(x / 3.0 + phases[3])
+        values = np.broadcast_to(values, (stop - row, size)).astype(np.float32)
+        # Stressed patches fade towards the stressed value within three radii
+        for centre_x, centre_y, radius in patches:
+            left, right = int(max(centre_x - 3 * radius, 0)), int(min(centre_x + 3 * radius, size))
+            if abs(centre_y - (row + stop) / 2) > 3 * radius + (stop - row) / 2 or right <= left:
+                continue
+            weight = np.exp(-((x[left:right] - centre_x) ** 2 + (y - centre_y) ** 2) / (2 * radius ** 2))
+            values[:, left:right] += (settings["stressed"] - values[:, left:right]) * weight
+        values[:, x % FIELD_SIZE < ROAD_WIDTH] = np.nan
+        values[(y[:, 0] % FIELD_SIZE) < ROAD_WIDTH] = np.nan
+        strip = write_strip(raster, row, stop)
+        strip[:] = values
+        strip.flush()
+        del strip
+    return path
+
+def ndre_to_nitrogen(ndre):
+    """
+    Estimate leaf N (%) from NDRE values with the demo farm's calibration.
+    """
+    intercept, slope = NDRE_NITROGEN_CALIBRATION
+    return intercept + slope * np.asarray(ndre)
+
+def generate_field_labels(path, size=4096, strip_rows=512):
+    """
+    Write a SIZE x SIZE int32 raster of field ids (1, 2, ... row by row; roads
+    are 0) matching generate_index_raster() to `path` and return the path.
+    """
+    per_row = -(-size // FIELD_SIZE)
+    raster = create_output(path, (size, size), np.int32)
+    x = np.arange(size)
+    for row in range(0, size, strip_rows):
+        stop = min(row + strip_rows, size)
+        y = np.arange(row, stop)[:, None]
+        labels = (y // FIELD_SIZE) * per_row + x // FIELD_SIZE + 1
+        labels[:, x % FIELD_SIZE < ROAD_WIDTH] = 0
+        labels[(y[:, 0] % FIELD_SIZE) < ROAD_WIDTH] = 0
+        strip = write_strip(raster, row, stop)
+        strip[:] = labels
+        strip.flush()
+        del strip
+    return path
+
+def _demo_raster(name, generate, directory):
+    from processing.tiles import TILE_CACHE_DIR
+
+    directory = os.path.join(TILE_CACHE_DIR, "rasters") if directory is None else directory
+    path = os.path.join(directory, name)
+    if not os.path.exists(path):
+        os.makedirs(directory, exist_ok=True)
+        temporary = f"{path}.{os.getpid()}.tmp.npy"
+        generate(temporary)
+        os.replace(temporary, path)
+    return path
+
+def demo_index_raster(index="ndvi", directory=None, size=4096):
+    """
+    Return the path of the demo raster for `index`, generating it on first use.
+    """
+    return _demo_raster(f"demo_{index}_{size}.npy", lambda path: generate_index_raster(path, index, size), directory)
+
+def demo_field_labels(directory=None, size=4096):
+    """
+    Return the path of the demo field label raster, generating it on first use.
+    """
+    return _demo_raster(f"demo_fields_{size}.npy", lambda path: generate_field_labels(path, size), directory)
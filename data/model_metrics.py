@@ -0,0 +1,104 @@
+"""
+Trained model performance tables served by the data accessors.
+
+modeling.training fits one model per target (biomass, nitrogen), growth stage
+and sensing model, and writes their cross-validated R² and RMSE to
+<MODEL_DIR>/metrics.npz as columns with one row per fitted model. The accessors
+in data.biomass_data and data.nitrogen_data read the table through here and
+fall back to the field-study figures for models and stages that have not been
+trained (or whose metric is not finite). The default model directory can be
+moved with the PA_MODEL_DIR environment variable.
+"""
+
+import os
+
+import numpy as np
+
+from data.cache import DATA_CACHE
+from data.growth_stages import get_stage_table
+
+# Default directory for trained models and their metrics table
+MODEL_DIR = os.environ.get(
+    "PA_MODEL_DIR", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "trained_models")
+)
+METRICS_FILE = "metrics.npz"
+
+# Columns of the metrics table
+METRIC_COLUMNS = ("target", "stage_code", "model", "r2", "rmse", "n_samples")
+
+def metrics_path(model_dir=None):
+    return os.path.join(MODEL_DIR if model_dir is None else model_dir, METRICS_FILE)
+
+def write_model_metrics(metrics, model_dir=None):
+    """
+    Atomically replace the metrics table with `metrics` (a dict of METRIC_COLUMNS arrays).
+    """
+    path = metrics_path(model_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp.npz"
+    np.savez(tmp_path, **{name: np.asarray(metrics[name]) for name in METRIC_COLUMNS})
+    os.replace(tmp_path, path)
+
+def _read_metrics(path, modified):
+    """
+    Load a metrics table; `modified` only keys the cache to the file version.
+    """
+    with np.load(path) as table:
+        return {name: table[name] for name in METRIC_COLUMNS}
+
+_read_metrics_cached = DATA_CACHE.memoize(_read_metrics)
+
+def load_model_metrics(model_dir=None):
+    """
+    Return the trained metrics table as read-only columns, or None if no models
+    have been trained. Re-reads the file after it is rewritten.
+    """
+    path = metrics_path(model_dir)
+    try:
+        modified = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+    return _read_metrics_cached(path, modified)
+
+def stage_metrics(target, metric="r2", model_dir=None):
+    """
+    Return {model: array of `metric` indexed by stage code} for a target, or
+    None if no models have been trained for it. Untrained stages are NaN.
+    """
+    table = load_model_metrics(model_dir)
+    if table is None:
+        return None
+    rows = table["target"] == target
+    if not rows.any():
+        return None
+    n_stages = len(get_stage_table()["stages"])
+    result = {}
+    for model in np.unique(table["model"][rows]):
+        values = np.full(n_stages, np.nan)
+        selected = rows & (table["model"] == model)
+        values[table["stage_code"][selected]] = table[metric][selected]
+        result[str(model)] = values
+    return result
+
+def fill_untrained(trained, study):
+    """
+    Return the trained metric values where they are finite, else the study values.
+    """
+    trained = np.asarray(trained, dtype=np.float64)
+    return np.where(np.isfinite(trained), trained, np.asarray(study, dtype=np.float64))
+
+def overall_metrics(target, model_dir=None):
+    """
+    Return {"r_squared": {model: r2}, "rmse": {model: rmse}} pooled over growth
+    stages (sample-weighted), or None if no models have been trained for `target`.
+    """
+    table = load_model_metrics(model_dir)
+    if table is None or not (table["target"] == target).any():
+        return None
+    r_squared, rmse = {}, {}
+    for model in np.unique(table["model"][table["target"] == target]):
+        rows = (table["target"] == target) & (table["model"] == model)
+        weights = table["n_samples"][rows]
+        r_squared[str(model)] = float(np.average(table["r2"][rows], weights=weights))
+        rmse[str(model)] = float(np.sqrt(np.average(table["rmse"][rows] ** 2, weights=weights)))
+    return {"r_squared": r_squared, "rmse": rmse}
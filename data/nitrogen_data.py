@@ -5,87 +5,132 @@ This file contains sample data for leaf nitrogen prediction based on different s
 
 import numpy as np
 import pandas as pd
-from data.biomass_data import DAH_INTERVALS, get_growth_stage
+from data.biomass_data import DAH_INTERVALS, MODEL_LABELS, get_bias_window
+from data.cache import DATA_CACHE
+from data.growth_stages import classify_growth_stage, growth_stage_labels
+from data.model_metrics import fill_untrained, overall_metrics, stage_metrics
 
-def generate_nitrogen_data():
-    """
-    Generate synthetic nitrogen data for visualization and modeling purposes.
-    Returns a pandas DataFrame with nitrogen prediction data.
-    """
-    # Set seed for reproducibility
-    np.random.seed(42)
-    
-    # Create a dataframe with days after harvest
-    df = pd.DataFrame({'dah': DAH_INTERVALS})
-    
-    # Add growth stage information
-    df['growth_stage'] = df['dah'].apply(get_growth_stage)
-    
-    # Actual nitrogen content curve (typically decreases over time)
-    # Values in percentage of dry weight, based on literature for sugarcane
-    # Nitrogen content typically decreases as the crop matures
-    df['actual_nitrogen'] = [2.2, 2.0, 1.9, 1.7, 1.5, 1.3]
-    
-    # Add small random variations to actual nitrogen for realism
-    df['actual_nitrogen'] = df['actual_nitrogen'] + np.random.normal(0, 0.05, len(df))
-    
-    # Predicted nitrogen content by different technologies
+# Table name used for nitrogen surveys in a data.survey_store.SurveyStore
+NITROGEN_TABLE = "nitrogen"
+
+# Actual leaf nitrogen curve sampled at DAH_INTERVALS (% of dry weight)
+# Nitrogen content typically decreases as the crop matures
+ACTUAL_NITROGEN_CURVE = [2.2, 2.0, 1.9, 1.7, 1.5, 1.3]
+
+# Per-model settings: bias factors for the (early, mid, late) survey windows,
+# noise standard deviation, reported error bars, R-squared at DAH_INTERVALS and
+# overall RMSE (% N). R-squared and RMSE are the field-study figures, served
+# until models are trained with modeling.training
+NITROGEN_MODELS = {
     # Multispectral - consistently good for nitrogen prediction
-    multispectral_errors = [0.2, 0.2, 0.15, 0.15, 0.1, 0.1]  # Decreasing error with growth
-    
-    df['multispectral_nitrogen'] = df.apply(
-        lambda row: row['actual_nitrogen'] * (
-            1.05 if row['dah'] < 184 else 
-            0.95 if row['dah'] > 226 else 
-            1.0
-        ) + np.random.normal(0, 0.1), axis=1
-    )
-    df['multispectral_nitrogen_error'] = multispectral_errors
-    
+    "multispectral": {
+        "factors": (1.05, 1.0, 0.95),
+        "noise": 0.1,
+        "errors": [0.2, 0.2, 0.15, 0.15, 0.1, 0.1],
+        "r2": [0.57, 0.58, 0.56, 0.57, 0.56, 0.55],
+        "rmse": 0.31,
+    },
     # LiDAR - poor for nitrogen prediction across all stages
-    lidar_errors = [0.4, 0.4, 0.35, 0.35, 0.3, 0.3]  # Higher errors
-    
-    df['lidar_nitrogen'] = df.apply(
-        lambda row: row['actual_nitrogen'] * (
-            0.85 if row['dah'] < 184 else 
-            0.9 if row['dah'] > 226 else 
-            0.87
-        ) + np.random.normal(0, 0.2), axis=1
-    )
-    df['lidar_nitrogen_error'] = lidar_errors
-    
+    "lidar": {
+        "factors": (0.85, 0.87, 0.9),
+        "noise": 0.2,
+        "errors": [0.4, 0.4, 0.35, 0.35, 0.3, 0.3],
+        "r2": [0.28, 0.29, 0.30, 0.31, 0.30, 0.28],
+        "rmse": 0.48,
+    },
     # Fusion model - slightly better than multispectral but not by much
-    fusion_errors = [0.19, 0.19, 0.14, 0.14, 0.09, 0.09]  # Slightly better than multispectral
-    
-    df['fusion_nitrogen'] = df.apply(
-        lambda row: row['actual_nitrogen'] * (
-            1.04 if row['dah'] < 184 else 
-            0.96 if row['dah'] > 226 else 
-            1.0
-        ) + np.random.normal(0, 0.09), axis=1
-    )
-    df['fusion_nitrogen_error'] = fusion_errors
-    
+    "fusion": {
+        "factors": (1.04, 1.0, 0.96),
+        "noise": 0.09,
+        "errors": [0.19, 0.19, 0.14, 0.14, 0.09, 0.09],
+        "r2": [0.59, 0.60, 0.58, 0.59, 0.57, 0.56],
+        "rmse": 0.30,
+    },
     # NDVI benchmark - decent but not as good as specialized indices
-    ndvi_errors = [0.25, 0.25, 0.20, 0.20, 0.15, 0.15]  # Higher than multispectral
-    
-    df['ndvi_nitrogen'] = df.apply(
-        lambda row: row['actual_nitrogen'] * (
-            1.1 if row['dah'] < 184 else 
-            0.9 if row['dah'] > 226 else 
-            1.0
-        ) + np.random.normal(0, 0.15), axis=1
-    )
-    df['ndvi_nitrogen_error'] = ndvi_errors
-    
-    # Model performance metrics (R-squared values)
-    # These are relatively consistent across growth stages for nitrogen prediction
-    # Following the pattern described in the research summary
-    df['r2_n_multispectral'] = [0.57, 0.58, 0.56, 0.57, 0.56, 0.55]
-    df['r2_n_lidar'] = [0.28, 0.29, 0.30, 0.31, 0.30, 0.28]
-    df['r2_n_fusion'] = [0.59, 0.60, 0.58, 0.59, 0.57, 0.56]
-    df['r2_n_ndvi'] = [0.51, 0.50, 0.49, 0.48, 0.47, 0.46]
-    
+    "ndvi": {
+        "factors": (1.1, 1.0, 0.9),
+        "noise": 0.15,
+        "errors": [0.25, 0.25, 0.20, 0.20, 0.15, 0.15],
+        "r2": [0.51, 0.50, 0.49, 0.48, 0.47, 0.46],
+        "rmse": 0.36,
+    },
+}
+
+def generate_nitrogen_season(n_fields=1, dah=None, seed=42, field_cv=0.05, dtype=np.float32):
+    """
+    Generate synthetic leaf nitrogen surveys for many fields in one vectorized pass.
+    Same row layout as generate_biomass_season(): field-major over the `dah` grid.
+    Returns a dict mapping column names to 1-D NumPy arrays.
+    """
+    rng = np.random.default_rng(seed)
+    dah_grid = np.asarray(DAH_INTERVALS if dah is None else dah, dtype=np.int32)
+    n_surveys = dah_grid.size
+    n_rows = n_fields * n_surveys
+
+    stage_grid = classify_growth_stage(dah_grid)
+    window_grid = get_bias_window(dah_grid)
+    curve_grid = np.interp(dah_grid, DAH_INTERVALS, ACTUAL_NITROGEN_CURVE).astype(dtype)
+
+    columns = {
+        "field_id": np.repeat(np.arange(n_fields, dtype=np.int32), n_surveys),
+        "dah": np.tile(dah_grid, n_fields),
+        "stage_code": np.tile(stage_grid, n_fields),
+    }
+
+    # Actual nitrogen: reference curve scaled per field plus survey noise
+    vigour = 1 + field_cv * rng.standard_normal(n_fields, dtype=dtype)
+    actual = np.multiply.outer(vigour, curve_grid).reshape(n_rows)
+    actual += 0.05 * rng.standard_normal(n_rows, dtype=dtype)
+    columns["actual_nitrogen"] = actual
+
+    window = np.tile(window_grid, n_fields)
+    for model, settings in NITROGEN_MODELS.items():
+        factors = np.asarray(settings["factors"], dtype=dtype)
+        predicted = rng.standard_normal(n_rows, dtype=dtype)
+        predicted *= settings["noise"]
+        predicted += actual * factors[window]
+        columns[f"{model}_nitrogen"] = predicted
+
+        errors = np.interp(dah_grid, DAH_INTERVALS, settings["errors"]).astype(dtype)
+        columns[f"{model}_nitrogen_error"] = np.tile(errors, n_fields)
+
+    # Model performance metrics (R-squared values) on the same survey grid
+    for model, settings in NITROGEN_MODELS.items():
+        r2 = np.interp(dah_grid, DAH_INTERVALS, settings["r2"]).astype(dtype)
+        columns[f"r2_n_{model}"] = np.tile(r2, n_fields)
+
+    return columns
+
+# Memoized generator: repeated calls with equal parameters share one read-only result
+get_nitrogen_season = DATA_CACHE.memoize(generate_nitrogen_season)
+
+def get_reference_nitrogen_season():
+    """
+    Returns the cached single reference field on the six survey dates as read-only arrays.
+    """
+    return get_nitrogen_season(n_fields=1, seed=42, field_cv=0.0, dtype=np.float64)
+
+def generate_nitrogen_data(model_dir=None):
+    """
+    Generate synthetic nitrogen data for visualization and modeling purposes.
+    Returns a pandas DataFrame with nitrogen prediction data; R² comes from the
+    models trained in `model_dir` (default: MODEL_DIR) where available.
+    """
+    # Single reference field on the six survey dates, no field-to-field variation
+    columns = get_reference_nitrogen_season()
+    df = pd.DataFrame(columns).drop(columns=["field_id"])
+
+    # Trained per-stage R-squared replaces the study figures where available
+    trained = stage_metrics("nitrogen", "r2", model_dir)
+    if trained is not None:
+        for model in NITROGEN_MODELS:
+            if model in trained:
+                df[f"r2_n_{model}"] = fill_untrained(trained[model][df["stage_code"].to_numpy()],
+                                                     df[f"r2_n_{model}"])
+
+    # Add growth stage information
+    df.insert(1, "growth_stage", growth_stage_labels(df.pop("stage_code").to_numpy()))
+
     return df
 
 def get_nitrogen_prediction_data():
@@ -94,104 +139,149 @@ def get_nitrogen_prediction_data():
     """
     return generate_nitrogen_data()
 
-def get_nitrogen_model_performance():
+def get_nitrogen_model_performance(model_dir=None):
     """
     Returns overall model performance for nitrogen prediction across all stages.
+    Cross-validated R² and RMSE of the models trained in `model_dir` are used
+    where available.
     """
-    df = generate_nitrogen_data()
+    season = get_reference_nitrogen_season()
     
     # Calculate mean performance across all stages
     performance = {
-        "Multispectral": df['r2_n_multispectral'].mean(),
-        "LiDAR": df['r2_n_lidar'].mean(),
-        "Fusion": df['r2_n_fusion'].mean(),
-        "NDVI": df['r2_n_ndvi'].mean()
-    }
-    
-    # Calculate RMSE values (inverse relationship to R²)
-    # Simplified calculation for demo purposes
-    rmse = {
-        "Multispectral": 0.31,
-        "LiDAR": 0.48,
-        "Fusion": 0.30,
-        "NDVI": 0.36
+        label: float(season[f'r2_n_{model}'].mean())
+        for model, label in MODEL_LABELS.items()
     }
-    
+    rmse = {label: NITROGEN_MODELS[model]["rmse"] for model, label in MODEL_LABELS.items()}
+
+    trained = overall_metrics("nitrogen", model_dir)
+    if trained is not None:
+        for metric, study in (("r_squared", performance), ("rmse", rmse)):
+            for model, label in MODEL_LABELS.items():
+                if model in trained[metric]:
+                    study[label] = float(fill_untrained(trained[metric][model], study[label]))
+
     return {"r_squared": performance, "rmse": rmse}
 
-def get_nitrogen_time_series():
+def get_nitrogen_time_series(store=None, fields=None):
     """
     Returns time series data for nitrogen content over the growing season.
+    With a SurveyStore, only the projected columns are read from disk,
+    optionally restricted to `fields` (a range or iterable of field ids).
     """
-    df = generate_nitrogen_data()
-    return df[['dah', 'actual_nitrogen', 'multispectral_nitrogen', 'multispectral_nitrogen_error']]
+    columns = ['dah', 'actual_nitrogen', 'multispectral_nitrogen', 'multispectral_nitrogen_error']
+
+    if store is not None:
+        return pd.DataFrame(store.read(NITROGEN_TABLE, columns=columns, fields=fields))
+
+    season = get_reference_nitrogen_season()
+    return pd.DataFrame({name: season[name] for name in columns})
+
+# Optimal leaf N (%) per growth stage code and the tolerance band around it
+NITROGEN_OPTIMAL = np.array([2.0, 1.8, 1.5])
+NITROGEN_TOLERANCE = 0.2
+
+# Nitrogen level within a stage: below, within or above the tolerance band
+NITROGEN_LEVELS = ("Low", "Optimal", "High")
+
+# Status code of a missing (NaN) leaf N measurement
+NITROGEN_NO_DATA = -1
+
+# Display lookup for status codes, indexed by stage code * 3 + level; the last
+# entry is indexed by NITROGEN_NO_DATA
+NITROGEN_RECOMMENDATIONS = (
+    # Early Growth Stage
+    {
+        "status": "Low",
+        "color": "red",
+        "recommendation": "Nitrogen levels are below optimal for early growth. Consider supplemental nitrogen application to support vegetative growth and tillering."
+    },
+    {
+        "status": "Optimal",
+        "color": "green",
+        "recommendation": "Nitrogen levels are within optimal range for early growth stage. Continue with standard management practices."
+    },
+    {
+        "status": "High",
+        "color": "orange",
+        "recommendation": "Nitrogen levels are above optimal for this growth stage. Consider reducing fertilizer application in future cycles. Monitor for excessive vegetative growth."
+    },
+    # Grand Growth Stage
+    {
+        "status": "Low",
+        "color": "orange",
+        "recommendation": "Nitrogen levels are below optimal for grand growth phase. Consider a light supplemental application if canopy is not fully developed."
+    },
+    {
+        "status": "Optimal",
+        "color": "green",
+        "recommendation": "Nitrogen levels are within optimal range for grand growth stage. Continue with standard management practices."
+    },
+    {
+        "status": "Slightly High",
+        "color": "yellowgreen",
+        "recommendation": "Nitrogen levels are slightly high for mid-growth stage. No immediate action needed, but monitor crop development."
+    },
+    # Maturation Stage
+    {
+        "status": "Low (Favorable)",
+        "color": "green",
+        "recommendation": "Nitrogen levels are low, which is favorable for ripening. No nitrogen application recommended at this late stage."
+    },
+    {
+        "status": "Optimal",
+        "color": "green",
+        "recommendation": "Nitrogen levels are within optimal range for maturation. Focus on ripening management for optimal sugar content."
+    },
+    {
+        "status": "High",
+        "color": "orange",
+        "recommendation": "Nitrogen levels are higher than desired for maturation stage. This may delay ripening and reduce sugar content. Consider adjusting pre-harvest management."
+    },
+    # No leaf N measurement
+    {
+        "status": "No data",
+        "color": "gray",
+        "recommendation": "No leaf nitrogen measurement is available for this area. Check the survey coverage or take a leaf sample before deciding on nitrogen application."
+    },
+)
+
+def classify_nitrogen(dah, nitrogen_value, return_delta=False):
+    """
+    Classify arrays of (DAH, leaf N %) pairs into compact nitrogen status codes.
+    Returns an int8 array of codes (stage code * 3 + level, see NITROGEN_RECOMMENDATIONS;
+    NITROGEN_NO_DATA where N is NaN), and with `return_delta` also the difference
+    from the stage's optimal N.
+    Inputs broadcast against each other, so a scalar DAH works with an N raster.
+    """
+    dah, nitrogen_value = np.broadcast_arrays(np.asarray(dah), np.asarray(nitrogen_value))
+    stage = classify_growth_stage(dah)
+
+    # Compare against precomputed band edges, matching the scalar thresholds exactly
+    codes = np.array(stage * 3 + 1, dtype=np.int8)
+    codes[nitrogen_value < (NITROGEN_OPTIMAL - NITROGEN_TOLERANCE)[stage]] -= 1
+    codes[nitrogen_value > (NITROGEN_OPTIMAL + NITROGEN_TOLERANCE)[stage]] += 1
+    # NaN fails both comparisons and would otherwise read as optimal
+    codes[np.isnan(nitrogen_value)] = NITROGEN_NO_DATA
+
+    if return_delta:
+        return codes, nitrogen_value - NITROGEN_OPTIMAL[stage]
+    return codes
+
+def describe_nitrogen_codes(codes, key="status"):
+    """
+    Resolve status codes to display values ("status", "color" or "recommendation");
+    NITROGEN_NO_DATA resolves to "No data". Intended for display time, after any aggregation has been done on the codes.
+    """
+    lookup = np.array([entry[key] for entry in NITROGEN_RECOMMENDATIONS], dtype=object)
+    return lookup[np.asarray(codes)]
 
 def get_nitrogen_recommendation(dah, nitrogen_value):
     """
     Generate a recommendation based on the current nitrogen level and growth stage.
     """
-    growth_stage = get_growth_stage(dah)
-    
-    if growth_stage == "Early Growth Stage":
-        optimal_n = 2.0
-        if nitrogen_value > optimal_n + 0.2:
-            return {
-                "status": "High",
-                "color": "orange",
-                "recommendation": "Nitrogen levels are above optimal for this growth stage. Consider reducing fertilizer application in future cycles. Monitor for excessive vegetative growth."
-            }
-        elif nitrogen_value < optimal_n - 0.2:
-            return {
-                "status": "Low",
-                "color": "red",
-                "recommendation": "Nitrogen levels are below optimal for early growth. Consider supplemental nitrogen application to support vegetative growth and tillering."
-            }
-        else:
-            return {
-                "status": "Optimal",
-                "color": "green",
-                "recommendation": "Nitrogen levels are within optimal range for early growth stage. Continue with standard management practices."
-            }
-    elif growth_stage == "Grand Growth Stage":
-        optimal_n = 1.8
-        if nitrogen_value > optimal_n + 0.2:
-            return {
-                "status": "Slightly High",
-                "color": "yellowgreen",
-                "recommendation": "Nitrogen levels are slightly high for mid-growth stage. No immediate action needed, but monitor crop development."
-            }
-        elif nitrogen_value < optimal_n - 0.2:
-            return {
-                "status": "Low",
-                "color": "orange",
-                "recommendation": "Nitrogen levels are below optimal for grand growth phase. Consider a light supplemental application if canopy is not fully developed."
-            }
-        else:
-            return {
-                "status": "Optimal",
-                "color": "green",
-                "recommendation": "Nitrogen levels are within optimal range for grand growth stage. Continue with standard management practices."
-            }
-    else:  # Maturation Stage
-        optimal_n = 1.5
-        if nitrogen_value > optimal_n + 0.2:
-            return {
-                "status": "High",
-                "color": "orange",
-                "recommendation": "Nitrogen levels are higher than desired for maturation stage. This may delay ripening and reduce sugar content. Consider adjusting pre-harvest management."
-            }
-        elif nitrogen_value < optimal_n - 0.2:
-            return {
-                "status": "Low (Favorable)",
-                "color": "green",
-                "recommendation": "Nitrogen levels are low, which is favorable for ripening. No nitrogen application recommended at this late stage."
-            }
-        else:
-            return {
-                "status": "Optimal",
-                "color": "green",
-                "recommendation": "Nitrogen levels are within optimal range for maturation. Focus on ripening management for optimal sugar content."
-            }
+    code = classify_nitrogen(dah, nitrogen_value)
+    return dict(NITROGEN_RECOMMENDATIONS[int(code)])
 
 def generate_scatter_data_for_nitrogen():
     """
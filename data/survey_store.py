@@ -0,0 +1,265 @@
+"""
+Columnar on-disk store for the biomass and nitrogen survey tables.
+
+Each table is a directory of survey segments, one per days-after-harvest (DAH)
+survey, and each segment holds one memory-mapped `.npy` file per column:
+
+    <root>/biomass/dah=0100/field_id.npy
+    <root>/biomass/dah=0100/actual_biomass.npy
+    <root>/biomass/dah=0142/...
+
+Segments are write-once: a survey is appended as a complete segment (or
+streamed through a SegmentWriter and published once complete) and never
+rewritten. Reads open only the segments matching the DAH filter and only the
+requested columns, and field filters given as a `range` are resolved with a
+binary search on the (sorted) field_id column so untouched rows are never paged in.
+"""
+
+import os
+import shutil
+import uuid
+
+import numpy as np
+
+# Columns every segment must carry; `dah` is implied by the segment name
+KEY_COLUMNS = ("field_id",)
+SEGMENT_PREFIX = "dah="
+
+class SurveyStore:
+    """
+    A directory of columnar survey tables with append-only survey segments.
+    """
+
+    def __init__(self, root):
+        self.root = os.fspath(root)
+
+    def _segment_path(self, table, dah):
+        return os.path.join(self.root, table, f"{SEGMENT_PREFIX}{int(dah):04d}")
+
+    def tables(self):
+        """
+        Return the names of the tables present in the store.
+        """
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(
+            name for name in os.listdir(self.root)
+            if os.path.isdir(os.path.join(self.root, name))
+        )
+
+    def surveys(self, table):
+        """
+        Return the sorted list of DAH values that have a segment in `table`.
+        """
+        table_path = os.path.join(self.root, table)
+        if not os.path.isdir(table_path):
+            return []
+        return sorted(
+            int(name[len(SEGMENT_PREFIX):]) for name in os.listdir(table_path)
+            if name.startswith(SEGMENT_PREFIX) and name[len(SEGMENT_PREFIX):].isdigit()
+        )
+
+    def columns(self, table):
+        """
+        Return the column names stored for `table`, including the implied `dah`.
+        """
+        surveys = self.surveys(table)
+        if not surveys:
+            return []
+        segment = self._segment_path(table, surveys[0])
+        names = sorted(name[:-4] for name in os.listdir(segment) if name.endswith(".npy"))
+        return ["dah"] + names
+
+    def column_paths(self, table, dah, columns=None):
+        """
+        Return {column: path} of the `.npy` files of one survey segment (default:
+        all its columns), e.g. for workers that memory-map their own row ranges.
+        Raises KeyError if the survey or a column is not stored.
+        """
+        segment = self._segment_path(table, dah)
+        if not os.path.isdir(segment):
+            raise KeyError(f"Survey {table} DAH {dah} is not stored")
+        stored = sorted(name[:-4] for name in os.listdir(segment) if name.endswith(".npy"))
+        names = stored if columns is None else list(columns)
+        missing = [name for name in names if name not in stored]
+        if missing:
+            raise KeyError(f"Survey {table} DAH {dah} has no columns {missing}")
+        return {name: os.path.join(segment, f"{name}.npy") for name in names}
+
+    def append_survey(self, table, dah, columns):
+        """
+        Write one survey of `table` as a new, immutable segment.
+        `columns` maps column names to equal-length 1-D arrays and must include
+        field_id. Raises FileExistsError if the survey was already written.
+        """
+        missing = [name for name in KEY_COLUMNS if name not in columns]
+        if missing:
+            raise ValueError(f"Survey columns must include {missing}")
+
+        arrays = {name: np.asarray(values) for name, values in columns.items() if name != "dah"}
+        lengths = {values.shape for values in arrays.values()}
+        if len(lengths) != 1 or len(next(iter(lengths))) != 1:
+            raise ValueError("Survey columns must be 1-D arrays of equal length")
+
+        # Keep field_id sorted inside a segment so field ranges are a binary search
+        field_id = arrays["field_id"]
+        if field_id.size and np.any(field_id[1:] < field_id[:-1]):
+            order = np.argsort(field_id, kind="stable")
+            arrays = {name: values[order] for name, values in arrays.items()}
+
+        final_path = self._segment_path(table, dah)
+        if os.path.exists(final_path):
+            raise FileExistsError(f"Survey {table} DAH {dah} is already stored")
+
+        # Write into a private directory, then publish it with a single rename
+        tmp_path = f"{final_path}.tmp-{uuid.uuid4().hex}"
+        os.makedirs(tmp_path)
+        try:
+            for name, values in arrays.items():
+                np.save(os.path.join(tmp_path, f"{name}.npy"), values)
+            os.rename(tmp_path, final_path)
+        except OSError:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            if os.path.exists(final_path):
+                raise FileExistsError(f"Survey {table} DAH {dah} is already stored")
+            raise
+
+    def create_survey(self, table, dah, n_rows, dtypes):
+        """
+        Open a new segment of `table` for streaming writes, e.g. predictions
+        produced chunk by chunk. `dtypes` maps column names (including field_id)
+        to dtypes. Returns a SegmentWriter; the segment is published by commit()
+        or on leaving a with-block cleanly, and discarded otherwise.
+        """
+        missing = [name for name in KEY_COLUMNS if name not in dtypes]
+        if missing:
+            raise ValueError(f"Survey columns must include {missing}")
+        final_path = self._segment_path(table, dah)
+        if os.path.exists(final_path):
+            raise FileExistsError(f"Survey {table} DAH {dah} is already stored")
+        return SegmentWriter(final_path, n_rows, dtypes)
+
+    def write_season(self, table, columns):
+        """
+        Split a generated season (dict of arrays with a `dah` column) by survey
+        and append each survey as its own segment.
+        """
+        dah = np.asarray(columns["dah"])
+        for survey in np.unique(dah):
+            mask = dah == survey
+            self.append_survey(
+                table, survey,
+                {name: np.asarray(values)[mask] for name, values in columns.items()}
+            )
+
+    def read(self, table, columns=None, dah=None, dah_range=None, fields=None):
+        """
+        Read a projection of `table` as a dict of 1-D arrays.
+
+        columns:   column names to load (default: all).
+        dah:       a survey day or iterable of survey days to keep.
+        dah_range: inclusive (low, high) DAH bounds; either end may be None.
+        fields:    field ids to keep; a step-1 `range` is sliced by binary search,
+                   any other iterable is matched against the field_id column.
+        """
+        surveys = self.surveys(table)
+        if dah is not None:
+            wanted = set(np.atleast_1d(dah).tolist())
+            surveys = [survey for survey in surveys if survey in wanted]
+        if dah_range is not None:
+            low, high = dah_range
+            surveys = [
+                survey for survey in surveys
+                if (low is None or survey >= low) and (high is None or survey <= high)
+            ]
+
+        names = list(columns) if columns is not None else self.columns(table)
+        if fields is not None and not (isinstance(fields, range) and fields.step == 1):
+            fields = np.unique(np.fromiter(fields, dtype=np.int64))
+        parts = {name: [] for name in names}
+        for survey in surveys:
+            segment = self._segment_path(table, survey)
+            rows = self._select_rows(segment, fields)
+            for name in names:
+                if name == "dah":
+                    count = _row_count(segment) if rows is None else _selection_size(rows)
+                    parts[name].append(np.full(count, survey, dtype=np.int32))
+                    continue
+                values = np.load(os.path.join(segment, f"{name}.npy"), mmap_mode="r")
+                parts[name].append(values if rows is None else values[rows])
+
+        return {
+            name: np.concatenate(chunks) if chunks else np.empty(0)
+            for name, chunks in parts.items()
+        }
+
+    def _select_rows(self, segment, fields):
+        """
+        Return a slice or index array selecting `fields` in a segment, or None for all rows.
+        """
+        if fields is None:
+            return None
+        field_id = np.load(os.path.join(segment, "field_id.npy"), mmap_mode="r")
+        if isinstance(fields, range) and fields.step == 1:
+            start, stop = np.searchsorted(field_id, [fields.start, fields.stop])
+            return slice(int(start), int(stop))
+        return np.flatnonzero(np.isin(field_id, fields))
+
+class SegmentWriter:
+    """
+    A survey segment being written through memory-mapped `.npy` columns.
+    Other processes may open `paths[name]` with mode "r+" to fill row ranges.
+    """
+
+    def __init__(self, final_path, n_rows, dtypes):
+        self.final_path = final_path
+        self.tmp_path = f"{final_path}.tmp-{uuid.uuid4().hex}"
+        os.makedirs(self.tmp_path)
+        self.paths = {name: os.path.join(self.tmp_path, f"{name}.npy") for name in dtypes}
+        self.columns = {
+            name: np.lib.format.open_memmap(self.paths[name], mode="w+", dtype=dtype, shape=(int(n_rows),))
+            for name, dtype in dtypes.items()
+        }
+
+    def commit(self):
+        """
+        Flush the columns and publish the segment with a single rename.
+        field_id must have been written in ascending order.
+        """
+        field_id = self.columns["field_id"]
+        for start in range(0, field_id.size, 1 << 22):
+            block = field_id[max(start - 1, 0):start + (1 << 22)]
+            if np.any(block[1:] < block[:-1]):
+                self.discard()
+                raise ValueError("Streamed segments must be written in field_id order")
+        for values in self.columns.values():
+            values.flush()
+        self.columns = {}
+        try:
+            os.rename(self.tmp_path, self.final_path)
+        except OSError:
+            shutil.rmtree(self.tmp_path, ignore_errors=True)
+            if os.path.exists(self.final_path):
+                raise FileExistsError(f"Survey segment {self.final_path} is already stored")
+            raise
+
+    def discard(self):
+        self.columns = {}
+        shutil.rmtree(self.tmp_path, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.discard()
+
+def _row_count(segment):
+    return np.load(os.path.join(segment, "field_id.npy"), mmap_mode="r").shape[0]
+
+def _selection_size(rows):
+    if isinstance(rows, slice):
+        return rows.stop - rows.start
+    return rows.size
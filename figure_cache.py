@@ -0,0 +1,182 @@
+"""
+Process-wide cache of built Plotly figures for the Streamlit pages.
+
+Every widget interaction reruns the whole page script, rebuilding each figure
+even when nothing it shows has changed. Pages move the construction of such
+figures into builder functions decorated with FIGURE_CACHE.memoize: the
+figure is built once per distinct set of arguments and shared by every rerun
+and session in the process, so only figures whose inputs changed are rebuilt.
+
+Entries are evicted least recently used, bounded both by count and by the
+size of their serialized JSON (what st.plotly_chart ships to the browser).
+An entry holds the figure's dict spec, and every call returns a new figure
+made from it without re-validating (a fraction of a rebuild), so a caller
+that updates its figure does not change what other reruns and sessions get.
+
+Builders must depend only on their arguments and on plain-data globals or
+closure values (numbers, strings and containers of them), which are part of
+the key; pass arrays and other data as arguments.
+"""
+
+import functools
+import inspect
+import threading
+import types
+from collections import OrderedDict
+
+_PLAIN_TYPES = (bool, int, float, complex, str, bytes, type(None))
+
+class FigureCache:
+    """
+    LRU cache of Plotly figures with per-builder hit/miss counters.
+    """
+
+    def __init__(self, maxsize=128, max_bytes=64 * 2**20):
+        self.maxsize = maxsize
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self._entries = OrderedDict()
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, builder):
+        """
+        Return a copy of the figure cached under `key` (whose first item names
+        the builder), calling `builder()` to produce it on a miss.
+        """
+        with self._lock:
+            counters = self._counters.setdefault(key[0], {"hits": 0, "misses": 0})
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                counters["hits"] += 1
+            else:
+                counters["misses"] += 1
+        if entry is not None:
+            figure_type, spec, _ = entry
+            # The spec came from a validated figure; the constructor copies it
+            return figure_type(spec, _validate=False)
+
+        figure = builder()
+        nbytes = len(figure.to_json())
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.nbytes -= previous[2]
+            self._entries[key] = (type(figure), figure.to_dict(), nbytes)
+            self.nbytes += nbytes
+            while self._entries and (len(self._entries) > self.maxsize or self.nbytes > self.max_bytes):
+                _, (_, _, evicted) = self._entries.popitem(last=False)
+                self.nbytes -= evicted
+        return figure
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+    def info(self):
+        """
+        Return cache statistics as a dict, with hit rates overall and per builder.
+        """
+        with self._lock:
+            builders = {name: dict(counts, hit_rate=_hit_rate(counts)) for name, counts in self._counters.items()}
+            hits = sum(counts["hits"] for counts in self._counters.values())
+            misses = sum(counts["misses"] for counts in self._counters.values())
+            return {
+                "hits": hits,
+                "misses": misses,
+                "hit_rate": _hit_rate({"hits": hits, "misses": misses}),
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "nbytes": self.nbytes,
+                "max_bytes": self.max_bytes,
+                "builders": builders,
+            }
+
+    def memoize(self, func):
+        """
+        Wrap a figure builder so calls with equal arguments share one figure.
+        Builders are keyed by source file, name and bytecode, so builders
+        redefined on every page rerun keep hitting their entries, and editing
+        a builder does not serve figures built by the old code. The plain-data
+        globals and closure values the builder reads are keyed as well.
+        """
+        signature = inspect.signature(func)
+        code = func.__code__
+        name = f"{code.co_filename}:{func.__qualname__}"
+        version = hash((code.co_code, code.co_consts))
+        global_names = sorted(_global_names(code) & set(func.__globals__))
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            key = (name, version, _referenced_values(func, global_names)) + tuple(
+                (param, _hashable(value)) for param, value in bound.arguments.items()
+            )
+            return self.get(key, lambda: func(*args, **kwargs))
+
+        wrapper.uncached = func
+        return wrapper
+
+# Shared by all pages and sessions of the process
+FIGURE_CACHE = FigureCache()
+
+def figure_cache_info():
+    """
+    Return hit/miss counters and size of the shared figure cache.
+    """
+    return FIGURE_CACHE.info()
+
+def _hit_rate(counts):
+    total = counts["hits"] + counts["misses"]
+    return counts["hits"] / total if total else 0.0
+
+def _hashable(value):
+    """
+    Convert builder arguments (lists, dicts, arrays) into hashable keys.
+    """
+    if isinstance(value, dict):
+        return tuple(sorted((key, _hashable(item)) for key, item in value.items()))
+    if isinstance(value, (list, tuple, range)):
+        return tuple(_hashable(item) for item in value)
+    if isinstance(value, (set, frozenset)):
+        return frozenset(_hashable(item) for item in value)
+    if hasattr(value, "tobytes") and hasattr(value, "dtype"):
+        # NumPy arrays and scalars, without importing NumPy here
+        return ("array", str(value.dtype), getattr(value, "shape", ()), value.tobytes())
+    return value
+
+def _global_names(code):
+    """
+    Return the names a code object and its nested code objects may load.
+    """
+    names = set(code.co_names)
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            names |= _global_names(const)
+    return names
+
+def _referenced_values(func, global_names):
+    """
+    Return the current plain-data globals and closure values of a builder as a
+    hashable key; modules, functions, arrays and other objects are left out.
+    """
+    values = [(name, func.__globals__[name]) for name in global_names if name in func.__globals__]
+    for name, cell in zip(func.__code__.co_freevars, func.__closure__ or ()):
+        try:
+            values.append((name, cell.cell_contents))
+        except ValueError:
+            # Closure variable not assigned yet
+            continue
+    return tuple((name, _hashable(value)) for name, value in values if _is_plain(value))
+
+def _is_plain(value):
+    if isinstance(value, _PLAIN_TYPES):
+        return True
+    if isinstance(value, dict):
+        return all(_is_plain(key) and _is_plain(item) for key, item in value.items())
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return all(_is_plain(item) for item in value)
+    return False
@@ -0,0 +1,171 @@
+"""
+Plot-level feature matrices for the biomass and nitrogen models.
+
+Every survey plot (one field on one DAH) is turned into one row of features:
+
+- multispectral: mean, standard deviation and 10th/90th percentiles of each
+  vegetation index over the plot's band tiles (processing.band_math);
+- LiDAR: canopy height model metrics from the plot's point cloud
+  (processing.lidar): mean, median, 90th percentile and maximum height,
+  canopy cover above 0.5 m and canopy volume per square metre.
+
+Plot imagery and point clouds are simulated from the field's actual biomass
+and leaf nitrogen (data.biomass_data / data.nitrogen_data): biomass drives leaf
+area, canopy cover and cane height, nitrogen drives chlorophyll absorption in
+the green and red-edge bands. Multispectral indices saturate in dense canopy
+and small early canopies are poorly resolved by LiDAR, as in the field study.
+
+Features are cached on disk in a data.survey_store.SurveyStore, one segment
+per survey, so adding a survey only computes features for the new plots.
+"""
+
+import numpy as np
+
+from data.biomass_data import DAH_INTERVALS, generate_biomass_season
+from data.nitrogen_data import generate_nitrogen_season
+from data.survey_store import SurveyStore
+from processing.band_math import INDEX_EXPRESSIONS, compile_indices
+from processing.lidar import process_point_cloud, synthetic_sugarcane_cloud
+
+# Bump when simulation or feature definitions change, so cached tables are rebuilt
+FEATURE_VERSION = 1
+
+# Simulated plot: band tile size (pixels), footprint (m) and LiDAR returns
+PLOT_PIXELS = 32
+PLOT_SIZE = 8.0
+PLOT_POINTS = 3000
+
+INDEX_NAMES = tuple(INDEX_EXPRESSIONS)
+INDEX_STATISTICS = ("mean", "std", "p10", "p90")
+CHM_METRICS = ("chm_mean", "chm_p50", "chm_p90", "chm_max", "canopy_cover", "canopy_volume")
+
+# Feature columns used by each sensing model
+MULTISPECTRAL_FEATURES = tuple(f"{index}_{stat}" for index in INDEX_NAMES for stat in INDEX_STATISTICS)
+MODEL_FEATURES = {
+    "multispectral": MULTISPECTRAL_FEATURES,
+    "lidar": CHM_METRICS,
+    "fusion": MULTISPECTRAL_FEATURES + CHM_METRICS,
+    "ndvi": ("ndvi_mean",),
+}
+
+# Soil and fully green leaf reflectance per band (blue, green, red, red_edge, nir)
+_SOIL = np.array([0.08, 0.11, 0.15, 0.20, 0.26], dtype=np.float32)
+_LEAF = np.array([0.04, 0.10, 0.04, 0.28, 0.46], dtype=np.float32)
+_BANDS = ("blue", "green", "red", "red_edge", "nir")
+
+_INDEX_PLAN = compile_indices(list(INDEX_NAMES))
+
+def simulate_plot(biomass, nitrogen, rng):
+    """
+    Simulate one plot's band tiles (dict of float32 reflectance) and (N, 3) point cloud.
+    """
+    # Leaf area grows with biomass and saturates in dense canopy; the
+    # biomass-to-leaf-area ratio varies from plot to plot
+    lai = 6.0 * (1 - np.exp(-max(biomass, 0.0) / 45.0)) * rng.lognormal(0, 0.2)
+    cover = 1 - np.exp(-0.55 * lai * rng.uniform(0.7, 1.3, (PLOT_PIXELS, PLOT_PIXELS)))
+
+    # Chlorophyll (leaf N) deepens green and red-edge absorption; dense canopy raises NIR
+    leaf = _LEAF.copy()
+    # Leaf structure and pigments other than chlorophyll blur the nitrogen signal
+    leaf[1] -= 0.035 * (nitrogen - 1.8) + rng.normal(0, 0.004)
+    leaf[3] -= 0.08 * (nitrogen - 1.8) + rng.normal(0, 0.01)
+    leaf[4] += 0.02 * lai
+    soil = _SOIL * rng.uniform(0.7, 1.3)
+    cover = cover[None].astype(np.float32)
+    bands = cover * leaf[:, None, None] + (1 - cover) * soil[:, None, None]
+    # Illumination differs between flights and plots
+    bands *= rng.normal(1, 0.06)
+    bands += rng.normal(0, 0.006, bands.shape).astype(np.float32)
+    bands = {name: np.clip(band, 0.001, 1) for name, band in zip(_BANDS, bands)}
+
+    # Cane height follows biomass, scattered by stalk density and, before the
+    # stalks elongate, by tillering; ground returns thin out as the canopy closes
+    spread = 0.06 + 0.4 * np.exp(-max(biomass, 0.0) / 25.0)
+    height = 0.042 * max(biomass, 0.0) * rng.lognormal(0, spread)
+    points = synthetic_sugarcane_cloud(
+        PLOT_POINTS, width=PLOT_SIZE, length=PLOT_SIZE, canopy_height=max(height, 0.05),
+        ground_fraction=float(np.clip(np.exp(-0.4 * lai), 0.05, 0.9)), seed=rng.integers(2**31),
+    )
+    # Sensor ranging noise dominates small early canopies
+    points[:, 2] += rng.normal(0, 0.25, len(points))
+    return bands, points
+
+def plot_features(bands, points):
+    """
+    Compute the feature row for one plot as a dict of floats.
+    """
+    features = {}
+    for index, values in _INDEX_PLAN.evaluate(bands).items():
+        values = values[np.isfinite(values)]
+        p10, p90 = np.percentile(values, [10, 90])
+        features.update({
+            f"{index}_mean": float(values.mean()),
+            f"{index}_std": float(values.std()),
+            f"{index}_p10": float(p10),
+            f"{index}_p90": float(p90),
+        })
+
+    products = process_point_cloud(points, cell_size=0.5, ground_window=3.0)
+    chm = products["chm"][np.isfinite(products["chm"])]
+    features.update({
+        "chm_mean": float(chm.mean()),
+        "chm_p50": float(np.median(chm)),
+        "chm_p90": float(np.percentile(chm, 90)),
+        "chm_max": float(chm.max()),
+        "canopy_cover": float(np.mean(chm > 0.5)),
+        "canopy_volume": products["total_volume"] / (PLOT_SIZE * PLOT_SIZE),
+    })
+    return features
+
+def compute_survey_features(dah, n_fields, seed):
+    """
+    Compute the feature rows and targets of every field for one survey.
+    Each plot draws from its own (seed, dah, field) stream, so a survey's
+    features do not depend on which other surveys are computed.
+    """
+    biomass = generate_biomass_season(n_fields=n_fields, dah=[dah], seed=seed)
+    nitrogen = generate_nitrogen_season(n_fields=n_fields, dah=[dah], seed=seed + 1)
+
+    rows = []
+    for field in range(n_fields):
+        rng = np.random.default_rng([seed, dah, field])
+        bands, points = simulate_plot(float(biomass["actual_biomass"][field]),
+                                      float(nitrogen["actual_nitrogen"][field]), rng)
+        rows.append(plot_features(bands, points))
+
+    columns = {
+        "field_id": biomass["field_id"],
+        "stage_code": biomass["stage_code"],
+        "actual_biomass": biomass["actual_biomass"],
+        "actual_nitrogen": nitrogen["actual_nitrogen"],
+    }
+    for name in rows[0]:
+        columns[name] = np.array([row[name] for row in rows], dtype=np.float32)
+    return columns
+
+def feature_table(n_fields, seed):
+    """
+    Name of the SurveyStore table holding features for a given simulation.
+    """
+    return f"features_v{FEATURE_VERSION}_seed{seed}_fields{n_fields}"
+
+def load_feature_matrix(store, dah=None, n_fields=100, seed=42):
+    """
+    Return the feature matrix for the `dah` surveys as a dict of columns,
+    computing and storing only the surveys missing from `store` (a
+    SurveyStore or a directory path).
+    """
+    if not isinstance(store, SurveyStore):
+        store = SurveyStore(store)
+    dah_grid = [int(value) for value in (DAH_INTERVALS if dah is None else dah)]
+    table = feature_table(n_fields, seed)
+
+    stored = set(store.surveys(table))
+    for survey in dah_grid:
+        if survey not in stored:
+            try:
+                store.append_survey(table, survey, compute_survey_features(survey, n_fields, seed))
+            except FileExistsError:
+                # Another process stored the same survey first
+                pass
+    return store.read(table, dah=dah_grid)
@@ -0,0 +1,243 @@
+"""
+Batch inference with the trained biomass and nitrogen models.
+
+Fitted estimators (modeling.training) are loaded once per process with joblib
+memory mapping, so worker processes share the model arrays through the page
+cache instead of each holding a copy. Linear models (the scaler + ridge
+pipelines and the NDVI baseline) are folded into one weight per feature
+column, and predictions are accumulated column by column over micro-batches
+that stay in CPU cache; other estimators fall back to their own predict().
+
+predict_field() scores a feature table or a set of feature rasters, routing
+each row to the model recommended for its growth stage by
+data.biomass_data.get_best_model_by_stage(). score_survey() streams the
+predictions for a stored feature survey into a new SurveyStore segment,
+optionally split across a process pool.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import joblib
+import numpy as np
+
+from data.biomass_data import MODEL_LABELS, get_best_model_by_stage
+from data.growth_stages import classify_growth_stage, get_stage_table
+from data.model_metrics import MODEL_DIR
+from data.survey_store import SurveyStore
+from modeling.features import MODEL_FEATURES
+from modeling.training import model_filename
+
+# Rows scored per micro-batch; 64k float32 rows keep the accumulator in L2 cache
+DEFAULT_BATCH_SIZE = 65_536
+
+_MODEL_KEYS = {label: model for model, label in MODEL_LABELS.items()}
+
+class CompiledModel:
+    """
+    A fitted estimator prepared for batch scoring over feature columns.
+    """
+
+    def __init__(self, estimator, features):
+        self.estimator = estimator
+        self.features = tuple(features)
+        self.weights, self.intercept = _linear_form(estimator, len(self.features))
+
+    @property
+    def is_linear(self):
+        return self.weights is not None
+
+    def predict(self, columns, rows=slice(None), out=None):
+        """
+        Predict for `rows` (a slice or index array) of a dict of 1-D feature columns.
+        """
+        first = columns[self.features[0]][rows]
+        if out is None:
+            out = np.empty(len(first), dtype=np.float32)
+        if not self.is_linear:
+            X = np.column_stack([np.asarray(columns[name][rows], dtype=np.float64) for name in self.features])
+            out[:] = self.estimator.predict(X)
+            return out
+
+        # out = intercept + sum_j w_j * x_j, one fused pass per feature column
+        out.fill(self.intercept)
+        scratch = np.empty_like(out)
+        for name, weight in zip(self.features, self.weights):
+            np.multiply(columns[name][rows], weight, out=scratch, dtype=np.float32, casting="unsafe")
+            out += scratch
+        return out
+
+def _linear_form(estimator, n_features):
+    """
+    Return (weights, intercept) if the estimator is an affine function of its
+    inputs (optionally behind a StandardScaler), else (None, None).
+    """
+    steps = [step for _, step in estimator.steps] if hasattr(estimator, "steps") else [estimator]
+    mean = np.zeros(n_features)
+    scale = np.ones(n_features)
+    for step in steps[:-1]:
+        if not (hasattr(step, "mean_") and hasattr(step, "scale_")):
+            return None, None
+        mean = np.asarray(step.mean_ if step.with_mean else np.zeros(n_features))
+        scale = np.asarray(step.scale_ if step.with_std else np.ones(n_features))
+    final = steps[-1]
+    if not (hasattr(final, "coef_") and hasattr(final, "intercept_")) or np.ndim(final.coef_) != 1:
+        return None, None
+    weights = np.asarray(final.coef_) / scale
+    intercept = float(final.intercept_) - float(np.dot(mean, weights))
+    return weights.astype(np.float32), intercept
+
+class ModelRegistry:
+    """
+    Fitted models of one model directory, each loaded on first use and kept.
+    """
+
+    def __init__(self, model_dir=None):
+        self.model_dir = MODEL_DIR if model_dir is None else model_dir
+        self._models = {}
+
+    def get(self, target, stage_code, model):
+        """
+        Return the CompiledModel for a (target, stage, sensing model).
+        """
+        key = (target, int(stage_code), model)
+        compiled = self._models.get(key)
+        if compiled is None:
+            path = os.path.join(self.model_dir, model_filename(target, stage_code, model))
+            if not os.path.exists(path):
+                raise FileNotFoundError(f"No trained model at {path}; run python -m modeling.training")
+            compiled = CompiledModel(joblib.load(path, mmap_mode="r"), MODEL_FEATURES[model])
+            self._models[key] = compiled
+        return compiled
+
+    def stage_routes(self, target):
+        """
+        Return the CompiledModel chosen for each stage code by get_best_model_by_stage().
+        """
+        stages = get_stage_table()["stages"]
+        return [
+            self.get(target, code, _MODEL_KEYS[get_best_model_by_stage(stage)])
+            for code, stage in enumerate(stages)
+        ]
+
+_REGISTRIES = {}
+
+def get_registry(model_dir=None):
+    """
+    Return the process-wide registry for a model directory.
+    """
+    model_dir = MODEL_DIR if model_dir is None else model_dir
+    registry = _REGISTRIES.get(model_dir)
+    if registry is None:
+        registry = _REGISTRIES[model_dir] = ModelRegistry(model_dir)
+    return registry
+
+def _as_columns(data):
+    """
+    Normalize a DataFrame, dict of 1-D columns or dict of 2-D rasters to flat
+    columns; returns (columns, output shape).
+    """
+    if hasattr(data, "columns") and hasattr(data, "to_numpy"):
+        data = {name: data[name].to_numpy() for name in data.columns}
+    shapes = {np.shape(values) for values in data.values() if np.ndim(values) > 0}
+    if len(shapes) != 1:
+        raise ValueError(f"Feature columns differ in shape: {sorted(shapes)}")
+    shape = shapes.pop()
+    columns = {name: np.asarray(values).reshape(-1) for name, values in data.items() if np.ndim(values) > 0}
+    return columns, shape
+
+def predict_field(data, target="biomass", dah=None, model_dir=None, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Predict `target` for every row of a feature table or pixel of a set of rasters.
+
+    data:   DataFrame or dict of feature columns, or dict of equally shaped 2-D
+            feature rasters. Rows are routed by a `stage_code` or `dah` column,
+            or by the scalar `dah` for the whole input.
+    Returns float32 predictions with the input's shape; raises ValueError for
+    stage codes outside the growth-stage table.
+    """
+    columns, shape = _as_columns(data)
+    n_rows = int(np.prod(shape))
+    routes = get_registry(model_dir).stage_routes(target)
+
+    if "stage_code" in columns:
+        stage_code = columns["stage_code"]
+    elif "dah" in columns:
+        stage_code = classify_growth_stage(columns["dah"])
+    elif dah is not None:
+        stage_code = np.full(1, classify_growth_stage(dah))
+    else:
+        raise ValueError("predict_field needs stage_code or dah per row, or a dah for the whole input")
+    unrouted = ~np.isin(stage_code, np.arange(len(routes)))
+    if unrouted.any():
+        raise ValueError(f"stage_code values must be integers in [0, {len(routes)}), "
+                         f"got {np.unique(stage_code[unrouted])[:5].tolist()}")
+
+    for model in {id(model): model for model in routes}.values():
+        missing = [name for name in model.features if name not in columns]
+        if missing:
+            raise ValueError(f"Missing feature columns for {target} prediction: {missing}")
+
+    out = np.empty(n_rows, dtype=np.float32)
+    if stage_code.size == 1 or np.all(stage_code == stage_code[0]):
+        # One stage (a single survey or raster): score contiguous micro-batches
+        model = routes[int(stage_code[0])]
+        for start in range(0, n_rows, batch_size):
+            rows = slice(start, min(start + batch_size, n_rows))
+            model.predict(columns, rows, out=out[rows])
+    else:
+        for code, model in enumerate(routes):
+            selected = np.flatnonzero(stage_code == code)
+            for start in range(0, selected.size, batch_size):
+                rows = selected[start:start + batch_size]
+                out[rows] = model.predict(columns, rows)
+    return out.reshape(shape)
+
+def _score_range(feature_paths, output_path, target, stage_code, model_dir, start, stop, batch_size):
+    """
+    Score rows [start, stop) of memory-mapped feature columns into an output column.
+    Runs in a worker process; the registry is loaded once per process.
+    """
+    model = get_registry(model_dir).stage_routes(target)[stage_code]
+    columns = {name: np.load(path, mmap_mode="r") for name, path in feature_paths.items()
+               if name in model.features}
+    out = np.load(output_path, mmap_mode="r+")
+    for batch in range(start, stop, batch_size):
+        rows = slice(batch, min(batch + batch_size, stop))
+        model.predict(columns, rows, out=out[rows])
+    out.flush()
+    return stop - start
+
+def score_survey(store, feature_table, dah, output_table, target="biomass", model_dir=None,
+                 workers=1, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Predict `target` for one stored feature survey and stream the predictions
+    into a new `output_table` segment (field_id, predicted_<target>).
+    With workers > 1, row ranges are scored in parallel processes.
+    Returns the number of rows scored.
+    """
+    if not isinstance(store, SurveyStore):
+        store = SurveyStore(store)
+    feature_paths = store.column_paths(feature_table, dah)
+    field_id = np.load(feature_paths["field_id"], mmap_mode="r")
+    n_rows = field_id.shape[0]
+    stage_code = int(classify_growth_stage(dah))
+    # Load (and validate) the routed model before any output is created
+    get_registry(model_dir).stage_routes(target)
+
+    column = f"predicted_{target}"
+    with store.create_survey(output_table, dah, n_rows, {"field_id": field_id.dtype, column: np.float32}) as writer:
+        writer.columns["field_id"][:] = field_id
+        bounds = np.linspace(0, n_rows, max(1, workers) + 1).astype(np.int64)
+        args = [
+            (feature_paths, writer.paths[column], target, stage_code, model_dir, int(start), int(stop), batch_size)
+            for start, stop in zip(bounds[:-1], bounds[1:]) if stop > start
+        ]
+        if workers <= 1:
+            for task in args:
+                _score_range(*task)
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                for future in [pool.submit(_score_range, *task) for task in args]:
+                    future.result()
+    return n_rows
@@ -0,0 +1,138 @@
+"""
+Training pipeline for the per-stage biomass and nitrogen models.
+
+For each target (biomass, nitrogen), growth stage and sensing model
+(multispectral, LiDAR, fusion and the NDVI baseline) a scikit-learn regressor
+is fitted on the plot-level feature matrix from modeling.features:
+
+- NDVI baseline: ordinary least squares on mean NDVI;
+- multispectral, LiDAR and fusion: standardized features with ridge
+  regression, its penalty chosen by internal cross-validation.
+
+R² and RMSE are measured by K-fold cross-validation and written to the
+metrics table served by data.model_metrics; each model is then refitted on all
+plots of its stage and saved with joblib as <model_dir>/<target>_<stage>_<model>.joblib.
+Fits are independent, so they run in parallel in a process pool.
+
+Example:
+    python -m modeling.training --fields 200 --features-dir survey_features/
+"""
+
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import joblib
+import numpy as np
+from sklearn.linear_model import LinearRegression, RidgeCV
+from sklearn.metrics import mean_squared_error, r2_score
+from sklearn.model_selection import KFold, cross_val_predict
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import StandardScaler
+
+from data.biomass_data import MODEL_LABELS
+from data.growth_stages import get_stage_table
+from data.model_metrics import MODEL_DIR, write_model_metrics
+from modeling.features import MODEL_FEATURES, load_feature_matrix
+
+# Targets and the feature-matrix column holding their measured value
+TARGETS = {"biomass": "actual_biomass", "nitrogen": "actual_nitrogen"}
+
+# Default directory of the on-disk feature store
+FEATURES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "survey_features")
+
+CV_FOLDS = 5
+RIDGE_ALPHAS = np.logspace(-3, 3, 13)
+
+def make_estimator(model):
+    """
+    Return an unfitted scikit-learn estimator for a sensing model.
+    """
+    if model == "ndvi":
+        return LinearRegression()
+    return make_pipeline(StandardScaler(), RidgeCV(alphas=RIDGE_ALPHAS))
+
+def model_filename(target, stage_code, model):
+    return f"{target}_{int(stage_code)}_{model}.joblib"
+
+def fit_stage_model(target, stage_code, model, features, values, model_dir, seed=0):
+    """
+    Cross-validate and fit one model, save it and return its metrics row.
+    Runs in a worker process.
+    """
+    folds = KFold(n_splits=min(CV_FOLDS, len(values)), shuffle=True, random_state=seed)
+    predicted = cross_val_predict(make_estimator(model), features, values, cv=folds)
+    estimator = make_estimator(model).fit(features, values)
+    joblib.dump(estimator, os.path.join(model_dir, model_filename(target, stage_code, model)))
+    return {
+        "target": target,
+        "stage_code": stage_code,
+        "model": model,
+        "r2": r2_score(values, predicted),
+        "rmse": float(np.sqrt(mean_squared_error(values, predicted))),
+        "n_samples": len(values),
+    }
+
+def training_tasks(matrix, targets=tuple(TARGETS), models=tuple(MODEL_LABELS)):
+    """
+    Yield (target, stage_code, model, X, y) for every model to fit.
+    """
+    stage_codes = np.asarray(matrix["stage_code"])
+    for target in targets:
+        values = np.asarray(matrix[TARGETS[target]], dtype=np.float64)
+        for stage_code in np.unique(stage_codes):
+            rows = stage_codes == stage_code
+            for model in models:
+                features = np.column_stack([matrix[name][rows] for name in MODEL_FEATURES[model]])
+                yield target, int(stage_code), model, features.astype(np.float64), values[rows]
+
+def train_models(matrix, model_dir=None, targets=tuple(TARGETS), models=tuple(MODEL_LABELS),
+                 max_workers=None):
+    """
+    Fit every (target, stage, model) combination on a feature matrix, save the
+    models and the metrics table in `model_dir` and return the metrics columns.
+    `max_workers=1` fits in this process.
+    """
+    model_dir = MODEL_DIR if model_dir is None else model_dir
+    os.makedirs(model_dir, exist_ok=True)
+    tasks = list(training_tasks(matrix, targets, models))
+
+    if max_workers == 1:
+        rows = [fit_stage_model(*task, model_dir) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            futures = [pool.submit(fit_stage_model, *task, model_dir) for task in tasks]
+            rows = [future.result() for future in futures]
+
+    metrics = {
+        "target": np.array([row["target"] for row in rows]),
+        "stage_code": np.array([row["stage_code"] for row in rows], dtype=np.int8),
+        "model": np.array([row["model"] for row in rows]),
+        "r2": np.array([row["r2"] for row in rows]),
+        "rmse": np.array([row["rmse"] for row in rows]),
+        "n_samples": np.array([row["n_samples"] for row in rows], dtype=np.int64),
+    }
+    write_model_metrics(metrics, model_dir)
+    return metrics
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train the per-stage biomass and nitrogen models.")
+    parser.add_argument("--fields", type=int, default=100, help="simulated fields per survey")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--features-dir", default=FEATURES_DIR, help="on-disk feature store")
+    parser.add_argument("--model-dir", default=MODEL_DIR,
+                        help="output directory (default: PA_MODEL_DIR or trained_models/, which the app reads)")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    args = parser.parse_args(argv)
+
+    matrix = load_feature_matrix(args.features_dir, n_fields=args.fields, seed=args.seed)
+    metrics = train_models(matrix, args.model_dir, max_workers=args.workers)
+
+    stages = get_stage_table()["stages"]
+    for target, stage_code, model, r2, rmse in zip(
+        metrics["target"], metrics["stage_code"], metrics["model"], metrics["r2"], metrics["rmse"]
+    ):
+        print(f"{target:<9} {stages[stage_code]:<20} {MODEL_LABELS[model]:<14} R² {r2:6.3f}  RMSE {rmse:7.3f}")
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,5 @@
 import streamlit as st
+from utils import remote_image
 
 # Page configuration
 st.set_page_config(
@@ -48,13 +49,11 @@ with col1:
     """)
 
 with col2:
-    st.image("https://plus.unsplash.com/premium_photo-1661872779637-b6e14433dfc1?q=80&w=2070&auto=format&fit=crop&ixlib=rb-4.0.3&ixid=M3wxMjA3fDB8MHxwaG90by1wYWdlfHx8fGVufDB8fHx8fA%3D%3D", 
-             caption="Precision agriculture enables data-driven farming decisions",
-             use_container_width=True)
+    remote_image("https://plus.unsplash.com/premium_photo-1661872779637-b6e14433dfc1?q=80&w=2070&auto=format&fit=crop&ixlib=rb-4.0.3&ixid=M3wxMjA3fDB8MHxwaG90by1wYWdlfHx8fGVufDB8fHx8fA%3D%3D",
+                 caption="Precision agriculture enables data-driven farming decisions")
     
-    st.image("https://images.unsplash.com/photo-1549507803-6c47d24c46f7?q=80&w=2080&auto=format&fit=crop&ixlib=rb-4.0.3&ixid=M3wxMjA3fDB8MHxwaG90by1wYWdlfHx8fGVufDB8fHx8fA%3D%3D", 
-             caption="Sugarcane fields benefit from precision management",
-             use_container_width=True)
+    remote_image("https://images.unsplash.com/photo-1549507803-6c47d24c46f7?q=80&w=2080&auto=format&fit=crop&ixlib=rb-4.0.3&ixid=M3wxMjA3fDB8MHxwaG90by1wYWdlfHx8fGVufDB8fHx8fA%3D%3D",
+                 caption="Sugarcane fields benefit from precision management")
 
 # Additional information
 st.markdown("""
@@ -1,4 +1,6 @@
 import streamlit as st
+from utils import lazy_import, remote_image
+go = lazy_import("plotly.graph_objects")
 
 # Page configuration
 st.set_page_config(
@@ -49,9 +51,8 @@ with col1:
     """)
 
 with col2:
-    st.image("https://images.unsplash.com/photo-1473968512647-3e447244af8f?q=80&w=2070&auto=format&fit=crop&ixlib=rb-4.0.3&ixid=M3wxMjA3fDB8MHxwaG90by1wYWdlfHx8fGVufDB8fHx8fA%3D%3D",
-             caption="Agricultural drone surveying crops",
-             use_container_width=True)
+    remote_image("https://images.unsplash.com/photo-1473968512647-3e447244af8f?q=80&w=2070&auto=format&fit=crop&ixlib=rb-4.0.3&ixid=M3wxMjA3fDB8MHxwaG90by1wYWdlfHx8fGVufDB8fHx8fA%3D%3D",
+                 caption="Agricultural drone surveying crops")
     
     # Add simplified UAV diagram using Streamlit components
     st.markdown("### Basic Components of an Agricultural UAV")
@@ -104,9 +105,6 @@ benefits_data = {
 categories = ["Field Coverage", "Data Resolution", "Cost Efficiency", "Time Savings", "Problem Detection"]
 
 # Create a radar chart using Plotly
-import plotly.graph_objects as go
-import numpy as np
-
 fig = go.Figure()
 
 # Add traditional methods
@@ -1,5 +1,10 @@
 import streamlit as st
-import plotly.graph_objects as go
+from figure_cache import FIGURE_CACHE
+from utils import lazy_import
+go = lazy_import("plotly.graph_objects")
+
+from processing.lidar import synthetic_sugarcane_cloud
+from processing.point_lod import PointCloudLOD, cached_lod
 
 # Page configuration
 st.set_page_config(
@@ -56,34 +61,39 @@ with col2:
     # LiDAR point cloud representation
     st.markdown("### LiDAR Point Cloud Representation")
     
-    # Create a 3D scatter plot to represent a LiDAR point cloud
-    import numpy as np
-    
-    # Generate sample data for a simplified sugarcane canopy
-    np.random.seed(42)
-    n_points = 1000
-    
-    # Create x and y coordinates in a grid pattern for rows
-    x = np.repeat(np.linspace(0, 10, 10), 100)
-    y = np.tile(np.linspace(0, 10, 100), 10)
-    
-    # Create z coordinates with higher values in the middle (plant structure)
-    base_z = np.sin(x * 0.5) * 1.5 + np.cos(y * 0.5) * 1.5
-    plant_shape = 3 * np.exp(-0.1 * ((x - 5)**2 + (y - 5)**2))
-    z = base_z + plant_shape + np.random.normal(0, 0.2, n_points)
-    
-    # Create color gradient based on height
-    colors = z
-    
-    # Create the 3D scatter plot
+    # Simulated sugarcane cloud, thinned server-side to the point budget
+    cloud_size = st.select_slider(
+        "Cloud size (points)",
+        options=[100_000, 300_000, 1_000_000, 3_000_000],
+        value=100_000,
+        format_func=lambda n: f"{n:,}",
+    )
+    point_budget = st.select_slider(
+        "Point budget",
+        options=[2_000, 5_000, 10_000, 20_000, 50_000],
+        value=10_000,
+        format_func=lambda n: f"{n:,}",
+    )
+
+    lod = cached_lod(
+        ("synthetic_sugarcane_cloud", cloud_size),
+        lambda: PointCloudLOD.from_points(synthetic_sugarcane_cloud(cloud_size, width=20.0, length=20.0)),
+    )
+    view = lod.view(point_budget)
+    st.caption(
+        f"Showing {len(view['z']):,} of {cloud_size:,} points: highest return per "
+        f"{view['voxel_size'] * 100:.0f} cm voxel"
+    )
+
+    # Create the 3D scatter plot, coloured by height
     fig = go.Figure(data=[go.Scatter3d(
-        x=x,
-        y=y,
-        z=z,
+        x=view["x"],
+        y=view["y"],
+        z=view["z"],
         mode='markers',
         marker=dict(
             size=2,
-            color=colors,
+            color=view["z"],
             colorscale='Greens',
             opacity=0.8
         )
@@ -165,89 +175,92 @@ st.subheader("LiDAR in Action: Seasonal Growth Monitoring")
 days = list(range(0, 361, 30))
 heights = [0.2, 0.8, 1.5, 2.1, 2.6, 3.0, 3.3, 3.5, 3.6, 3.7, 3.7, 3.7]
 
-# Plot the data
-fig = go.Figure()
+@FIGURE_CACHE.memoize
+def seasonal_height_figure(days, heights):
+    # Plot the data
+    fig = go.Figure()
 
-fig.add_trace(go.Scatter(
-    x=days,
-    y=heights,
-    mode='lines+markers',
-    name='Plant Height',
-    line=dict(color='green', width=3),
-    marker=dict(size=10)
-))
+    fig.add_trace(go.Scatter(
+        x=days,
+        y=heights,
+        mode='lines+markers',
+        name='Plant Height',
+        line=dict(color='green', width=3),
+        marker=dict(size=10)
+    ))
 
-# Add growth phases
-fig.add_shape(
-    type="rect",
-    x0=0, y0=0,
-    x1=90, y1=4,
-    fillcolor="rgba(76, 175, 80, 0.2)",
-    line=dict(width=0),
-    layer="below"
-)
-fig.add_annotation(
-    x=45, y=0.2,
-    text="Germination & Establishment",
-    showarrow=False,
-    font=dict(color="green")
-)
+    # Add growth phases
+    fig.add_shape(
+        type="rect",
+        x0=0, y0=0,
+        x1=90, y1=4,
+        fillcolor="rgba(76, 175, 80, 0.2)",
+        line=dict(width=0),
+        layer="below"
+    )
+    fig.add_annotation(
+        x=45, y=0.2,
+        text="Germination & Establishment",
+        showarrow=False,
+        font=dict(color="green")
+    )
 
-fig.add_shape(
-    type="rect",
-    x0=90, y0=0,
-    x1=180, y1=4,
-    fillcolor="rgba(139, 195, 74, 0.2)",
-    line=dict(width=0),
-    layer="below"
-)
-fig.add_annotation(
-    x=135, y=2.1,
-    text="Grand Growth",
-    showarrow=False,
-    font=dict(color="green")
-)
+    fig.add_shape(
+        type="rect",
+        x0=90, y0=0,
+        x1=180, y1=4,
+        fillcolor="rgba(139, 195, 74, 0.2)",
+        line=dict(width=0),
+        layer="below"
+    )
+    fig.add_annotation(
+        x=135, y=2.1,
+        text="Grand Growth",
+        showarrow=False,
+        font=dict(color="green")
+    )
 
-fig.add_shape(
-    type="rect",
-    x0=180, y0=0,
-    x1=270, y1=4,
-    fillcolor="rgba(205, 220, 57, 0.2)",
-    line=dict(width=0),
-    layer="below"
-)
-fig.add_annotation(
-    x=225, y=3.4,
-    text="Maturation",
-    showarrow=False,
-    font=dict(color="green")
-)
+    fig.add_shape(
+        type="rect",
+        x0=180, y0=0,
+        x1=270, y1=4,
+        fillcolor="rgba(205, 220, 57, 0.2)",
+        line=dict(width=0),
+        layer="below"
+    )
+    fig.add_annotation(
+        x=225, y=3.4,
+        text="Maturation",
+        showarrow=False,
+        font=dict(color="green")
+    )
 
-fig.add_shape(
-    type="rect",
-    x0=270, y0=0,
-    x1=360, y1=4,
-    fillcolor="rgba(255, 235, 59, 0.2)",
-    line=dict(width=0),
-    layer="below"
-)
-fig.add_annotation(
-    x=315, y=3.7,
-    text="Ripening",
-    showarrow=False,
-    font=dict(color="green")
-)
+    fig.add_shape(
+        type="rect",
+        x0=270, y0=0,
+        x1=360, y1=4,
+        fillcolor="rgba(255, 235, 59, 0.2)",
+        line=dict(width=0),
+        layer="below"
+    )
+    fig.add_annotation(
+        x=315, y=3.7,
+        text="Ripening",
+        showarrow=False,
+        font=dict(color="green")
+    )
 
-# Update layout
-fig.update_layout(
-    title="LiDAR-Measured Sugarcane Height Through Growing Season",
-    xaxis_title="Days After Planting",
-    yaxis_title="Crop Height (meters)",
-    legend_title="Measurement Type",
-    height=500
-)
+    # Update layout
+    fig.update_layout(
+        title="LiDAR-Measured Sugarcane Height Through Growing Season",
+        xaxis_title="Days After Planting",
+        yaxis_title="Crop Height (meters)",
+        legend_title="Measurement Type",
+        height=500
+    )
+    return fig
 
-st.plotly_chart(fig, use_container_width=True)
+st.plotly_chart(seasonal_height_figure(days, heights), use_container_width=True)
 
 st.markdown("""
 The graph above shows how LiDAR technology can track sugarcane growth throughout the season. Key observations:
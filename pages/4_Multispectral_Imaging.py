@@ -1,8 +1,10 @@
 import streamlit as st
-import plotly.graph_objects as go
-import plotly.express as px
-import numpy as np
-import pandas as pd
+from figure_cache import FIGURE_CACHE
+from utils import lazy_import, remote_image
+go = lazy_import("plotly.graph_objects")
+px = lazy_import("plotly.express")
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
 
 # Page configuration
 st.set_page_config(
@@ -74,46 +76,48 @@ with col2:
         "Moisture content assessment"
     ]
     
-    # Create dataframe
-    df = pd.DataFrame({
-        "Wavelength (nm)": wavelengths,
-        "Band": labels,
-        "Color": colors,
-        "Agricultural Use": agricultural_use
-    })
-    
-    # Create figure
-    fig = px.bar(
-        df, 
-        x="Wavelength (nm)", 
-        y=[1]*len(wavelengths),
-        color="Band",
-        color_discrete_sequence=colors,
-        hover_data={"Agricultural Use": True, "Band": True, "Wavelength (nm)": True},
-        labels={"y": ""}
-    )
-    
-    # Update layout
-    fig.update_layout(
-        title="Spectral Bands Used in Agricultural Remote Sensing",
-        showlegend=False,
-        plot_bgcolor="white",
-        height=400,
-        yaxis=dict(showticklabels=False, showgrid=False),
-        xaxis=dict(title="Wavelength (nm)"),
-        margin=dict(l=0, r=0, t=40, b=0)
-    )
-    
-    # Remove y-axis
-    fig.update_yaxes(visible=False)
-    
+    @FIGURE_CACHE.memoize
+    def spectral_bands_figure(wavelengths, labels, colors, agricultural_use):
+        # Create dataframe
+        df = pd.DataFrame({
+            "Wavelength (nm)": wavelengths,
+            "Band": labels,
+            "Color": colors,
+            "Agricultural Use": agricultural_use
+        })
+
+        # Create figure
+        fig = px.bar(
+            df, 
+            x="Wavelength (nm)", 
+            y=[1]*len(wavelengths),
+            color="Band",
+            color_discrete_sequence=colors,
+            hover_data={"Agricultural Use": True, "Band": True, "Wavelength (nm)": True},
+            labels={"y": ""}
+        )
+
+        # Update layout
+        fig.update_layout(
+            title="Spectral Bands Used in Agricultural Remote Sensing",
+            showlegend=False,
+            plot_bgcolor="white",
+            height=400,
+            yaxis=dict(showticklabels=False, showgrid=False),
+            xaxis=dict(title="Wavelength (nm)"),
+            margin=dict(l=0, r=0, t=40, b=0)
+        )
+
+        # Remove y-axis
+        fig.update_yaxes(visible=False)
+        return fig
+
     # Display the figure
-    st.plotly_chart(fig, use_container_width=True)
+    st.plotly_chart(spectral_bands_figure(wavelengths, labels, colors, agricultural_use), use_container_width=True)
     
     # Show multispectral camera concept
-    st.image("https://ee.cdnartwhere.eu/wp-content/uploads/import/default/files/sites/default/files/images/news-pixinov1.jpg", 
-             caption="UAV equipped with multispectral camera (representative image)",
-             use_container_width=True)
+    remote_image("https://ee.cdnartwhere.eu/wp-content/uploads/import/default/files/sites/default/files/images/news-pixinov1.jpg",
+                 caption="UAV equipped with multispectral camera (representative image)")
 
 # Full width content - Vegetation Indices
 st.markdown("""
@@ -1,8 +1,9 @@
 import streamlit as st
-import plotly.graph_objects as go
-import plotly.express as px
-import pandas as pd
-import numpy as np
+from utils import lazy_import, remote_image
+go = lazy_import("plotly.graph_objects")
+px = lazy_import("plotly.express")
+pd = lazy_import("pandas")
+np = lazy_import("numpy")
 
 # Page configuration
 st.set_page_config(
@@ -148,9 +149,8 @@ with col2:
     st.plotly_chart(fig, use_container_width=True)
     
     # Add ground sampling illustration
-    st.image("https://cdn.pixabay.com/photo/2014/04/05/11/39/microscope-316556_1280.jpg", 
-             caption="Laboratory analysis of leaf samples (representative image)",
-             use_container_width=True)
+    remote_image("https://cdn.pixabay.com/photo/2014/04/05/11/39/microscope-316556_1280.jpg",
+                 caption="Laboratory analysis of leaf samples (representative image)")
 
 # Data processing section
 st.markdown("""
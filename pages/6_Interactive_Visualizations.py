@@ -1,9 +1,15 @@
 import streamlit as st
-import plotly.graph_objects as go
-import plotly.express as px
 import pandas as pd
 import numpy as np
-from datetime import datetime, timedelta
+from figure_cache import FIGURE_CACHE
+from utils import lazy_import
+go = lazy_import("plotly.graph_objects")
+px = lazy_import("plotly.express")
+from data.growth_stages import classify_growth_stage, growth_stage_labels
+from data.biomass_data import generate_biomass_data
+from data.nitrogen_data import NITROGEN_RECOMMENDATIONS, classify_nitrogen, generate_nitrogen_data
+from planning.flight_path import advisor_altitude, pack_polygons, plan_flights
+from planning.survey_schedule import group_by_month, schedule_surveys
 
 # Page configuration
 st.set_page_config(
@@ -42,18 +48,6 @@ def generate_sample_data():
     nitrogen_values = [2.2, 2.0, 1.9, 1.7, 1.5, 1.3]
     nitrogen_error = [0.2, 0.2, 0.15, 0.15, 0.1, 0.1]
     
-    # R-squared values for biomass prediction
-    r2_multispectral = [0.52, 0.57, 0.49, 0.43, 0.41, 0.38]
-    r2_lidar = [0.31, 0.44, 0.53, 0.61, 0.68, 0.71]
-    r2_fusion = [0.54, 0.59, 0.57, 0.63, 0.69, 0.72]
-    r2_ndvi = [0.48, 0.46, 0.39, 0.36, 0.33, 0.31]
-    
-    # R-squared values for nitrogen prediction (consistent across growth stages)
-    r2_n_multispectral = [0.57, 0.58, 0.56, 0.57, 0.56, 0.55]
-    r2_n_lidar = [0.28, 0.29, 0.30, 0.31, 0.30, 0.28]
-    r2_n_fusion = [0.59, 0.60, 0.58, 0.59, 0.57, 0.56]
-    r2_n_ndvi = [0.51, 0.50, 0.49, 0.48, 0.47, 0.46]
-    
     return {
         "days": days,
         "multispectral_biomass": multispectral_biomass,
@@ -65,20 +59,19 @@ def generate_sample_data():
         "ndvi_biomass": ndvi_biomass,
         "ndvi_error": ndvi_error,
         "nitrogen_values": nitrogen_values,
-        "nitrogen_error": nitrogen_error,
-        "r2_multispectral": r2_multispectral,
-        "r2_lidar": r2_lidar,
-        "r2_fusion": r2_fusion,
-        "r2_ndvi": r2_ndvi,
-        "r2_n_multispectral": r2_n_multispectral,
-        "r2_n_lidar": r2_n_lidar,
-        "r2_n_fusion": r2_n_fusion,
-        "r2_n_ndvi": r2_n_ndvi
+        "nitrogen_error": nitrogen_error
     }
 
 # Get the data
 data = generate_sample_data()
 
+# R-squared per survey: trained model metrics when available, otherwise the study figures
+biomass_r2 = generate_biomass_data()
+nitrogen_r2 = generate_nitrogen_data()
+for model in ("multispectral", "lidar", "fusion", "ndvi"):
+    data[f"r2_{model}"] = biomass_r2[f"r2_{model}"].tolist()
+    data[f"r2_n_{model}"] = nitrogen_r2[f"r2_n_{model}"].tolist()
+
 # Create tabs for different visualizations
 tab1, tab2, tab3, tab4 = st.tabs([
     "Biomass Prediction", 
@@ -106,101 +99,105 @@ with tab1:
     with col4:
         show_ndvi = st.checkbox("NDVI Benchmark", value=False)
     
-    # Create the line chart
-    fig = go.Figure()
-    
-    # Add traces based on checkbox selections
-    if show_multispectral:
-        fig.add_trace(go.Scatter(
-            x=data["days"],
-            y=data["multispectral_biomass"],
-            mode="lines+markers",
-            name="Multispectral",
-            line=dict(color="green", width=3),
-            error_y=dict(
-                type="data",
-                array=data["multispectral_error"],
-                visible=True
-            )
-        ))
-    
-    if show_lidar:
-        fig.add_trace(go.Scatter(
-            x=data["days"],
-            y=data["lidar_biomass"],
-            mode="lines+markers",
-            name="LiDAR",
-            line=dict(color="blue", width=3),
-            error_y=dict(
-                type="data",
-                array=data["lidar_error"],
-                visible=True
-            )
-        ))
-    
-    if show_fusion:
-        fig.add_trace(go.Scatter(
-            x=data["days"],
-            y=data["fusion_biomass"],
-            mode="lines+markers",
-            name="Fusion",
-            line=dict(color="purple", width=3),
-            error_y=dict(
-                type="data",
-                array=data["fusion_error"],
-                visible=True
-            )
-        ))
-    
-    if show_ndvi:
-        fig.add_trace(go.Scatter(
-            x=data["days"],
-            y=data["ndvi_biomass"],
-            mode="lines+markers",
-            name="NDVI Benchmark",
-            line=dict(color="gray", width=2, dash="dash"),
-            error_y=dict(
-                type="data",
-                array=data["ndvi_error"],
-                visible=True
-            )
-        ))
-    
-    # Add growth stage regions
-    fig.add_vrect(
-        x0=80, x1=150,
-        fillcolor="rgba(144, 238, 144, 0.3)",
-        layer="below", line_width=0,
-        annotation_text="Early Growth",
-        annotation_position="top left"
-    )
-    
-    fig.add_vrect(
-        x0=150, x1=250,
-        fillcolor="rgba(60, 179, 113, 0.2)",
-        layer="below", line_width=0,
-        annotation_text="Grand Growth",
-        annotation_position="top left"
-    )
-    
-    fig.add_vrect(
-        x0=250, x1=330,
-        fillcolor="rgba(46, 139, 87, 0.2)",
-        layer="below", line_width=0,
-        annotation_text="Maturation",
-        annotation_position="top left"
-    )
-    
-    # Update layout
-    fig.update_layout(
-        title="Sugarcane Biomass Predictions by Different Models",
-        xaxis_title="Days After Harvest (DAH)",
-        yaxis_title="Biomass (tons/hectare)",
-        legend_title="Model Type",
-        height=600
-    )
-    
+    @FIGURE_CACHE.memoize
+    def biomass_prediction_figure(data, show_multispectral, show_lidar, show_fusion, show_ndvi):
+        # Create the line chart
+        fig = go.Figure()
+
+        # Add traces based on checkbox selections
+        if show_multispectral:
+            fig.add_trace(go.Scatter(
+                x=data["days"],
+                y=data["multispectral_biomass"],
+                mode="lines+markers",
+                name="Multispectral",
+                line=dict(color="green", width=3),
+                error_y=dict(
+                    type="data",
+                    array=data["multispectral_error"],
+                    visible=True
+                )
+            ))
+
+        if show_lidar:
+            fig.add_trace(go.Scatter(
+                x=data["days"],
+                y=data["lidar_biomass"],
+                mode="lines+markers",
+                name="LiDAR",
+                line=dict(color="blue", width=3),
+                error_y=dict(
+                    type="data",
+                    array=data["lidar_error"],
+                    visible=True
+                )
+            ))
+
+        if show_fusion:
+            fig.add_trace(go.Scatter(
+                x=data["days"],
+                y=data["fusion_biomass"],
+                mode="lines+markers",
+                name="Fusion",
+                line=dict(color="purple", width=3),
+                error_y=dict(
+                    type="data",
+                    array=data["fusion_error"],
+                    visible=True
+                )
+            ))
+
+        if show_ndvi:
+            fig.add_trace(go.Scatter(
+                x=data["days"],
+                y=data["ndvi_biomass"],
+                mode="lines+markers",
+                name="NDVI Benchmark",
+                line=dict(color="gray", width=2, dash="dash"),
+                error_y=dict(
+                    type="data",
+                    array=data["ndvi_error"],
+                    visible=True
+                )
+            ))
+
+        # Add growth stage regions
+        fig.add_vrect(
+            x0=80, x1=150,
+            fillcolor="rgba(144, 238, 144, 0.3)",
+            layer="below", line_width=0,
+            annotation_text="Early Growth",
+            annotation_position="top left"
+        )
+
+        fig.add_vrect(
+            x0=150, x1=250,
+            fillcolor="rgba(60, 179, 113, 0.2)",
+            layer="below", line_width=0,
+            annotation_text="Grand Growth",
+            annotation_position="top left"
+        )
+
+        fig.add_vrect(
+            x0=250, x1=330,
+            fillcolor="rgba(46, 139, 87, 0.2)",
+            layer="below", line_width=0,
+            annotation_text="Maturation",
+            annotation_position="top left"
+        )
+
+        # Update layout
+        fig.update_layout(
+            title="Sugarcane Biomass Predictions by Different Models",
+            xaxis_title="Days After Harvest (DAH)",
+            yaxis_title="Biomass (tons/hectare)",
+            legend_title="Model Type",
+            height=600
+        )
+        return fig
+
     # Display the figure
+    fig = biomass_prediction_figure(data, show_multispectral, show_lidar, show_fusion, show_ndvi)
     st.plotly_chart(fig, use_container_width=True)
     
     # Add explanatory text
@@ -220,7 +217,8 @@ with tab2:
     ### Model Performance Comparison
     
     The bar charts below compare the performance (R² values) of different models for predicting biomass and nitrogen content at various growth stages.
-    R² values range from 0 to 1, with higher values indicating better model performance.
+    R² is at most 1, with higher values indicating better model performance. A cross-validated R² below 0 means
+    the model predicts worse than simply using the average, and its bar extends below the axis line.
     """)
     
     # Add a toggle to switch between biomass and nitrogen
@@ -259,27 +257,31 @@ with tab2:
     models = ["Multispectral", "LiDAR", "Fusion", "NDVI Benchmark"]
     colors = ["green", "blue", "purple", "gray"]
     
-    fig = go.Figure()
-    
-    fig.add_trace(go.Bar(
-        x=models,
-        y=r2_values,
-        marker_color=colors,
-        text=[f"{val:.3f}" for val in r2_values],
-        textposition="auto"
-    ))
-    
-    # Update layout
-    fig.update_layout(
-        title=title,
-        xaxis_title="Model Type",
-        yaxis_title="R² Value",
-        yaxis=dict(range=[0, 0.8]),
-        height=500
-    )
-    
+    @FIGURE_CACHE.memoize
+    def model_performance_figure(models, colors, r2_values, title):
+        fig = go.Figure()
+
+        fig.add_trace(go.Bar(
+            x=models,
+            y=r2_values,
+            marker_color=colors,
+            text=[f"{val:.3f}" for val in r2_values],
+            textposition="auto"
+        ))
+
+        # Update layout
+        fig.update_layout(
+            title=title,
+            xaxis_title="Model Type",
+            yaxis_title="R² Value",
+            # Negative R² and trained values above the study range stay visible
+            yaxis=dict(range=[min(0.0, min(r2_values) - 0.05), max(0.8, max(r2_values) + 0.05)]),
+            height=500
+        )
+        return fig
+
     # Display the figure
-    st.plotly_chart(fig, use_container_width=True)
+    st.plotly_chart(model_performance_figure(models, colors, r2_values, title), use_container_width=True)
     
     # Add horizontal best model indicator
     current_best = models[np.argmax(r2_values)]
@@ -325,76 +327,79 @@ with tab3:
     as predicted by multispectral imaging. Nitrogen content typically decreases as the crop matures.
     """)
     
-    # Create the nitrogen content line chart
-    fig = go.Figure()
-    
-    # Add nitrogen content trace
-    fig.add_trace(go.Scatter(
-        x=data["days"],
-        y=data["nitrogen_values"],
-        mode="lines+markers",
-        name="Leaf N Content",
-        line=dict(color="darkgreen", width=3),
-        error_y=dict(
-            type="data",
-            array=data["nitrogen_error"],
-            visible=True
+    @FIGURE_CACHE.memoize
+    def nitrogen_content_figure(data):
+        # Create the nitrogen content line chart
+        fig = go.Figure()
+
+        # Add nitrogen content trace
+        fig.add_trace(go.Scatter(
+            x=data["days"],
+            y=data["nitrogen_values"],
+            mode="lines+markers",
+            name="Leaf N Content",
+            line=dict(color="darkgreen", width=3),
+            error_y=dict(
+                type="data",
+                array=data["nitrogen_error"],
+                visible=True
+            )
+        ))
+
+        # Add threshold lines
+        fig.add_trace(go.Scatter(
+            x=[data["days"][0], data["days"][-1]],
+            y=[2.0, 2.0],
+            mode="lines",
+            name="Optimal N (Early)",
+            line=dict(color="green", width=1, dash="dash")
+        ))
+
+        fig.add_trace(go.Scatter(
+            x=[data["days"][0], data["days"][-1]],
+            y=[1.5, 1.5],
+            mode="lines",
+            name="Optimal N (Late)",
+            line=dict(color="orange", width=1, dash="dash")
+        ))
+
+        # Add growth stage regions
+        fig.add_vrect(
+            x0=80, x1=150,
+            fillcolor="rgba(144, 238, 144, 0.3)",
+            layer="below", line_width=0,
+            annotation_text="Early Growth",
+            annotation_position="top left"
         )
-    ))
-    
-    # Add threshold lines
-    fig.add_trace(go.Scatter(
-        x=[data["days"][0], data["days"][-1]],
-        y=[2.0, 2.0],
-        mode="lines",
-        name="Optimal N (Early)",
-        line=dict(color="green", width=1, dash="dash")
-    ))
-    
-    fig.add_trace(go.Scatter(
-        x=[data["days"][0], data["days"][-1]],
-        y=[1.5, 1.5],
-        mode="lines",
-        name="Optimal N (Late)",
-        line=dict(color="orange", width=1, dash="dash")
-    ))
-    
-    # Add growth stage regions
-    fig.add_vrect(
-        x0=80, x1=150,
-        fillcolor="rgba(144, 238, 144, 0.3)",
-        layer="below", line_width=0,
-        annotation_text="Early Growth",
-        annotation_position="top left"
-    )
-    
-    fig.add_vrect(
-        x0=150, x1=250,
-        fillcolor="rgba(60, 179, 113, 0.2)",
-        layer="below", line_width=0,
-        annotation_text="Grand Growth",
-        annotation_position="top left"
-    )
-    
-    fig.add_vrect(
-        x0=250, x1=330,
-        fillcolor="rgba(46, 139, 87, 0.2)",
-        layer="below", line_width=0,
-        annotation_text="Maturation",
-        annotation_position="top left"
-    )
-    
-    # Update layout
-    fig.update_layout(
-        title="Leaf Nitrogen Content Throughout Growing Season",
-        xaxis_title="Days After Harvest (DAH)",
-        yaxis_title="Leaf Nitrogen Content (%)",
-        legend_title="Measurements",
-        height=500
-    )
-    
+
+        fig.add_vrect(
+            x0=150, x1=250,
+            fillcolor="rgba(60, 179, 113, 0.2)",
+            layer="below", line_width=0,
+            annotation_text="Grand Growth",
+            annotation_position="top left"
+        )
+
+        fig.add_vrect(
+            x0=250, x1=330,
+            fillcolor="rgba(46, 139, 87, 0.2)",
+            layer="below", line_width=0,
+            annotation_text="Maturation",
+            annotation_position="top left"
+        )
+
+        # Update layout
+        fig.update_layout(
+            title="Leaf Nitrogen Content Throughout Growing Season",
+            xaxis_title="Days After Harvest (DAH)",
+            yaxis_title="Leaf Nitrogen Content (%)",
+            legend_title="Measurements",
+            height=500
+        )
+        return fig
+
     # Display the figure
-    st.plotly_chart(fig, use_container_width=True)
+    st.plotly_chart(nitrogen_content_figure(data), use_container_width=True)
     
     # Interactive management recommendation
     st.subheader("Nitrogen Management Recommendations")
@@ -413,48 +418,11 @@ with tab3:
     n_content = data["nitrogen_values"][closest_idx]
     
     # Determine recommendation based on growth stage and N content
-    if selected_day < 150:
-        optimal_n = 2.0
-        if n_content > optimal_n + 0.2:
-            recommendation = "Nitrogen levels are above optimal for this growth stage. Consider reducing fertilizer application in future cycles. Monitor for excessive vegetative growth."
-            status = "High"
-            color = "orange"
-        elif n_content < optimal_n - 0.2:
-            recommendation = "Nitrogen levels are below optimal for early growth. Consider supplemental nitrogen application to support vegetative growth and tillering."
-            status = "Low"
-            color = "red"
-        else:
-            recommendation = "Nitrogen levels are within optimal range for early growth stage. Continue with standard management practices."
-            status = "Optimal"
-            color = "green"
-    elif selected_day < 250:
-        optimal_n = 1.8
-        if n_content > optimal_n + 0.2:
-            recommendation = "Nitrogen levels are slightly high for mid-growth stage. No immediate action needed, but monitor crop development."
-            status = "Slightly High"
-            color = "yellowgreen"
-        elif n_content < optimal_n - 0.2:
-            recommendation = "Nitrogen levels are below optimal for grand growth phase. Consider a light supplemental application if canopy is not fully developed."
-            status = "Low"
-            color = "orange"
-        else:
-            recommendation = "Nitrogen levels are within optimal range for grand growth stage. Continue with standard management practices."
-            status = "Optimal"
-            color = "green"
-    else:
-        optimal_n = 1.5
-        if n_content > optimal_n + 0.2:
-            recommendation = "Nitrogen levels are higher than desired for maturation stage. This may delay ripening and reduce sugar content. Consider adjusting pre-harvest management."
-            status = "High"
-            color = "orange"
-        elif n_content < optimal_n - 0.2:
-            recommendation = "Nitrogen levels are low, which is favorable for ripening. No nitrogen application recommended at this late stage."
-            status = "Low (Favorable)"
-            color = "green"
-        else:
-            recommendation = "Nitrogen levels are within optimal range for maturation. Focus on ripening management for optimal sugar content."
-            status = "Optimal"
-            color = "green"
+    status_code, n_delta = classify_nitrogen(selected_day, n_content, return_delta=True)
+    advice = NITROGEN_RECOMMENDATIONS[int(status_code)]
+    recommendation = advice["recommendation"]
+    status = advice["status"]
+    color = advice["color"]
     
     # Display recommendation
     col1, col2 = st.columns([1, 2])
@@ -462,7 +430,7 @@ with tab3:
         st.metric(
             label="Current N Status",
             value=f"{n_content:.2f}%",
-            delta=f"{n_content - optimal_n:.2f}" if abs(n_content - optimal_n) > 0.05 else None,
+            delta=f"{n_delta:.2f}" if abs(n_delta) > 0.05 else None,
             delta_color="inverse"
         )
         st.info(f"Status: **{status}**")
@@ -493,16 +461,15 @@ with tab4:
     )
     
     # Determine the growth stage
-    if days_after_harvest < 150:
-        growth_stage = "Early Growth Stage"
+    stage_code = int(classify_growth_stage(days_after_harvest))
+    growth_stage = growth_stage_labels(stage_code)
+    if stage_code == 0:
         stage_desc = "Tillering and initial stem elongation. Crop height typically 0.5-1.5m."
         color = "lightgreen"
-    elif days_after_harvest < 250:
-        growth_stage = "Grand Growth Stage"
+    elif stage_code == 1:
         stage_desc = "Rapid growth with maximum stem elongation. Crop height typically 1.5-3.0m."
         color = "green"
     else:
-        growth_stage = "Maturation Stage"
         stage_desc = "Sugar accumulation and ripening. Limited height increase, focus on sucrose content."
         color = "darkgreen"
     
@@ -522,21 +489,19 @@ with tab4:
         st.markdown("### Recommended Technology")
         
         # Determine recommendations based on growth stage
-        if days_after_harvest < 150:
+        if stage_code == 0:
             primary_tech = "Multispectral Imaging"
             secondary_tech = "LiDAR (optional)"
             key_indices = "NDVI, NDRE, GNDVI"
-            flight_altitude = "100m AGL"
             flight_frequency = "Every 3-4 weeks"
             
             # Create gauges to show relative effectiveness
             ms_effectiveness = 85
             lidar_effectiveness = 45
-        elif days_after_harvest < 250:
+        elif stage_code == 1:
             primary_tech = "Multispectral + LiDAR"
             secondary_tech = "Multispectral only (if budget constrained)"
             key_indices = "NDRE, Canopy Height, Volume"
-            flight_altitude = "100m AGL"
             flight_frequency = "Every 4-6 weeks"
             
             # Create gauges to show relative effectiveness
@@ -546,13 +511,22 @@ with tab4:
             primary_tech = "LiDAR"
             secondary_tech = "Multispectral (for nitrogen only)"
             key_indices = "Canopy Height, Volume, Density"
-            flight_altitude = "120m AGL"
             flight_frequency = "Every 3-4 weeks"
             
             # Create gauges to show relative effectiveness
             ms_effectiveness = 45
             lidar_effectiveness = 85
         
+        # Flight plan for a square 50 ha field with the stage's primary sensor
+        altitude = float(advisor_altitude(days_after_harvest))
+        vertices, offsets = pack_polygons([[(0, 0), (707, 0), (707, 707), (0, 707)]])
+        plan = plan_flights(vertices, offsets, altitude, sensor="lidar" if stage_code == 2 else "multispectral")
+        flight_altitude = f"{altitude:.0f}m AGL"
+        flight_plan = (
+            f"{plan['n_lines'][0]} lines, {plan['flight_time_s'][0] / 60:.0f} min per 50 ha"
+            + (f", {plan['n_images'][0]:,} images at {plan['gsd_cm'][0]:.1f} cm/px" if plan["n_images"][0] else "")
+        )
+
         # Display recommendations
         st.markdown(f"""
         **Primary Technology:** {primary_tech}
@@ -564,6 +538,7 @@ with tab4:
         **Recommended Flight Parameters:**
         - Altitude: {flight_altitude}
         - Frequency: {flight_frequency}
+        - Flight plan: {flight_plan}
         """)
         
         # Create gauges to show relative effectiveness
@@ -619,14 +594,14 @@ with tab4:
         st.markdown("### Management Focus Areas")
         
         # Determine management focus based on growth stage
-        if days_after_harvest < 150:
+        if stage_code == 0:
             management_areas = [
                 {"area": "Nitrogen Management", "priority": "High", "description": "Ensure adequate nitrogen for canopy development. Use NDRE index to guide variable rate application."},
                 {"area": "Gap Detection", "priority": "High", "description": "Identify areas with poor emergence for potential replanting."},
                 {"area": "Weed Management", "priority": "Medium", "description": "Detect weed pressure while crop canopy is still developing."},
                 {"area": "Water Management", "priority": "Medium", "description": "Monitor for water stress to support vegetative growth."}
             ]
-        elif days_after_harvest < 250:
+        elif stage_code == 1:
             management_areas = [
                 {"area": "Water Management", "priority": "High", "description": "Critical to maintain optimal moisture during grand growth phase."},
                 {"area": "Biomass Monitoring", "priority": "High", "description": "Track growth rate to predict yield and identify underperforming areas."},
@@ -654,51 +629,35 @@ with tab4:
     # Add a calendar view for recommended survey schedule
     st.subheader("Recommended Survey Schedule")
     
-    # Create a calendar-style visualization
-    today = datetime.now()
-    harvest_date = today - timedelta(days=days_after_harvest)
-    
-    # Generate survey dates based on current stage
-    if days_after_harvest < 150:
-        interval = 21  # 3 weeks
-    elif days_after_harvest < 250:
-        interval = 35  # 5 weeks
-    else:
-        interval = 21  # 3 weeks
-    
-    # Generate next 4 recommended survey dates
-    survey_dates = []
-    last_survey = today
-    for i in range(4):
-        next_survey = last_survey + timedelta(days=interval)
-        survey_dates.append(next_survey)
-        last_survey = next_survey
-    
-    # Create a calendar-like visualization
-    months = ["January", "February", "March", "April", "May", "June", 
-              "July", "August", "September", "October", "November", "December"]
-    
-    # Group dates by month
-    calendar_data = {}
-    for date in [today] + survey_dates:
-        month = months[date.month-1]
-        if month not in calendar_data:
-            calendar_data[month] = []
-        calendar_data[month].append(date.day)
+    # Schedule the rest of the season for this field: the survey sensors and
+    # interval follow the advisor's plan for the stage at each survey
+    today = np.datetime64("today", "D")
+    field = {
+        "field_id": [1],
+        "harvest_date": [today - days_after_harvest],
+        "area_ha": [50.0],
+    }
+    schedule = schedule_surveys(field, start_dah=days_after_harvest, end_dah=365)
+    survey_dates = schedule["date"][:5]
+    payloads = iter(np.where(
+        schedule["multispectral"] & schedule["lidar"], "Multispectral + LiDAR",
+        np.where(schedule["lidar"], "LiDAR", "Multispectral"),
+    )[:5])
     
     # Display as a simple calendar
     col1, col2, col3, col4 = st.columns(4)
     cols = [col1, col2, col3, col4]
     
-    for i, (month, days) in enumerate(calendar_data.items()):
+    for i, (month, days) in enumerate(group_by_month(survey_dates)):
         if i < 4:  # Limit to 4 columns
             with cols[i]:
-                st.markdown(f"### {month}")
+                st.markdown(f"### {month.item():%B}")
                 for day in days:
-                    if i == 0 and day == today.day:
-                        st.markdown(f"**{day}** - TODAY")
+                    payload = next(payloads)
+                    if month == today.astype("datetime64[M]") and day == today.item().day:
+                        st.markdown(f"**{day}** - TODAY ({payload})")
                     else:
-                        st.markdown(f"**{day}** - Survey")
+                        st.markdown(f"**{day}** - {payload} survey")
 
 # Footer
 st.markdown("---")
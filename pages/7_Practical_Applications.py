@@ -1,8 +1,15 @@
+import tempfile
+
 import streamlit as st
-import plotly.graph_objects as go
-import plotly.express as px
 import pandas as pd
 import numpy as np
+from figure_cache import FIGURE_CACHE
+from utils import lazy_import, remote_image
+go = lazy_import("plotly.graph_objects")
+px = lazy_import("plotly.express")
+from data.index_rasters import demo_index_raster, ndre_to_nitrogen
+from planning.prescription import DEFAULT_RATE_STEP, nitrogen_rates
+from processing.zoning import delineate_zones
 
 # Page configuration
 st.set_page_config(
@@ -336,29 +343,110 @@ with tab1:
         before = [100, 100, 100, 100]
         after = [82, 107, 93, 114]
         
-        fig = go.Figure()
-        
-        fig.add_trace(go.Bar(
-            x=categories,
-            y=before,
-            name='Before UAV Technology',
-            marker_color='lightgrey'
-        ))
-        
-        fig.add_trace(go.Bar(
-            x=categories,
-            y=after,
-            name='After UAV Technology',
-            marker_color='green'
+        @FIGURE_CACHE.memoize
+        def brazil_results_figure(categories, before, after):
+            fig = go.Figure()
+
+            fig.add_trace(go.Bar(
+                x=categories,
+                y=before,
+                name='Before UAV Technology',
+                marker_color='lightgrey'
+            ))
+
+            fig.add_trace(go.Bar(
+                x=categories,
+                y=after,
+                name='After UAV Technology',
+                marker_color='green'
+            ))
+
+            fig.update_layout(
+                title="Performance Relative to Baseline (100%)",
+                barmode='group',
+                height=350
+            )
+            return fig
+
+        st.plotly_chart(brazil_results_figure(categories, before, after), use_container_width=True)
+
+    st.markdown("#### From NDRE Map to Management Zones")
+    st.markdown("""
+    The zones below are built the same way from a simulated NDRE survey of a farm block. Pixels are clustered on
+    their NDRE value, the zone map is smoothed, and patches too small for the spreader to follow are merged into
+    the surrounding zone. Zone 1 has the lowest NDRE and usually the greatest nitrogen need.
+    """)
+
+    @st.cache_data(show_spinner="Delineating zones...")
+    def brazil_ndre_zones(n_zones):
+        with tempfile.TemporaryDirectory() as directory:
+            result = delineate_zones({"ndre": demo_index_raster("ndre", size=2048)},
+                                     f"{directory}/zones.npy", n_zones=n_zones)
+            # Every 4th pixel is plenty for a 512 pixel wide figure
+            zones = np.load(result["path"])[::4, ::4].copy()
+        return zones, result["table"]
+
+    @FIGURE_CACHE.memoize
+    def brazil_zone_figure(n_zones):
+        zones = brazil_ndre_zones(n_zones)[0]
+        colours = px.colors.sample_colorscale("RdYlGn", [zone / (n_zones - 1) for zone in range(n_zones)])
+        # Discrete colour bands; roads (zone 0) are left blank
+        scale = []
+        for zone, colour in enumerate(colours):
+            scale += [(zone / n_zones, colour), ((zone + 1) / n_zones, colour)]
+        fig = go.Figure(go.Heatmap(
+            z=np.where(zones == 0, np.nan, zones),
+            zmin=0.5, zmax=n_zones + 0.5,
+            colorscale=scale,
+            colorbar=dict(title="Zone", tickvals=list(range(1, n_zones + 1))),
+            hovertemplate="Zone %{z}<extra></extra>",
         ))
-        
-        fig.update_layout(
-            title="Performance Relative to Baseline (100%)",
-            barmode='group',
-            height=350
-        )
-        
-        st.plotly_chart(fig, use_container_width=True)
+        fig.update_layout(height=420, margin=dict(l=10, r=10, t=10, b=10),
+                          xaxis=dict(visible=False), yaxis=dict(visible=False, autorange="reversed", scaleanchor="x"))
+        return fig
+
+    n_zones = st.slider("Number of zones", 2, 5, 3)
+    table = brazil_ndre_zones(n_zones)[1]
+    col1, col2 = st.columns([3, 2])
+    with col1:
+        st.plotly_chart(brazil_zone_figure(n_zones), use_container_width=True)
+    with col2:
+        st.dataframe(pd.DataFrame({
+            "Zone": table["zone"],
+            "Area (%)": table["share"] * 100,
+            "Mean NDRE": table["ndre_mean"],
+            "NDRE P10": table["ndre_p10"],
+            "NDRE P90": table["ndre_p90"],
+        }).style.format({"Area (%)": "{:.1f}", "Mean NDRE": "{:.3f}", "NDRE P10": "{:.3f}", "NDRE P90": "{:.3f}"}),
+            hide_index=True, use_container_width=True)
+
+    st.markdown("#### Variable-Rate Nitrogen Prescription")
+    st.markdown("""
+    Each zone's leaf nitrogen is estimated from its mean NDRE. Its shortfall from the optimal N for the growth
+    stage is then converted into a nitrogen rate by the stage's response curve. On the spreader, the rate map is
+    applied on a grid of swath-wide cells.
+    """)
+
+    dah = st.slider("Days after harvest at the survey", 30, 300, 120, step=10)
+    zone_nitrogen = ndre_to_nitrogen(table["ndre_mean"])
+    # Rounded to the spreader controller's step, as in exported prescriptions
+    rates = np.round(nitrogen_rates(zone_nitrogen, dah) / DEFAULT_RATE_STEP) * DEFAULT_RATE_STEP
+    variable = float((rates * table["share"]).sum())
+    uniform = float(rates.max())
+    col1, col2 = st.columns([3, 2])
+    with col1:
+        st.dataframe(pd.DataFrame({
+            "Zone": table["zone"],
+            "Area (%)": table["share"] * 100,
+            "Leaf N (%)": zone_nitrogen,
+            "N rate (kg/ha)": rates,
+        }).style.format({"Area (%)": "{:.1f}", "Leaf N (%)": "{:.2f}", "N rate (kg/ha)": "{:.0f}"}),
+            hide_index=True, use_container_width=True)
+    with col2:
+        st.metric("Average N rate", f"{variable:.0f} kg/ha",
+                  f"{(variable - uniform) / uniform:.0%} vs uniform" if uniform else None, delta_color="inverse")
+        st.caption(f"The uniform rate is the rate needed by the weakest zone, {uniform:.0f} kg/ha, applied "
+                   "to the whole block.")
 
 with tab2:
     st.markdown("### Cooperative UAV Service Model in Queensland, Australia")
@@ -395,24 +483,27 @@ with tab2:
         years = [2019, 2020, 2021, 2022, 2023]
         adoption_rate = [15, 40, 65, 85, 95]
         
-        fig = go.Figure()
-        
-        fig.add_trace(go.Scatter(
-            x=years,
-            y=adoption_rate,
-            mode='lines+markers',
-            name='Member Adoption Rate (%)',
-            line=dict(color='green', width=3)
-        ))
-        
-        fig.update_layout(
-            title="Cooperative Member Adoption Rate",
-            xaxis_title="Year",
-            yaxis_title="Farms Using UAV Technology (%)",
-            height=350
-        )
-        
-        st.plotly_chart(fig, use_container_width=True)
+        @FIGURE_CACHE.memoize
+        def cooperative_adoption_figure(years, adoption_rate):
+            fig = go.Figure()
+
+            fig.add_trace(go.Scatter(
+                x=years,
+                y=adoption_rate,
+                mode='lines+markers',
+                name='Member Adoption Rate (%)',
+                line=dict(color='green', width=3)
+            ))
+
+            fig.update_layout(
+                title="Cooperative Member Adoption Rate",
+                xaxis_title="Year",
+                yaxis_title="Farms Using UAV Technology (%)",
+                height=350
+            )
+            return fig
+
+        st.plotly_chart(cooperative_adoption_figure(years, adoption_rate), use_container_width=True)
 
 with tab3:
     st.markdown("### Small-Scale Implementation in Thailand")
@@ -448,66 +539,70 @@ with tab3:
         # Create a simple ROI chart
         months = list(range(1, 13))
         costs = [1500] + [0] * 11
-        cumulative_costs = np.cumsum(costs)
-        
+
         # Calculate monthly benefits (increasing over time)
         monthly_benefits = [0, 0, 400, 400, 500, 500, 600, 600, 700, 700, 800, 1000]
-        cumulative_benefits = np.cumsum(monthly_benefits)
-        
-        # Calculate net position
-        net_position = cumulative_benefits - cumulative_costs
-        
-        fig = go.Figure()
-        
-        fig.add_trace(go.Scatter(
-            x=months,
-            y=cumulative_costs,
-            mode='lines',
-            name='Cumulative Costs',
-            line=dict(color='red')
-        ))
-        
-        fig.add_trace(go.Scatter(
-            x=months,
-            y=cumulative_benefits,
-            mode='lines',
-            name='Cumulative Benefits',
-            line=dict(color='green')
-        ))
-        
-        fig.add_trace(go.Scatter(
-            x=months,
-            y=net_position,
-            mode='lines',
-            name='Net Position',
-            line=dict(color='blue')
-        ))
-        
-        fig.add_shape(
-            type="line",
-            x0=1, y0=0,
-            x1=12, y1=0,
-            line=dict(color="black", dash="dash")
-        )
-        
-        # Add break-even point annotation
-        breakeven_month = 9  # Approximate based on the data
-        fig.add_annotation(
-            x=breakeven_month,
-            y=200,
-            text="Break Even",
-            showarrow=True,
-            arrowhead=1
-        )
-        
-        fig.update_layout(
-            title="Small Farm ROI Timeline",
-            xaxis_title="Month",
-            yaxis_title="Value (₹)",
-            height=350
-        )
-        
-        st.plotly_chart(fig, use_container_width=True)
+
+        @FIGURE_CACHE.memoize
+        def small_farm_roi_figure(months, costs, monthly_benefits):
+            cumulative_costs = np.cumsum(costs)
+            cumulative_benefits = np.cumsum(monthly_benefits)
+
+            # Calculate net position
+            net_position = cumulative_benefits - cumulative_costs
+
+            fig = go.Figure()
+
+            fig.add_trace(go.Scatter(
+                x=months,
+                y=cumulative_costs,
+                mode='lines',
+                name='Cumulative Costs',
+                line=dict(color='red')
+            ))
+
+            fig.add_trace(go.Scatter(
+                x=months,
+                y=cumulative_benefits,
+                mode='lines',
+                name='Cumulative Benefits',
+                line=dict(color='green')
+            ))
+
+            fig.add_trace(go.Scatter(
+                x=months,
+                y=net_position,
+                mode='lines',
+                name='Net Position',
+                line=dict(color='blue')
+            ))
+
+            fig.add_shape(
+                type="line",
+                x0=1, y0=0,
+                x1=12, y1=0,
+                line=dict(color="black", dash="dash")
+            )
+
+            # Add break-even point annotation
+            breakeven_month = 9  # Approximate based on the data
+            fig.add_annotation(
+                x=breakeven_month,
+                y=200,
+                text="Break Even",
+                showarrow=True,
+                arrowhead=1
+            )
+
+            fig.update_layout(
+                title="Small Farm ROI Timeline",
+                xaxis_title="Month",
+                yaxis_title="Value (₹)",
+                height=350
+            )
+            return fig
+
+        st.plotly_chart(small_farm_roi_figure(months, costs, monthly_benefits), use_container_width=True)
 
 # Challenges and Solutions
 st.markdown("## Common Challenges and Solutions")
@@ -551,9 +646,8 @@ with col1:
     - **Regulatory frameworks** for beyond visual line of sight operation
     """)
     
-    st.image("https://assets.grok.com/users/a06ca20a-97de-4d76-90d8-39fb0f0183fd/generated/m66V7X7zl2IZXxTU/image.jpg", 
-             caption="Next-generation automated UAV systems",
-             use_container_width=True)
+    remote_image("https://assets.grok.com/users/a06ca20a-97de-4d76-90d8-39fb0f0183fd/generated/m66V7X7zl2IZXxTU/image.jpg",
+                 caption="Next-generation automated UAV systems")
 
 with col2:
     st.markdown("### Advanced Sensor Integration")
@@ -564,9 +658,8 @@ with col2:
     - **Integrated sensor packages** combining multiple technologies
     """)
     
-    st.image("https://assets.grok.com/users/a06ca20a-97de-4d76-90d8-39fb0f0183fd/generated/marFVgkccqzoYrV4/image.jpg", 
-             caption="Multi-sensor integration on advanced UAVs",
-             use_container_width=True)
+    remote_image("https://assets.grok.com/users/a06ca20a-97de-4d76-90d8-39fb0f0183fd/generated/marFVgkccqzoYrV4/image.jpg",
+                 caption="Multi-sensor integration on advanced UAVs")
 
 with col3:
     st.markdown("### AI and Machine Learning")
@@ -577,9 +670,8 @@ with col3:
     - **Computer vision** for individual plant monitoring
     """)
     
-    st.image("https://assets.grok.com/users/a06ca20a-97de-4d76-90d8-39fb0f0183fd/generated/m4Jo8ftlLaelVKfM/image.jpg", 
-             caption="AI-powered analytics for agricultural data",
-             use_container_width=True)
+    remote_image("https://assets.grok.com/users/a06ca20a-97de-4d76-90d8-39fb0f0183fd/generated/m4Jo8ftlLaelVKfM/image.jpg",
+                 caption="AI-powered analytics for agricultural data")
 
 # Conclusive call to action
 st.markdown("## Getting Started with UAV Technology")
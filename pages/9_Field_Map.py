@@ -0,0 +1,128 @@
+import base64
+
+import streamlit as st
+from utils import lazy_import
+pd = lazy_import("pandas")
+from data.index_rasters import INDEX_RASTERS, demo_field_labels, demo_index_raster
+from processing.tiles import COLORMAPS, TILE_SIZE, TileCache, TilePyramid
+from processing.zonal import zonal_statistics
+
+# Page configuration
+st.set_page_config(
+    page_title="Field Map - UAV Technologies",
+    page_icon="🗺️",
+    layout="wide"
+)
+
+# Viewport size in map pixels (width, height)
+VIEW = (960, 540)
+
+# Main content
+st.title("Field Map")
+st.subheader("Vegetation Index Maps of a Sugarcane Farm Block")
+
+st.markdown("""
+A UAV survey produces index rasters with hundreds of millions of pixels, far more than a browser can take
+at once. The map below works like an online map: the raster is cut into a pyramid of small colour-mapped
+tiles at several zoom levels, and only the tiles inside the view are loaded. Zoom in to see individual
+fields and crop rows; stressed patches show up in yellow and red.
+""")
+
+@st.cache_resource
+def tile_cache():
+    # One cache shared by all layers, sessions and reruns
+    return TileCache()
+
+@st.cache_resource
+def load_pyramid(index):
+    low, high = INDEX_RASTERS[index]["range"]
+    # WebP tiles are about 20 times smaller than PNG for index maps
+    pyramid = TilePyramid(demo_index_raster(index), tile_cache(), colormap="RdYlGn", vmin=low, vmax=high,
+                          fmt="webp")
+    # Overviews only; tiles are rendered on first request
+    pyramid.update(render=False)
+    return pyramid
+
+@st.cache_data
+def field_statistics(index):
+    stats = zonal_statistics(demo_field_labels(), {index: demo_index_raster(index)},
+                             ranges={index: INDEX_RASTERS[index]["range"]})
+    table = stats.table()
+    return pd.DataFrame({
+        "Field": table["zone"],
+        "Mean": table[f"{index}_mean"],
+        "Std": table[f"{index}_std"],
+        "P10": table[f"{index}_p10"],
+        "Median": table[f"{index}_p50"],
+        "P90": table[f"{index}_p90"],
+        "Min": table[f"{index}_min"],
+        "Max": table[f"{index}_max"],
+    })
+
+col1, col2, col3, col4 = st.columns(4)
+with col1:
+    index = st.selectbox("Index", list(INDEX_RASTERS), format_func=str.upper)
+pyramid = load_pyramid(index)
+with col2:
+    zoom = st.slider("Zoom", 0, pyramid.max_zoom, max(pyramid.max_zoom - 2, 0))
+with col3:
+    east = st.slider("West - East", 0, 100, 50, format="%d%%")
+with col4:
+    south = st.slider("North - South", 0, 100, 50, format="%d%%")
+
+# Only the tiles overlapping the viewport are fetched and sent
+rows, cols = pyramid.level_shape(zoom)
+tiles = pyramid.tiles_in_view(zoom, (cols * east / 100, rows * south / 100), VIEW)
+images = []
+sent = 0
+for x, y, left, top in tiles:
+    data = pyramid.tile(zoom, x, y)
+    sent += len(data)
+    images.append(
+        f'<img src="data:image/{pyramid.fmt};base64,{base64.b64encode(data).decode()}" '
+        f'style="position:absolute;left:{left}px;top:{top}px;width:{TILE_SIZE}px;height:{TILE_SIZE}px">'
+    )
+st.markdown(
+    f'<div style="position:relative;width:{VIEW[0]}px;height:{VIEW[1]}px;max-width:100%;overflow:hidden;'
+    f'background:#d9d9d9;border-radius:4px">{"".join(images)}</div>',
+    unsafe_allow_html=True,
+)
+
+# Colour legend
+low, high = INDEX_RASTERS[index]["range"]
+stops = ", ".join(f"rgb{colour} {position * 100:.0f}%" for position, colour in COLORMAPS["RdYlGn"])
+st.markdown(
+    f'<div style="width:{VIEW[0] // 2}px;max-width:100%;margin-top:0.5rem">'
+    f'<div style="height:12px;background:linear-gradient(to right, {stops})"></div>'
+    f'<div style="display:flex;justify-content:space-between;font-size:13px">'
+    f'<span>{low:g}</span><span>{index.upper()}</span><span>{high:g}</span></div></div>',
+    unsafe_allow_html=True,
+)
+
+source_mb = pyramid.source.shape[0] * pyramid.source.shape[1] * 4 / 2**20
+st.caption(
+    f"Zoom {zoom} of {pyramid.max_zoom}: {len(tiles)} tiles in view, {sent / 1024:.0f} KB sent. "
+    f"The full raster is {pyramid.source.shape[1]:,} x {pyramid.source.shape[0]:,} pixels ({source_mb:.0f} MB as float32)."
+)
+
+st.subheader(f"{index.upper()} by Field")
+st.markdown("""
+Fields are numbered row by row from the north-west corner. The 10th percentile picks out fields whose
+stressed patches pull down part of the field even when the mean looks healthy.
+""")
+st.dataframe(field_statistics(index).style.format(precision=3), hide_index=True, use_container_width=True)
+
+with st.expander("How the tile pyramid works"):
+    st.markdown(f"""
+    - **Tiles**: the raster is cut into {TILE_SIZE} x {TILE_SIZE} pixel tiles. The highest zoom shows survey
+      pixels one to one, and each lower zoom halves the resolution until the whole block fits in one tile.
+    - **Colour mapping**: tiles are rendered to WebP images with roads and other no-data pixels left transparent.
+    - **Caching**: rendered tiles are kept in a size-capped disk cache shared by all users; the least recently
+      viewed tiles are dropped first.
+    - **Incremental updates**: when a new survey replaces part of a raster, only the tiles over the changed
+      area are rebuilt.
+    """)
+
+# Footer
+st.markdown("---")
+st.markdown("© 2023 Precision Agriculture Education Initiative")
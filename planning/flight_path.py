@@ -0,0 +1,195 @@
+"""
+Lawnmower flight plans for UAV surveys of many fields at once.
+
+Field boundaries are polygons in projected coordinates (metres), passed as
+one ragged array: all vertices stacked in `vertices` with `offsets[f]` to
+`offsets[f + 1]` delimiting field f (pack_polygons() builds it from a list).
+For each field the planner
+
+- turns the advisor's altitude (ADVISOR_ALTITUDES, by growth stage) and the
+  sensor's field of view into an image footprint and ground sample distance;
+- spaces parallel flight lines by the footprint width less the side overlap,
+  running along the field's longest edge unless a heading is given;
+- clips every line to the polygon (the span between its first and last
+  boundary crossing) and joins the lines in alternating directions;
+- spaces camera triggers by the footprint length less the front overlap and
+  derives image count, path length and flight time.
+
+Every step runs on flat arrays covering all fields and lines, so thousands of
+fields are re-planned in one call when a parameter changes.
+"""
+
+import numpy as np
+
+from data.growth_stages import classify_growth_stage
+
+# Field of view (degrees, across and along track) and image size (pixels) per
+# sensor; the LiDAR entry describes its scan pattern and takes no images
+SENSOR_SPECS = {
+    "multispectral": {"fov_deg": (47.2, 34.4), "image_px": (1280, 960), "trigger_interval_s": 1.0},
+    "rgb": {"fov_deg": (73.7, 53.1), "image_px": (5472, 3648), "trigger_interval_s": 2.0},
+    "lidar": {"fov_deg": (70.4, 4.5), "image_px": None, "trigger_interval_s": None},
+}
+
+# Flight altitude above ground (m) recommended by the Growth Stage Advisor per stage
+ADVISOR_ALTITUDES = (100.0, 100.0, 120.0)
+
+def advisor_altitude(dah):
+    """
+    Return the recommended flight altitude (m AGL) for DAH values.
+    """
+    return np.asarray(ADVISOR_ALTITUDES)[classify_growth_stage(dah)]
+
+def pack_polygons(polygons):
+    """
+    Stack a list of (V, 2) polygon vertex arrays into (vertices, offsets).
+    """
+    polygons = [np.asarray(polygon, dtype=np.float64).reshape(-1, 2) for polygon in polygons]
+    if any(len(polygon) < 3 for polygon in polygons):
+        raise ValueError("Field polygons need at least three vertices")
+    offsets = np.zeros(len(polygons) + 1, dtype=np.int64)
+    np.cumsum([len(polygon) for polygon in polygons], out=offsets[1:])
+    vertices = np.concatenate(polygons) if polygons else np.empty((0, 2))
+    return vertices, offsets
+
+def _ranges(starts, counts):
+    """
+    Concatenate arange(start, start + count) for every (start, count) pair.
+    """
+    total = int(counts.sum())
+    first = np.repeat(np.cumsum(counts) - counts, counts)
+    return np.repeat(starts, counts) + np.arange(total) - first
+
+def sensor_footprint(altitude, sensor="multispectral"):
+    """
+    Return (across-track width, along-track length, GSD in cm) of one image at
+    `altitude`; GSD is NaN for sensors that take no images.
+    """
+    spec = SENSOR_SPECS[sensor]
+    half_angles = np.radians(np.asarray(spec["fov_deg"]) / 2)
+    altitude = np.asarray(altitude, dtype=np.float64)
+    across = 2 * altitude * np.tan(half_angles[0])
+    along = 2 * altitude * np.tan(half_angles[1])
+    gsd = across / spec["image_px"][0] * 100 if spec["image_px"] else np.full_like(across, np.nan)
+    return across, along, gsd
+
+def plan_flights(vertices, offsets, altitude, sensor="multispectral", front_overlap=0.75, side_overlap=0.7,
+                 speed=8.0, turn_time=6.0, heading=None, run_in=0.0):
+    """
+    Plan lawnmower flights over every field.
+
+    vertices, offsets: ragged field polygons (see pack_polygons)
+    altitude:          flight altitude (m AGL), scalar or one per field
+    heading:           flight line direction (degrees from the x axis), scalar or
+                       one per field; default along each field's longest edge
+    speed:             cruise speed (m/s), lowered where the camera cannot
+                       trigger fast enough for the front overlap
+    turn_time:         seconds spent turning between lines
+    run_in:            metres flown beyond the boundary at both ends of a line
+    Returns a dict with the waypoints ((W, 3) x, y, altitude) of field f in
+    rows waypoint_offsets[f]:waypoint_offsets[f + 1] and per-field arrays of
+    altitude, heading_deg, gsd_cm, line_spacing, photo_spacing, speed,
+    n_lines, n_images, distance_m and flight_time_s.
+    """
+    if not (0 <= front_overlap < 1 and 0 <= side_overlap < 1):
+        raise ValueError("Overlaps must be fractions in [0, 1)")
+    vertices = np.asarray(vertices, dtype=np.float64)
+    offsets = np.asarray(offsets, dtype=np.int64)
+    n_fields = offsets.size - 1
+    counts = np.diff(offsets)
+    vertex_field = np.repeat(np.arange(n_fields), counts)
+    altitude = np.broadcast_to(np.asarray(altitude, dtype=np.float64), (n_fields,))
+
+    # Edge i runs from vertex i to the next vertex of the same polygon
+    following = np.arange(vertices.shape[0]) + 1
+    following[offsets[1:] - 1] = offsets[:-1]
+    edges = vertices[following] - vertices
+    if heading is None:
+        length = np.hypot(edges[:, 0], edges[:, 1])
+        longest = np.lexsort((-length, vertex_field))[offsets[:-1]]
+        angle = np.arctan2(edges[longest, 1], edges[longest, 0])
+    else:
+        angle = np.radians(np.broadcast_to(np.asarray(heading, dtype=np.float64), (n_fields,)))
+
+    # Rotate each field so its flight lines run along x
+    cos, sin = np.cos(angle), np.sin(angle)
+    x, y = vertices[:, 0], vertices[:, 1]
+    u = x * cos[vertex_field] + y * sin[vertex_field]
+    v = -x * sin[vertex_field] + y * cos[vertex_field]
+
+    across, along, gsd = sensor_footprint(altitude, sensor)
+    line_spacing = across * (1 - side_overlap)
+    photo_spacing = along * (1 - front_overlap)
+
+    # Lines centred across each field's extent, at least one per field
+    v_low = np.minimum.reduceat(v, offsets[:-1])
+    v_high = np.maximum.reduceat(v, offsets[:-1])
+    n_lines = np.maximum(np.ceil((v_high - v_low) / line_spacing), 1).astype(np.int64)
+    line_field = np.repeat(np.arange(n_fields), n_lines)
+    line_rank = np.arange(line_field.size) - np.repeat(np.cumsum(n_lines) - n_lines, n_lines)
+    first_line = v_low + ((v_high - v_low) - (n_lines - 1) * line_spacing) / 2
+    line_v = first_line[line_field] + line_rank * line_spacing[line_field]
+
+    # Crossings of every line with every edge of its field
+    pair_edge = _ranges(offsets[line_field], counts[line_field])
+    pair_v = np.repeat(line_v, counts[line_field])
+    v0, v1 = v[pair_edge], v[following[pair_edge]]
+    u0, u1 = u[pair_edge], u[following[pair_edge]]
+    crosses = (v0 <= pair_v) != (v1 <= pair_v)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        crossing = u0 + (pair_v - v0) / (v1 - v0) * (u1 - u0)
+    pair_start = np.cumsum(counts[line_field]) - counts[line_field]
+    u_start = np.minimum.reduceat(np.where(crosses, crossing, np.inf), pair_start)
+    u_end = np.maximum.reduceat(np.where(crosses, crossing, -np.inf), pair_start)
+
+    # Drop lines that miss the polygon and alternate directions within each field
+    hit = np.isfinite(u_start)
+    line_field, line_v = line_field[hit], line_v[hit]
+    u_start, u_end = u_start[hit] - run_in, u_end[hit] + run_in
+    n_lines = np.bincount(line_field, minlength=n_fields)
+    line_rank = np.arange(line_field.size) - np.repeat(np.cumsum(n_lines) - n_lines, n_lines)
+    reverse = line_rank % 2 == 1
+    u_pairs = np.where(reverse[:, None], np.c_[u_end, u_start], np.c_[u_start, u_end])
+
+    waypoint_field = np.repeat(line_field, 2)
+    waypoint_u = u_pairs.reshape(-1)
+    waypoint_v = np.repeat(line_v, 2)
+    waypoint_cos, waypoint_sin = cos[waypoint_field], sin[waypoint_field]
+    waypoints = np.column_stack([
+        waypoint_u * waypoint_cos - waypoint_v * waypoint_sin,
+        waypoint_u * waypoint_sin + waypoint_v * waypoint_cos,
+        altitude[waypoint_field],
+    ])
+    waypoint_offsets = np.zeros(n_fields + 1, dtype=np.int64)
+    np.cumsum(2 * n_lines, out=waypoint_offsets[1:])
+
+    # Path: lines plus the transitions between them, all within one field
+    step = np.hypot(np.diff(waypoint_u), np.diff(waypoint_v))
+    same_field = waypoint_field[1:] == waypoint_field[:-1]
+    distance = np.bincount(waypoint_field[1:][same_field], weights=step[same_field], minlength=n_fields)
+
+    spec = SENSOR_SPECS[sensor]
+    line_length = u_end - u_start
+    if spec["image_px"]:
+        images_per_line = np.floor(line_length / photo_spacing[line_field]).astype(np.int64) + 1
+        n_images = np.bincount(line_field, weights=images_per_line, minlength=n_fields).astype(np.int64)
+        speed = np.minimum(speed, photo_spacing / spec["trigger_interval_s"])
+    else:
+        n_images = np.zeros(n_fields, dtype=np.int64)
+        speed = np.full(n_fields, float(speed))
+    flight_time = distance / speed + np.maximum(n_lines - 1, 0) * turn_time
+
+    return {
+        "waypoints": waypoints,
+        "waypoint_offsets": waypoint_offsets,
+        "altitude": altitude.copy(),
+        "heading_deg": np.degrees(angle),
+        "gsd_cm": gsd,
+        "line_spacing": line_spacing,
+        "photo_spacing": photo_spacing,
+        "speed": speed,
+        "n_lines": n_lines,
+        "n_images": n_images,
+        "distance_m": distance,
+        "flight_time_s": flight_time,
+    }
@@ -0,0 +1,245 @@
+"""
+Variable-rate nitrogen prescriptions for fertilizer spreaders.
+
+A leaf nitrogen raster (% N per pixel), or a management-zone raster with one
+N estimate per zone, is turned into an application map on the spreader's
+grid:
+
+- the survey's DAH gives the growth stage and its optimal leaf N
+  (data.nitrogen_data.NITROGEN_OPTIMAL), and each pixel's deficit is the
+  optimum less its N;
+- a response curve per stage (RESPONSE_CURVES, piecewise linear) converts the
+  deficit into an N rate in kg/ha. The default curves apply nothing within the
+  advisor's tolerance band and nothing during maturation, in line with
+  NITROGEN_RECOMMENDATIONS;
+- pixel rates are averaged over swath-width x cell-length grid cells (the
+  smallest area the spreader can vary its rate over), then rounded to the
+  controller's rate step and limited to its minimum and maximum rate.
+
+The raster is read in strips of whole grid-cell rows and every step is an
+array operation, so memory depends on the strip and not the block. Zone
+rasters only need a lookup of precomputed per-zone rates. Prescriptions are
+exported as a gridded CSV (cell centre and rate) or as GeoJSON cell polygons
+in the raster's projected coordinates.
+
+Example:
+    python -m planning.prescription --nitrogen leaf_n.npy --dah 120 --pixel-size 0.5 \\
+        --swath 24 --out prescription.geojson
+"""
+
+import argparse
+import json
+import time
+
+import numpy as np
+
+from data.growth_stages import classify_growth_stage
+from data.nitrogen_data import NITROGEN_OPTIMAL, NITROGEN_TOLERANCE
+from processing.multispectral import BandRaster
+from processing.zonal import write_table
+
+# N rate (kg/ha) response to the leaf N deficit below the stage optimum (% N)
+# per growth stage code, as (deficits, rates); rates are interpolated between
+# the points and held at the end rates outside them. Rates start at the edge of
+# the advisor's tolerance band
+_DEFICITS = tuple(NITROGEN_TOLERANCE + step for step in (0.0, 0.2, 0.4, 0.6))
+RESPONSE_CURVES = {
+    # Early growth: full response to support tillering
+    0: (_DEFICITS, (0.0, 60.0, 100.0, 120.0)),
+    # Grand growth: lighter supplemental rates
+    1: (_DEFICITS, (0.0, 40.0, 70.0, 80.0)),
+    # Maturation: no nitrogen, it delays ripening
+    2: ((0.0,), (0.0,)),
+}
+
+# Spreader swath width (m); grid cells are square unless a cell length is given
+DEFAULT_SWATH_WIDTH = 24.0
+
+# Rate resolution of the spreader controller (kg/ha)
+DEFAULT_RATE_STEP = 5.0
+
+# Grid-cell rows read per strip
+STRIP_CELLS = 8
+
+def nitrogen_rates(nitrogen, dah, curves=RESPONSE_CURVES):
+    """
+    Return N rates (kg/ha) for leaf N values (%) surveyed at `dah`; NaN N
+    gives NaN rates.
+    """
+    stage = int(classify_growth_stage(dah))
+    deficits, rates = curves[stage]
+    deficit = NITROGEN_OPTIMAL[stage] - np.asarray(nitrogen, dtype=np.float32)
+    return np.interp(deficit, deficits, rates).astype(np.float32)
+
+def _zone_lookup(zone_nitrogen):
+    """
+    Return a leaf N lookup indexed by zone id, NaN for unlisted zones and for
+    ids past the end (the last entry).
+    """
+    zone_nitrogen = dict(zone_nitrogen)
+    lookup = np.full(max(zone_nitrogen, default=0) + 2, np.nan, dtype=np.float32)
+    for zone, value in zone_nitrogen.items():
+        if zone > 0:
+            lookup[zone] = value
+    return lookup
+
+def build_prescription(source, dah, pixel_size, swath_width=DEFAULT_SWATH_WIDTH, cell_length=None,
+                       zone_nitrogen=None, curves=RESPONSE_CURVES, rate_step=DEFAULT_RATE_STEP, min_rate=0.0,
+                       max_rate=None, n_fraction=1.0, origin=(0.0, 0.0)):
+    """
+    Build a variable-rate N prescription on the spreader grid.
+
+    source:        path or BandRaster of leaf N (%), NaN where there is no crop;
+                   or of integer zone ids when `zone_nitrogen` is given.
+    zone_nitrogen: optional dict of zone id -> leaf N (%); zone 0 is no crop.
+    pixel_size:    raster pixel size (m). Grid cells are whole pixels, the
+                   nearest to swath_width x cell_length (default: square).
+    rate_step:     rates are rounded to this step; rates below `min_rate`
+                   become 0 and rates are capped at `max_rate`.
+    n_fraction:    N content of the product (0.46 for urea) for product rates.
+    origin:        projected coordinates of the raster's top-left corner;
+                   rows run south.
+    Returns a dict with the per-cell columns ("cells": row, col, x, y,
+    area_ha, nitrogen, rate_kg_ha, product_kg_ha), the 2-D "rates" grid (NaN
+    for cells without crop), "cell_size" in metres, total N and cropped area.
+    """
+    began = time.perf_counter()
+    raster = source if isinstance(source, BandRaster) else BandRaster.open(source)
+    rows, cols = raster.shape
+    cell_cols = max(1, int(round(swath_width / pixel_size)))
+    cell_rows = max(1, int(round((swath_width if cell_length is None else cell_length) / pixel_size)))
+    grid_shape = (-(-rows // cell_rows), -(-cols // cell_cols))
+
+    if zone_nitrogen is not None:
+        nitrogen_lookup = _zone_lookup(zone_nitrogen)
+        rate_lookup = nitrogen_rates(nitrogen_lookup, dah, curves)
+    rate_sum = np.zeros(grid_shape)
+    nitrogen_sum = np.zeros(grid_shape)
+    count = np.zeros(grid_shape)
+    col_starts = np.arange(0, cols, cell_cols)
+    strip_rows = cell_rows * STRIP_CELLS
+    for row in range(0, rows, strip_rows):
+        stop = min(row + strip_rows, rows)
+        strip = raster.read_strip(row, stop)
+        if zone_nitrogen is not None:
+            zones = np.clip(strip, 0, nitrogen_lookup.size - 1)
+            nitrogen = nitrogen_lookup[zones]
+            rates = rate_lookup[zones]
+        else:
+            nitrogen = np.array(strip, dtype=np.float32)
+            rates = nitrogen_rates(nitrogen, dah, curves)
+        del strip
+        valid = ~np.isnan(nitrogen)
+        np.copyto(nitrogen, 0, where=~valid)
+        np.copyto(rates, 0, where=~valid)
+
+        # Sum whole cells: reduce the strip's rows, then its columns
+        row_starts = np.arange(0, stop - row, cell_rows)
+        cells = slice(row // cell_rows, row // cell_rows + row_starts.size)
+        for total, values in ((rate_sum, rates), (nitrogen_sum, nitrogen), (count, valid.astype(np.float32))):
+            total[cells] = np.add.reduceat(np.add.reduceat(values, row_starts, axis=0), col_starts, axis=1)
+
+    cropped = count > 0
+    with np.errstate(invalid="ignore", divide="ignore"):
+        cell_rates = rate_sum / count
+        cell_nitrogen = nitrogen_sum / count
+    if rate_step:
+        cell_rates = np.round(cell_rates / rate_step) * rate_step
+    cell_rates[cell_rates < min_rate] = 0.0
+    if max_rate is not None:
+        np.minimum(cell_rates, max_rate, out=cell_rates)
+    area = count * pixel_size * pixel_size / 1e4
+
+    # Cell extents; the last row and column may be partial
+    x_edges = origin[0] + np.minimum(np.arange(grid_shape[1] + 1) * cell_cols, cols) * pixel_size
+    y_edges = origin[1] - np.minimum(np.arange(grid_shape[0] + 1) * cell_rows, rows) * pixel_size
+    grid_row, grid_col = np.nonzero(cropped)
+    cells = {
+        "row": grid_row,
+        "col": grid_col,
+        "x": (x_edges[grid_col] + x_edges[grid_col + 1]) / 2,
+        "y": (y_edges[grid_row] + y_edges[grid_row + 1]) / 2,
+        "area_ha": area[cropped],
+        "nitrogen": cell_nitrogen[cropped],
+        "rate_kg_ha": cell_rates[cropped],
+        "product_kg_ha": cell_rates[cropped] / n_fraction,
+    }
+    return {
+        "cells": cells,
+        "rates": np.where(cropped, cell_rates, np.nan),
+        "cell_size": (cell_cols * pixel_size, cell_rows * pixel_size),
+        "x_edges": x_edges,
+        "y_edges": y_edges,
+        "total_n_kg": float((cells["rate_kg_ha"] * cells["area_ha"]).sum()),
+        "area_ha": float(cells["area_ha"].sum()),
+        "seconds": time.perf_counter() - began,
+    }
+
+def write_prescription_csv(path, prescription):
+    """
+    Write one row per cropped grid cell: centre x, y, rates and area.
+    """
+    cells = prescription["cells"]
+    write_table(path, {name: cells[name] for name in ("x", "y", "rate_kg_ha", "product_kg_ha", "area_ha")})
+
+def write_prescription_geojson(path, prescription, decimals=2):
+    """
+    Write cropped grid cells as GeoJSON polygons with their rates. Coordinates
+    are in the raster's projected system; no CRS member is written.
+    """
+    cells = prescription["cells"]
+    x_edges, y_edges = prescription["x_edges"], prescription["y_edges"]
+    left, right = x_edges[cells["col"]].round(decimals), x_edges[cells["col"] + 1].round(decimals)
+    top, bottom = y_edges[cells["row"]].round(decimals), y_edges[cells["row"] + 1].round(decimals)
+    features = [
+        {
+            "type": "Feature",
+            # Counter-clockwise exterior ring (RFC 7946); y0 is the top edge
+            "geometry": {"type": "Polygon", "coordinates": [[[x0, y1], [x1, y1], [x1, y0], [x0, y0], [x0, y1]]]},
+            "properties": {"rate_kg_ha": rate, "product_kg_ha": round(product, decimals)},
+        }
+        for x0, x1, y0, y1, rate, product in zip(left.tolist(), right.tolist(), top.tolist(), bottom.tolist(),
+                                                 cells["rate_kg_ha"].tolist(), cells["product_kg_ha"].tolist())
+    ]
+    with open(path, "w") as f:
+        # dumps() runs in the C encoder; dump() streams through the Python one
+        f.write(json.dumps({"type": "FeatureCollection", "features": features}, separators=(",", ":")))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--nitrogen", help="leaf N raster (%%), NaN where there is no crop")
+    source.add_argument("--zones", help="zone raster; needs --zone-nitrogen")
+    parser.add_argument("--zone-nitrogen", action="append", default=[], metavar="ZONE=N",
+                        help="leaf N (%%) of a zone")
+    parser.add_argument("--dah", type=float, required=True, help="days after harvest of the survey")
+    parser.add_argument("--pixel-size", type=float, required=True, help="raster pixel size (m)")
+    parser.add_argument("--swath", type=float, default=DEFAULT_SWATH_WIDTH, help="spreader swath width (m)")
+    parser.add_argument("--cell-length", type=float, help="grid cell length along travel (m, default: swath)")
+    parser.add_argument("--rate-step", type=float, default=DEFAULT_RATE_STEP)
+    parser.add_argument("--min-rate", type=float, default=0.0)
+    parser.add_argument("--max-rate", type=float)
+    parser.add_argument("--n-fraction", type=float, default=1.0, help="N content of the product, e.g. 0.46 for urea")
+    parser.add_argument("--origin", type=float, nargs=2, default=(0.0, 0.0), metavar=("X", "Y"),
+                        help="projected coordinates of the raster's top-left corner")
+    parser.add_argument("--out", required=True, help="output .csv or .geojson")
+    args = parser.parse_args(argv)
+
+    if args.zones and not args.zone_nitrogen:
+        parser.error("--zones needs --zone-nitrogen")
+    zone_nitrogen = {int(zone): float(value) for zone, value in (item.split("=", 1) for item in args.zone_nitrogen)}
+    prescription = build_prescription(args.nitrogen or args.zones, args.dah, args.pixel_size, args.swath,
+                                      args.cell_length, zone_nitrogen or None, rate_step=args.rate_step,
+                                      min_rate=args.min_rate, max_rate=args.max_rate, n_fraction=args.n_fraction,
+                                      origin=tuple(args.origin))
+    if args.out.lower().endswith((".geojson", ".json")):
+        write_prescription_geojson(args.out, prescription)
+    else:
+        write_prescription_csv(args.out, prescription)
+    area = prescription["area_ha"]
+    print(f"{prescription['cells']['x'].size:,} cells of {prescription['cell_size'][0]:g} x "
+          f"{prescription['cell_size'][1]:g} m over {area:,.1f} ha: {prescription['total_n_kg']:,.0f} kg N "
+          f"({prescription['total_n_kg'] / max(area, 1e-9):.1f} kg/ha) -> {args.out}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+"""
+Season-long UAV survey scheduling for many fields with a shared drone fleet.
+
+Each field is surveyed from START_DAH to END_DAH days after its harvest date.
+The sensors flown and the days until the next survey follow the Growth Stage
+Advisor's plan for the field's stage at the time of the survey (SURVEY_PLANS),
+so the cadence tightens and the payload changes as the crop moves through its
+stages. A survey is due one interval after the field's previous survey and
+may be flown up to `late_days` after that, or from `early_days` before it to
+spread the load of busy weeks.
+
+Daily capacity is the hectares the drones of each payload can cover and the
+field visits the crews can make. The solver walks the calendar day by day:
+surveys enter an earliest-deadline-first heap when their window opens, the
+most urgent candidates are checked against the day's remaining capacity in
+one vectorized pass, and each flown survey schedules the field's next one.
+Surveys that cannot be flown inside their window are flown as soon as
+capacity allows and reported with their lateness.
+"""
+
+import heapq
+
+import numpy as np
+
+from data.growth_stages import classify_growth_stage, get_stage_table
+
+SENSORS = ("multispectral", "lidar")
+
+# Sensors flown and days until the next survey in each growth stage, per
+# stage table, following the Growth Stage Advisor's recommendations
+SURVEY_PLANS = {
+    "default": (
+        {"sensors": ("multispectral",), "interval": 21},
+        {"sensors": ("multispectral", "lidar"), "interval": 35},
+        {"sensors": ("lidar",), "interval": 21},
+    ),
+    "four_stage": (
+        {"sensors": ("multispectral",), "interval": 21},
+        {"sensors": ("multispectral", "lidar"), "interval": 35},
+        {"sensors": ("multispectral", "lidar"), "interval": 35},
+        {"sensors": ("lidar",), "interval": 21},
+    ),
+}
+
+# Survey season in days after harvest (the research study's first and last survey)
+START_DAH = 100
+END_DAH = 310
+
+# Default daily capacity of one drone (hectares) and one crew (field visits)
+HECTARES_PER_DRONE_DAY = 120.0
+VISITS_PER_CREW_DAY = 6
+
+SCHEDULE_COLUMNS = ("field_id", "date", "dah", "stage_code", "multispectral", "lidar", "due_date", "late_days")
+
+def register_survey_plan(table, plans):
+    """
+    Add or replace the survey plan for a stage table: one
+    {"sensors": (...), "interval": days} entry per stage.
+    """
+    stages = get_stage_table(table)["stages"]
+    if len(plans) != len(stages):
+        raise ValueError(f"Stage table {table!r} has {len(stages)} stages, got {len(plans)} survey plans")
+    for plan in plans:
+        unknown = set(plan["sensors"]) - set(SENSORS)
+        if unknown:
+            raise ValueError(f"Unknown sensors in survey plan: {sorted(unknown)}")
+        if plan["interval"] < 1:
+            raise ValueError("Survey intervals must be at least one day")
+    SURVEY_PLANS[table] = tuple(dict(plan) for plan in plans)
+
+def _plan_lookup(tables, max_dah):
+    """
+    Return (interval, sensors, stage) lookup arrays indexed by [table, dah].
+    """
+    dah = np.arange(max_dah + 1)
+    intervals = np.empty((len(tables), dah.size), dtype=np.int64)
+    sensors = np.empty((len(tables), dah.size, len(SENSORS)), dtype=bool)
+    stages = np.empty((len(tables), dah.size), dtype=np.int8)
+    for index, table in enumerate(tables):
+        try:
+            plans = SURVEY_PLANS[table]
+        except KeyError:
+            raise ValueError(f"No survey plan for stage table {table!r}") from None
+        codes = classify_growth_stage(dah, table)
+        stage_intervals = np.array([plan["interval"] for plan in plans])
+        stage_sensors = np.array([[sensor in plan["sensors"] for sensor in SENSORS] for plan in plans])
+        intervals[index] = stage_intervals[codes]
+        sensors[index] = stage_sensors[codes]
+        stages[index] = codes
+    return intervals, sensors, stages
+
+def fit_capacity(demand, capacity, max_visits):
+    """
+    Select candidates, given in priority order, that fit a day's capacity.
+
+    demand:     (N, n_sensors) hectares each candidate needs per sensor
+    capacity:   (n_sensors,) hectares left per sensor
+    max_visits: field visits left
+    Each pass takes the longest prefix of the remaining candidates whose
+    cumulative demand fits, after dropping those that no longer fit alone.
+    Returns a boolean mask of selected candidates.
+    """
+    selected = np.zeros(len(demand), dtype=bool)
+    eligible = np.ones(len(demand), dtype=bool)
+    remaining = np.asarray(capacity, dtype=np.float64) + 1e-9
+    while max_visits > 0:
+        eligible &= (demand <= remaining).all(axis=1)
+        candidates = np.flatnonzero(eligible)
+        if candidates.size == 0:
+            break
+        fits = (np.cumsum(demand[candidates], axis=0) <= remaining).all(axis=1)
+        count = min(max_visits, candidates.size if fits.all() else int(np.argmin(fits)))
+        taken = candidates[:count]
+        selected[taken] = True
+        eligible[taken] = False
+        remaining -= demand[taken].sum(axis=0)
+        max_visits -= count
+    return selected
+
+def schedule_surveys(fields, drones=None, crews=2, hectares_per_drone_day=HECTARES_PER_DRONE_DAY,
+                     visits_per_crew_day=VISITS_PER_CREW_DAY, start_dah=START_DAH, end_dah=END_DAH,
+                     early_days=0, late_days=7, blocked_dates=(), table="default"):
+    """
+    Schedule every survey of the season for a set of fields.
+
+    fields:        DataFrame or dict of columns: field_id, harvest_date (datetime64
+                   or ISO strings), area_ha and optionally table (the field's stage
+                   table; defaults to `table`)
+    drones:        {sensor: number of drones carrying it}, default one of each
+    blocked_dates: dates with no flying (weather, holidays)
+    Returns the schedule as a dict of SCHEDULE_COLUMNS arrays sorted by date.
+    """
+    field_id = np.asarray(fields["field_id"])
+    harvest = np.asarray(fields["harvest_date"], dtype="datetime64[D]").astype(np.int64)
+    area = np.asarray(fields["area_ha"], dtype=np.float64)
+    field_tables = np.asarray(fields["table"]) if "table" in fields else np.full(len(field_id), table)
+    tables, table_index = np.unique(field_tables, return_inverse=True)
+    drones = {"multispectral": 1, "lidar": 1} if drones is None else drones
+    capacity = np.array([drones.get(sensor, 0) * hectares_per_drone_day for sensor in SENSORS])
+    max_visits = crews * visits_per_crew_day
+
+    max_dah = end_dah + late_days + max(plan["interval"] for name in tables for plan in SURVEY_PLANS.get(name, ()))
+    intervals, sensors, stages = _plan_lookup(tables, max_dah)
+
+    # Every survey must fit into one day's capacity for the sensors it needs
+    season = slice(start_dah, end_dah + 1)
+    needed = sensors[:, season].any(axis=1)[table_index]
+    oversized = (needed * area[:, None] > capacity).any(axis=1)
+    if oversized.any():
+        raise ValueError(
+            f"{int(oversized.sum())} fields (e.g. field {field_id[oversized][0]}) exceed a day's drone capacity "
+            "for the sensors they need"
+        )
+    if max_visits < 1:
+        raise ValueError("Crew capacity must allow at least one field visit per day")
+
+    blocked = set(np.asarray(blocked_dates, dtype="datetime64[D]").astype(np.int64).tolist())
+    due = harvest + start_dah
+    # No survey is flown before its field's harvest
+    earliest = np.maximum(due - early_days, harvest)
+    pending = list(zip(earliest.tolist(), (due + late_days).tolist(), due.tolist(), range(len(due))))
+    heapq.heapify(pending)
+    ready = []
+    # The most urgent candidates checked per day; extra ones let small fields
+    # use capacity a large field could not
+    candidate_limit = 4 * max_visits
+
+    flown_field, flown_day, flown_due = [], [], []
+    day = pending[0][0] if pending else 0
+    while pending or ready:
+        if not ready:
+            day = max(day, pending[0][0])
+        while pending and pending[0][0] <= day:
+            _, deadline, survey_due, field = heapq.heappop(pending)
+            heapq.heappush(ready, (deadline, survey_due, field))
+        if day in blocked:
+            day += 1
+            continue
+
+        candidates = [heapq.heappop(ready) for _ in range(min(len(ready), candidate_limit))]
+        field = np.array([candidate[2] for candidate in candidates])
+        dah = np.clip(day - harvest[field], 0, max_dah)
+        demand = sensors[table_index[field], dah] * area[field, None]
+        selected = fit_capacity(demand, capacity, max_visits)
+        for candidate, keep in zip(candidates, selected.tolist()):
+            if not keep:
+                heapq.heappush(ready, candidate)
+
+        flown = field[selected]
+        flown_field.append(flown)
+        flown_day.append(np.full(flown.size, day))
+        flown_due.append(np.array([candidate[1] for candidate in candidates])[selected])
+
+        # Next survey of each flown field, unless it falls after the season
+        next_due = day + intervals[table_index[flown], dah[selected]]
+        more = next_due - harvest[flown] <= end_dah
+        earliest = np.maximum(next_due[more] - early_days, harvest[flown[more]])
+        for first_day, survey_due, next_field in zip(earliest.tolist(), next_due[more].tolist(), flown[more].tolist()):
+            heapq.heappush(pending, (first_day, survey_due + late_days, survey_due, next_field))
+        day += 1
+
+    field = np.concatenate(flown_field) if flown_field else np.empty(0, dtype=np.int64)
+    days = np.concatenate(flown_day) if flown_day else np.empty(0, dtype=np.int64)
+    dues = np.concatenate(flown_due).astype(np.int64) if flown_due else np.empty(0, dtype=np.int64)
+    order = np.lexsort((field_id[field], days))
+    field, days, dues = field[order], days[order], dues[order]
+    dah = days - harvest[field]
+    survey_sensors = sensors[table_index[field], np.clip(dah, 0, max_dah)]
+    return {
+        "field_id": field_id[field],
+        "date": days.astype("datetime64[D]"),
+        "dah": dah.astype(np.int16),
+        "stage_code": stages[table_index[field], np.clip(dah, 0, max_dah)],
+        "multispectral": survey_sensors[:, 0],
+        "lidar": survey_sensors[:, 1],
+        "due_date": dues.astype("datetime64[D]"),
+        "late_days": np.maximum(days - dues - late_days, 0).astype(np.int16),
+    }
+
+def daily_load(schedule, fields):
+    """
+    Return per-day totals of a schedule: date, surveys and hectares per sensor.
+    """
+    field_id = np.asarray(fields["field_id"])
+    order = np.argsort(field_id)
+    rows = order[np.searchsorted(field_id, schedule["field_id"], sorter=order)]
+    hectares = np.asarray(fields["area_ha"], dtype=np.float64)[rows]
+    dates, index, surveys = np.unique(schedule["date"], return_inverse=True, return_counts=True)
+    load = {"date": dates, "surveys": surveys}
+    for sensor in SENSORS:
+        load[f"{sensor}_ha"] = np.bincount(index, weights=hectares * schedule[sensor], minlength=dates.size)
+    return load
+
+def group_by_month(dates):
+    """
+    Group dates by calendar month; returns [(month, day-of-month array), ...] in order.
+    """
+    dates = np.sort(np.asarray(dates, dtype="datetime64[D]"))
+    months = dates.astype("datetime64[M]")
+    starts = np.flatnonzero(np.r_[True, months[1:] != months[:-1]])
+    return [
+        (month, (chunk - month.astype("datetime64[D]")).astype(np.int64) + 1)
+        for month, chunk in zip(months[starts], np.split(dates, starts[1:]))
+    ]
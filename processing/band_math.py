@@ -0,0 +1,323 @@
+"""
+Band-math expression compiler for vegetation indices.
+
+Index formulas are written as plain arithmetic over band names, e.g.
+"(nir - red) / (nir + red)". A set of requested indices is compiled into one
+evaluation plan:
+
+- shared subexpressions (such as `nir - red` in NDVI, SAVI and EVI) are
+  computed once, with + and * operands put in canonical order;
+- intermediate results live in a small pool of scratch buffers, reused as
+  soon as their last reader has run, and every operation writes with `out=`;
+- final results are written straight into the caller's output arrays;
+- division by zero yields NaN instead of inf or a warning.
+
+All arithmetic is done in float32. SAVI, EVI and the other soil/atmosphere
+adjusted indices assume reflectance (0-1) inputs rather than raw digital numbers.
+"""
+
+import re
+
+import numpy as np
+
+# Index formulas over the band names in processing.multispectral.BAND_NAMES
+INDEX_EXPRESSIONS = {
+    "ndvi": "(nir - red) / (nir + red)",
+    "gndvi": "(nir - green) / (nir + green)",
+    "ndre": "(nir - red_edge) / (nir + red_edge)",
+    "savi": "1.5 * (nir - red) / (nir + red + 0.5)",
+    "evi": "2.5 * (nir - red) / (nir + 6 * red - 7.5 * blue + 1)",
+    "cire": "nir / red_edge - 1",
+}
+
+_TOKEN = re.compile(r"\s*(?:(\d+\.?\d*(?:[eE][-+]?\d+)?|\.\d+(?:[eE][-+]?\d+)?)|([A-Za-z_]\w*)|(.))")
+
+_UFUNCS = {"+": np.add, "-": np.subtract, "*": np.multiply, "/": np.divide}
+
+class ExpressionError(ValueError):
+    """
+    Raised for malformed band-math expressions.
+    """
+
+def tokenize(expression):
+    """
+    Split an expression into (kind, value) tokens: number, name or operator.
+    """
+    tokens = []
+    for number, name, operator in _TOKEN.findall(expression):
+        if number:
+            tokens.append(("number", float(number)))
+        elif name:
+            tokens.append(("name", name))
+        elif operator.strip():
+            if operator not in "+-*/()":
+                raise ExpressionError(f"Unexpected character {operator!r} in {expression!r}")
+            tokens.append(("op", operator))
+    return tokens
+
+class _Parser:
+    """
+    Recursive-descent parser producing nested tuples:
+    ("band", name), ("const", value), ("neg", node) and (operator, left, right).
+    """
+
+    def __init__(self, expression):
+        self.expression = expression
+        self.tokens = tokenize(expression)
+        self.position = 0
+
+    def parse(self):
+        node = self._sum()
+        if self.position != len(self.tokens):
+            raise ExpressionError(f"Unexpected {self.tokens[self.position][1]!r} in {self.expression!r}")
+        return node
+
+    def _peek(self):
+        return self.tokens[self.position] if self.position < len(self.tokens) else (None, None)
+
+    def _next(self):
+        token = self._peek()
+        self.position += 1
+        return token
+
+    def _sum(self):
+        node = self._product()
+        while self._peek() in (("op", "+"), ("op", "-")):
+            operator = self._next()[1]
+            node = (operator, node, self._product())
+        return node
+
+    def _product(self):
+        node = self._unary()
+        while self._peek() in (("op", "*"), ("op", "/")):
+            operator = self._next()[1]
+            node = (operator, node, self._unary())
+        return node
+
+    def _unary(self):
+        if self._peek() == ("op", "-"):
+            self._next()
+            return ("neg", self._unary())
+        if self._peek() == ("op", "+"):
+            self._next()
+            return self._unary()
+        return self._atom()
+
+    def _atom(self):
+        kind, value = self._next()
+        if kind == "number":
+            return ("const", value)
+        if kind == "name":
+            return ("band", value)
+        if (kind, value) == ("op", "("):
+            node = self._sum()
+            if self._next() != ("op", ")"):
+                raise ExpressionError(f"Missing ')' in {self.expression!r}")
+            return node
+        raise ExpressionError(f"Unexpected end of expression in {self.expression!r}")
+
+def parse_expression(expression):
+    """
+    Parse a band-math expression into a nested tuple tree.
+    """
+    return _Parser(expression).parse()
+
+class _Graph:
+    """
+    Hash-consed expression DAG: structurally equal subtrees share one node id.
+    """
+
+    def __init__(self):
+        self.nodes = []
+        self.ids = {}
+
+    def add(self, tree):
+        kind = tree[0]
+        if kind in ("band", "const"):
+            return self._intern(tree)
+        if kind == "neg":
+            operand = self.add(tree[1])
+            if self.nodes[operand][0] == "const":
+                return self._intern(("const", -self.nodes[operand][1]))
+            return self._intern(("neg", operand))
+
+        left, right = self.add(tree[1]), self.add(tree[2])
+        if self.nodes[left][0] == "const" and self.nodes[right][0] == "const":
+            # Constant folding
+            a, b = self.nodes[left][1], self.nodes[right][1]
+            if kind == "/" and b == 0:
+                return self._intern(("const", float("nan")))
+            return self._intern(("const", float(_UFUNCS[kind](a, b))))
+        if kind in ("+", "*") and right < left:
+            # Canonical operand order for commutative operators
+            left, right = right, left
+        return self._intern((kind, left, right))
+
+    def _intern(self, node):
+        node_id = self.ids.get(node)
+        if node_id is None:
+            node_id = len(self.nodes)
+            self.nodes.append(node)
+            self.ids[node] = node_id
+        return node_id
+
+class IndexPlan:
+    """
+    A compiled evaluation plan for a set of band-math indices.
+
+    Attributes:
+        indices:      requested index names, in order.
+        bands:        band names the plan reads.
+        n_operations: array operations per evaluation after sharing subexpressions.
+        n_buffers:    full-size scratch buffers needed (excluding outputs).
+    """
+
+    def __init__(self, expressions):
+        self.expressions = dict(expressions)
+        self.indices = list(self.expressions)
+        graph = _Graph()
+        roots = {name: graph.add(parse_expression(text)) for name, text in self.expressions.items()}
+        self._compile(graph.nodes, roots)
+        self._capacity = -1
+        self._buffers = []
+        self._mask = None
+
+    def _compile(self, nodes, roots):
+        # Keep only nodes reachable from the requested indices, in topological order
+        reachable = set()
+        stack = list(roots.values())
+        while stack:
+            node_id = stack.pop()
+            if node_id in reachable:
+                continue
+            reachable.add(node_id)
+            stack.extend(arg for arg in nodes[node_id][1:] if nodes[node_id][0] not in ("band", "const"))
+        order = sorted(reachable)
+
+        self.bands = sorted({nodes[node_id][1] for node_id in order if nodes[node_id][0] == "band"})
+        outputs = {}
+        for name, node_id in roots.items():
+            outputs.setdefault(node_id, []).append(name)
+
+        # Last step reading each node, for freeing scratch buffers early
+        last_use = {}
+        for node_id in order:
+            node = nodes[node_id]
+            if node[0] not in ("band", "const"):
+                for arg in node[1:]:
+                    last_use[arg] = node_id
+
+        # Linear-scan buffer assignment: an operand's buffer is released before the
+        # result is placed, so results are computed in place where possible
+        location = {}
+        free = []
+        n_buffers = 0
+        steps = []
+        for node_id in order:
+            node = nodes[node_id]
+            if node[0] == "band":
+                location[node_id] = ("band", node[1])
+                continue
+            if node[0] == "const":
+                location[node_id] = ("const", node[1])
+                continue
+
+            args = [location[arg] for arg in node[1:]]
+            for arg in set(node[1:]):
+                if last_use.get(arg) == node_id and location[arg][0] == "buffer":
+                    free.append(location[arg][1])
+
+            if node_id in outputs:
+                dest = ("out", outputs[node_id][0])
+            elif free:
+                dest = ("buffer", free.pop())
+            else:
+                dest = ("buffer", n_buffers)
+                n_buffers += 1
+            location[node_id] = dest
+            steps.append((node[0], dest, args))
+
+        # Indices that are a bare band or constant still need their output filled
+        self._copies = [
+            (name, location[node_id]) for node_id, names in outputs.items() for name in names
+            if location[node_id][0] in ("band", "const")
+        ]
+        # Indices sharing an identical expression reuse the first one's result
+        self._aliases = [
+            (name, names[0]) for node_id, names in outputs.items() for name in names[1:]
+            if location[node_id][0] == "out"
+        ]
+        self.steps = steps
+        self.n_operations = len(steps)
+        self.n_buffers = n_buffers
+
+    def _scratch(self, shape):
+        size = int(np.prod(shape))
+        if self._capacity < size:
+            # Grow the pool once; smaller windows reuse a prefix of each buffer
+            self._buffers = [np.empty(size, dtype=np.float32) for _ in range(self.n_buffers)]
+            self._mask = np.empty(size, dtype=bool)
+            self._capacity = size
+        return [buffer[:size].reshape(shape) for buffer in self._buffers], self._mask[:size].reshape(shape)
+
+    def evaluate(self, bands, out=None):
+        """
+        Evaluate every index of the plan.
+
+        bands: dict of band name -> array (all the same shape, any numeric dtype).
+        out:   optional dict of index name -> float32 array to write into; missing
+               outputs are allocated.
+        Returns a dict of index name -> result array.
+        """
+        missing = [band for band in self.bands if band not in bands]
+        if missing:
+            raise ValueError(f"Missing bands for {self.indices}: {missing}")
+        shape = np.shape(bands[self.bands[0]]) if self.bands else np.shape(next(iter(bands.values())))
+        out = dict(out or {})
+        for name in self.indices:
+            if name not in out:
+                out[name] = np.empty(shape, dtype=np.float32)
+
+        buffers, mask = self._scratch(shape)
+
+        def resolve(place):
+            kind, key = place
+            if kind == "band":
+                return bands[key]
+            if kind == "const":
+                return key
+            if kind == "out":
+                return out[key]
+            return buffers[key]
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            for operator, dest, args in self.steps:
+                target = resolve(dest)
+                if operator == "neg":
+                    np.negative(resolve(args[0]), out=target, dtype=np.float32)
+                elif operator == "/":
+                    numerator, denominator = resolve(args[0]), resolve(args[1])
+                    # Record zero denominators before the result may overwrite them
+                    np.equal(denominator, 0, out=mask)
+                    np.divide(numerator, denominator, out=target, dtype=np.float32)
+                    np.copyto(target, np.nan, where=mask)
+                else:
+                    _UFUNCS[operator](resolve(args[0]), resolve(args[1]), out=target, dtype=np.float32)
+
+        for name, place in self._copies:
+            np.copyto(out[name], resolve(place), casting="unsafe")
+        for name, source in self._aliases:
+            np.copyto(out[name], out[source])
+        return {name: out[name] for name in self.indices}
+
+def compile_indices(indices):
+    """
+    Compile indices into one IndexPlan.
+    `indices` is a list of names from INDEX_EXPRESSIONS or a dict of name -> expression.
+    """
+    if isinstance(indices, dict):
+        return IndexPlan(indices)
+    unknown = [name for name in indices if name not in INDEX_EXPRESSIONS]
+    if unknown:
+        raise ValueError(f"Unknown vegetation index: {unknown}")
+    return IndexPlan({name: INDEX_EXPRESSIONS[name] for name in indices})
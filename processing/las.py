@@ -0,0 +1,405 @@
+"""
+Memory-mapped reader and writer for LAS point clouds (ASPRS LAS 1.2-1.4).
+
+Opening a file parses the public header and maps the point records as a
+structured NumPy array with np.memmap; nothing is read until a column is used,
+so multi-GB files open in milliseconds. Scaled coordinates and packed bit
+fields (return number, classification) are decoded lazily, per column and per
+chunk. Spatial-window and classification filters compare the raw integer
+records chunk by chunk and return row indices, so the full cloud is never
+materialized.
+
+Point data record formats 0-3 and 6-8 are supported (uncompressed LAS only).
+
+Example:
+    las = LasFile("field.las")
+    rows = las.select(bounds=(xmin, ymin, xmax, ymax), classes=[2])
+    ground = las.read(["x", "y", "z"], rows)
+"""
+
+import datetime
+import os
+import struct
+
+import numpy as np
+
+DEFAULT_CHUNK_SIZE = 5_000_000
+
+# Public header block, LAS 1.2 part (227 bytes)
+_HEADER_12 = struct.Struct("<4sHH16sBB32s32sHHHIIBHI5I3d3d6d")
+# LAS 1.3 waveform offset and LAS 1.4 extended counts
+_HEADER_13 = struct.Struct("<Q")
+_HEADER_14 = struct.Struct("<QIQ15Q")
+HEADER_SIZE = {2: 227, 3: 235, 4: 375}
+
+# Byte offsets of header fields patched when writing
+_OFFSET_LEGACY_COUNT = 107
+_OFFSET_BOUNDS = 179
+_OFFSET_WAVEFORM = 227
+_OFFSET_EVLR = 235
+
+_LEGACY_FIELDS = [
+    ("X", "<i4"), ("Y", "<i4"), ("Z", "<i4"), ("intensity", "<u2"),
+    ("return_bits", "u1"), ("classification_bits", "u1"), ("scan_angle_rank", "i1"),
+    ("user_data", "u1"), ("point_source_id", "<u2"),
+]
+_EXTENDED_FIELDS = [
+    ("X", "<i4"), ("Y", "<i4"), ("Z", "<i4"), ("intensity", "<u2"),
+    ("return_bits", "u1"), ("flag_bits", "u1"), ("classification", "u1"),
+    ("user_data", "u1"), ("scan_angle", "<i2"), ("point_source_id", "<u2"), ("gps_time", "<f8"),
+]
+_GPS = [("gps_time", "<f8")]
+_RGB = [("red", "<u2"), ("green", "<u2"), ("blue", "<u2")]
+
+POINT_FORMAT_FIELDS = {
+    0: _LEGACY_FIELDS,
+    1: _LEGACY_FIELDS + _GPS,
+    2: _LEGACY_FIELDS + _RGB,
+    3: _LEGACY_FIELDS + _GPS + _RGB,
+    6: _EXTENDED_FIELDS,
+    7: _EXTENDED_FIELDS + _RGB,
+    8: _EXTENDED_FIELDS + _RGB + [("nir", "<u2")],
+}
+
+# ASPRS standard classification codes used for filtering
+GROUND_CLASS = 2
+VEGETATION_CLASSES = (3, 4, 5)
+
+class LasFormatError(ValueError):
+    """
+    Raised for files that are not uncompressed LAS or use an unsupported format.
+    """
+
+def point_dtype(point_format, record_length=None):
+    """
+    Return the structured dtype of a point record, padding any extra bytes.
+    """
+    try:
+        fields = list(POINT_FORMAT_FIELDS[point_format])
+    except KeyError:
+        raise LasFormatError(f"Unsupported point data format {point_format}") from None
+    dtype = np.dtype(fields)
+    if record_length is not None and record_length > dtype.itemsize:
+        fields.append(("extra_bytes", f"V{record_length - dtype.itemsize}"))
+        dtype = np.dtype(fields)
+    elif record_length is not None and record_length < dtype.itemsize:
+        raise LasFormatError(f"Record length {record_length} is too short for format {point_format}")
+    return dtype
+
+def read_header(path):
+    """
+    Parse the public header block of a LAS file into a dict.
+    """
+    with open(path, "rb") as f:
+        raw = f.read(HEADER_SIZE[4])
+    if len(raw) < _HEADER_12.size or raw[:4] != b"LASF":
+        raise LasFormatError(f"{path} is not a LAS file")
+    values = _HEADER_12.unpack_from(raw)
+    header = {
+        "file_source_id": values[1],
+        "global_encoding": values[2],
+        "version": (values[4], values[5]),
+        "system_identifier": values[6].rstrip(b"\0").decode("ascii", "replace"),
+        "generating_software": values[7].rstrip(b"\0").decode("ascii", "replace"),
+        "creation_day": values[8],
+        "creation_year": values[9],
+        "header_size": values[10],
+        "point_offset": values[11],
+        "n_vlrs": values[12],
+        "point_format": values[13],
+        "record_length": values[14],
+        "n_points": values[15],
+        "points_by_return": list(values[16:21]),
+        "scale": values[21:24],
+        "offset": values[24:27],
+        "max": (values[27], values[29], values[31]),
+        "min": (values[28], values[30], values[32]),
+    }
+    if header["point_format"] & 0xC0:
+        raise LasFormatError(f"{path} is compressed (LAZ); decompress it first")
+    if header["version"] >= (1, 4) and header["header_size"] >= HEADER_SIZE[4]:
+        extended = _HEADER_14.unpack_from(raw, HEADER_SIZE[3])
+        if extended[2]:
+            header["n_points"] = extended[2]
+            header["points_by_return"] = list(extended[3:])
+    return header
+
+def decode_column(records, name, point_format, scale=None, offset=None):
+    """
+    Decode one column from a block of point records.
+    x, y and z are scaled to float64 (needs `scale` and `offset`); return_number,
+    number_of_returns and classification are unpacked from their bit fields;
+    any other name returns the raw record field.
+    """
+    extended = point_format >= 6
+    if name in ("x", "y", "z"):
+        axis = "xyz".index(name)
+        return records[name.upper()] * scale[axis] + offset[axis]
+    if name == "return_number":
+        return records["return_bits"] & (0x0F if extended else 0x07)
+    if name == "number_of_returns":
+        bits = records["return_bits"]
+        return (bits >> 4) & 0x0F if extended else (bits >> 3) & 0x07
+    if name == "classification":
+        if extended:
+            return np.asarray(records["classification"])
+        return records["classification_bits"] & 0x1F
+    return np.asarray(records[name])
+
+class LasFile:
+    """
+    A LAS file with its point records mapped as a structured array.
+    """
+
+    def __init__(self, path):
+        self.path = os.fspath(path)
+        self.header = read_header(self.path)
+        self.point_format = self.header["point_format"]
+        self.dtype = point_dtype(self.point_format, self.header["record_length"])
+        n_points = self.header["n_points"]
+
+        needed = self.header["point_offset"] + n_points * self.dtype.itemsize
+        if os.path.getsize(self.path) < needed:
+            raise LasFormatError(f"{self.path} is truncated: expected at least {needed} bytes")
+        if n_points:
+            self.points = np.memmap(self.path, dtype=self.dtype, mode="r",
+                                    offset=self.header["point_offset"], shape=(n_points,))
+        else:
+            self.points = np.empty(0, dtype=self.dtype)
+        self.scale = np.asarray(self.header["scale"])
+        self.offset = np.asarray(self.header["offset"])
+
+    def __len__(self):
+        return len(self.points)
+
+    @property
+    def extended(self):
+        return self.point_format >= 6
+
+    def column(self, name, rows=None):
+        """
+        Decode one column for `rows` (slice, index array or None for all).
+        See decode_column() for the available names.
+        """
+        records = self.points if rows is None else self.points[rows]
+        return decode_column(records, name, self.point_format, self.scale, self.offset)
+
+    def read(self, columns=("x", "y", "z"), rows=None):
+        """
+        Decode several columns for `rows` into a dict of arrays.
+        """
+        records = self.points if rows is None else self.points[rows]
+        return {
+            name: decode_column(records, name, self.point_format, self.scale, self.offset)
+            for name in columns
+        }
+
+    def _raw_bounds(self, bounds):
+        """
+        Convert (xmin, ymin, xmax, ymax) to inclusive integer record bounds.
+        """
+        xmin, ymin, xmax, ymax = bounds
+        limits = []
+        for axis, low, high in ((0, xmin, xmax), (1, ymin, ymax)):
+            raw_low = np.ceil((low - self.offset[axis]) / self.scale[axis])
+            raw_high = np.floor((high - self.offset[axis]) / self.scale[axis])
+            info = np.iinfo(np.int32)
+            limits.append((int(np.clip(raw_low, info.min, info.max)), int(np.clip(raw_high, info.min, info.max))))
+        return limits
+
+    def chunk_mask(self, start, stop, bounds=None, classes=None):
+        """
+        Return the filter mask for records [start, stop) without decoding coordinates.
+        """
+        records = self.points[start:stop]
+        mask = np.ones(stop - start, dtype=bool)
+        if bounds is not None:
+            (x_low, x_high), (y_low, y_high) = self._raw_bounds(bounds)
+            x = records["X"]
+            y = records["Y"]
+            mask &= (x >= x_low) & (x <= x_high) & (y >= y_low) & (y <= y_high)
+        if classes is not None:
+            classification = decode_column(records, "classification", self.point_format)
+            mask &= np.isin(classification, list(classes))
+        return mask
+
+    def select(self, bounds=None, classes=None, chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        Return int64 row indices of points inside `bounds` (xmin, ymin, xmax, ymax)
+        and with a classification in `classes`, scanning chunk by chunk.
+        """
+        selected = []
+        for start in range(0, len(self), chunk_size):
+            stop = min(start + chunk_size, len(self))
+            selected.append(np.flatnonzero(self.chunk_mask(start, stop, bounds, classes)) + start)
+        return np.concatenate(selected) if selected else np.empty(0, dtype=np.int64)
+
+    def iter_chunks(self, columns=("x", "y", "z"), chunk_size=DEFAULT_CHUNK_SIZE,
+                    bounds=None, classes=None):
+        """
+        Yield dicts of decoded columns chunk by chunk, filtered if requested.
+        """
+        for start in range(0, len(self), chunk_size):
+            stop = min(start + chunk_size, len(self))
+            records = self.points[start:stop]
+            if bounds is not None or classes is not None:
+                records = records[self.chunk_mask(start, stop, bounds, classes)]
+            yield {
+                name: decode_column(records, name, self.point_format, self.scale, self.offset)
+                for name in columns
+            }
+
+    def iter_xyz(self, chunk_size=DEFAULT_CHUNK_SIZE, bounds=None, classes=None):
+        """
+        Yield (N, 3) float64 coordinate chunks, e.g. for processing.lidar.PointGridder.
+        """
+        for chunk in self.iter_chunks(("x", "y", "z"), chunk_size, bounds, classes):
+            yield np.column_stack([chunk["x"], chunk["y"], chunk["z"]])
+
+    def write_subset(self, path, rows, chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        Write the records at `rows` to a new LAS file with the same format,
+        header and VLRs, updating point counts and bounds. Extended VLRs and
+        waveform packets are not copied.
+        """
+        rows = np.asarray(rows)
+        with open(self.path, "rb") as f:
+            prefix = bytearray(f.read(self.header["point_offset"]))
+
+        n_points = rows.size
+        with open(path, "wb") as f:
+            f.write(prefix)
+            f.truncate(len(prefix) + n_points * self.dtype.itemsize)
+
+        raw_min = np.full(3, np.iinfo(np.int64).max)
+        raw_max = np.full(3, np.iinfo(np.int64).min)
+        by_return = np.zeros(16, dtype=np.int64)
+        if n_points:
+            out = np.memmap(path, dtype=self.dtype, mode="r+", offset=len(prefix), shape=(n_points,))
+            for start in range(0, n_points, chunk_size):
+                records = self.points[rows[start:start + chunk_size]]
+                out[start:start + len(records)] = records
+                for axis, name in enumerate("XYZ"):
+                    raw_min[axis] = min(raw_min[axis], int(records[name].min()))
+                    raw_max[axis] = max(raw_max[axis], int(records[name].max()))
+                returns = decode_column(records, "return_number", self.point_format)
+                by_return += np.bincount(returns, minlength=16)[:16]
+            out.flush()
+            del out
+
+        low = raw_min * self.scale + self.offset if n_points else np.zeros(3)
+        high = raw_max * self.scale + self.offset if n_points else np.zeros(3)
+        _patch_counts_and_bounds(prefix, self.header["version"], self.extended, n_points, by_return, low, high)
+        with open(path, "r+b") as f:
+            f.write(prefix[:self.header["header_size"]])
+
+def write_las(path, columns, point_format=None, scale=(0.001, 0.001, 0.001), offset=None,
+              chunk_size=DEFAULT_CHUNK_SIZE, system_identifier="Precision-Agriculture"):
+    """
+    Write decoded point columns to a new LAS file.
+
+    columns: dict with x, y, z (required) and optionally intensity, return_number,
+             number_of_returns, classification, user_data, point_source_id,
+             gps_time, red, green, blue and nir.
+    point_format defaults to the smallest format carrying the given columns;
+    formats 0-3 are written as LAS 1.2 and 6-8 as LAS 1.4.
+    """
+    x, y, z = (np.asarray(columns[name], dtype=np.float64) for name in ("x", "y", "z"))
+    n_points = x.size
+    if point_format is None:
+        point_format = _default_format(columns)
+    dtype = point_dtype(point_format)
+    extended = point_format >= 6
+    version = (1, 4) if extended else (1, 2)
+    header_size = HEADER_SIZE[version[1]]
+
+    scale = np.asarray(scale, dtype=np.float64)
+    if offset is None:
+        offset = np.array([x.min(), y.min(), z.min()]) if n_points else np.zeros(3)
+        offset = np.floor(offset)
+    offset = np.asarray(offset, dtype=np.float64)
+
+    today = datetime.date.today()
+    header = bytearray(header_size)
+    _HEADER_12.pack_into(
+        header, 0, b"LASF", 0, 0x10 if extended else 0, bytes(16), version[0], version[1],
+        system_identifier.encode("ascii")[:32], b"Precision-Agriculture las.py",
+        today.timetuple().tm_yday, today.year, header_size, header_size, 0, point_format, dtype.itemsize,
+        0, 0, 0, 0, 0, 0, *scale, *offset, 0, 0, 0, 0, 0, 0,
+    )
+
+    with open(path, "wb") as f:
+        f.write(header)
+        f.truncate(header_size + n_points * dtype.itemsize)
+
+    raw_min = np.full(3, np.iinfo(np.int64).max)
+    raw_max = np.full(3, np.iinfo(np.int64).min)
+    by_return = np.zeros(16, dtype=np.int64)
+    if n_points:
+        out = np.memmap(path, dtype=dtype, mode="r+", offset=header_size, shape=(n_points,))
+        for start in range(0, n_points, chunk_size):
+            stop = min(start + chunk_size, n_points)
+            block = out[start:stop]
+            for axis, (name, values) in enumerate((("X", x), ("Y", y), ("Z", z))):
+                raw = np.round((values[start:stop] - offset[axis]) / scale[axis])
+                raw_min[axis] = min(raw_min[axis], int(raw.min()))
+                raw_max[axis] = max(raw_max[axis], int(raw.max()))
+                block[name] = raw
+            returns = _encode_fields(block, columns, start, stop, extended)
+            by_return += np.bincount(returns, minlength=16)[:16]
+        out.flush()
+        del out
+        info = np.iinfo(np.int32)
+        if raw_min.min() < info.min or raw_max.max() > info.max:
+            os.remove(path)
+            raise LasFormatError("Coordinates do not fit 32-bit records at this scale and offset")
+
+    # Bounds of the stored (quantized) coordinates, as readers will decode them
+    low = raw_min * scale + offset if n_points else np.zeros(3)
+    high = raw_max * scale + offset if n_points else np.zeros(3)
+    _patch_counts_and_bounds(header, version, extended, n_points, by_return, low, high)
+    with open(path, "r+b") as f:
+        f.write(header)
+
+def _default_format(columns):
+    if "nir" in columns:
+        return 8
+    has_gps = "gps_time" in columns
+    has_rgb = "red" in columns
+    return {(False, False): 0, (True, False): 1, (False, True): 2, (True, True): 3}[(has_gps, has_rgb)]
+
+def _encode_fields(block, columns, start, stop, extended):
+    """
+    Pack optional decoded columns into the records of `block`; returns return numbers.
+    """
+    def values(name, default=0):
+        if name in columns:
+            return np.asarray(columns[name])[start:stop]
+        return np.full(stop - start, default)
+
+    return_number = values("return_number", 1).astype(np.uint8)
+    number_of_returns = values("number_of_returns", 1).astype(np.uint8)
+    classification = values("classification").astype(np.uint8)
+    if extended:
+        block["return_bits"] = (return_number & 0x0F) | ((number_of_returns & 0x0F) << 4)
+        block["classification"] = classification
+    else:
+        block["return_bits"] = (return_number & 0x07) | ((number_of_returns & 0x07) << 3)
+        block["classification_bits"] = classification & 0x1F
+    for name in ("intensity", "user_data", "point_source_id", "gps_time", "red", "green", "blue", "nir"):
+        if name in block.dtype.names and name in columns:
+            block[name] = values(name)
+    return return_number
+
+def _patch_counts_and_bounds(header, version, extended, n_points, by_return, low, high):
+    """
+    Update point counts, per-return counts and bounds in a header buffer.
+    """
+    legacy = n_points if not extended and n_points <= 0xFFFFFFFF else 0
+    legacy_returns = by_return[1:6] if legacy else np.zeros(5, dtype=np.int64)
+    struct.pack_into("<I5I", header, _OFFSET_LEGACY_COUNT, legacy, *legacy_returns.tolist())
+    struct.pack_into("<6d", header, _OFFSET_BOUNDS, high[0], low[0], high[1], low[1], high[2], low[2])
+    if version >= (1, 3) and len(header) >= HEADER_SIZE[3]:
+        _HEADER_13.pack_into(header, _OFFSET_WAVEFORM, 0)
+    if version >= (1, 4) and len(header) >= HEADER_SIZE[4]:
+        _HEADER_14.pack_into(header, _OFFSET_EVLR, 0, 0, n_points, *by_return[1:16].tolist())
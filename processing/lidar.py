@@ -0,0 +1,236 @@
+"""
+LiDAR point-cloud processing for sugarcane canopy structure.
+
+Implements the chain described on the LiDAR Technology page: ground filtering,
+height calculation and volume calculation. Points are binned onto a regular
+grid with sort-based grouping (argsort + np.minimum/maximum.reduceat), one
+chunk at a time, so only per-cell minimum, maximum and count are kept between
+chunks and clouds of 10^8 points never need to be in memory at once.
+
+From those per-cell reductions:
+- DSM: highest return per cell (canopy surface);
+- DTM: ground surface from the lowest returns, with empty cells filled from
+  their nearest neighbour, isolated low noise removed by a median filter and
+  canopy removed by a morphological opening wider than the crop rows;
+- CHM: DSM - DTM, clipped at zero;
+- volume: CHM x cell area, the canopy volume in each cell (m^3).
+
+Grid rows run along y (row 0 at the minimum y) and columns along x.
+"""
+
+import numpy as np
+from scipy import ndimage
+
+# Default chunk of points binned at a time (about 120 MB of float64 xyz)
+DEFAULT_CHUNK_SIZE = 5_000_000
+
+class GridSpec:
+    """
+    A regular raster grid: lower-left origin, square cell size and shape.
+    """
+
+    def __init__(self, x0, y0, cell_size, rows, cols):
+        self.x0 = float(x0)
+        self.y0 = float(y0)
+        self.cell_size = float(cell_size)
+        self.rows = int(rows)
+        self.cols = int(cols)
+
+    @classmethod
+    def from_bounds(cls, xmin, ymin, xmax, ymax, cell_size):
+        """
+        Build the smallest grid of `cell_size` cells covering the bounds.
+        """
+        cols = max(1, int(np.floor((xmax - xmin) / cell_size)) + 1)
+        rows = max(1, int(np.floor((ymax - ymin) / cell_size)) + 1)
+        return cls(xmin, ymin, cell_size, rows, cols)
+
+    @classmethod
+    def for_points(cls, points, cell_size):
+        """
+        Build a grid covering an (N, 3) point array.
+        """
+        xmin, ymin = points[:, 0].min(), points[:, 1].min()
+        xmax, ymax = points[:, 0].max(), points[:, 1].max()
+        return cls.from_bounds(xmin, ymin, xmax, ymax, cell_size)
+
+    @property
+    def shape(self):
+        return (self.rows, self.cols)
+
+    @property
+    def cell_area(self):
+        return self.cell_size * self.cell_size
+
+    def cell_index(self, x, y):
+        """
+        Return (flat cell index, inside mask) for coordinate arrays.
+        Points outside the grid get index -1.
+        """
+        col = np.floor((np.asarray(x) - self.x0) / self.cell_size).astype(np.int64)
+        row = np.floor((np.asarray(y) - self.y0) / self.cell_size).astype(np.int64)
+        inside = (col >= 0) & (col < self.cols) & (row >= 0) & (row < self.rows)
+        flat = np.where(inside, row * self.cols + col, -1)
+        return flat, inside
+
+def group_reduce(keys, values):
+    """
+    Group `values` by integer `keys` with one sort.
+    Returns (unique keys, count, min, max) per group.
+    """
+    order = np.argsort(keys, kind="stable")
+    sorted_keys = keys[order]
+    sorted_values = values[order]
+    starts = np.flatnonzero(np.r_[True, sorted_keys[1:] != sorted_keys[:-1]])
+    counts = np.diff(np.r_[starts, sorted_keys.size])
+    return (
+        sorted_keys[starts],
+        counts,
+        np.minimum.reduceat(sorted_values, starts),
+        np.maximum.reduceat(sorted_values, starts),
+    )
+
+class PointGridder:
+    """
+    Accumulates per-cell lowest return, highest return and point count over chunks.
+    """
+
+    def __init__(self, grid):
+        self.grid = grid
+        n_cells = grid.rows * grid.cols
+        self.zmin = np.full(n_cells, np.inf, dtype=np.float32)
+        self.zmax = np.full(n_cells, -np.inf, dtype=np.float32)
+        self.count = np.zeros(n_cells, dtype=np.int64)
+        self.n_points = 0
+
+    def add(self, points, chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        Bin an (N, 3) array of x, y, z points, `chunk_size` points at a time.
+        Points outside the grid are ignored.
+        """
+        for start in range(0, len(points), chunk_size):
+            chunk = np.asarray(points[start:start + chunk_size])
+            flat, inside = self.grid.cell_index(chunk[:, 0], chunk[:, 1])
+            if not inside.all():
+                flat = flat[inside]
+                chunk = chunk[inside]
+            if not flat.size:
+                continue
+            cells, counts, zmin, zmax = group_reduce(flat, chunk[:, 2].astype(np.float32))
+            # Cells are unique within a chunk, so fancy assignment merges safely
+            self.zmin[cells] = np.minimum(self.zmin[cells], zmin)
+            self.zmax[cells] = np.maximum(self.zmax[cells], zmax)
+            self.count[cells] += counts
+            self.n_points += flat.size
+        return self
+
+    def add_chunks(self, chunks):
+        """
+        Bin every (N, 3) array produced by an iterable of chunks.
+        """
+        for chunk in chunks:
+            self.add(chunk)
+        return self
+
+    def grids(self):
+        """
+        Return (zmin, zmax, count) as 2-D grids, NaN where a cell has no returns.
+        """
+        empty = self.count == 0
+        zmin = np.where(empty, np.nan, self.zmin).reshape(self.grid.shape)
+        zmax = np.where(empty, np.nan, self.zmax).reshape(self.grid.shape)
+        return zmin, zmax, self.count.reshape(self.grid.shape)
+
+def fill_nearest(values):
+    """
+    Replace NaN cells with the value of the nearest non-NaN cell.
+    """
+    missing = np.isnan(values)
+    if not missing.any() or missing.all():
+        return values.copy()
+    indices = ndimage.distance_transform_edt(missing, return_distances=False, return_indices=True)
+    return values[tuple(indices)]
+
+def ground_surface(zmin, cell_size, ground_window=5.0, noise_window=3):
+    """
+    Estimate a DTM from per-cell lowest returns.
+    `ground_window` (m) must be wider than the largest above-ground object,
+    e.g. a few crop rows; `noise_window` (cells) removes isolated low outliers.
+    """
+    surface = fill_nearest(zmin)
+    if noise_window > 1:
+        surface = ndimage.median_filter(surface, size=noise_window, mode="nearest")
+    window = max(1, int(round(ground_window / cell_size)))
+    if window > 1:
+        surface = ndimage.grey_opening(surface, size=(window, window), mode="nearest")
+    return surface
+
+def surface_models(gridder, ground_window=5.0, noise_window=3):
+    """
+    Derive DTM, DSM, CHM and per-cell canopy volume from a filled PointGridder.
+    Returns a dict of 2-D float32 grids plus the grid spec and point counts.
+    """
+    grid = gridder.grid
+    zmin, dsm, count = gridder.grids()
+    dtm = ground_surface(zmin, grid.cell_size, ground_window, noise_window)
+
+    chm = dsm - dtm
+    np.maximum(chm, 0, out=chm, where=~np.isnan(chm))
+    volume = np.where(np.isnan(chm), 0, chm) * grid.cell_area
+
+    return {
+        "grid": grid,
+        "count": count,
+        "dtm": dtm.astype(np.float32),
+        "dsm": dsm.astype(np.float32),
+        "chm": chm.astype(np.float32),
+        "volume": volume.astype(np.float32),
+    }
+
+def classify_ground(points, dtm, grid, height_threshold=0.15, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Return a boolean mask of points within `height_threshold` metres of the DTM.
+    Points outside the grid are never ground.
+    """
+    mask = np.zeros(len(points), dtype=bool)
+    surface = dtm.ravel()
+    for start in range(0, len(points), chunk_size):
+        chunk = np.asarray(points[start:start + chunk_size])
+        flat, inside = grid.cell_index(chunk[:, 0], chunk[:, 1])
+        height = chunk[inside, 2] - surface[flat[inside]]
+        mask[start:start + len(chunk)][inside] = height <= height_threshold
+    return mask
+
+def process_point_cloud(points, cell_size=0.5, grid=None, ground_window=5.0,
+                        chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Run the full chain on an (N, 3) point array (or memory-mapped array).
+    Returns the surface_models() dict with a "total_volume" entry (m^3).
+    """
+    if grid is None:
+        grid = GridSpec.for_points(points, cell_size)
+    gridder = PointGridder(grid).add(points, chunk_size=chunk_size)
+    products = surface_models(gridder, ground_window=ground_window)
+    products["total_volume"] = float(products["volume"].sum(dtype=np.float64))
+    return products
+
+def synthetic_sugarcane_cloud(n_points, width=100.0, length=100.0, row_spacing=1.5,
+                              canopy_height=3.0, ground_fraction=0.2, seed=42):
+    """
+    Generate an (N, 3) synthetic sugarcane point cloud: gently sloping terrain with
+    crop rows along y, a ground-return fraction reaching the soil and canopy
+    returns spread through the upper part of the cane.
+    """
+    rng = np.random.default_rng(seed)
+    x = rng.uniform(0, width, n_points)
+    y = rng.uniform(0, length, n_points)
+    terrain = 0.02 * x + 0.5 * np.sin(y / 20.0)
+
+    # Canopy is tallest over the row centres and thins out between rows
+    row_offset = np.abs(((x / row_spacing) % 1.0) - 0.5) * 2
+    top = canopy_height * (1 - 0.3 * row_offset)
+    height = top * rng.uniform(0.6, 1.0, n_points)
+    height[rng.random(n_points) < ground_fraction] = 0.0
+
+    z = terrain + height + rng.normal(0, 0.03, n_points)
+    return np.column_stack([x, y, z])
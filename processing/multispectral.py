@@ -0,0 +1,203 @@
+"""
+Chunked multispectral raster ingestion and vegetation index computation.
+
+Band rasters are read from local files through memory mapping, one window at
+a time. The requested indices are evaluated together by one compiled band-math
+plan (see processing.band_math), which works in preallocated float32 scratch
+tiles and writes straight into the mapped outputs. Mappings are closed as soon
+as a window is done, so peak memory depends on the window size and not on the
+size of the orthomosaic.
+
+Supported inputs are `.npy` files, uncompressed (contiguous) TIFFs and raw
+headerless binaries with an explicit shape and dtype. Outputs are `.npy` files.
+
+Example:
+    python -m processing.multispectral --band nir=nir.npy --band red=red.npy \\
+        --band red_edge=re.npy --index ndvi --index ndre --out indices/
+"""
+
+import argparse
+import os
+
+import numpy as np
+
+from processing.band_math import INDEX_EXPRESSIONS, compile_indices
+
+# Band order of a typical 5-band agricultural multispectral sensor
+BAND_NAMES = ("blue", "green", "red", "red_edge", "nir")
+
+# Default processing window (rows x columns); 1024 x 1024 float32 tiles are 4 MB
+DEFAULT_WINDOW = (1024, 1024)
+
+class BandRaster:
+    """
+    A single-band, row-major raster on disk, opened lazily one strip at a time.
+    """
+
+    def __init__(self, path, shape, dtype, offset=0):
+        self.path = os.fspath(path)
+        self.shape = tuple(int(size) for size in shape)
+        self.dtype = np.dtype(dtype)
+        self.offset = int(offset)
+
+    @classmethod
+    def open(cls, path, shape=None, dtype=None):
+        """
+        Describe a band file. `.npy` and TIFF headers are parsed; raw files need
+        `shape` and `dtype`.
+        """
+        path = os.fspath(path)
+        extension = os.path.splitext(path)[1].lower()
+        if extension == ".npy":
+            return cls._open_npy(path)
+        if extension in (".tif", ".tiff"):
+            return cls._open_tiff(path)
+        if shape is None or dtype is None:
+            raise ValueError(f"Raw raster {path} needs an explicit shape and dtype")
+        return cls(path, shape, dtype)
+
+    @classmethod
+    def _open_npy(cls, path):
+        with open(path, "rb") as f:
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+            else:
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+            offset = f.tell()
+        if fortran_order or len(shape) != 2:
+            raise ValueError(f"{path} must hold a 2-D C-ordered band")
+        return cls(path, shape, dtype, offset)
+
+    @classmethod
+    def _open_tiff(cls, path):
+        try:
+            import tifffile
+        except ImportError:
+            raise ImportError("Reading TIFF bands requires the tifffile package") from None
+        with tifffile.TiffFile(path) as tif:
+            page = tif.pages[0]
+            offset = page.dataoffsets[0] if page.is_contiguous else None
+            if offset is None or page.compression != 1 or len(page.shape) != 2:
+                raise ValueError(f"{path} must be an uncompressed, contiguous single-band TIFF")
+            return cls(path, page.shape, page.dtype, offset)
+
+    def read_strip(self, row_start, row_stop):
+        """
+        Memory-map rows [row_start, row_stop) of the band.
+        Drop the returned array when done to release the mapping.
+        """
+        row_bytes = self.shape[1] * self.dtype.itemsize
+        return np.memmap(
+            self.path, dtype=self.dtype, mode="r",
+            offset=self.offset + row_start * row_bytes,
+            shape=(row_stop - row_start, self.shape[1]),
+        )
+
+def create_output(path, shape, dtype=np.float32):
+    """
+    Create an empty `.npy` output raster on disk and return its BandRaster.
+    """
+    array = np.lib.format.open_memmap(path, mode="w+", dtype=dtype, shape=tuple(shape))
+    offset = array.offset
+    del array
+    return BandRaster(path, shape, dtype, offset)
+
+def write_strip(raster, row_start, row_stop):
+    """
+    Memory-map rows [row_start, row_stop) of an output raster for writing.
+    """
+    row_bytes = raster.shape[1] * raster.dtype.itemsize
+    return np.memmap(
+        raster.path, dtype=raster.dtype, mode="r+",
+        offset=raster.offset + row_start * row_bytes,
+        shape=(row_stop - row_start, raster.shape[1]),
+    )
+
+def iter_windows(shape, window=DEFAULT_WINDOW):
+    """
+    Yield (row slice, column slice) pairs tiling a raster of `shape`.
+    """
+    rows, cols = shape
+    window_rows, window_cols = window
+    for row in range(0, rows, window_rows):
+        for col in range(0, cols, window_cols):
+            yield slice(row, min(row + window_rows, rows)), slice(col, min(col + window_cols, cols))
+
+def check_band_shapes(bands):
+    """
+    Return the common shape of a dict of BandRasters, raising if they differ.
+    """
+    shapes = {raster.shape for raster in bands.values()}
+    if len(shapes) != 1:
+        raise ValueError(f"Band rasters differ in shape: {sorted(shapes)}")
+    return shapes.pop()
+
+def compute_indices(bands, indices, outputs, window=DEFAULT_WINDOW):
+    """
+    Compute vegetation indices window by window with one compiled band-math plan.
+
+    bands:   dict of band name -> BandRaster.
+    indices: index names from INDEX_EXPRESSIONS, or a dict of name -> expression.
+    outputs: dict of index name -> output BandRaster (float32, same shape).
+    Returns the number of pixels processed per index.
+    """
+    shape = check_band_shapes(bands)
+    plan = compile_indices(indices)
+    missing = [band for band in plan.bands if band not in bands]
+    if missing:
+        raise ValueError(f"Missing bands for {plan.indices}: {missing}")
+
+    for rows, cols in iter_windows(shape, window):
+        # Map only this window's rows; only the window's columns are paged in.
+        # The plan reads the mapped bands directly and writes into the output maps.
+        strips = {band: bands[band].read_strip(rows.start, rows.stop) for band in plan.bands}
+        targets = {index: write_strip(outputs[index], rows.start, rows.stop) for index in plan.indices}
+        plan.evaluate(
+            {band: strip[:, cols] for band, strip in strips.items()},
+            out={index: target[:, cols] for index, target in targets.items()},
+        )
+
+        # Flush and unmap before the next window, keeping resident memory bounded
+        for target in targets.values():
+            target.flush()
+        del strips, targets
+
+    return shape[0] * shape[1]
+
+def process_rasters(band_paths, indices, output_dir, window=DEFAULT_WINDOW):
+    """
+    Open band files, compute `indices` and write one `<index>.npy` per index.
+    Returns a dict of index name -> output path.
+    """
+    bands = {band: BandRaster.open(path) for band, path in band_paths.items()}
+    shape = check_band_shapes(bands)
+    os.makedirs(output_dir, exist_ok=True)
+    outputs = {
+        index: create_output(os.path.join(output_dir, f"{index}.npy"), shape)
+        for index in list(indices)
+    }
+    compute_indices(bands, indices, outputs, window)
+    return {index: raster.path for index, raster in outputs.items()}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compute vegetation indices from band rasters in fixed-size windows.")
+    parser.add_argument("--band", action="append", required=True, metavar="NAME=PATH",
+                        help=f"band raster, NAME one of {', '.join(BAND_NAMES)}")
+    parser.add_argument("--index", action="append", default=[], choices=sorted(INDEX_EXPRESSIONS))
+    parser.add_argument("--expr", action="append", default=[], metavar="NAME=EXPRESSION",
+                        help='custom band-math index, e.g. "ndwi=(green - nir) / (green + nir)"')
+    parser.add_argument("--out", required=True, help="output directory")
+    parser.add_argument("--window", type=int, nargs=2, default=DEFAULT_WINDOW, metavar=("ROWS", "COLS"))
+    args = parser.parse_args(argv)
+
+    band_paths = dict(item.split("=", 1) for item in args.band)
+    indices = {index: INDEX_EXPRESSIONS[index] for index in args.index}
+    indices.update(item.split("=", 1) for item in args.expr)
+    if not indices:
+        parser.error("at least one --index or --expr is required")
+    for index, path in process_rasters(band_paths, indices, args.out, tuple(args.window)).items():
+        print(f"{index}: {path}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,396 @@
+"""
+Orthomosaic assembly from overlapping UAV frames.
+
+Frames are `.npy` rasters (rows x columns, optionally x bands) with the GPS
+position of their centre in projected metres and the survey's ground sample
+distance. Assembly runs in four stages:
+
+- features: ORB (or AKAZE) keypoints and descriptors per frame;
+- matching: only pairs of frames whose GPS positions are close (the
+  neighbour graph, at most `max_neighbours` per frame) are matched, and a
+  RANSAC similarity transform (or full homography) is fitted to each pair;
+- placement: the best-matched pairs form a spanning tree per connected group
+  of frames; chaining transforms along the tree places every frame in the
+  group, and a similarity fit aligns the group with its GPS positions. Frames without
+  usable matches are placed by GPS alone;
+- blending: the mosaic is written tile by tile into an `.npy` file. Each tile
+  warps only the frames that overlap it and feathers them by distance to the
+  frame edge, so memory depends on the tile size, not the mosaic size.
+
+Features, matching and blending are spread over a process pool; workers read
+frames through memory mapping.
+
+Example:
+    python -m processing.orthomosaic --frames frames/*.npy --positions positions.csv \\
+        --gsd 0.05 --out mosaic.npy --workers 4
+"""
+
+import argparse
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components, minimum_spanning_tree
+from scipy.spatial import cKDTree
+
+# Output tile edge (pixels); a 1024 x 1024 float32 accumulator per band is 4 MB
+DEFAULT_TILE_SIZE = 1024
+
+DEFAULT_MAX_FEATURES = 2000
+DEFAULT_MAX_NEIGHBOURS = 8
+
+# Lowe's ratio test and RANSAC reprojection threshold (pixels)
+MATCH_RATIO = 0.75
+RANSAC_THRESHOLD = 3.0
+MIN_INLIERS = 20
+
+def create_detector(detector="orb", max_features=DEFAULT_MAX_FEATURES):
+    """
+    Return an OpenCV feature detector and the norm its descriptors match under.
+    """
+    if detector == "orb":
+        return cv2.ORB_create(nfeatures=max_features), cv2.NORM_HAMMING
+    if detector == "akaze":
+        if not hasattr(cv2, "AKAZE_create"):
+            raise ImportError("AKAZE is not available in this OpenCV build")
+        return cv2.AKAZE_create(), cv2.NORM_HAMMING
+    raise ValueError(f"Unknown feature detector {detector!r}")
+
+def to_uint8(band):
+    """
+    Scale one band to uint8 for feature detection.
+    """
+    band = np.asarray(band)
+    if band.dtype == np.uint8:
+        return band
+    low, high = np.percentile(band, (1, 99))
+    scale = 255.0 / (high - low) if high > low else 1.0
+    return np.clip((band - low) * scale, 0, 255).astype(np.uint8)
+
+def neighbour_pairs(positions, radius, max_neighbours=DEFAULT_MAX_NEIGHBOURS):
+    """
+    Return (P, 2) frame index pairs (i < j) whose GPS positions are within
+    `radius` metres, keeping each frame's `max_neighbours` nearest.
+    """
+    positions = np.asarray(positions, dtype=np.float64)
+    k = min(max_neighbours + 1, len(positions))
+    distances, neighbours = cKDTree(positions).query(positions, k=k, distance_upper_bound=radius)
+    distances, neighbours = distances.reshape(len(positions), k), neighbours.reshape(len(positions), k)
+    frame = np.repeat(np.arange(len(positions)), k).reshape(-1, k)
+    keep = np.isfinite(distances) & (neighbours != frame)
+    pairs = np.sort(np.column_stack([frame[keep], neighbours[keep]]), axis=1)
+    return np.unique(pairs, axis=0).reshape(-1, 2)
+
+# Per-worker state, set by _init_worker (or in-process when workers <= 1)
+_WORKER = {}
+
+def _init_worker(state):
+    cv2.setNumThreads(1)
+    _WORKER.clear()
+    _WORKER.update(state)
+
+def _run(func, tasks, workers, state):
+    """
+    Map `func` over `tasks` in a process pool, or in this process when workers <= 1.
+    """
+    if workers <= 1:
+        _init_worker(state)
+        try:
+            return [func(task) for task in tasks]
+        finally:
+            _WORKER.clear()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(state,)) as pool:
+        return list(pool.map(func, tasks, chunksize=max(1, len(tasks) // (4 * workers))))
+
+def _detect(path):
+    frame = np.load(path, mmap_mode="r")
+    band = frame if frame.ndim == 2 else frame[..., _WORKER["feature_band"]]
+    detector, _ = create_detector(_WORKER["detector"], _WORKER["max_features"])
+    keypoints, descriptors = detector.detectAndCompute(to_uint8(band), None)
+    points = np.array([keypoint.pt for keypoint in keypoints], dtype=np.float32).reshape(-1, 2)
+    return points, descriptors
+
+def _match(pair):
+    """
+    Fit the transform taking frame j's pixels to frame i's; returns (3x3 H, inliers).
+    """
+    i, j = pair
+    (points_i, descriptors_i), (points_j, descriptors_j) = _WORKER["features"][i], _WORKER["features"][j]
+    if descriptors_i is None or descriptors_j is None or len(points_i) < 2 or len(points_j) < 2:
+        return None, 0
+    # Binary descriptors: approximate neighbours from an LSH index are about
+    # three times faster than brute-force Hamming matching
+    matcher = cv2.FlannBasedMatcher(dict(algorithm=6, table_number=6, key_size=12, multi_probe_level=1),
+                                    dict(checks=50))
+    matches = matcher.knnMatch(descriptors_i, descriptors_j, k=2)
+    good = [m[0] for m in matches if len(m) == 2 and m[0].distance < MATCH_RATIO * m[1].distance]
+    if len(good) < MIN_INLIERS:
+        return None, 0
+    source = points_j[[m.trainIdx for m in good]]
+    target = points_i[[m.queryIdx for m in good]]
+    if _WORKER["motion"] == "homography":
+        H, mask = cv2.findHomography(source, target, cv2.RANSAC, RANSAC_THRESHOLD)
+    else:
+        affine, mask = cv2.estimateAffinePartial2D(source, target, method=cv2.RANSAC,
+                                                   ransacReprojThreshold=RANSAC_THRESHOLD)
+        H = np.vstack([affine, [0.0, 0.0, 1.0]]) if affine is not None else None
+    inliers = int(mask.sum()) if mask is not None else 0
+    # Reject degenerate fits: frames from one flight differ by little scale
+    if H is None or inliers < MIN_INLIERS or not 0.5 < abs(np.linalg.det(H[:2, :2])) < 2.0:
+        return None, 0
+    return H, inliers
+
+def _translation(dx, dy):
+    return np.array([[1.0, 0.0, dx], [0.0, 1.0, dy], [0.0, 0.0, 1.0]])
+
+def fit_similarity(source, target):
+    """
+    Return the 3x3 least-squares similarity (rotation, uniform scale, shift)
+    taking (N, 2) `source` points onto `target`; a pure shift for N < 3.
+    """
+    source_mean, target_mean = source.mean(axis=0), target.mean(axis=0)
+    if len(source) < 3:
+        return _translation(*(target_mean - source_mean))
+    # Umeyama: SVD of the cross-covariance, without reflections
+    a, b = source - source_mean, target - target_mean
+    u, sigma, vt = np.linalg.svd(b.T @ a)
+    sign = np.sign(np.linalg.det(u @ vt))
+    rotation = u @ np.diag([1.0, sign]) @ vt
+    scale = (sigma * [1.0, sign]).sum() / (a ** 2).sum()
+    transform = np.eye(3)
+    transform[:2, :2] = scale * rotation
+    transform[:2, 2] = target_mean - scale * rotation @ source_mean
+    return transform
+
+def place_frames(shapes, positions, gsd, pairs, homographies, inliers):
+    """
+    Place frames in mosaic pixel coordinates.
+
+    shapes:       (rows, cols) per frame
+    positions:    (N, 2) GPS centres (m); mosaic rows run north to south
+    pairs:        (P, 2) matched frame pairs with `homographies[p]` taking
+                  frame j's pixels to frame i's and `inliers[p]` RANSAC inliers
+    Returns (N, 3, 3) transforms from frame pixels to mosaic pixels and the
+    component label of each frame (frames placed by GPS alone are their own
+    component).
+    """
+    n = len(shapes)
+    positions = np.asarray(positions, dtype=np.float64)
+    gps_pixels = np.column_stack([positions[:, 0], -positions[:, 1]]) / gsd
+    centres = np.array([((cols - 1) / 2, (rows - 1) / 2) for rows, cols in shapes], dtype=np.float64).reshape(-1, 2)
+
+    good = np.asarray(inliers) > 0
+    pairs = np.asarray(pairs).reshape(-1, 2)[good]
+    homographies = [H for H, keep in zip(homographies, good) if keep]
+    weights = 1.0 / np.asarray(inliers, dtype=np.float64)[good]
+    graph = coo_matrix((weights, (pairs[:, 0], pairs[:, 1])), shape=(n, n)).tocsr()
+    tree = minimum_spanning_tree(graph)
+    _, labels = connected_components(tree, directed=False)
+
+    relative = {}
+    for (i, j), H in zip(pairs.tolist(), homographies):
+        relative[i, j] = H
+        relative[j, i] = np.linalg.inv(H)
+    tree = tree + tree.T
+
+    transforms = np.empty((n, 3, 3))
+    placed = np.zeros(n, dtype=bool)
+    for root in range(n):
+        if placed[root]:
+            continue
+        # Breadth-first over the spanning tree, chaining child -> parent homographies
+        transforms[root] = np.eye(3)
+        placed[root] = True
+        members = [root]
+        queue = deque([root])
+        while queue:
+            parent = queue.popleft()
+            for child in tree.indices[tree.indptr[parent]:tree.indptr[parent + 1]].tolist():
+                if not placed[child]:
+                    transforms[child] = transforms[parent] @ relative[parent, child]
+                    placed[child] = True
+                    members.append(child)
+                    queue.append(child)
+        # Align the group with the GPS positions of its frame centres, so the
+        # mosaic does not inherit the root frame's heading
+        members = np.array(members)
+        mapped = np.einsum("nij,nj->ni", transforms[members], np.c_[centres[members], np.ones(len(members))])
+        mapped = mapped[:, :2] / mapped[:, 2:]
+        transforms[members] = fit_similarity(mapped, gps_pixels[members]) @ transforms[members]
+    return transforms, labels
+
+def frame_bounds(shapes, transforms):
+    """
+    Return (N, 4) mosaic pixel bounds (col_min, row_min, col_max, row_max) of each frame.
+    """
+    corners = np.array([
+        [[0, 0, 1], [cols, 0, 1], [cols, rows, 1], [0, rows, 1]] for rows, cols in shapes
+    ], dtype=np.float64)
+    mapped = np.einsum("nij,nkj->nki", transforms, corners)
+    mapped = mapped[..., :2] / mapped[..., 2:]
+    return np.concatenate([mapped.min(axis=1), mapped.max(axis=1)], axis=1)
+
+def _feather(shape):
+    """
+    Blend weight of a frame's pixels: distance to the nearest edge, in (0, 1].
+    """
+    rows, cols = shape
+    row = np.minimum(np.arange(rows), np.arange(rows)[::-1]) + 1
+    col = np.minimum(np.arange(cols), np.arange(cols)[::-1]) + 1
+    weight = np.minimum.outer(row, col).astype(np.float32)
+    return weight / weight.max()
+
+def _warp(image, transform, size):
+    """
+    Warp an image of any band count; cv2.warpPerspective handles at most 4 channels.
+    """
+    if image.ndim == 2 or image.shape[2] <= 4:
+        warped = cv2.warpPerspective(image, transform, size, flags=cv2.INTER_LINEAR, borderValue=0)
+        return warped.reshape(size[1], size[0], -1)
+    return np.concatenate([_warp(image[..., band:band + 4], transform, size)
+                           for band in range(0, image.shape[2], 4)], axis=2)
+
+def _blend_tile(task):
+    row, col, rows, cols, frames = task
+    state = _WORKER
+    acc = np.zeros((rows, cols, state["bands"]), dtype=np.float32)
+    total = np.zeros((rows, cols), dtype=np.float32)
+    for index in frames:
+        # Warp only into the part of the tile the frame covers
+        col_min, row_min, col_max, row_max = state["bounds"][index]
+        left, top = max(int(np.floor(col_min)) - col, 0), max(int(np.floor(row_min)) - row, 0)
+        right, bottom = min(int(np.ceil(col_max)) - col, cols), min(int(np.ceil(row_max)) - row, rows)
+        if right <= left or bottom <= top:
+            continue
+        size = (right - left, bottom - top)
+        frame = np.load(state["paths"][index], mmap_mode="r")
+        transform = _translation(-col - left, -row - top) @ state["transforms"][index]
+        feather = state["feathers"].get(frame.shape[:2])
+        if feather is None:
+            feather = state["feathers"][frame.shape[:2]] = _feather(frame.shape[:2])
+        weight = _warp(feather, transform, size)[..., 0]
+        warped = _warp(np.ascontiguousarray(frame), transform, size)
+        acc[top:bottom, left:right] += warped * weight[..., None]
+        total[top:bottom, left:right] += weight
+    np.divide(acc, total[..., None], out=acc, where=total[..., None] > 0)
+
+    mosaic = np.load(state["out_path"], mmap_mode="r+")
+    target = mosaic[row:row + rows, col:col + cols]
+    if np.issubdtype(mosaic.dtype, np.integer):
+        info = np.iinfo(mosaic.dtype)
+        np.clip(np.rint(acc), info.min, info.max, out=acc)
+    target[...] = acc.reshape(target.shape)
+    mosaic.flush()
+    del mosaic, target
+    return rows * cols
+
+def build_orthomosaic(frame_paths, positions, gsd, out_path, workers=1, detector="orb", motion="similarity",
+                      max_features=DEFAULT_MAX_FEATURES, max_neighbours=DEFAULT_MAX_NEIGHBOURS,
+                      neighbour_radius=None, feature_band=0, tile_size=DEFAULT_TILE_SIZE):
+    """
+    Assemble frames into an orthomosaic written to `out_path` (`.npy`).
+
+    frame_paths:      `.npy` frames of equal dtype and band count
+    positions:        (N, 2) GPS centre of each frame (projected metres)
+    gsd:              ground sample distance (m per pixel)
+    motion:           "similarity" (rotation, scale and shift; nadir frames over
+                      flat fields) or "homography" (full perspective, which
+                      drifts more when chained across many frames)
+    neighbour_radius: GPS distance (m) within which frames are matched;
+                      default 80% of the largest frame footprint
+    Returns a dict with the mosaic path and shape, the (N, 3, 3) frame
+    transforms, the matched pairs with their inlier counts, the number of
+    frames placed by matching, and per-stage timings and counts.
+    """
+    frame_paths = [os.fspath(path) for path in frame_paths]
+    positions = np.asarray(positions, dtype=np.float64).reshape(-1, 2)
+    if len(frame_paths) != len(positions):
+        raise ValueError(f"{len(frame_paths)} frames but {len(positions)} positions")
+    headers = [np.load(path, mmap_mode="r") for path in frame_paths]
+    shapes = [header.shape[:2] for header in headers]
+    bands = {1 if header.ndim == 2 else header.shape[2] for header in headers}
+    dtypes = {header.dtype for header in headers}
+    if len(bands) != 1 or len(dtypes) != 1:
+        raise ValueError("Frames must share one dtype and band count")
+    del headers
+    if neighbour_radius is None:
+        neighbour_radius = 0.8 * max(max(shape) for shape in shapes) * gsd
+
+    timings = {}
+    if motion not in ("similarity", "homography"):
+        raise ValueError(f"Unknown motion model {motion!r}")
+    state = {"detector": detector, "max_features": max_features, "feature_band": feature_band, "motion": motion}
+    began = time.perf_counter()
+    features = _run(_detect, frame_paths, workers, state)
+    timings["features_s"] = time.perf_counter() - began
+
+    began = time.perf_counter()
+    pairs = neighbour_pairs(positions, neighbour_radius, max_neighbours)
+    matched = _run(_match, [tuple(pair) for pair in pairs.tolist()], workers, dict(state, features=features))
+    homographies = [H for H, _ in matched]
+    inliers = np.array([count for _, count in matched], dtype=np.int64)
+    timings["matching_s"] = time.perf_counter() - began
+    del features
+
+    transforms, labels = place_frames(shapes, positions, gsd, pairs, homographies, inliers)
+    bounds = frame_bounds(shapes, transforms)
+    origin = np.floor(bounds[:, :2].min(axis=0))
+    transforms = _translation(*-origin) @ transforms
+    bounds -= np.r_[origin, origin]
+    width, height = np.ceil(bounds[:, 2:].max(axis=0)).astype(np.int64)
+    band_count = bands.pop()
+    shape = (int(height), int(width)) if band_count == 1 else (int(height), int(width), band_count)
+    mosaic = np.lib.format.open_memmap(out_path, mode="w+", dtype=dtypes.pop(), shape=shape)
+    del mosaic
+
+    # One task per output tile, listing the frames whose bounds overlap it
+    tasks = []
+    for row in range(0, shape[0], tile_size):
+        for col in range(0, shape[1], tile_size):
+            rows, cols = min(tile_size, shape[0] - row), min(tile_size, shape[1] - col)
+            overlaps = ((bounds[:, 0] < col + cols) & (bounds[:, 2] > col)
+                        & (bounds[:, 1] < row + rows) & (bounds[:, 3] > row))
+            tasks.append((row, col, rows, cols, np.flatnonzero(overlaps).tolist()))
+    began = time.perf_counter()
+    _run(_blend_tile, tasks, workers, {
+        "paths": frame_paths, "transforms": transforms, "bounds": bounds, "bands": band_count,
+        "out_path": os.fspath(out_path), "feathers": {},
+    })
+    timings["blending_s"] = time.perf_counter() - began
+
+    component_sizes = np.bincount(labels)
+    return {
+        "path": os.fspath(out_path),
+        "shape": shape,
+        "transforms": transforms,
+        "pairs": pairs,
+        "inliers": inliers,
+        "registered": int((component_sizes[labels] > 1).sum()),
+        "tiles": len(tasks),
+        **timings,
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Assemble overlapping UAV frames into a tiled orthomosaic.")
+    parser.add_argument("--frames", nargs="+", required=True, help="frame .npy files")
+    parser.add_argument("--positions", required=True, help="CSV of x,y frame centres (m), one row per frame")
+    parser.add_argument("--gsd", type=float, required=True, help="ground sample distance (m per pixel)")
+    parser.add_argument("--out", required=True, help="output .npy mosaic")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--detector", choices=("orb", "akaze"), default="orb")
+    parser.add_argument("--motion", choices=("similarity", "homography"), default="similarity")
+    parser.add_argument("--tile-size", type=int, default=DEFAULT_TILE_SIZE)
+    args = parser.parse_args(argv)
+
+    positions = np.loadtxt(args.positions, delimiter=",", ndmin=2)
+    result = build_orthomosaic(args.frames, positions, args.gsd, args.out, workers=args.workers,
+                               detector=args.detector, motion=args.motion, tile_size=args.tile_size)
+    print(f"{result['path']}: {result['shape']}, {result['registered']}/{len(args.frames)} frames registered "
+          f"from {int((result['inliers'] > 0).sum())}/{len(result['pairs'])} matched pairs")
+
+if __name__ == "__main__":
+    main()
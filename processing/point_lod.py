@@ -0,0 +1,259 @@
+"""
+Level-of-detail voxel decimation for interactive point-cloud views.
+
+A browser can only draw a few tens of thousands of 3-D markers smoothly, so
+clouds are thinned on the server before plotting. Points are reduced onto a
+voxel pyramid: level 0 uses `base_voxel` cubes and each further level is 1.33
+to 1.5 times coarser, down to a few thousand points. Every voxel keeps its
+highest return (the canopy top, which is what the view needs to show), the
+number of points it stands for and their mean intensity.
+
+Level 0 is built chunk by chunk with sort-based grouping, as in
+processing.lidar, and coarser levels are reduced from a finer level whose
+voxels tile them exactly, so the full cloud is read only once. A view then
+takes the finest level within a point budget, which keeps the figure payload
+and render time roughly constant whatever the size of the cloud.
+
+Pyramids are cached per cloud in LOD_CACHE, keyed by the caller (a file path
+and modification time, or the parameters of a synthetic cloud).
+"""
+
+import numpy as np
+
+from data.cache import ColumnarCache
+
+# Voxel edge at the finest level (m); 5 cm resolves individual stalks
+DEFAULT_BASE_VOXEL = 0.05
+
+# Coarsening stops once a level has no more than this many points
+MIN_LEVEL_POINTS = 2_000
+
+# Default chunk of points reduced at a time
+DEFAULT_CHUNK_SIZE = 5_000_000
+
+# Voxel indices are packed into one int64 key, 21 bits per axis
+_AXIS_BITS = 21
+_AXIS_MASK = (1 << _AXIS_BITS) - 1
+
+# Pyramids for the most recently viewed clouds
+LOD_CACHE = ColumnarCache(maxsize=8)
+
+_COLUMNS = ("key", "x", "y", "z", "intensity_sum", "count")
+
+def pack_voxel_index(ix, iy, iz):
+    """
+    Pack non-negative integer voxel coordinates into int64 keys.
+    """
+    return (np.asarray(ix, dtype=np.int64) << (2 * _AXIS_BITS)) | (np.asarray(iy, dtype=np.int64) << _AXIS_BITS) | iz
+
+def unpack_voxel_keys(keys):
+    """
+    Split int64 voxel keys back into (ix, iy, iz).
+    """
+    return keys >> (2 * _AXIS_BITS), (keys >> _AXIS_BITS) & _AXIS_MASK, keys & _AXIS_MASK
+
+def voxel_keys(x, y, z, origin, voxel_size):
+    """
+    Return int64 voxel keys for coordinates relative to `origin` (the cloud minimum).
+    """
+    ix = np.floor((np.asarray(x) - origin[0]) / voxel_size).astype(np.int64)
+    iy = np.floor((np.asarray(y) - origin[1]) / voxel_size).astype(np.int64)
+    iz = np.floor((np.asarray(z) - origin[2]) / voxel_size).astype(np.int64)
+    for index in (ix, iy, iz):
+        if index.size and (index.min() < 0 or index.max() > _AXIS_MASK):
+            raise ValueError("Points lie outside the voxel grid; check the origin and voxel size")
+    return pack_voxel_index(ix, iy, iz)
+
+def coarsen_keys(keys, factor):
+    """
+    Map voxel keys to the keys of the enclosing voxels `factor` times larger.
+    """
+    ix, iy, iz = unpack_voxel_keys(keys)
+    return pack_voxel_index(ix // factor, iy // factor, iz // factor)
+
+def level_multiplier(level):
+    """
+    Voxel size of `level` in base voxels: 1, 2, 3, 4, 6, 8, 12, 16, ...
+    Levels grow by x1.5 and x1.33 in turn, and level k nests exactly in level k + 2.
+    """
+    if level == 0:
+        return 1
+    if level % 2:
+        return 2 ** ((level + 1) // 2)
+    return 3 * 2 ** ((level - 2) // 2)
+
+def _parent_level(level):
+    # The finer level whose voxels tile this one exactly
+    return level - 2 if level >= 3 else 0
+
+def reduce_voxels(voxels):
+    """
+    Merge rows sharing a voxel key with one sort: keep the highest point and
+    sum point counts and intensities. `voxels` is a dict of the _COLUMNS arrays.
+    """
+    keys = voxels["key"]
+    order = np.argsort(keys)
+    sorted_keys = keys[order]
+    starts = np.flatnonzero(np.r_[True, sorted_keys[1:] != sorted_keys[:-1]])
+    z = voxels["z"][order]
+    zmax = np.maximum.reduceat(z, starts)
+
+    # The highest point of each group is its first row reaching the group maximum
+    group = np.repeat(np.arange(starts.size), np.diff(np.r_[starts, z.size]))
+    candidates = np.flatnonzero(z == zmax[group])
+    first = candidates[np.r_[True, group[candidates][1:] != group[candidates][:-1]]]
+    top = order[first]
+    return {
+        "key": sorted_keys[starts],
+        "x": voxels["x"][top],
+        "y": voxels["y"][top],
+        "z": zmax,
+        "intensity_sum": np.add.reduceat(voxels["intensity_sum"][order], starts),
+        "count": np.add.reduceat(voxels["count"][order], starts),
+    }
+
+class PointCloudLOD:
+    """
+    A voxel pyramid over one point cloud; level k has voxels of base_voxel * level_multiplier(k).
+    """
+
+    def __init__(self, levels, origin, base_voxel):
+        self.levels = levels
+        self.origin = tuple(float(value) for value in origin)
+        self.base_voxel = float(base_voxel)
+
+    @classmethod
+    def build(cls, chunks, origin, base_voxel=DEFAULT_BASE_VOXEL, min_points=MIN_LEVEL_POINTS):
+        """
+        Build the pyramid from an iterable of chunks, each a dict with x, y, z
+        and optionally intensity arrays (e.g. processing.las.LasFile.iter_chunks).
+        `origin` is the (x, y, z) minimum of the whole cloud.
+        """
+        partial = []
+        for chunk in chunks:
+            x = np.asarray(chunk["x"], dtype=np.float64)
+            if not x.size:
+                continue
+            y = np.asarray(chunk["y"], dtype=np.float64)
+            z = np.asarray(chunk["z"], dtype=np.float64)
+            intensity = chunk.get("intensity")
+            partial.append(reduce_voxels({
+                "key": voxel_keys(x, y, z, origin, base_voxel),
+                "x": x,
+                "y": y,
+                "z": z,
+                "intensity_sum": (np.zeros(x.size) if intensity is None
+                                  else np.asarray(intensity, dtype=np.float64)),
+                "count": np.ones(x.size, dtype=np.int64),
+            }))
+
+        if not partial:
+            empty = {name: np.empty(0, dtype=np.int64 if name in ("key", "count") else np.float64)
+                     for name in _COLUMNS}
+            return cls([empty], origin, base_voxel)
+
+        # Voxels may straddle chunks, so merge the per-chunk reductions once more
+        level = reduce_voxels({name: np.concatenate([p[name] for p in partial]) for name in _COLUMNS})
+        del partial
+
+        levels = [level]
+        while len(levels[-1]["key"]) > min_points:
+            index = len(levels)
+            parent = _parent_level(index)
+            factor = level_multiplier(index) // level_multiplier(parent)
+            coarser = reduce_voxels(dict(levels[parent], key=coarsen_keys(levels[parent]["key"], factor)))
+            if len(coarser["key"]) == len(levels[-1]["key"]):
+                break
+            levels.append(coarser)
+        return cls(levels, origin, base_voxel)
+
+    @classmethod
+    def from_points(cls, points, intensity=None, base_voxel=DEFAULT_BASE_VOXEL,
+                    chunk_size=DEFAULT_CHUNK_SIZE, min_points=MIN_LEVEL_POINTS):
+        """
+        Build the pyramid from an (N, 3) point array and optional intensities.
+        """
+        origin = points.min(axis=0) if len(points) else np.zeros(3)
+
+        def chunks():
+            for start in range(0, len(points), chunk_size):
+                chunk = np.asarray(points[start:start + chunk_size])
+                yield {
+                    "x": chunk[:, 0],
+                    "y": chunk[:, 1],
+                    "z": chunk[:, 2],
+                    "intensity": None if intensity is None else intensity[start:start + chunk_size],
+                }
+
+        return cls.build(chunks(), origin, base_voxel, min_points)
+
+    @classmethod
+    def from_las(cls, las, base_voxel=DEFAULT_BASE_VOXEL, chunk_size=DEFAULT_CHUNK_SIZE,
+                 min_points=MIN_LEVEL_POINTS):
+        """
+        Build the pyramid from a processing.las.LasFile, streaming its records.
+        """
+        chunks = las.iter_chunks(("x", "y", "z", "intensity"), chunk_size=chunk_size)
+        return cls.build(chunks, las.header["min"], base_voxel, min_points)
+
+    @property
+    def n_points(self):
+        """
+        Points per level, finest first.
+        """
+        return [len(level["key"]) for level in self.levels]
+
+    def voxel_size(self, level):
+        return self.base_voxel * level_multiplier(level)
+
+    def level_for_budget(self, budget):
+        """
+        Return the finest level with at most `budget` points (the coarsest if none fits).
+        """
+        for index, n_points in enumerate(self.n_points):
+            if n_points <= budget:
+                return index
+        return len(self.levels) - 1
+
+    def view(self, budget):
+        """
+        Return the points of the level chosen for `budget` as a dict of x, y, z,
+        intensity (mean per voxel), count, plus the level and its voxel size.
+        """
+        index = self.level_for_budget(budget)
+        level = self.levels[index]
+        return {
+            "x": level["x"],
+            "y": level["y"],
+            "z": level["z"],
+            "intensity": (level["intensity_sum"] / level["count"]).astype(np.float32),
+            "count": level["count"],
+            "level": index,
+            "voxel_size": self.voxel_size(index),
+        }
+
+    def to_columns(self):
+        """
+        Flatten the pyramid into a dict of arrays for LOD_CACHE.
+        """
+        columns = {"origin": np.asarray(self.origin), "base_voxel": np.asarray(self.base_voxel)}
+        for index, level in enumerate(self.levels):
+            for name in _COLUMNS:
+                columns[f"{index}/{name}"] = level[name]
+        return columns
+
+    @classmethod
+    def from_columns(cls, columns):
+        """
+        Rebuild a pyramid from to_columns() output.
+        """
+        n_levels = sum(1 for name in columns if name.endswith("/key"))
+        levels = [{name: columns[f"{index}/{name}"] for name in _COLUMNS} for index in range(n_levels)]
+        return cls(levels, columns["origin"], columns["base_voxel"])
+
+def cached_lod(key, builder):
+    """
+    Return the pyramid cached under `key`, calling `builder()` (returning a
+    PointCloudLOD) to build it on a miss.
+    """
+    return PointCloudLOD.from_columns(LOD_CACHE.get(key, lambda: builder().to_columns()))
@@ -0,0 +1,274 @@
+"""
+Radiometric calibration of raw multispectral frames to surface reflectance.
+
+Raw digital numbers (DN) depend on exposure, sensor gain and the sunlight at
+the moment of capture, so the same crop reads differently under a passing
+cloud. The calibration normalises each frame's DN by its exposure and gain,
+scales every band by a factor measured on calibration-panel captures of known
+reflectance, and corrects for the change in downwelling irradiance between
+the panel captures and the frame (from the irradiance sensor):
+
+    reflectance = (DN - black_level) / (exposure * gain) * factor[band] / irradiance[frame, band]
+
+For a batch of frames this is one multiply-add per pixel with (N, B) scales
+and offsets broadcast over (N, rows, columns, B) arrays, done in place. An
+optional per-band response LUT linearises sensors whose DN are not
+proportional to radiance.
+
+calibrate_folder() streams a folder of frames described by a `frames.csv`
+table (file, exposure, gain and one irradiance_<band> column per band) through
+the calibration in batches. A thread pool reads frames ahead of the batch
+being calibrated and writes finished frames behind it; outputs are float32
+reflectance or uint16 reflectance scaled by REFLECTANCE_SCALE.
+
+Example:
+    python -m processing.radiometry --frames flight/ --panels panels/ \\
+        --panel-reflectance 0.49 0.49 0.49 0.49 0.49 --panel-roi 200 280 280 360 \\
+        --out reflectance/ --dtype uint16 --workers 8
+"""
+
+import argparse
+import csv
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from processing.multispectral import BAND_NAMES
+
+# uint16 outputs hold reflectance x 10000 (0.0001 resolution, reflectance up to 6.5)
+REFLECTANCE_SCALE = 10_000
+
+DEFAULT_BATCH_SIZE = 8
+
+# Rows per float32 scratch strip for integer outputs; 16 rows of a 1280 x 5
+# frame are 400 KB and stay in cache
+STRIP_ROWS = 16
+
+FRAME_TABLE = "frames.csv"
+
+def read_frame(path):
+    """
+    Read one frame as a (rows, columns, bands) array from `.npy`, TIFF or PNG.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".npy":
+        frame = np.load(path)
+    elif extension in (".tif", ".tiff"):
+        try:
+            import tifffile
+        except ImportError:
+            raise ImportError("Reading TIFF frames requires the tifffile package") from None
+        frame = tifffile.imread(path)
+    elif extension == ".png":
+        import cv2
+        frame = cv2.imread(path, cv2.IMREAD_UNCHANGED)
+        if frame is None:
+            raise ValueError(f"Could not decode {path}")
+    else:
+        raise ValueError(f"Unsupported frame format: {path}")
+    return frame[..., None] if frame.ndim == 2 else frame
+
+def read_frame_table(path, bands=BAND_NAMES):
+    """
+    Read a frame table (file, exposure, gain, irradiance_<band>...).
+    Returns a dict of files (joined to the table's folder), exposure (N,),
+    gain (N,) and irradiance (N, B) arrays.
+    """
+    with open(path, newline="") as f:
+        reader = csv.DictReader(f)
+        rows = list(reader)
+    missing = {"file", "exposure", "gain", *(f"irradiance_{band}" for band in bands)} - set(reader.fieldnames or ())
+    if missing:
+        raise ValueError(f"{path} lacks columns: {sorted(missing)}")
+    folder = os.path.dirname(os.fspath(path))
+    return {
+        "files": [os.path.join(folder, row["file"]) for row in rows],
+        "exposure": np.array([float(row["exposure"]) for row in rows]),
+        "gain": np.array([float(row["gain"]) for row in rows]),
+        "irradiance": np.array(
+            [[float(row[f"irradiance_{band}"]) for band in bands] for row in rows]
+        ).reshape(-1, len(bands)),
+    }
+
+class RadiometricCalibration:
+    """
+    Per-band conversion of raw DN to reflectance for frames of known exposure,
+    gain and irradiance.
+    """
+
+    def __init__(self, factors, black_level=0.0, response_lut=None):
+        self.factors = np.asarray(factors, dtype=np.float64)
+        self.black_level = np.broadcast_to(np.asarray(black_level, dtype=np.float64), self.factors.shape)
+        self.response_lut = None if response_lut is None else np.asarray(response_lut, dtype=np.float32)
+        if self.response_lut is not None and self.response_lut.shape[0] != self.factors.size:
+            raise ValueError("The response LUT needs one row per band")
+
+    @classmethod
+    def from_panels(cls, panels, exposure, gain, irradiance, panel_reflectance, roi=None,
+                    black_level=0.0, response_lut=None):
+        """
+        Measure the per-band factors on calibration-panel captures.
+
+        panels:            (P, rows, columns, B) raw panel frames
+        exposure, gain:    (P,) per capture
+        irradiance:        (P, B) irradiance sensor readings per capture
+        panel_reflectance: (B,) known reflectance of the panel
+        roi:               (row slice, column slice) covering the panel;
+                           default the central third of the frame
+        The factor is the median over captures, so one badly lit capture does
+        not skew the calibration.
+        """
+        panels = np.asarray(panels)
+        if roi is None:
+            rows, cols = panels.shape[1:3]
+            roi = (slice(rows // 3, 2 * rows // 3), slice(cols // 3, 2 * cols // 3))
+        calibration = cls(np.ones(panels.shape[-1]), black_level, response_lut)
+        patch = calibration.linearise(panels[:, roi[0], roi[1]])
+        mean_dn = patch.reshape(len(panels), -1, panels.shape[-1]).mean(axis=1)
+        normalised = (mean_dn - calibration.black_level) / (np.asarray(exposure) * np.asarray(gain))[:, None]
+        factors = np.asarray(panel_reflectance) * np.asarray(irradiance) / normalised
+        calibration.factors = np.median(factors, axis=0)
+        return calibration
+
+    def linearise(self, frames):
+        """
+        Map DN through the response LUT (if any), band by band.
+        """
+        if self.response_lut is None:
+            return frames
+        out = np.empty(frames.shape, dtype=np.float32)
+        for band in range(frames.shape[-1]):
+            np.take(self.response_lut[band], frames[..., band], out=out[..., band])
+        return out
+
+    def scale_offset(self, exposure, gain, irradiance):
+        """
+        Return (N, B) scale and offset with reflectance = DN * scale + offset.
+        """
+        scale = self.factors / (np.asarray(irradiance) * (np.asarray(exposure) * np.asarray(gain))[:, None])
+        return scale, -self.black_level * scale
+
+    def apply(self, frames, exposure, gain, irradiance, dtype=np.float32):
+        """
+        Calibrate a (N, rows, columns, B) batch of raw frames.
+        dtype float32 returns reflectance; uint16 returns reflectance x REFLECTANCE_SCALE.
+        """
+        dtype = np.dtype(dtype)
+        scale, offset = self.scale_offset(exposure, gain, irradiance)
+        if dtype == np.uint16:
+            scale, offset = scale * REFLECTANCE_SCALE, offset * REFLECTANCE_SCALE
+        elif dtype != np.float32:
+            raise ValueError("Calibrated frames are float32 or uint16")
+        scale = scale.astype(np.float32)[:, None, None, :]
+        offset = offset.astype(np.float32)[:, None, None, :]
+        linear = self.linearise(frames)
+        out = np.empty(linear.shape, dtype=dtype)
+        if dtype == np.float32:
+            # In-place passes avoid the slow mixed-type broadcast multiply
+            np.copyto(out, linear, casting="unsafe")
+            out *= scale
+            out += offset
+            return out
+
+        # Integer output: scale a few rows at a time in a float32 scratch strip
+        # instead of holding a float32 copy of the whole batch
+        rows = linear.shape[1]
+        scratch = np.empty((STRIP_ROWS,) + linear.shape[2:], dtype=np.float32)
+        limit = np.iinfo(np.uint16).max
+        for frame in range(len(linear)):
+            for row in range(0, rows, STRIP_ROWS):
+                block = scratch[:min(STRIP_ROWS, rows - row)]
+                np.copyto(block, linear[frame, row:row + STRIP_ROWS], casting="unsafe")
+                block *= scale[frame]
+                block += offset[frame]
+                np.clip(block, 0, limit, out=block)
+                np.rint(block, out=block)
+                np.copyto(out[frame, row:row + STRIP_ROWS], block, casting="unsafe")
+        return out
+
+def _read_into(buffer, slot, path):
+    frame = read_frame(path)
+    if frame.shape != buffer.shape[1:]:
+        raise ValueError(f"{path} has shape {frame.shape}, expected {buffer.shape[1:]}")
+    buffer[slot] = frame
+
+def calibrate_folder(frame_dir, calibration, out_dir, dtype=np.float32, batch_size=DEFAULT_BATCH_SIZE,
+                     workers=4, table=FRAME_TABLE):
+    """
+    Calibrate every frame listed in `frame_dir`/`table`, writing `<name>.npy`
+    reflectance frames to `out_dir`.
+    The next batch is read while one is calibrated and the previous one is
+    written. Frames are read straight into two alternating batch buffers, so
+    memory stays at a few batches whatever the folder size.
+    Returns a dict of frames, seconds and frames_per_s.
+    """
+    frames = read_frame_table(os.path.join(frame_dir, table), bands=BAND_NAMES[:calibration.factors.size])
+    os.makedirs(out_dir, exist_ok=True)
+    n = len(frames["files"])
+    batches = [slice(start, min(start + batch_size, n)) for start in range(0, n, batch_size)]
+    began = time.perf_counter()
+    if not batches:
+        return {"frames": 0, "seconds": 0.0, "frames_per_s": 0.0}
+    first = read_frame(frames["files"][0])
+    buffers = [np.empty((batch_size,) + first.shape, dtype=first.dtype) for _ in range(2)]
+
+    def read_batch(batch, buffer):
+        return [pool.submit(_read_into, buffer, slot, path) for slot, path in enumerate(frames["files"][batch])]
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        reads = read_batch(batches[0], buffers[0])
+        writes = []
+        for index, batch in enumerate(batches):
+            for future in reads:
+                future.result()
+            raw = buffers[index % 2][:batch.stop - batch.start]
+            if index + 1 < len(batches):
+                reads = read_batch(batches[index + 1], buffers[(index + 1) % 2])
+            out = calibration.apply(raw, frames["exposure"][batch], frames["gain"][batch],
+                                    frames["irradiance"][batch], dtype=dtype)
+            for future in writes:
+                future.result()
+            names = [os.path.splitext(os.path.basename(path))[0] for path in frames["files"][batch]]
+            writes = [pool.submit(np.save, os.path.join(out_dir, f"{name}.npy"), frame)
+                      for name, frame in zip(names, out)]
+        for future in writes:
+            future.result()
+    elapsed = time.perf_counter() - began
+    return {"frames": n, "seconds": elapsed, "frames_per_s": n / elapsed if elapsed else float("inf")}
+
+def load_panel_calibration(panel_dir, panel_reflectance, roi=None, black_level=0.0, table=FRAME_TABLE):
+    """
+    Build a RadiometricCalibration from the panel captures listed in `panel_dir`/`table`.
+    """
+    bands = BAND_NAMES[:len(panel_reflectance)]
+    panels = read_frame_table(os.path.join(panel_dir, table), bands=bands)
+    captures = np.stack([read_frame(path) for path in panels["files"]])
+    return RadiometricCalibration.from_panels(captures, panels["exposure"], panels["gain"], panels["irradiance"],
+                                              panel_reflectance, roi=roi, black_level=black_level)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Calibrate raw multispectral frames to reflectance.")
+    parser.add_argument("--frames", required=True, help=f"folder of raw frames with a {FRAME_TABLE} table")
+    parser.add_argument("--panels", required=True, help=f"folder of calibration-panel captures with a {FRAME_TABLE} table")
+    parser.add_argument("--panel-reflectance", type=float, nargs="+", required=True, help="panel reflectance per band")
+    parser.add_argument("--panel-roi", type=int, nargs=4, metavar=("ROW0", "ROW1", "COL0", "COL1"))
+    parser.add_argument("--black-level", type=float, default=0.0)
+    parser.add_argument("--out", required=True, help="output folder")
+    parser.add_argument("--dtype", choices=("float32", "uint16"), default="float32")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--workers", type=int, default=4, help="threads for reading and writing frames")
+    args = parser.parse_args(argv)
+
+    roi = None
+    if args.panel_roi:
+        row0, row1, col0, col1 = args.panel_roi
+        roi = (slice(row0, row1), slice(col0, col1))
+    calibration = load_panel_calibration(args.panels, args.panel_reflectance, roi, args.black_level)
+    stats = calibrate_folder(args.frames, calibration, args.out, dtype=args.dtype, batch_size=args.batch_size,
+                             workers=args.workers)
+    print(f"{stats['frames']} frames in {stats['seconds']:.2f} s ({stats['frames_per_s']:.1f} frames/s)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,366 @@
+"""
+Tiled spatial index for neighbourhood queries over LiDAR point clouds.
+
+Row detection, stem counting and outlier removal all ask "which points are
+near here?" for many locations at once. The field is cut into square tiles
+(processing.lidar.GridSpec cells) and point indices are bucketed by tile in
+two streaming passes. Each tile, when first queried, gets:
+
+- a scipy.spatial.cKDTree for exact radius and nearest-neighbour queries;
+- a VoxelHash (built on the first box query): points sorted by packed voxel
+  key with CSR offsets, used for coarse bucketing and box queries.
+
+Only the most recently used tiles are kept, so index memory is bounded by the
+tile size rather than the size of the field. Queries are batched: radius and
+box queries return CSR-style (offsets, indices) arrays, where the neighbours of
+query i are indices[offsets[i]:offsets[i + 1]]; kNN returns (Q, k) arrays.
+All returned indices are row numbers in the indexed point array.
+"""
+
+from collections import OrderedDict
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+from processing.lidar import GridSpec
+from processing.point_lod import pack_voxel_index, unpack_voxel_keys, voxel_keys
+
+# Default tile edge (m); a 50 m tile of dense UAV LiDAR holds a few million points
+DEFAULT_TILE_SIZE = 50.0
+
+# Default voxel edge of the per-tile hash (m)
+DEFAULT_VOXEL_SIZE = 1.0
+
+# Tiles kept loaded at once
+DEFAULT_MAX_TILES = 16
+
+# Points bucketed per pass when building
+DEFAULT_CHUNK_SIZE = 5_000_000
+
+def csr_from_pairs(query_ids, point_ids, n_queries, distances=None):
+    """
+    Group (query, point) pairs into CSR arrays sorted by query, then point.
+    Returns (offsets, indices) or (offsets, indices, distances).
+    """
+    order = np.lexsort((point_ids, query_ids))
+    counts = np.bincount(query_ids, minlength=n_queries)
+    offsets = np.zeros(n_queries + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+    indices = np.asarray(point_ids, dtype=np.int64)[order]
+    if distances is None:
+        return offsets, indices
+    return offsets, indices, np.asarray(distances)[order]
+
+def _gather_ranges(starts, stops):
+    """
+    Concatenate the integer ranges [starts[i], stops[i]) without a Python loop.
+    """
+    lengths = stops - starts
+    total = int(lengths.sum())
+    if not total:
+        return np.empty(0, dtype=np.int64)
+    shifts = np.repeat(starts - np.r_[0, np.cumsum(lengths)[:-1]], lengths)
+    return np.arange(total, dtype=np.int64) + shifts
+
+class VoxelHash:
+    """
+    Points bucketed by voxel: sorted unique voxel keys with CSR offsets into a
+    point permutation.
+    """
+
+    def __init__(self, points, voxel_size=DEFAULT_VOXEL_SIZE, origin=None):
+        points = np.asarray(points, dtype=np.float64)
+        self.points = points
+        self.voxel_size = float(voxel_size)
+        if origin is None:
+            origin = points.min(axis=0) if len(points) else np.zeros(3)
+        self.origin = np.asarray(origin, dtype=np.float64)
+        self.upper = points.max(axis=0) if len(points) else self.origin.copy()
+        keys = voxel_keys(points[:, 0], points[:, 1], points[:, 2], self.origin, self.voxel_size)
+        self.order = np.argsort(keys)
+        sorted_keys = keys[self.order]
+        starts = np.flatnonzero(np.r_[True, sorted_keys[1:] != sorted_keys[:-1]]) if keys.size else np.empty(0, int)
+        self.keys = sorted_keys[starts]
+        self.offsets = np.r_[starts, keys.size].astype(np.int64)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def query_box(self, low, high):
+        """
+        Return local indices of points with low <= point <= high on every axis.
+        `low` and `high` may give only x and y, in which case z is unbounded.
+        """
+        if not len(self.keys):
+            return np.empty(0, dtype=np.int64)
+        low = np.r_[low, [-np.inf] * (3 - len(low))]
+        high = np.r_[high, [np.inf] * (3 - len(high))]
+        extent = np.floor((self.upper - self.origin) / self.voxel_size).astype(np.int64)
+        first = np.clip(np.floor((low - self.origin) / self.voxel_size), 0, extent).astype(np.int64)
+        last = np.clip(np.floor((high - self.origin) / self.voxel_size), 0, extent).astype(np.int64)
+        if np.any(high < low) or np.any(high < self.origin) or np.any(low > self.upper):
+            return np.empty(0, dtype=np.int64)
+
+        n_box_voxels = int(np.prod(last - first + 1))
+        if n_box_voxels < len(self.keys):
+            # Look up each voxel of the box in the sorted keys
+            axes = [np.arange(first[axis], last[axis] + 1) for axis in range(3)]
+            ix, iy, iz = (grid.ravel() for grid in np.meshgrid(*axes, indexing="ij"))
+            wanted = pack_voxel_index(ix, iy, iz)
+            position = np.searchsorted(self.keys, wanted)
+            found = position < len(self.keys)
+            found[found] = self.keys[position[found]] == wanted[found]
+            buckets = position[found]
+        else:
+            # The box spans more voxels than are occupied: scan the occupied ones
+            ix, iy, iz = unpack_voxel_keys(self.keys)
+            inside = ((ix >= first[0]) & (ix <= last[0]) & (iy >= first[1]) & (iy <= last[1])
+                      & (iz >= first[2]) & (iz <= last[2]))
+            buckets = np.flatnonzero(inside)
+
+        candidates = self.order[_gather_ranges(self.offsets[buckets], self.offsets[buckets + 1])]
+        # Voxels on the box edge are only partly inside, so test the points exactly
+        inside = np.all((self.points[candidates] >= low) & (self.points[candidates] <= high), axis=1)
+        return np.sort(candidates[inside])
+
+class _Tile:
+    """
+    The points of one tile with their KD-tree and (built on first use) voxel hash.
+    """
+
+    def __init__(self, rows, points, voxel_size, leafsize):
+        self.rows = rows
+        self.points = points
+        self.voxel_size = voxel_size
+        # Sliding-midpoint splits build about twice as fast as balanced median splits
+        self.tree = cKDTree(points, leafsize=leafsize, balanced_tree=False, compact_nodes=False)
+        self._hash = None
+
+    @property
+    def hash(self):
+        if self._hash is None:
+            self._hash = VoxelHash(self.points, self.voxel_size)
+        return self._hash
+
+class SpatialIndex:
+    """
+    A tiled radius / kNN / box index over an (N, 3) point array or memmap.
+    """
+
+    def __init__(self, points, tile_size=DEFAULT_TILE_SIZE, voxel_size=DEFAULT_VOXEL_SIZE,
+                 max_tiles=DEFAULT_MAX_TILES, leafsize=16, chunk_size=DEFAULT_CHUNK_SIZE, bounds=None):
+        """
+        Bucket point rows by tile. `bounds` (xmin, ymin, xmax, ymax) avoids a
+        pass over the points when it is already known, e.g. from a LAS header.
+        """
+        self.points = points
+        self.voxel_size = float(voxel_size)
+        self.max_tiles = int(max_tiles)
+        self.leafsize = int(leafsize)
+        self.chunk_size = int(chunk_size)
+        n_points = len(points)
+
+        if bounds is None:
+            low = np.full(2, np.inf)
+            high = np.full(2, -np.inf)
+            for start in range(0, n_points, chunk_size):
+                chunk = np.asarray(points[start:start + chunk_size])[:, :2]
+                low = np.minimum(low, chunk.min(axis=0))
+                high = np.maximum(high, chunk.max(axis=0))
+            bounds = (*low, *high) if n_points else (0.0, 0.0, 0.0, 0.0)
+        self.tiles = GridSpec.from_bounds(*bounds, tile_size)
+
+        # Pass 1: points per tile; pass 2: scatter row numbers into tile order
+        n_tiles = self.tiles.rows * self.tiles.cols
+        counts = np.zeros(n_tiles, dtype=np.int64)
+        for start, tile_ids in self._iter_tile_ids():
+            counts += np.bincount(tile_ids, minlength=n_tiles)
+        self.offsets = np.zeros(n_tiles + 1, dtype=np.int64)
+        np.cumsum(counts, out=self.offsets[1:])
+
+        row_dtype = np.int32 if n_points < 2**31 else np.int64
+        self.order = np.empty(n_points, dtype=row_dtype)
+        cursor = self.offsets[:-1].copy()
+        for start, tile_ids in self._iter_tile_ids():
+            order = np.argsort(tile_ids, kind="stable")
+            sorted_ids = tile_ids[order]
+            first = np.flatnonzero(np.r_[True, sorted_ids[1:] != sorted_ids[:-1]])
+            lengths = np.diff(np.r_[first, sorted_ids.size])
+            tiles = sorted_ids[first]
+            # Rows stay ascending within each tile, so tile reads are sequential
+            self.order[_gather_ranges(cursor[tiles], cursor[tiles] + lengths)] = order + start
+            cursor[tiles] += lengths
+
+        self._loaded = OrderedDict()
+
+    def _iter_tile_ids(self):
+        for start in range(0, len(self.points), self.chunk_size):
+            chunk = np.asarray(self.points[start:start + self.chunk_size])
+            yield start, self._tile_of(chunk[:, 0], chunk[:, 1])
+
+    def _tile_of(self, x, y):
+        # Points on or past the far edge belong to the last tile
+        col = np.clip(np.floor((x - self.tiles.x0) / self.tiles.cell_size), 0, self.tiles.cols - 1)
+        row = np.clip(np.floor((y - self.tiles.y0) / self.tiles.cell_size), 0, self.tiles.rows - 1)
+        return row.astype(np.int64) * self.tiles.cols + col.astype(np.int64)
+
+    def __len__(self):
+        return len(self.points)
+
+    @property
+    def n_tiles(self):
+        return self.tiles.rows * self.tiles.cols
+
+    def tile_rows(self, tile_id):
+        """
+        Return the ascending row numbers of the points in a tile.
+        """
+        return self.order[self.offsets[tile_id]:self.offsets[tile_id + 1]].astype(np.int64)
+
+    def tile(self, tile_id):
+        """
+        Return the loaded tile (building its hash and tree on first use), or None if empty.
+        """
+        tile = self._loaded.get(tile_id)
+        if tile is not None:
+            self._loaded.move_to_end(tile_id)
+            return tile
+        rows = self.tile_rows(tile_id)
+        if not rows.size:
+            return None
+        points = np.asarray(self.points[rows], dtype=np.float64)[:, :3]
+        tile = _Tile(rows, points, self.voxel_size, self.leafsize)
+        self._loaded[tile_id] = tile
+        while len(self._loaded) > self.max_tiles:
+            self._loaded.popitem(last=False)
+        return tile
+
+    def _tiles_near(self, low, high):
+        """
+        Tile ids whose area intersects the xy rectangle [low, high].
+        """
+        cell = self.tiles.cell_size
+        first_col, first_row = (np.floor((np.asarray(low) - (self.tiles.x0, self.tiles.y0)) / cell)).astype(int)
+        last_col, last_row = (np.floor((np.asarray(high) - (self.tiles.x0, self.tiles.y0)) / cell)).astype(int)
+        cols = np.arange(max(first_col, 0), min(last_col, self.tiles.cols - 1) + 1)
+        rows = np.arange(max(first_row, 0), min(last_row, self.tiles.rows - 1) + 1)
+        return (rows[:, None] * self.tiles.cols + cols[None, :]).ravel()
+
+    def _group_queries(self, queries):
+        """
+        Yield (tile id, query positions) for queries grouped by the tile they fall in.
+        """
+        tile_ids = self._tile_of(queries[:, 0], queries[:, 1])
+        order = np.argsort(tile_ids, kind="stable")
+        sorted_ids = tile_ids[order]
+        starts = np.flatnonzero(np.r_[True, sorted_ids[1:] != sorted_ids[:-1]])
+        for start, stop in zip(starts, np.r_[starts[1:], order.size]):
+            yield sorted_ids[start], order[start:stop]
+
+    def query_radius(self, queries, radius, return_distance=False):
+        """
+        Find all points within `radius` (3-D distance) of each query point.
+        Returns CSR (offsets, indices[, distances]) with indices sorted per query.
+        """
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float64))
+        query_ids, point_ids, distances = [], [], []
+        for _, positions in self._group_queries(queries):
+            group = queries[positions]
+            group_tree = cKDTree(group)
+            low = group[:, :2].min(axis=0) - radius
+            high = group[:, :2].max(axis=0) + radius
+            for tile_id in self._tiles_near(low, high):
+                tile = self.tile(tile_id)
+                if tile is None:
+                    continue
+                # Sparse pair search returns flat (query, point, distance) arrays directly
+                pairs = group_tree.sparse_distance_matrix(tile.tree, radius, output_type="ndarray")
+                query_ids.append(positions[pairs["i"]])
+                point_ids.append(tile.rows[pairs["j"]])
+                distances.append(pairs["v"])
+
+        if query_ids:
+            query_ids, point_ids, distances = map(np.concatenate, (query_ids, point_ids, distances))
+        else:
+            query_ids = point_ids = np.empty(0, dtype=np.int64)
+            distances = np.empty(0)
+        result = csr_from_pairs(query_ids, point_ids, len(queries), distances)
+        return result if return_distance else result[:2]
+
+    def query_knn(self, queries, k):
+        """
+        Find the `k` nearest points (3-D distance) of each query point.
+        Returns (distances, indices) of shape (Q, k), nearest first; missing
+        neighbours (fewer than k points in the field) have distance inf and index -1.
+        """
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float64))
+        distances = np.full((len(queries), k), np.inf)
+        indices = np.full((len(queries), k), -1, dtype=np.int64)
+        cell = self.tiles.cell_size
+
+        for tile_id, positions in self._group_queries(queries):
+            row, col = divmod(int(tile_id), self.tiles.cols)
+            pending = positions
+            ring = 0
+            while pending.size:
+                group = queries[pending]
+                rows = np.arange(max(row - ring, 0), min(row + ring, self.tiles.rows - 1) + 1)
+                cols = np.arange(max(col - ring, 0), min(col + ring, self.tiles.cols - 1) + 1)
+                best_d, best_i = self._knn_over((rows[:, None] * self.tiles.cols + cols).ravel(), group, k)
+
+                # Exact once the k-th neighbour is closer than any tile outside the block
+                block_low = np.array([self.tiles.x0 + cols[0] * cell, self.tiles.y0 + rows[0] * cell])
+                block_high = np.array([self.tiles.x0 + (cols[-1] + 1) * cell, self.tiles.y0 + (rows[-1] + 1) * cell])
+                open_low = np.array([cols[0] > 0, rows[0] > 0])
+                open_high = np.array([cols[-1] < self.tiles.cols - 1, rows[-1] < self.tiles.rows - 1])
+                margin = np.minimum(
+                    np.where(open_low, group[:, :2] - block_low, np.inf),
+                    np.where(open_high, block_high - group[:, :2], np.inf),
+                ).min(axis=1)
+                done = best_d[:, -1] <= margin
+                distances[pending[done]] = best_d[done]
+                indices[pending[done]] = best_i[done]
+                pending = pending[~done]
+                ring += 1
+        return distances, indices
+
+    def _knn_over(self, tile_ids, group, k):
+        """
+        Merge the k nearest points of each query over several tiles.
+        """
+        candidate_d = [np.full((len(group), k), np.inf)]
+        candidate_i = [np.full((len(group), k), -1, dtype=np.int64)]
+        for tile_id in tile_ids:
+            tile = self.tile(tile_id)
+            if tile is None:
+                continue
+            tile_k = min(k, len(tile.rows))
+            d, i = tile.tree.query(group, k=tile_k)
+            d, i = d.reshape(len(group), tile_k), i.reshape(len(group), tile_k)
+            candidate_d.append(d)
+            candidate_i.append(tile.rows[i])
+        d = np.concatenate(candidate_d, axis=1)
+        i = np.concatenate(candidate_i, axis=1)
+        nearest = np.argsort(d, axis=1, kind="stable")[:, :k]
+        return np.take_along_axis(d, nearest, axis=1), np.take_along_axis(i, nearest, axis=1)
+
+    def query_box(self, lows, highs):
+        """
+        Find the points inside each axis-aligned box.
+        `lows` and `highs` are (B, 2) or (B, 3) arrays; with two columns z is unbounded.
+        Returns CSR (offsets, indices) with indices sorted per box.
+        """
+        lows = np.atleast_2d(np.asarray(lows, dtype=np.float64))
+        highs = np.atleast_2d(np.asarray(highs, dtype=np.float64))
+        box_ids, point_ids = [], []
+        for box, (low, high) in enumerate(zip(lows, highs)):
+            for tile_id in self._tiles_near(low[:2], high[:2]):
+                tile = self.tile(tile_id)
+                if tile is None:
+                    continue
+                local = tile.hash.query_box(low, high)
+                box_ids.append(np.full(local.size, box, dtype=np.int64))
+                point_ids.append(tile.rows[local])
+        if box_ids:
+            return csr_from_pairs(np.concatenate(box_ids), np.concatenate(point_ids), len(lows))
+        return csr_from_pairs(np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), len(lows))
@@ -0,0 +1,452 @@
+"""
+XYZ tile pyramid and size-capped disk tile cache for index rasters.
+
+A full-field NDVI or NDRE raster is far too large to send to the browser on
+every rerun. Instead the raster is cut into TILE_SIZE square tiles addressed
+as {z}/{x}/{y}: the highest zoom shows source pixels one to one, and every
+lower zoom halves the resolution until zoom 0 fits in one tile. Tiles are
+rendered through a colour map into PNG (or WebP) with no-data pixels
+transparent, and a map view fetches only the tiles in its viewport.
+
+TilePyramid.update() keeps the pyramid in step with its source raster:
+
+- the source is hashed in tile-sized blocks and compared with the hashes
+  stored at the last update, so only blocks whose pixels changed are dirty;
+- float32 overview rasters (one `.npy` per zoom below the highest) are
+  rebuilt only under dirty blocks, each from the 2x2 NaN-aware mean of the
+  zoom above;
+- dirty tiles, and tiles missing from the cache, are rendered into it (with
+  render=False stale tiles are dropped and rendered on first request).
+
+Hashing, overview blocks and tile rendering run on a thread pool (NumPy,
+hashlib and the OpenCV encoders release the GIL). Encoded tiles live in a
+TileCache bounded in bytes and evicted least recently used; evicted tiles are
+re-rendered from the overviews when requested again.
+
+Example:
+    python -m processing.tiles ndvi.npy --colormap RdYlGn --vmin 0 --vmax 1 --workers 8
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from processing.multispectral import BandRaster, create_output, write_strip
+
+TILE_SIZE = 256
+
+TILE_CACHE_DIR = os.environ.get(
+    "PA_TILE_CACHE", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "tile_cache")
+)
+
+# Encoded tiles kept on disk; a 256 x 256 index tile is 20-120 KB as PNG
+DEFAULT_MAX_BYTES = 512 * 2**20
+
+# Colour map stops (position, RGB)
+COLORMAPS = {
+    "RdYlGn": ((0.0, (165, 0, 38)), (0.25, (244, 109, 67)), (0.5, (255, 255, 191)),
+               (0.75, (102, 189, 99)), (1.0, (0, 104, 55))),
+    "viridis": ((0.0, (68, 1, 84)), (0.25, (59, 82, 139)), (0.5, (33, 145, 140)),
+                (0.75, (94, 201, 98)), (1.0, (253, 231, 37))),
+}
+
+def colormap_lut(name, size=256):
+    """
+    Return a (size, 4) uint8 lookup table in OpenCV's BGRA order.
+    """
+    try:
+        stops = COLORMAPS[name]
+    except KeyError:
+        raise ValueError(f"Unknown colour map {name!r}; choose from {sorted(COLORMAPS)}") from None
+    positions = np.array([position for position, _ in stops])
+    colours = np.array([colour for _, colour in stops], dtype=np.float64)
+    grid = np.linspace(0, 1, size)
+    lut = np.empty((size, 4), dtype=np.uint8)
+    for channel, rgb in enumerate((2, 1, 0)):
+        lut[:, channel] = np.rint(np.interp(grid, positions, colours[:, rgb]))
+    lut[:, 3] = 255
+    return lut
+
+def colorize(values, lut, vmin, vmax):
+    """
+    Map a 2-D float array to BGRA through `lut`; NaN pixels are transparent.
+    """
+    scale = (len(lut) - 1) / (vmax - vmin)
+    index = np.nan_to_num((values - vmin) * scale, nan=-1.0)
+    np.clip(index, -1, len(lut) - 1, out=index)
+    rgba = lut[np.maximum(index, 0).astype(np.intp)]
+    rgba[np.isnan(values), 3] = 0
+    return rgba
+
+def downsample(window):
+    """
+    Halve a 2-D float window by 2x2 NaN-aware means; odd edges are padded with NaN.
+    """
+    rows, cols = window.shape
+    padded = np.full((rows + rows % 2, cols + cols % 2), np.nan, dtype=np.float32)
+    padded[:rows, :cols] = window
+    blocks = padded.reshape(padded.shape[0] // 2, 2, padded.shape[1] // 2, 2)
+    valid = ~np.isnan(blocks)
+    total = np.where(valid, blocks, 0).sum(axis=(1, 3))
+    count = valid.sum(axis=(1, 3))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(count > 0, total / count, np.nan).astype(np.float32)
+
+class TileCache:
+    """
+    Encoded tiles on disk under `directory`, capped at `max_bytes` and evicted
+    least recently used. Keys are relative paths such as "ndvi/abc/3/2/5.png".
+    """
+
+    def __init__(self, directory=TILE_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = os.fspath(directory)
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._scan()
+
+    def _scan(self):
+        """
+        Index tiles left by earlier processes, oldest access first.
+        """
+        found = []
+        tiles = os.path.join(self.directory, "tiles")
+        for root, _, files in os.walk(tiles):
+            for name in files:
+                path = os.path.join(root, name)
+                stat = os.stat(path)
+                found.append((stat.st_mtime, os.path.relpath(path, tiles), stat.st_size))
+        for _, key, size in sorted(found):
+            self._entries[key] = size
+            self.nbytes += size
+        # Apply the size cap from the start, not only on the next put()
+        self._remove_files(self._evict(keep=0))
+
+    def _evict(self, keep=1):
+        """
+        Drop least recently used entries until the cache fits `max_bytes`,
+        keeping at least `keep` entries; returns the dropped keys. Call with
+        the lock held.
+        """
+        evicted = []
+        while self.nbytes > self.max_bytes and len(self._entries) > keep:
+            old, size = self._entries.popitem(last=False)
+            self.nbytes -= size
+            evicted.append(old)
+        return evicted
+
+    def _remove_files(self, keys):
+        for key in keys:
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
+
+    def _path(self, key):
+        return os.path.join(self.directory, "tiles", key)
+
+    def get(self, key):
+        """
+        Return the encoded tile stored under `key`, or None.
+        """
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            # Evicted by another thread or process sharing the directory
+            self._forget(key)
+            return None
+        try:
+            # Record the access so recency survives a restart
+            os.utime(path)
+        except FileNotFoundError:
+            # Evicted after it was read; the tile read is still good
+            self._forget(key)
+        return data
+
+    def _forget(self, key):
+        with self._lock:
+            self.nbytes -= self._entries.pop(key, 0)
+
+    def put(self, key, data):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temporary = f"{path}.{threading.get_ident()}.tmp"
+        with open(temporary, "wb") as f:
+            f.write(data)
+        os.replace(temporary, path)
+        with self._lock:
+            self.nbytes += len(data) - self._entries.pop(key, 0)
+            self._entries[key] = len(data)
+            evicted = self._evict()
+        self._remove_files(evicted)
+
+    def remove(self, keys):
+        """
+        Remove the given tiles; returns how many were cached.
+        """
+        with self._lock:
+            keys = [key for key in keys if key in self._entries]
+            for key in keys:
+                self.nbytes -= self._entries.pop(key)
+        self._remove_files(keys)
+        return len(keys)
+
+    def discard(self, prefix, keep=None):
+        """
+        Remove every tile whose key starts with `prefix`, except those starting with `keep`.
+        """
+        with self._lock:
+            keys = [key for key in self._entries if key.startswith(prefix) and not (keep and key.startswith(keep))]
+        return self.remove(keys)
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def info(self):
+        with self._lock:
+            return {
+                "tiles": len(self._entries),
+                "nbytes": self.nbytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+class TilePyramid:
+    """
+    Zoom pyramid of colour-mapped tiles over one single-band index raster.
+    """
+
+    def __init__(self, source, cache=None, colormap="RdYlGn", vmin=0.0, vmax=1.0, fmt="png",
+                 tile_size=TILE_SIZE, workers=4):
+        self.source = BandRaster.open(source)
+        if fmt not in ("png", "webp"):
+            raise ValueError("Tiles are encoded as png or webp")
+        self.cache = TileCache() if cache is None else cache
+        self.colormap, self.vmin, self.vmax, self.fmt = colormap, float(vmin), float(vmax), fmt
+        self.lut = colormap_lut(colormap)
+        self.tile_size = tile_size
+        self.workers = workers
+        self.max_zoom = max(0, math.ceil(math.log2(max(self.source.shape) / tile_size)))
+
+        path = os.path.abspath(self.source.path)
+        name = os.path.splitext(os.path.basename(path))[0]
+        self.layer = f"{name}-{hashlib.blake2b(path.encode(), digest_size=4).hexdigest()}"
+        style = json.dumps([colormap, self.vmin, self.vmax, fmt, tile_size])
+        self.style = hashlib.blake2b(style.encode(), digest_size=4).hexdigest()
+        self.overview_dir = os.path.join(self.cache.directory, "overviews", self.layer)
+        self._levels = {}
+
+    def level_shape(self, zoom):
+        factor = 2 ** (self.max_zoom - zoom)
+        return tuple(-(-size // factor) for size in self.source.shape)
+
+    def grid(self, zoom):
+        """
+        Return the (rows, columns) of tiles at `zoom`.
+        """
+        return tuple(-(-size // self.tile_size) for size in self.level_shape(zoom))
+
+    def _level(self, zoom):
+        """
+        The raster backing `zoom`: the source at the highest zoom, an overview below.
+        """
+        if zoom == self.max_zoom:
+            return self.source
+        level = self._levels.get(zoom)
+        if level is None:
+            path = os.path.join(self.overview_dir, f"z{zoom}.npy")
+            if os.path.exists(path) and BandRaster.open(path).shape == self.level_shape(zoom):
+                level = BandRaster.open(path)
+            else:
+                os.makedirs(self.overview_dir, exist_ok=True)
+                level = create_output(path, self.level_shape(zoom))
+            self._levels[zoom] = level
+        return level
+
+    def _read(self, zoom, row, col, rows, cols):
+        level = self._level(zoom)
+        stop = min(row + rows, level.shape[0])
+        strip = level.read_strip(row, stop)
+        window = np.array(strip[:, col:min(col + cols, level.shape[1])], dtype=np.float32)
+        del strip
+        return window
+
+    def _hash_strip(self, tile_row):
+        size = self.tile_size
+        row = tile_row * size
+        strip = self.source.read_strip(row, min(row + size, self.source.shape[0]))
+        digests = [
+            int.from_bytes(hashlib.blake2b(np.ascontiguousarray(strip[:, col:col + size]).tobytes(),
+                                           digest_size=8).digest(), "little")
+            for col in range(0, self.source.shape[1], size)
+        ]
+        del strip
+        return np.array(digests, dtype=np.uint64)
+
+    def _build_overview_tile(self, zoom, x, y):
+        size = self.tile_size
+        window = self._read(zoom + 1, 2 * y * size, 2 * x * size, 2 * size, 2 * size)
+        block = downsample(window)
+        level = self._level(zoom)
+        row, col = y * size, x * size
+        target = write_strip(level, row, row + block.shape[0])
+        target[:, col:col + block.shape[1]] = block
+        target.flush()
+        del target
+
+    def key(self, zoom, x, y):
+        return f"{self.layer}/{self.style}/{zoom}/{x}/{y}.{self.fmt}"
+
+    def render(self, zoom, x, y):
+        """
+        Render and cache one tile; returns the encoded bytes.
+        """
+        size = self.tile_size
+        values = np.full((size, size), np.nan, dtype=np.float32)
+        window = self._read(zoom, y * size, x * size, size, size)
+        values[:window.shape[0], :window.shape[1]] = window
+        ok, encoded = cv2.imencode(f".{self.fmt}", colorize(values, self.lut, self.vmin, self.vmax))
+        if not ok:
+            raise RuntimeError(f"Could not encode tile {zoom}/{x}/{y}")
+        data = encoded.tobytes()
+        self.cache.put(self.key(zoom, x, y), data)
+        return data
+
+    def tile(self, zoom, x, y):
+        """
+        Return tile {zoom}/{x}/{y} as encoded bytes (from the cache, rendering
+        it on a miss), or None outside the pyramid.
+        """
+        if not 0 <= zoom <= self.max_zoom:
+            return None
+        rows, cols = self.grid(zoom)
+        if not (0 <= x < cols and 0 <= y < rows):
+            return None
+        data = self.cache.get(self.key(zoom, x, y))
+        return data if data is not None else self.render(zoom, x, y)
+
+    def tiles_in_view(self, zoom, centre, size):
+        """
+        Return [(x, y, left, top), ...] for the tiles a viewport of `size`
+        (width, height) pixels centred on `centre` (column, row, in pixels of
+        `zoom`) overlaps, with each tile's offset inside the viewport.
+        """
+        rows, cols = self.grid(zoom)
+        left = centre[0] - size[0] / 2
+        top = centre[1] - size[1] / 2
+        first_x = max(int(left // self.tile_size), 0)
+        last_x = min(int((left + size[0] - 1) // self.tile_size), cols - 1)
+        first_y = max(int(top // self.tile_size), 0)
+        last_y = min(int((top + size[1] - 1) // self.tile_size), rows - 1)
+        return [
+            (x, y, int(round(x * self.tile_size - left)), int(round(y * self.tile_size - top)))
+            for y in range(first_y, last_y + 1)
+            for x in range(first_x, last_x + 1)
+        ]
+
+    def update(self, render=True):
+        """
+        Bring overviews (and, with render=True, cached tiles) up to date with
+        the source raster, touching only blocks whose source pixels changed.
+        Returns counts of changed source blocks, rebuilt overview tiles and
+        rendered tiles, and the elapsed seconds.
+        """
+        began = time.perf_counter()
+        os.makedirs(self.overview_dir, exist_ok=True)
+        manifest_path = os.path.join(self.overview_dir, "blocks.npy")
+        rows, cols = self.grid(self.max_zoom)
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            hashes = np.stack(list(pool.map(self._hash_strip, range(rows))))
+            previous = np.load(manifest_path) if os.path.exists(manifest_path) else None
+            if previous is not None and previous.shape == hashes.shape:
+                dirty = hashes != previous
+            else:
+                dirty = np.ones(hashes.shape, dtype=bool)
+            changed = int(dirty.sum())
+            if changed:
+                # Source pixels changed: tiles cached in other styles are stale too
+                self.cache.discard(f"{self.layer}/", keep=f"{self.layer}/{self.style}/")
+
+            dirty_by_zoom = {self.max_zoom: dirty}
+            rebuilt = 0
+            for zoom in range(self.max_zoom - 1, -1, -1):
+                above = dirty_by_zoom[zoom + 1]
+                padded = np.zeros(self.grid(zoom), dtype=bool).repeat(2, axis=0).repeat(2, axis=1)
+                padded[:above.shape[0], :above.shape[1]] = above
+                mask = padded.reshape(padded.shape[0] // 2, 2, padded.shape[1] // 2, 2).any(axis=(1, 3))
+                # Levels are written in place; a fresh overview is dirty everywhere
+                if not os.path.exists(os.path.join(self.overview_dir, f"z{zoom}.npy")):
+                    mask[:] = True
+                self._level(zoom)
+                tiles = np.argwhere(mask)
+                list(pool.map(lambda tile, zoom=zoom: self._build_overview_tile(zoom, tile[1], tile[0]), tiles))
+                dirty_by_zoom[zoom] = mask
+                rebuilt += len(tiles)
+
+            rendered = 0
+            if render:
+                # Dirty tiles and any not in the cache yet (first build, evicted)
+                tiles = [
+                    (zoom, x, y)
+                    for zoom, mask in dirty_by_zoom.items()
+                    for y, x in np.ndindex(*mask.shape)
+                    if mask[y, x] or self.key(zoom, x, y) not in self.cache
+                ]
+                list(pool.map(lambda tile: self.render(*tile), tiles))
+                rendered = len(tiles)
+            else:
+                # Drop stale tiles of this style; they are re-rendered on request
+                self.cache.remove([self.key(zoom, x, y) for zoom, mask in dirty_by_zoom.items()
+                                   for y, x in np.argwhere(mask)])
+        np.save(manifest_path, hashes)
+        return {
+            "changed_blocks": changed,
+            "overview_tiles": rebuilt,
+            "rendered_tiles": rendered,
+            "seconds": time.perf_counter() - began,
+        }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build or update the tile pyramid of an index raster.")
+    parser.add_argument("source", help="single-band .npy index raster")
+    parser.add_argument("--colormap", choices=sorted(COLORMAPS), default="RdYlGn")
+    parser.add_argument("--vmin", type=float, default=0.0)
+    parser.add_argument("--vmax", type=float, default=1.0)
+    parser.add_argument("--format", choices=("png", "webp"), default="png")
+    parser.add_argument("--cache-dir", default=TILE_CACHE_DIR)
+    parser.add_argument("--max-mb", type=float, default=DEFAULT_MAX_BYTES / 2**20)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args(argv)
+
+    cache = TileCache(args.cache_dir, int(args.max_mb * 2**20))
+    pyramid = TilePyramid(args.source, cache, args.colormap, args.vmin, args.vmax, args.format,
+                          workers=args.workers)
+    stats = pyramid.update()
+    print(f"zoom 0-{pyramid.max_zoom}: {stats['changed_blocks']} changed blocks, {stats['overview_tiles']} overview "
+          f"tiles, {stats['rendered_tiles']} tiles rendered in {stats['seconds']:.2f} s; "
+          f"cache {cache.info()['nbytes'] / 2**20:.1f} MB")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,330 @@
+"""
+Zonal statistics of value rasters over a label raster of fields or zones.
+
+A label raster assigns every pixel a zone id (0 or negative outside every
+zone). For each value raster (NDRE, CHM, N estimate, ...) and each zone the
+engine computes pixel count, sum, mean, standard deviation, minimum, maximum
+and approximate percentiles, skipping NaN (no-data) values:
+
+- the rasters are read one memory-mapped window at a time, and the zones in a
+  window are renumbered densely so per-window arrays stay small however many
+  zones the raster holds;
+- count, sum and the squared deviations come from np.bincount;
+- minimum and maximum are reduced over runs of equal labels first (zones are
+  contiguous, so a window holds far fewer runs than pixels) and the runs are
+  then grouped by zone with one sort;
+- percentiles are read off fixed-bin histograms per zone over each value's
+  range, interpolated within the bin and clipped to the zone's exact min/max.
+
+Every window produces a partial ZonalStats that is merged into the total
+(counts and histograms add, means and variances combine with Chan's update),
+so row ranges can be processed in parallel and results from separate tiles or
+runs can be merged afterwards.
+
+Example:
+    python -m processing.zonal --labels fields.npy --value ndre=ndre.npy \\
+        --value chm=chm.npy --percentile 10 50 90 --out field_stats.csv
+"""
+
+import argparse
+import csv
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from processing.multispectral import DEFAULT_WINDOW, BandRaster, iter_windows
+
+# Histogram bins per zone and value; percentiles resolve to 1/256 of the range
+DEFAULT_BINS = 256
+
+DEFAULT_PERCENTILES = (10, 50, 90)
+
+# Rows sampled to estimate a value range when none is given
+RANGE_SAMPLE_ROWS = 64
+
+def value_range(raster, sample_rows=RANGE_SAMPLE_ROWS):
+    """
+    Estimate the (min, max) of a BandRaster from evenly spaced rows.
+    """
+    lows, highs = [], []
+    for row in np.unique(np.linspace(0, raster.shape[0] - 1, sample_rows).astype(np.int64)):
+        strip = raster.read_strip(row, row + 1)
+        if np.isnan(strip).all():
+            continue
+        lows.append(np.nanmin(strip))
+        highs.append(np.nanmax(strip))
+        del strip
+    if not lows:
+        return 0.0, 1.0
+    low, high = float(min(lows)), float(max(highs))
+    return (low, high) if high > low else (low, low + 1.0)
+
+def _group_runs(labels, values):
+    """
+    Return (zones, min, max) of `values` grouped by consecutive runs of equal
+    `labels`, then by zone. NaN values are ignored.
+    """
+    starts = np.flatnonzero(np.r_[True, labels[1:] != labels[:-1]])
+    run_min = np.fmin.reduceat(values, starts)
+    run_max = np.fmax.reduceat(values, starts)
+    run_labels = labels[starts]
+    order = np.argsort(run_labels, kind="stable")
+    run_labels = run_labels[order]
+    groups = np.flatnonzero(np.r_[True, run_labels[1:] != run_labels[:-1]])
+    return (
+        run_labels[groups],
+        np.fmin.reduceat(run_min[order], groups),
+        np.fmax.reduceat(run_max[order], groups),
+    )
+
+class ZonalStats:
+    """
+    Mergeable per-zone statistics of one or more value rasters.
+
+    Arrays are indexed by zone id. `pixels` counts labelled pixels per zone;
+    the per-value `count` excludes NaN values.
+    """
+
+    def __init__(self, ranges, bins=DEFAULT_BINS):
+        self.ranges = {name: (float(low), float(high)) for name, (low, high) in ranges.items()}
+        self.bins = int(bins)
+        self.pixels = np.zeros(0, dtype=np.int64)
+        self.stats = {name: self._empty(0) for name in self.ranges}
+
+    @property
+    def names(self):
+        return tuple(self.ranges)
+
+    @property
+    def n_zones(self):
+        return self.pixels.size
+
+    def _empty(self, n_zones):
+        return {
+            "count": np.zeros(n_zones, dtype=np.int64),
+            "mean": np.zeros(n_zones),
+            "m2": np.zeros(n_zones),
+            "min": np.full(n_zones, np.inf),
+            "max": np.full(n_zones, -np.inf),
+            "hist": np.zeros((n_zones, self.bins), dtype=np.int64),
+        }
+
+    def _grow(self, n_zones):
+        if n_zones <= self.n_zones:
+            return
+        # Grow geometrically; windows meet new zone ids one at a time
+        n_zones = max(n_zones, 2 * self.n_zones)
+        self.pixels = np.r_[self.pixels, np.zeros(n_zones - self.n_zones, dtype=np.int64)]
+        for name, stats in self.stats.items():
+            extra = self._empty(n_zones - stats["count"].size)
+            for key in stats:
+                stats[key] = np.concatenate([stats[key], extra[key]])
+
+    def _merge_at(self, zones, pixels, partial):
+        """
+        Merge per-zone partial statistics for the zone ids in `zones`.
+        """
+        self._grow(int(zones.max()) + 1 if zones.size else 0)
+        self.pixels[zones] += pixels
+        for name, stats in self.stats.items():
+            other = partial[name]
+            count_a, count_b = stats["count"][zones], other["count"]
+            total = count_a + count_b
+            safe = np.maximum(total, 1)
+            delta = other["mean"] - stats["mean"][zones]
+            stats["mean"][zones] += delta * count_b / safe
+            stats["m2"][zones] += other["m2"] + delta * delta * count_a * count_b / safe
+            stats["count"][zones] = total
+            stats["min"][zones] = np.minimum(stats["min"][zones], other["min"])
+            stats["max"][zones] = np.maximum(stats["max"][zones], other["max"])
+            stats["hist"][zones] += other["hist"]
+        return self
+
+    def merge(self, other):
+        """
+        Merge another ZonalStats with the same values, ranges and bins into this one.
+        """
+        if other.ranges != self.ranges or other.bins != self.bins:
+            raise ValueError("Zonal statistics differ in values, ranges or bins")
+        return self._merge_at(np.arange(other.n_zones), other.pixels, other.stats)
+
+    def add(self, labels, values):
+        """
+        Accumulate one window: an integer label array and a dict of value name
+        -> array of the same shape.
+        """
+        labels = np.asarray(labels).ravel()
+        inside = labels > 0
+        if not inside.all():
+            keep = np.flatnonzero(inside)
+            labels = labels[keep]
+        else:
+            keep = None
+        if not labels.size:
+            return self
+
+        # Renumber the window's zones 0..k-1 so every per-window array has k rows
+        pixels = np.bincount(labels)
+        zones = np.flatnonzero(pixels)
+        local = np.zeros(pixels.size, dtype=np.intp)
+        local[zones] = np.arange(zones.size)
+        local = local[labels]
+        k = zones.size
+
+        partial = {}
+        for name, (low, high) in self.ranges.items():
+            window = np.asarray(values[name]).ravel()
+            window = window[keep] if keep is not None else window
+            valid = ~np.isnan(window)
+            stats = self._empty(k)
+            if valid.all():
+                group, data = local, window
+            else:
+                group, data = local[valid], window[valid]
+            if data.size:
+                count = np.bincount(group, minlength=k)
+                mean = np.bincount(group, weights=data, minlength=k) / np.maximum(count, 1)
+                deviation = data - mean[group]
+                stats["count"] = count
+                stats["mean"] = mean
+                stats["m2"] = np.bincount(group, weights=deviation * deviation, minlength=k)
+                present, stats_min, stats_max = _group_runs(local, window)
+                stats["min"][present] = stats_min
+                stats["max"][present] = stats_max
+                # All-NaN zones reduce to NaN; keep them empty
+                np.nan_to_num(stats["min"], copy=False, nan=np.inf)
+                np.nan_to_num(stats["max"], copy=False, nan=-np.inf)
+                scale = self.bins / (high - low)
+                bins = np.clip(((data - low) * scale).astype(np.intp), 0, self.bins - 1)
+                stats["hist"] = np.bincount(group * self.bins + bins, minlength=k * self.bins).reshape(k, self.bins)
+            partial[name] = stats
+        return self._merge_at(zones, pixels[zones], partial)
+
+    def percentiles(self, name, percentiles=DEFAULT_PERCENTILES):
+        """
+        Approximate percentiles of `name` per zone as a (zones, len(percentiles))
+        array, NaN for zones without values.
+        """
+        stats = self.stats[name]
+        low, high = self.ranges[name]
+        width = (high - low) / self.bins
+        cumulative = np.cumsum(stats["hist"], axis=1)
+        result = np.full((self.n_zones, len(percentiles)), np.nan)
+        for column, percentile in enumerate(percentiles):
+            target = stats["count"] * (percentile / 100.0)
+            # First bin whose cumulative count reaches the target, then interpolate within it
+            index = np.minimum((cumulative < target[:, None]).sum(axis=1), self.bins - 1)
+            rows = np.arange(self.n_zones)
+            below = np.where(index > 0, cumulative[rows, np.maximum(index - 1, 0)], 0)
+            in_bin = np.maximum(stats["hist"][rows, index], 1)
+            fraction = np.clip((target - below) / in_bin, 0, 1)
+            result[:, column] = np.clip(low + (index + fraction) * width, stats["min"], stats["max"])
+        result[stats["count"] == 0] = np.nan
+        return result
+
+    def table(self, percentiles=DEFAULT_PERCENTILES):
+        """
+        Return a dict of columns with one row per zone that has labelled pixels:
+        zone, pixels and <value>_count, _sum, _mean, _std, _min, _max, _p<q>.
+        """
+        zones = np.flatnonzero(self.pixels)
+        columns = {"zone": zones, "pixels": self.pixels[zones]}
+        for name, stats in self.stats.items():
+            count = stats["count"][zones]
+            empty = count == 0
+            mean = np.where(empty, np.nan, stats["mean"][zones])
+            columns[f"{name}_count"] = count
+            columns[f"{name}_sum"] = np.where(empty, 0.0, mean) * count
+            columns[f"{name}_mean"] = mean
+            columns[f"{name}_std"] = np.sqrt(stats["m2"][zones] / np.maximum(count, 1))
+            columns[f"{name}_std"][empty] = np.nan
+            columns[f"{name}_min"] = np.where(empty, np.nan, stats["min"][zones])
+            columns[f"{name}_max"] = np.where(empty, np.nan, stats["max"][zones])
+            values = self.percentiles(name, percentiles)[zones]
+            for column, percentile in enumerate(percentiles):
+                columns[f"{name}_p{percentile:g}"] = values[:, column]
+        return columns
+
+def _open(raster):
+    return raster if isinstance(raster, BandRaster) else BandRaster.open(raster)
+
+def _zonal_rows(labels, values, ranges, bins, window, row_start, row_stop):
+    """
+    Statistics of rows [row_start, row_stop), one window at a time.
+    """
+    result = ZonalStats(ranges, bins)
+    for rows, cols in iter_windows((row_stop - row_start, labels.shape[1]), window):
+        rows = slice(rows.start + row_start, rows.stop + row_start)
+        # Map only this window's rows and drop the mappings before the next one
+        label_strip = labels.read_strip(rows.start, rows.stop)
+        strips = {name: raster.read_strip(rows.start, rows.stop) for name, raster in values.items()}
+        result.add(label_strip[:, cols], {name: strip[:, cols] for name, strip in strips.items()})
+        del label_strip, strips
+    return result
+
+def zonal_statistics(labels, values, ranges=None, bins=DEFAULT_BINS, window=DEFAULT_WINDOW, workers=1):
+    """
+    Compute zonal statistics of value rasters over a label raster.
+
+    labels:  path or BandRaster of integer zone ids (<= 0 outside every zone).
+    values:  dict of value name -> path or BandRaster, same shape as labels.
+    ranges:  optional dict of value name -> (low, high) histogram range for the
+             percentiles; missing ranges are estimated from sampled rows.
+    With workers > 1, row ranges are processed in parallel processes and merged.
+    Returns a ZonalStats; call .table() for the per-zone columns.
+    """
+    labels = _open(labels)
+    values = {name: _open(raster) for name, raster in values.items()}
+    for name, raster in values.items():
+        if raster.shape != labels.shape:
+            raise ValueError(f"Value raster {name} is {raster.shape}, labels are {labels.shape}")
+    ranges = dict(ranges or {})
+    for name, raster in values.items():
+        if name not in ranges:
+            ranges[name] = value_range(raster)
+    ranges = {name: ranges[name] for name in values}
+
+    bounds = np.linspace(0, labels.shape[0], max(1, workers) + 1).astype(np.int64)
+    tasks = [(labels, values, ranges, bins, window, int(start), int(stop))
+             for start, stop in zip(bounds[:-1], bounds[1:]) if stop > start]
+    result = ZonalStats(ranges, bins)
+    if workers <= 1:
+        for task in tasks:
+            result.merge(_zonal_rows(*task))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for future in [pool.submit(_zonal_rows, *task) for task in tasks]:
+                result.merge(future.result())
+    return result
+
+def write_table(path, columns):
+    """
+    Write a dict of equal-length columns to a CSV file.
+    """
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(list(columns))
+        writer.writerows(zip(*(np.asarray(column).tolist() for column in columns.values())))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--labels", required=True, help="integer zone raster (.npy or TIFF)")
+    parser.add_argument("--value", action="append", required=True, metavar="NAME=PATH")
+    parser.add_argument("--range", action="append", default=[], metavar="NAME=LOW,HIGH",
+                        help="histogram range for a value's percentiles (default: sampled)")
+    parser.add_argument("--percentile", type=float, nargs="+", default=list(DEFAULT_PERCENTILES))
+    parser.add_argument("--bins", type=int, default=DEFAULT_BINS)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--out", required=True, help="output CSV")
+    args = parser.parse_args(argv)
+
+    values = dict(item.split("=", 1) for item in args.value)
+    ranges = {name: tuple(float(part) for part in bounds.split(","))
+              for name, bounds in (item.split("=", 1) for item in args.range)}
+    stats = zonal_statistics(args.labels, values, ranges, args.bins, workers=args.workers)
+    table = stats.table(args.percentile)
+    write_table(args.out, table)
+    print(f"{table['zone'].size} zones x {len(values)} values -> {args.out}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,302 @@
+"""
+Management-zone delineation from stacked per-pixel features.
+
+Feature rasters of the same shape (NDRE and other indices, canopy height,
+nitrogen estimates) are clustered into K management zones for variable-rate
+application:
+
+- sample: a few thousand rows spread over the raster are read and random
+  pixels drawn from them, so fitting reads a small part of the data;
+- fit: features are standardized and clustered with scikit-learn's
+  MiniBatchKMeans; zones are numbered 1..K in ascending order of the first
+  feature's cluster centre (zone 1 is the lowest NDRE when NDRE comes first);
+- apply: the raster is processed one window at a time with a halo around it.
+  Each pixel goes to its nearest cluster centre, a majority filter smooths
+  the zone map, and slivers (connected patches smaller than `min_area`
+  pixels) are absorbed by the nearest surrounding zone. Patches that reach
+  the edge of the haloed window are kept, since they may continue beyond it;
+- summary: per-zone statistics of every feature are accumulated with
+  processing.zonal in the same pass.
+
+Pixels where any feature is NaN get zone 0. Memory depends on the window size
+and the sample size, not on the raster, and row ranges run in parallel
+processes.
+
+Example:
+    python -m processing.zoning --feature ndre=ndre.npy --feature chm=chm.npy \\
+        --zones 4 --out zones.npy --table zones.csv --workers 4
+"""
+
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from scipy import ndimage
+from sklearn.cluster import MiniBatchKMeans
+
+from processing.multispectral import DEFAULT_WINDOW, BandRaster, check_band_shapes, create_output, iter_windows, write_strip
+from processing.zonal import ZonalStats, value_range, write_table
+
+DEFAULT_ZONES = 4
+
+# Pixels drawn for fitting and the rows they are drawn from
+DEFAULT_SAMPLE_SIZE = 200_000
+SAMPLE_ROWS = 2048
+
+# Majority filter width and smallest kept patch (pixels)
+DEFAULT_SMOOTH = 5
+DEFAULT_MIN_AREA = 400
+
+class ZoneModel:
+    """
+    Standardization and K cluster centres, with zones ordered by the first
+    feature's centre.
+    """
+
+    def __init__(self, features, mean, scale, centres, weights=None):
+        self.features = tuple(features)
+        self.mean = np.asarray(mean, dtype=np.float32)
+        self.scale = np.asarray(scale, dtype=np.float32)
+        self.centres = np.asarray(centres, dtype=np.float32)
+        self.weights = np.ones(len(self.features), dtype=np.float32) if weights is None else \
+            np.asarray(weights, dtype=np.float32)
+
+    @property
+    def n_zones(self):
+        return len(self.centres)
+
+    @classmethod
+    def fit(cls, features, sample, n_zones=DEFAULT_ZONES, weights=None, seed=0):
+        """
+        Cluster an (N, F) sample of the named features into `n_zones` zones.
+        `weights` scales each standardized feature's influence.
+        """
+        sample = np.asarray(sample, dtype=np.float64)
+        if len(sample) < n_zones:
+            raise ValueError(f"Need at least {n_zones} valid sample pixels, got {len(sample)}")
+        mean = sample.mean(axis=0)
+        scale = sample.std(axis=0)
+        scale[scale == 0] = 1.0
+        weights = np.ones(sample.shape[1]) if weights is None else np.asarray(weights, dtype=np.float64)
+        kmeans = MiniBatchKMeans(n_clusters=n_zones, batch_size=4096, n_init=3, random_state=seed)
+        kmeans.fit((sample - mean) / scale * weights)
+        centres = kmeans.cluster_centers_[np.argsort(kmeans.cluster_centers_[:, 0])]
+        return cls(features, mean, scale, centres, weights)
+
+    def centres_in_units(self):
+        """
+        Return the cluster centres in feature units as a dict of name -> (K,) array.
+        """
+        centres = self.centres / self.weights * self.scale + self.mean
+        return {name: centres[:, column] for column, name in enumerate(self.features)}
+
+    def predict(self, stack):
+        """
+        Return zone ids (uint8, 1..K, 0 where a feature is NaN) for a
+        (..., F) feature stack.
+        """
+        # Nearest centre by |c|^2 - 2 x.c, with the standardization folded into
+        # one (F, K) projection so each pixel costs a single small matmul
+        projection = (self.weights / self.scale)[:, None] * self.centres.T
+        offset = np.square(self.centres).sum(axis=1) + 2 * (self.mean @ projection)
+        scores = offset - 2 * (stack @ projection)
+        zones = scores.argmin(axis=-1).astype(np.uint8) + 1
+        # NaN features propagate into every score
+        zones[np.isnan(scores[..., 0])] = 0
+        return zones
+
+def sample_features(rasters, sample_size=DEFAULT_SAMPLE_SIZE, sample_rows=SAMPLE_ROWS, seed=0):
+    """
+    Draw up to `sample_size` pixels without NaN features from randomly chosen
+    rows of a dict of BandRasters. Returns an (N, F) float32 array.
+    """
+    rows, cols = check_band_shapes(rasters)
+    rng = np.random.default_rng(seed)
+    chosen = np.sort(rng.choice(rows, min(rows, sample_rows), replace=False))
+    per_row = -(-sample_size // len(chosen))
+    samples = []
+    for row in chosen:
+        columns = rng.integers(0, cols, per_row)
+        values = []
+        for raster in rasters.values():
+            strip = raster.read_strip(row, row + 1)
+            values.append(np.asarray(strip[0, columns], dtype=np.float32))
+            del strip
+        samples.append(np.column_stack(values))
+    sample = np.concatenate(samples)
+    return sample[~np.isnan(sample).any(axis=1)][:sample_size]
+
+def majority_filter(zones, size, n_zones):
+    """
+    Replace each zone id by the most common id in its `size` x `size`
+    neighbourhood; zone 0 (no data) is left as is and never spreads.
+    """
+    if size <= 1:
+        return zones
+    result = zones.copy()
+    best = np.zeros(zones.shape, dtype=np.float32)
+    for zone in range(1, n_zones + 1):
+        share = ndimage.uniform_filter((zones == zone).astype(np.float32), size, mode="nearest")
+        more = share > best
+        result[more] = zone
+        best[more] = share[more]
+    result[zones == 0] = 0
+    return result
+
+def remove_slivers(zones, min_area, n_zones, open_edges=(True, True, True, True)):
+    """
+    Give connected patches smaller than `min_area` pixels the zone of their
+    nearest larger neighbour. Patches touching an open edge (top, bottom,
+    left, right) are kept, since they may continue outside the array.
+    """
+    if min_area <= 1:
+        return zones
+    edges = [side for side, is_open in zip((np.s_[0, :], np.s_[-1, :], np.s_[:, 0], np.s_[:, -1]), open_edges)
+             if is_open]
+    small = np.zeros(zones.shape, dtype=bool)
+    for zone in range(1, n_zones + 1):
+        patches, count = ndimage.label(zones == zone)
+        if not count:
+            continue
+        keep = np.bincount(patches.ravel(), minlength=count + 1) >= min_area
+        keep[0] = True
+        for side in edges:
+            keep[patches[side]] = True
+        small |= ~keep[patches]
+    source = (zones > 0) & ~small
+    if not small.any() or not source.any():
+        return zones
+    # Fill each cluster of slivers from the nearest kept pixel within one pixel
+    # of its bounding box; clusters enclosed by no-data are left as they are
+    result = zones.copy()
+    clusters, _ = ndimage.label(small)
+    for cluster, box in enumerate(ndimage.find_objects(clusters), start=1):
+        box = tuple(slice(max(side.start - 1, 0), side.stop + 1) for side in box)
+        if not source[box].any():
+            continue
+        indices = ndimage.distance_transform_edt(~source[box], return_distances=False, return_indices=True)
+        inside = clusters[box] == cluster
+        result[box][inside] = zones[box][tuple(indices)][inside]
+    return result
+
+def _zone_rows(rasters, model, out, ranges, smooth, min_area, window, row_start, row_stop):
+    """
+    Zone rows [row_start, row_stop) one haloed window at a time, writing into
+    `out` and returning the ZonalStats of the features over the new zones.
+    """
+    rows_total, cols_total = out.shape
+    radius = smooth // 2
+    # The halo lets slivers near the window edge be measured whole; the extra
+    # radius is cut off after smoothing, where the filter saw only part of it
+    halo = int(np.ceil(np.sqrt(min_area))) + 1
+    pad = halo + radius
+    stats = ZonalStats(ranges)
+    for rows, cols in iter_windows((row_stop - row_start, cols_total), window):
+        rows = slice(rows.start + row_start, rows.stop + row_start)
+        top, bottom = max(rows.start - pad, 0), min(rows.stop + pad, rows_total)
+        left, right = max(cols.start - pad, 0), min(cols.stop + pad, cols_total)
+        strips = {name: raster.read_strip(top, bottom) for name, raster in rasters.items()}
+        stack = np.stack([np.asarray(strip[:, left:right], dtype=np.float32) for strip in strips.values()], axis=-1)
+        del strips
+
+        zones = majority_filter(model.predict(stack), smooth, model.n_zones)
+        inner = (
+            slice(radius if top > 0 else 0, zones.shape[0] - (radius if bottom < rows_total else 0)),
+            slice(radius if left > 0 else 0, zones.shape[1] - (radius if right < cols_total else 0)),
+        )
+        zones = remove_slivers(zones[inner], min_area, model.n_zones,
+                               (top > 0, bottom < rows_total, left > 0, right < cols_total))
+        # Offset of the window core within the trimmed, haloed array
+        row0 = rows.start - top - inner[0].start
+        col0 = cols.start - left - inner[1].start
+        core = zones[row0:row0 + rows.stop - rows.start, col0:col0 + cols.stop - cols.start]
+        stack = stack[inner][row0:row0 + core.shape[0], col0:col0 + core.shape[1]]
+
+        target = write_strip(out, rows.start, rows.stop)
+        target[:, cols] = core
+        target.flush()
+        del target
+        stats.add(core, {name: stack[..., column] for column, name in enumerate(rasters)})
+    return stats
+
+def delineate_zones(features, out_path, n_zones=DEFAULT_ZONES, smooth=DEFAULT_SMOOTH, min_area=DEFAULT_MIN_AREA,
+                    weights=None, sample_size=DEFAULT_SAMPLE_SIZE, window=DEFAULT_WINDOW, workers=1, seed=0):
+    """
+    Cluster feature rasters into management zones and write a uint8 zone raster.
+
+    features: dict of feature name -> path or BandRaster, all the same shape;
+              the first feature orders the zones.
+    weights:  optional dict of feature name -> weight of its standardized values.
+    Returns a dict with the zone raster "path", the fitted "model", the
+    per-zone "table" (processing.zonal columns plus "share" of zoned pixels),
+    the sample size and the elapsed seconds.
+    """
+    began = time.perf_counter()
+    rasters = {name: raster if isinstance(raster, BandRaster) else BandRaster.open(raster)
+               for name, raster in features.items()}
+    shape = check_band_shapes(rasters)
+    if n_zones > 255:
+        raise ValueError("At most 255 zones fit a uint8 zone raster")
+    weights = None if weights is None else [float(weights.get(name, 1.0)) for name in rasters]
+
+    sample = sample_features(rasters, sample_size, seed=seed)
+    model = ZoneModel.fit(list(rasters), sample, n_zones, weights, seed)
+    ranges = {}
+    for column, name in enumerate(rasters):
+        low, high = np.min(sample[:, column]), np.max(sample[:, column])
+        ranges[name] = (float(low), float(high)) if high > low else value_range(rasters[name])
+
+    os.makedirs(os.path.dirname(os.path.abspath(out_path)), exist_ok=True)
+    out = create_output(out_path, shape, np.uint8)
+    bounds = np.linspace(0, shape[0], max(1, workers) + 1).astype(np.int64)
+    tasks = [(rasters, model, out, ranges, smooth, min_area, window, int(start), int(stop))
+             for start, stop in zip(bounds[:-1], bounds[1:]) if stop > start]
+    stats = ZonalStats(ranges)
+    if workers <= 1:
+        for task in tasks:
+            stats.merge(_zone_rows(*task))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for future in [pool.submit(_zone_rows, *task) for task in tasks]:
+                stats.merge(future.result())
+
+    table = stats.table()
+    table["share"] = table["pixels"] / max(int(table["pixels"].sum()), 1)
+    return {
+        "path": out.path,
+        "model": model,
+        "table": table,
+        "sample_size": len(sample),
+        "seconds": time.perf_counter() - began,
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--feature", action="append", required=True, metavar="NAME=PATH",
+                        help="feature raster; the first one orders the zones")
+    parser.add_argument("--weight", action="append", default=[], metavar="NAME=WEIGHT")
+    parser.add_argument("--zones", type=int, default=DEFAULT_ZONES)
+    parser.add_argument("--smooth", type=int, default=DEFAULT_SMOOTH, help="majority filter width (pixels)")
+    parser.add_argument("--min-area", type=int, default=DEFAULT_MIN_AREA, help="smallest kept patch (pixels)")
+    parser.add_argument("--sample-size", type=int, default=DEFAULT_SAMPLE_SIZE)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", required=True, help="output zone raster (.npy)")
+    parser.add_argument("--table", help="optional per-zone summary CSV")
+    args = parser.parse_args(argv)
+
+    features = dict(item.split("=", 1) for item in args.feature)
+    weights = {name: float(value) for name, value in (item.split("=", 1) for item in args.weight)}
+    result = delineate_zones(features, args.out, args.zones, args.smooth, args.min_area, weights or None,
+                             args.sample_size, workers=args.workers, seed=args.seed)
+    if args.table:
+        write_table(args.table, result["table"])
+    for zone, share in zip(result["table"]["zone"], result["table"]["share"]):
+        centre = ", ".join(f"{name} {values[zone - 1]:.3g}" for name, values in result["model"].centres_in_units().items())
+        print(f"zone {zone}: {share:6.1%} of pixels, centre {centre}")
+    print(f"{result['path']} in {result['seconds']:.1f} s")
+
+if __name__ == "__main__":
+    main()
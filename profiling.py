@@ -0,0 +1,259 @@
+"""
+Opt-in render profiler for the Streamlit pages.
+
+Enabled by the PA_PROFILE=1 environment variable or the `?profile=1` query
+parameter. app.py runs every page inside profile_page(), which calls
+start_page() before the page script and finish_page() after it. While a
+profiled page runs, the profiler records:
+
+- the page script's total run time;
+- for every st.plotly_chart call: the figure's build time (from creating the
+  figure, or the previous chart, to the chart call), the time and payload
+  size of its JSON serialization, and the time of the chart call itself;
+- for every call of a data accessor (the public functions of ACCESSOR_MODULES)
+  made by the page: its run time. Calls nested inside another accessor are
+  counted in the outer call only.
+
+finish_page() shows the records and the figure cache hit rate (figure_cache)
+in a sidebar panel and appends them as JSON lines to PROFILE_LOG for offline
+analysis. The timing hooks are installed when a profiled run starts and the
+original functions restored when the last concurrent profiled run finishes,
+so runs without profiling never go through them. With profiling off,
+start_page() and finish_page() do nothing.
+"""
+
+import contextlib
+import functools
+import importlib
+import inspect
+import json
+import os
+import sys
+import threading
+import time
+
+import streamlit as st
+
+from figure_cache import figure_cache_info
+
+PROFILE_ENV = "PA_PROFILE"
+PROFILE_LOG = os.environ.get(
+    "PA_PROFILE_LOG", os.path.join(os.path.dirname(os.path.abspath(__file__)), "profile_log.jsonl")
+)
+
+# Modules whose public functions are timed as data accessors
+ACCESSOR_MODULES = ("data.biomass_data", "data.nitrogen_data", "data.growth_stages", "data.model_metrics")
+
+_state = threading.local()
+_hooks_lock = threading.Lock()
+_log_lock = threading.Lock()
+# Profiled runs in progress and the (owner, name, original) of each hook
+_hook_users = 0
+_originals = []
+
+class PageProfile:
+    """
+    Records of one page run.
+    """
+
+    def __init__(self, page):
+        self.page = page
+        self.started = time.perf_counter()
+        self.last_chart = self.started
+        self.records = []
+        self.accessor_depth = 0
+
+    def record(self, kind, name, **metrics):
+        self.records.append({"kind": kind, "name": name, **metrics})
+
+def is_enabled():
+    """
+    Return True if profiling is requested by environment or query parameter.
+    """
+    if os.environ.get(PROFILE_ENV, "").lower() in ("1", "true", "yes"):
+        return True
+    try:
+        return st.query_params.get("profile") in ("1", "true")
+    except Exception:
+        # No script run context (e.g. imported outside `streamlit run`)
+        return False
+
+def active_profile():
+    """
+    Return the PageProfile of the page running in this thread, or None.
+    """
+    return getattr(_state, "profile", None)
+
+def start_page(page):
+    """
+    Start profiling a run of the named page if profiling is enabled. Call
+    before the page script runs, so the data accessors it imports are the
+    timed ones.
+    """
+    _state.profile = None
+    if not is_enabled():
+        return None
+    _install_hooks()
+    _state.profile = PageProfile(page)
+    return _state.profile
+
+def finish_page():
+    """
+    Finish the current page run: remove the hooks, record the run's total
+    time, log the records and show them in the sidebar.
+    """
+    profile = _stop()
+    if profile is None:
+        return None
+    profile.record("page", profile.page, total_ms=(time.perf_counter() - profile.started) * 1e3)
+    cache = figure_cache_info()
+    profile.record("figure_cache", "FIGURE_CACHE", **{key: cache[key] for key in ("hits", "misses", "size", "nbytes")})
+    _append_log(profile)
+    _render_panel(profile)
+    return profile
+
+@contextlib.contextmanager
+def profile_page(page):
+    """
+    Profile the page run in the `with` block if profiling is enabled. A run
+    that raises (including st.stop() and reruns) is discarded, but its hooks
+    are still removed.
+    """
+    start_page(page)
+    try:
+        yield
+    except BaseException:
+        _stop()
+        raise
+    finish_page()
+
+def _stop():
+    profile = active_profile()
+    if profile is None:
+        return None
+    _state.profile = None
+    _remove_hooks()
+    return profile
+
+def _install_hooks():
+    global _hook_users
+    with _hooks_lock:
+        _hook_users += 1
+        if _hook_users > 1:
+            return
+        from plotly.basedatatypes import BaseFigure
+        from streamlit.delta_generator import DeltaGenerator
+
+        _wrap(BaseFigure, "__init__", _timed_figure_init)
+        # st.plotly_chart is a method bound to the main container at import,
+        # so it is wrapped on its own; containers use the class method
+        _wrap(DeltaGenerator, "plotly_chart", functools.partial(_timed_plotly_chart, figure_arg=1))
+        _wrap(st, "plotly_chart", functools.partial(_timed_plotly_chart, figure_arg=0))
+        for module_name in ACCESSOR_MODULES:
+            module = importlib.import_module(module_name)
+            for name, func in inspect.getmembers(module, inspect.isfunction):
+                if not name.startswith("_") and func.__module__ == module_name:
+                    _wrap(module, name, _timed_accessor)
+
+def _wrap(owner, name, make_wrapper):
+    original = getattr(owner, name)
+    _originals.append((owner, name, original))
+    setattr(owner, name, make_wrapper(original))
+
+def _remove_hooks():
+    global _hook_users
+    with _hooks_lock:
+        _hook_users -= 1
+        if _hook_users:
+            return
+        while _originals:
+            owner, name, original = _originals.pop()
+            setattr(owner, name, original)
+
+def _timed_figure_init(init):
+    @functools.wraps(init)
+    def wrapper(self, *args, **kwargs):
+        init(self, *args, **kwargs)
+        self._profile_created = time.perf_counter()
+    return wrapper
+
+def _timed_plotly_chart(plotly_chart, figure_arg):
+    @functools.wraps(plotly_chart)
+    def wrapper(*args, **kwargs):
+        profile = active_profile()
+        if profile is None:
+            return plotly_chart(*args, **kwargs)
+        figure_or_data = args[figure_arg] if len(args) > figure_arg else kwargs["figure_or_data"]
+
+        called = time.perf_counter()
+        # Figures cached across reruns were built before this run
+        created = max(getattr(figure_or_data, "_profile_created", called), profile.last_chart)
+        began = time.perf_counter()
+        payload = figure_or_data.to_json() if hasattr(figure_or_data, "to_json") else json.dumps(figure_or_data)
+        serialized = time.perf_counter()
+        result = plotly_chart(*args, **kwargs)
+        finished = time.perf_counter()
+
+        caller = sys._getframe(1)
+        title = _figure_title(figure_or_data)
+        name = f"{os.path.basename(caller.f_code.co_filename)}:{caller.f_lineno}"
+        profile.record(
+            "figure", f"{name} {title}".strip(),
+            build_ms=(called - created) * 1e3,
+            json_ms=(serialized - began) * 1e3,
+            chart_ms=(finished - serialized) * 1e3,
+            payload_bytes=len(payload.encode()),
+        )
+        profile.last_chart = time.perf_counter()
+        return result
+    return wrapper
+
+def _figure_title(figure):
+    try:
+        return figure.layout.title.text or ""
+    except AttributeError:
+        return ""
+
+def _timed_accessor(func):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        profile = active_profile()
+        if profile is None or profile.accessor_depth:
+            return func(*args, **kwargs)
+        profile.accessor_depth += 1
+        began = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            profile.accessor_depth -= 1
+            profile.record("accessor", f"{func.__module__}.{func.__name__}",
+                           total_ms=(time.perf_counter() - began) * 1e3)
+    return wrapper
+
+def _append_log(profile):
+    timestamp = time.strftime("%Y-%m-%dT%H:%M:%S")
+    lines = [json.dumps({"time": timestamp, "page": profile.page, **record}) for record in profile.records]
+    with _log_lock:
+        with open(PROFILE_LOG, "a") as f:
+            f.write("\n".join(lines) + "\n")
+
+def _render_panel(profile):
+    import pandas as pd
+
+    records = [record for record in profile.records if record["kind"] != "figure_cache"]
+    table = pd.DataFrame(records, columns=[
+        "kind", "name", "total_ms", "build_ms", "json_ms", "chart_ms", "payload_bytes",
+    ]).round(2)
+    page_ms = table.loc[table["kind"] == "page", "total_ms"].iloc[0]
+    figures = table[table["kind"] == "figure"]
+    cache = figure_cache_info()
+    with st.sidebar.expander("Render profile", expanded=True):
+        st.caption(
+            f"{profile.page}: {page_ms:.0f} ms, {len(figures)} figures, "
+            f"{figures['payload_bytes'].sum() / 1024:.0f} KB of figure JSON. Logged to {PROFILE_LOG}."
+        )
+        st.caption(
+            f"Figure cache: {cache['hit_rate']:.0%} hit rate ({cache['hits']} hits, {cache['misses']} misses), "
+            f"{cache['size']} figures, {cache['nbytes'] / 2**20:.1f} MB."
+        )
+        st.dataframe(table, hide_index=True, use_container_width=True)
@@ -1,5 +1,29 @@
+import html
+import importlib
+import sys
+import types
+
 import streamlit as st
 
+class LazyModule(types.ModuleType):
+    """Stand-in for a module that is imported on first attribute access."""
+
+    def __getattr__(self, attr):
+        module = importlib.import_module(self.__name__)
+        return getattr(module, attr)
+
+def lazy_import(name):
+    """Return module `name`, deferring the import until it is first used.
+
+    Pages bind their heavy libraries (plotly, pandas, numpy) with this, so
+    text above the first chart renders before those libraries load and
+    unused ones are never imported.
+    """
+    module = sys.modules.get(name)
+    return module if module is not None else LazyModule(name)
+
+growth_stages = lazy_import("data.growth_stages")
+
 def local_css(file_name):
     """Apply local CSS styles."""
     with open(file_name) as f:
@@ -11,18 +35,26 @@ def display_tooltip(text, tooltip_text):
     <span class="tooltiptext">{tooltip_text}</span>
     </span>"""
 
+def remote_image(url, caption=None):
+    """Display an image by URL at container width, loaded by the browser.
+
+    st.image imports numpy to marshal any image, even a URL; this keeps
+    text pages free of numeric libraries.
+    """
+    caption_html = (
+        f'<figcaption style="text-align:center;font-size:14px;opacity:0.6">{html.escape(caption)}</figcaption>'
+        if caption else ""
+    )
+    st.markdown(
+        f'<figure style="margin:0 0 1rem 0"><img src="{html.escape(url)}" style="width:100%">{caption_html}</figure>',
+        unsafe_allow_html=True,
+    )
+
 def create_term_definition(term, definition):
     """Create an expandable term definition for the glossary."""
     with st.expander(term):
         st.markdown(definition)
 
 def get_sugarcane_growth_stage(days_after_harvest):
-    """Return the growth stage based on days after harvest (DAH)."""
-    if days_after_harvest < 100:
-        return "Early Growth Stage"
-    elif days_after_harvest < 180:
-        return "Mid Growth Stage"
-    elif days_after_harvest < 250:
-        return "Late Growth Stage"
-    else:
-        return "Maturation Stage"
+    """Return the four-stage growth stage based on days after harvest (DAH)."""
+    return growth_stages.get_growth_stage_label(days_after_harvest, table="four_stage")